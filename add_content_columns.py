@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+为假设内容添加标题列（由触发器维护）
+
+- hypothesis.title（来自 hypothesis_content）
+- predefined_comparisons.title_en / title_zh（来自 hypothesis_content_en / hypothesis_content_zh）
+- 标题列是普通列：添加时用 json_extract 填好，之后由 INSERT / UPDATE OF 内容列 的触发器更新，
+  读取标题（例如 /admin/ratings 的 LEFT JOIN）只读这一列，不读取、解析整个JSON；
+  (topic, title) 上的索引存储了标题，只需要标题的查询可以直接走覆盖索引
+- SQLite 不能用 ALTER TABLE 添加 STORED 生成列；旧版本添加的 VIRTUAL 生成列
+  （读取时对每一行执行 json_extract）会自动换成普通列
+- 非法JSON（例如重建脚本写入的数字）对应的标题为 NULL；
+  内容被 content_compression.py 压缩为BLOB时触发器不更新标题，保留压缩前的值
+
+用法:
+    python add_content_columns.py [--db hypothesis_data.db]
+    python add_content_columns.py --benchmark [--runs 20]
+"""
+
+import argparse
+import json
+import sqlite3
+import time
+
+# 配置数据库路径
+DB_PATH = "hypothesis_data.db"
+
+# 表 -> [(标题列, 内容列, JSON路径)]
+CONTENT_COLUMNS = {
+    'hypothesis': [('title', 'hypothesis_content', '$.title')],
+    'predefined_comparisons': [
+        ('title_en', 'hypothesis_content_en', '$.title'),
+        ('title_zh', 'hypothesis_content_zh', '$.title'),
+    ],
+}
+
+# 索引名 -> (表, 列)
+CONTENT_INDEXES = {
+    'idx_hypothesis_topic_title': ('hypothesis', 'topic, title'),
+    'idx_predefined_topic_rank_titles': ('predefined_comparisons', 'topic_name, hypothesis_rank, title_en, title_zh'),
+}
+
+
+def title_sql(source, path):
+    return f"CASE WHEN json_valid({source}) THEN json_extract({source}, '{path}') END"
+
+
+def _trigger_names(table, name):
+    return f"{table}_{name}_insert", f"{table}_{name}_update"
+
+
+def _pending_changes(conn):
+    """需要添加或迁移的 (表, 列, 内容列, JSON路径, 是否为旧的生成列)，以及缺少的触发器、索引"""
+    tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    existing = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type IN ('trigger', 'index')")}
+
+    columns_to_add, triggers_to_add = [], []
+    for table, columns in CONTENT_COLUMNS.items():
+        if table not in tables:
+            continue
+        # table_xinfo 才会列出生成列；hidden：2 为 VIRTUAL 生成列，3 为 STORED 生成列
+        info = {column[1]: column[6] for column in conn.execute(f"PRAGMA table_xinfo({table})")}
+        for name, source, path in columns:
+            if source not in info:
+                continue
+            if name not in info or info[name] in (2, 3):
+                columns_to_add.append((table, name, source, path, name in info))
+            if not set(_trigger_names(table, name)) <= existing:
+                triggers_to_add.append((table, name, source, path))
+    indexes_to_add = [index for index, (table, _) in CONTENT_INDEXES.items()
+                      if table in tables and index not in existing]
+    return columns_to_add, triggers_to_add, indexes_to_add
+
+
+def ensure_content_columns(conn):
+    """
+    添加缺失的标题列、触发器与索引（可重复执行，都已存在时只读取表结构）；
+    predefined_comparisons 被重建后会重新添加。返回新增的列名列表
+    """
+    if not any(_pending_changes(conn)):
+        return []
+
+    # 多个进程同时添加：持有写锁后重新检查（调用方已在事务中时直接在该事务中执行）
+    own_transaction = not conn.in_transaction
+    if own_transaction:
+        conn.execute("BEGIN IMMEDIATE")
+    try:
+        columns_to_add, triggers_to_add, indexes_to_add = _pending_changes(conn)
+        added = []
+        for table, name, source, path, generated in columns_to_add:
+            if generated:
+                # 引用该列的索引需要先删除，下面重新创建
+                for index, (index_table, index_columns) in CONTENT_INDEXES.items():
+                    if index_table == table and name in [column.strip() for column in index_columns.split(',')]:
+                        conn.execute(f"DROP INDEX IF EXISTS {index}")
+                        if index not in indexes_to_add:
+                            indexes_to_add.append(index)
+                conn.execute(f"ALTER TABLE {table} DROP COLUMN {name}")
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN {name} TEXT")
+            conn.execute(f"UPDATE {table} SET {name} = {title_sql(source, path)}")
+            added.append(f"{table}.{name}")
+
+        for table, name, source, path in triggers_to_add:
+            insert, update = _trigger_names(table, name)
+            assign = f"UPDATE {table} SET {name} = {title_sql('NEW.' + source, path)} WHERE rowid = NEW.rowid;"
+            conn.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS {insert} AFTER INSERT ON {table}
+                WHEN typeof(NEW.{source}) != 'blob' BEGIN {assign} END
+            """)
+            conn.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS {update} AFTER UPDATE OF {source} ON {table}
+                WHEN typeof(NEW.{source}) != 'blob' BEGIN {assign} END
+            """)
+
+        for index in indexes_to_add:
+            table, columns = CONTENT_INDEXES[index]
+            conn.execute(f"CREATE INDEX IF NOT EXISTS {index} ON {table}({columns})")
+
+        if own_transaction:
+            conn.commit()
+    except Exception:
+        if own_transaction:
+            conn.rollback()
+        raise
+    return added
+
+
+def add_content_columns():
+    """为hypothesis、predefined_comparisons表添加标题列"""
+    try:
+        conn = sqlite3.connect(DB_PATH)
+        added = ensure_content_columns(conn)
+        if added:
+            print(f"✅ 成功添加标题列: {', '.join(added)}")
+        else:
+            print("ℹ️  标题列已存在")
+
+        for table, columns in CONTENT_COLUMNS.items():
+            titled = conn.execute(f"SELECT COUNT({columns[0][0]}), COUNT(*) FROM {table}").fetchone()
+            print(f"  - {table}: {titled[0]}/{titled[1]} 行有标题")
+
+        conn.close()
+        print("\n✅ 数据库更新完成")
+
+    except sqlite3.Error as e:
+        print(f"❌ 数据库操作错误: {e}")
+    except Exception as e:
+        print(f"❌ 未知错误: {e}")
+
+
+def _bytes_read():
+    """当前进程通过read系统调用读取的字节数（Linux /proc/self/io），不可用时返回None"""
+    try:
+        with open('/proc/self/io', 'r') as f:
+            for line in f:
+                if line.startswith('rchar:'):
+                    return int(line.split()[1])
+    except OSError:
+        return None
+    return None
+
+
+def _measure(db_path, runs, query, params, transform):
+    """每次使用新连接（SQLite页缓存为空），返回 (耗时中位数ms, 每次从文件读取的字节数, 返回给Python的字节数)"""
+    timings, file_bytes, result_bytes = [], [], 0
+    for _ in range(runs):
+        conn = sqlite3.connect(db_path)
+        before = _bytes_read()
+        start = time.perf_counter()
+        rows = conn.execute(query, params).fetchall()
+        titles = transform(rows)
+        timings.append((time.perf_counter() - start) * 1000)
+        after = _bytes_read()
+        if before is not None and after is not None:
+            file_bytes.append(after - before)
+        result_bytes = sum(len(str(value).encode('utf-8')) for row in rows for value in row)
+        conn.close()
+    timings.sort()
+    return timings[len(timings) // 2], (min(file_bytes) if file_bytes else None), result_bytes, len(titles)
+
+
+def benchmark(db_path, runs):
+    """对比：读取完整JSON再在Python中解析 vs 通过标题列/覆盖索引只读标题"""
+    conn = sqlite3.connect(db_path)
+    ensure_content_columns(conn)
+    topic = conn.execute("SELECT topic FROM hypothesis GROUP BY topic ORDER BY COUNT(*) DESC LIMIT 1").fetchone()
+    conn.close()
+    if topic is None:
+        print("⚠️  hypothesis表为空")
+        return
+
+    def parse_titles(rows):
+        titles = []
+        for row in rows:
+            try:
+                titles.append(json.loads(row[1]).get('title'))
+            except (TypeError, ValueError, AttributeError):
+                titles.append(None)
+        return titles
+
+    def plain_titles(rows):
+        return [row[1] for row in rows]
+
+    cases = [
+        ('一个主题的标题（JSON）', "SELECT id, hypothesis_content FROM hypothesis WHERE topic = ?", topic, parse_titles),
+        ('一个主题的标题（标题列）', "SELECT id, title FROM hypothesis WHERE topic = ?", topic, plain_titles),
+        ('全部标题（JSON）', "SELECT id, hypothesis_content FROM hypothesis", (), parse_titles),
+        # ORDER BY topic 让查询走 (topic, title) 覆盖索引，不读取表中的JSON所在的页
+        ('全部标题（标题列）', "SELECT id, title FROM hypothesis ORDER BY topic", (), plain_titles),
+    ]
+
+    print(f"📊 {db_path}（每项 {runs} 次，新连接，取中位数）\n")
+    print(f"{'查询':<24}{'耗时ms':>10}{'读取文件字节':>16}{'返回字节':>14}{'行数':>8}")
+    for label, query, params, transform in cases:
+        ms, file_bytes, result_bytes, count = _measure(db_path, runs, query, params, transform)
+        print(f"{label:<24}{ms:>10.2f}{file_bytes if file_bytes is not None else '-':>16}{result_bytes:>14}{count:>8}")
+
+    conn = sqlite3.connect(db_path)
+    for label, query, params, _ in cases[1::2]:
+        plan = conn.execute(f"EXPLAIN QUERY PLAN {query}", params).fetchall()
+        print(f"\n{label}: {'; '.join(row[-1] for row in plan)}")
+    conn.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='为假设内容添加标题列（触发器维护）')
+    parser.add_argument('--db', default=DB_PATH, help='数据库路径')
+    parser.add_argument('--benchmark', action='store_true', help='对比读取完整JSON与标题列的耗时和读取量')
+    parser.add_argument('--runs', type=int, default=20, help='性能测试次数')
+    args = parser.parse_args()
+
+    DB_PATH = args.db
+    if args.benchmark:
+        benchmark(args.db, args.runs)
+    else:
+        add_content_columns()
@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+管理页面实时推送（Server-Sent Events）
+
+- /admin/stream 推送新的评分（event: rating）、评论（event: comment）以及各主题计数（event: counters）
+- 按 rating_id / comment_id 水位线读取新行（主键范围查询），不扫描整张表；
+  每次轮询先检查 PRAGMA data_version，没有其他连接提交时不执行任何查询
+- 事件ID为 "rating_id:comment_id"，断线重连时浏览器带 Last-Event-ID，从断点继续推送
+- 连接时的主题计数读取 rating_counters（触发器维护），只统计水位线之后的少量新行，重连不扫描评分表
+- 每个连接最长 ADMIN_STREAM_MAX_SECONDS 秒，之后由浏览器自动重连，避免长期占用worker；
+  每个进程同时连接数不超过 ADMIN_STREAM_MAX_CLIENTS
+- 每个推送连接一直占用一个worker线程，ADMIN_STREAM_MAX_CLIENTS 必须小于 GUNICORN_THREADS，
+  至少留一个线程处理评分提交等普通请求，否则启动时报错（设为0可关闭推送）
+
+环境变量:
+    ADMIN_STREAM_POLL_INTERVAL=1      轮询间隔（秒）
+    ADMIN_STREAM_MAX_SECONDS=300      单个连接的最长时间（秒）
+    ADMIN_STREAM_MAX_CLIENTS=1        每个进程的最大连接数（须小于 GUNICORN_THREADS）
+    GUNICORN_THREADS=4                每个worker的线程数（gunicorn.conf.py 启动时按实际配置设置）
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from flask import Response, request
+
+from add_content_columns import ensure_content_columns
+from rate_limit import too_many_requests
+from rating_counters import ensure_rating_counters, topic_counts_at
+
+ADMIN_STREAM_POLL_INTERVAL = float(os.environ.get('ADMIN_STREAM_POLL_INTERVAL', 1))
+ADMIN_STREAM_MAX_SECONDS = float(os.environ.get('ADMIN_STREAM_MAX_SECONDS', 300))
+ADMIN_STREAM_MAX_CLIENTS = int(os.environ.get('ADMIN_STREAM_MAX_CLIENTS', 1))
+GUNICORN_THREADS = int(os.environ.get('GUNICORN_THREADS', 4))
+
+# 没有事件时发送注释行保持连接（代理通常在60秒无数据后断开）
+HEARTBEAT_SECONDS = 15
+
+# 浏览器断线后的重连间隔（毫秒）
+RECONNECT_MS = 3000
+
+# 每次轮询最多读取的行数，积压的数据在下一次轮询继续推送
+BATCH_SIZE = 200
+
+RATING_COLUMNS = ['rating_id', 'session_id', 'topic_name', 'comparison_number', 'hypothesis_A_id', 'hypothesis_B_id',
+                  'novelty_score', 'soundness_score', 'feasibility_score', 'significance_score', 'overall_score',
+                  'timestamp']
+COMMENT_COLUMNS = ['comment_id', 'session_id', 'topic_name', 'comment_text', 'timestamp']
+
+
+def parse_event_id(value):
+    """解析 "rating_id:comment_id"，格式不对时返回None"""
+    try:
+        rating_id, comment_id = (int(part) for part in value.split(':'))
+    except (AttributeError, ValueError):
+        return None
+    return rating_id, comment_id
+
+
+def format_event(event, data, event_id=None):
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(data, ensure_ascii=False)}")
+    return '\n'.join(lines) + '\n\n'
+
+
+def current_watermarks(conn):
+    """当前最大的 rating_id、comment_id（主键上的MAX只读一个页面）"""
+    rating_id = conn.execute("SELECT COALESCE(MAX(rating_id), 0) FROM ratings").fetchone()[0]
+    comment_id = conn.execute("SELECT COALESCE(MAX(comment_id), 0) FROM comments").fetchone()[0]
+    return rating_id, comment_id
+
+
+def topic_counters(conn, rating_id, comment_id):
+    """水位线及以前的各主题评分数、评论数（每个连接只统计一次，之后按推送的事件累加）"""
+    counters = {}
+    # 计数表与水位线之后的新行在同一个读事务中读取，中间提交的评分不会被重复或遗漏
+    conn.execute("BEGIN")
+    try:
+        for topic, count in topic_counts_at(conn, 'ratings', rating_id).items():
+            counters.setdefault(topic, {'ratings': 0, 'comments': 0})['ratings'] = count
+        for topic, count in topic_counts_at(conn, 'comments', comment_id).items():
+            counters.setdefault(topic, {'ratings': 0, 'comments': 0})['comments'] = count
+    finally:
+        conn.execute("COMMIT")
+    return counters
+
+
+def fetch_new_ratings(conn, after, limit=BATCH_SIZE):
+    """rating_id 大于水位线的评分，附带两个假设的标题"""
+    cursor = conn.execute(f"""
+        SELECT {', '.join('r.' + column for column in RATING_COLUMNS)}, h1.title, h2.title
+        FROM ratings r
+        LEFT JOIN hypothesis h1 ON r.hypothesis_A_id = h1.id
+        LEFT JOIN hypothesis h2 ON r.hypothesis_B_id = h2.id
+        WHERE r.rating_id > ?
+        ORDER BY r.rating_id
+        LIMIT ?
+    """, (after, limit))
+    return [dict(zip(RATING_COLUMNS + ['title_A', 'title_B'], row)) for row in cursor]
+
+
+def fetch_new_comments(conn, after, limit=BATCH_SIZE):
+    cursor = conn.execute(f"""
+        SELECT {', '.join(COMMENT_COLUMNS)} FROM comments
+        WHERE comment_id > ?
+        ORDER BY comment_id
+        LIMIT ?
+    """, (after, limit))
+    return [dict(zip(COMMENT_COLUMNS, row)) for row in cursor]
+
+
+def stream_events(db_path, watermarks=None, max_seconds=None, poll_interval=None,
+                  clock=time.monotonic, sleep=time.sleep):
+    """生成SSE文本；watermarks 为 (rating_id, comment_id)，None 表示只推送连接之后的新数据"""
+    max_seconds = ADMIN_STREAM_MAX_SECONDS if max_seconds is None else max_seconds
+    poll_interval = ADMIN_STREAM_POLL_INTERVAL if poll_interval is None else poll_interval
+    # 自动提交模式：轮询之间不持有读锁，不影响评分写入
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    try:
+        ensure_content_columns(conn)
+        ensure_rating_counters(conn)
+        rating_id, comment_id = watermarks or current_watermarks(conn)
+        counters = topic_counters(conn, rating_id, comment_id)
+
+        yield f"retry: {RECONNECT_MS}\n\n"
+        yield format_event('counters', counters, f"{rating_id}:{comment_id}")
+
+        started = last_sent = clock()
+        data_version = None
+        while clock() - started < max_seconds:
+            version = conn.execute("PRAGMA data_version").fetchone()[0]
+            if version != data_version:
+                ratings = fetch_new_ratings(conn, rating_id)
+                comments = fetch_new_comments(conn, comment_id)
+                # 读满一批时下一轮继续读取，不等待 data_version 变化
+                data_version = version if len(ratings) < BATCH_SIZE and len(comments) < BATCH_SIZE else None
+
+                for rating in ratings:
+                    rating_id = rating['rating_id']
+                    counters.setdefault(rating['topic_name'], {'ratings': 0, 'comments': 0})['ratings'] += 1
+                    yield format_event('rating', rating, f"{rating_id}:{comment_id}")
+                for comment in comments:
+                    comment_id = comment['comment_id']
+                    counters.setdefault(comment['topic_name'], {'ratings': 0, 'comments': 0})['comments'] += 1
+                    yield format_event('comment', comment, f"{rating_id}:{comment_id}")
+                if ratings or comments:
+                    yield format_event('counters', counters, f"{rating_id}:{comment_id}")
+                    last_sent = clock()
+
+            if clock() - last_sent >= HEARTBEAT_SECONDS:
+                yield ": keepalive\n\n"
+                last_sent = clock()
+            if data_version is not None:
+                sleep(poll_interval)
+    finally:
+        conn.close()
+
+
+def init_app(app, db_path, max_clients=None, threads=None):
+    """注册 /admin/stream；max_clients 不小于 threads 时报错（推送连接会占满所有线程）"""
+    max_clients = ADMIN_STREAM_MAX_CLIENTS if max_clients is None else max_clients
+    threads = GUNICORN_THREADS if threads is None else threads
+    if max_clients >= threads:
+        raise ValueError(f"ADMIN_STREAM_MAX_CLIENTS={max_clients} 必须小于 GUNICORN_THREADS={threads}，"
+                         f"否则推送连接会占用全部worker线程")
+
+    clients = {'count': 0}
+    clients_lock = threading.Lock()
+
+    @app.route('/admin/stream')
+    def admin_stream():
+        """管理员接口 - 新评分、评论与主题计数的实时推送（SSE）"""
+        watermarks = parse_event_id(request.headers.get('Last-Event-ID'))
+        if watermarks is None and 'rating_id' in request.args:
+            watermarks = (request.args.get('rating_id', 0, type=int), request.args.get('comment_id', 0, type=int))
+
+        with clients_lock:
+            if clients['count'] >= max_clients:
+                return too_many_requests(RECONNECT_MS / 1000, 'server busy', status=503)
+            clients['count'] += 1
+
+        def release():
+            with clients_lock:
+                clients['count'] -= 1
+
+        response = Response(stream_events(db_path, watermarks), mimetype='text/event-stream')
+        # 连接关闭（包括浏览器断开）时由WSGI服务器调用
+        response.call_on_close(release)
+        response.headers['Cache-Control'] = 'no-cache'
+        # 关闭nginx等反向代理的缓冲，事件立即送达
+        response.headers['X-Accel-Buffering'] = 'no'
+        return response
+
+    return app
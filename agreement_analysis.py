@@ -0,0 +1,337 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+专家评分一致性分析（inter-rater agreement）
+
+- 一次查询把 ratings 表读入NumPy数组
+- 同一主题中同一对假设（不论A/B顺序）视为一个评分单元，评分者为各个会话
+- 按维度、按主题计算 Krippendorff's alpha，以及每个假设对的 Fleiss 式一致度
+- 全部计算向量化，结果按 ratings 行数缓存
+
+用法:
+    python agreement_analysis.py [--db hypothesis_data.db] [--metric interval|ordinal|nominal]
+    python agreement_analysis.py --benchmark 1000000
+"""
+
+import argparse
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+
+# 配置数据库路径
+DB_PATH = "hypothesis_data.db"
+
+# 评分维度（ratings表中的列名）
+DIMENSIONS = ['novelty_score', 'soundness_score', 'feasibility_score', 'significance_score', 'overall_score']
+
+# 5点量表：1=A明显更好 ... 5=B明显更好
+NUM_CATEGORIES = 5
+
+# 分批读取的行数
+FETCH_BATCH_SIZE = 100000
+
+METRICS = ('interval', 'ordinal', 'nominal')
+
+_cache = {}
+_cache_lock = threading.Lock()
+
+
+def load_ratings(conn):
+    """
+    一次遍历读取 ratings 表，返回NumPy数组：
+    rating_id, topic（编码）, hypothesis_A_id, hypothesis_B_id, scores（n×5）
+    主题名在SQLite中与编码表连接，Python端只处理整数
+    """
+    cursor = conn.cursor()
+    cursor.execute("SELECT DISTINCT topic_name FROM ratings ORDER BY topic_name")
+    topics = [row[0] for row in cursor.fetchall()]
+
+    cursor.execute(f"""
+        WITH topic_codes AS (
+            SELECT topic_name, ROW_NUMBER() OVER (ORDER BY topic_name) - 1 AS code
+            FROM (SELECT DISTINCT topic_name FROM ratings)
+        )
+        SELECT r.rating_id, t.code, r.hypothesis_A_id, r.hypothesis_B_id,
+               {', '.join('r.' + dim for dim in DIMENSIONS)}
+        FROM ratings r
+        JOIN topic_codes t ON t.topic_name = r.topic_name
+    """)
+    chunks = []
+    while True:
+        rows = cursor.fetchmany(FETCH_BATCH_SIZE)
+        if not rows:
+            break
+        chunks.append(np.array(rows, dtype=np.int64))
+    data = np.concatenate(chunks) if chunks else np.zeros((0, 4 + len(DIMENSIONS)), dtype=np.int64)
+
+    return {
+        'topics': topics,
+        'rating_id': data[:, 0],
+        'topic': data[:, 1],
+        'hypothesis_A_id': data[:, 2],
+        'hypothesis_B_id': data[:, 3],
+        'scores': data[:, 4:].astype(np.int8),
+    }
+
+
+def normalize_pairs(hyp_a, hyp_b, scores):
+    """
+    把 (A, B, 评分) 统一为 (较小ID, 较大ID, 评分)：
+    A、B交换展示时评分方向取反（6 - score），使同一对假设的评分可比
+    """
+    swapped = hyp_a > hyp_b
+    low = np.where(swapped, hyp_b, hyp_a)
+    high = np.where(swapped, hyp_a, hyp_b)
+    oriented = np.where(swapped[:, None], NUM_CATEGORIES + 1 - scores, scores)
+    return low, high, oriented
+
+
+def distance_matrix(metric, category_totals=None):
+    """Krippendorff 距离函数 δ²(c, k)"""
+    values = np.arange(1, NUM_CATEGORIES + 1, dtype=np.float64)
+    if metric == 'interval':
+        return (values[:, None] - values[None, :]) ** 2
+    if metric == 'nominal':
+        return 1.0 - np.eye(NUM_CATEGORIES)
+    if metric == 'ordinal':
+        # δ²(c,k) = (Σ_{g=c..k} n_g - (n_c + n_k)/2)²
+        cumulative = np.concatenate([[0.0], np.cumsum(category_totals)])
+        low = np.minimum.outer(np.arange(NUM_CATEGORIES), np.arange(NUM_CATEGORIES))
+        high = np.maximum.outer(np.arange(NUM_CATEGORIES), np.arange(NUM_CATEGORIES))
+        spans = cumulative[high + 1] - cumulative[low]
+        return (spans - (category_totals[:, None] + category_totals[None, :]) / 2.0) ** 2
+    raise ValueError(f"unknown metric: {metric}")
+
+
+def krippendorff_alpha(coincidence, metric='interval'):
+    """由重合矩阵（coincidence matrix）计算 alpha；没有可配对评分时返回None"""
+    category_totals = coincidence.sum(axis=0)
+    total = category_totals.sum()
+    if total <= 1:
+        return None
+    delta = distance_matrix(metric, category_totals)
+    observed = (coincidence * delta).sum() / total
+    expected = (np.outer(category_totals, category_totals) * delta).sum() / (total * (total - 1))
+    if expected == 0:
+        # 所有评分落在同一类别：无差异可言，视为完全一致
+        return 1.0
+    return float(1.0 - observed / expected)
+
+
+def fleiss_kappa(counts):
+    """对评分者数量不等的单元计算Fleiss式kappa；counts为 单元×类别 计数矩阵"""
+    raters = counts.sum(axis=1)
+    usable = raters >= 2
+    if not usable.any():
+        return None
+    counts = counts[usable]
+    raters = raters[usable]
+    agreement = ((counts ** 2).sum(axis=1) - raters) / (raters * (raters - 1))
+    proportions = counts.sum(axis=0) / counts.sum()
+    chance = (proportions ** 2).sum()
+    if chance >= 1.0:
+        return 1.0
+    return float((agreement.mean() - chance) / (1.0 - chance))
+
+
+def _none_if_nan(value):
+    return None if value is None or np.isnan(value) else float(value)
+
+
+def compute_agreement(data, metric='interval', include_pairs=True):
+    """按维度、主题计算一致性指标"""
+    if metric not in METRICS:
+        raise ValueError(f"metric must be one of {METRICS}")
+
+    topics = data['topics']
+    low, high, oriented = normalize_pairs(data['hypothesis_A_id'], data['hypothesis_B_id'], data['scores'])
+
+    # 评分单元 = (主题, 较小ID, 较大ID)：先把假设ID压缩为连续编码，再合成一个整数键，
+    # 一维 np.unique 比按行去重快得多，且结果按主题有序
+    hypothesis_ids, codes = np.unique(np.concatenate([low, high]), return_inverse=True)
+    num_hypotheses = max(len(hypothesis_ids), 1)
+    low_code, high_code = codes[:len(low)], codes[len(low):]
+    keys = (data['topic'] * num_hypotheses + low_code) * num_hypotheses + high_code
+    unit_key_values, unit_index = np.unique(keys, return_inverse=True)
+    num_units = len(unit_key_values)
+    unit_topic = unit_key_values // (num_hypotheses * num_hypotheses)
+    unit_low = hypothesis_ids[(unit_key_values // num_hypotheses) % num_hypotheses]
+    unit_high = hypothesis_ids[unit_key_values % num_hypotheses]
+    topic_starts = np.searchsorted(unit_topic, np.arange(len(topics)))
+
+    result = {'overall': {}, 'topics': {topic: {'dimensions': {}} for topic in topics}}
+    pair_agreement = {}
+
+    for d, dimension in enumerate(DIMENSIONS):
+        category = oriented[:, d].astype(np.int64) - 1
+        valid = (category >= 0) & (category < NUM_CATEGORIES)
+        counts = np.bincount(unit_index[valid] * NUM_CATEGORIES + category[valid],
+                             minlength=num_units * NUM_CATEGORIES).reshape(num_units, NUM_CATEGORIES).astype(np.float64)
+        raters = counts.sum(axis=1)
+        pairable = raters >= 2
+
+        # 每个单元对重合矩阵的贡献：n_uc·n_uk/(m_u-1)，对角线减去 n_uc/(m_u-1)
+        weights = np.where(pairable, 1.0 / np.maximum(raters - 1, 1), 0.0)
+        weighted = counts * weights[:, None]
+        contribution = weighted[:, :, None] * counts[:, None, :]
+        diagonal = np.arange(NUM_CATEGORIES)
+        contribution[:, diagonal, diagonal] -= weighted
+
+        # 单元的 Fleiss 式一致度 P_u
+        with np.errstate(invalid='ignore', divide='ignore'):
+            unit_agreement = ((counts ** 2).sum(axis=1) - raters) / (raters * (raters - 1))
+        unit_agreement[~pairable] = np.nan
+        pair_agreement[dimension] = unit_agreement
+
+        def summarize(unit_slice):
+            unit_counts = counts[unit_slice]
+            agreement = unit_agreement[unit_slice]
+            has_pairs = pairable[unit_slice]
+            return {
+                'alpha': krippendorff_alpha(contribution[unit_slice].sum(axis=0), metric),
+                'fleiss_kappa': fleiss_kappa(unit_counts),
+                'mean_pair_agreement': _none_if_nan(np.nanmean(agreement)) if has_pairs.any() else None,
+                'units': int(len(unit_counts)),
+                'pairable_units': int(has_pairs.sum()),
+                'ratings': int(unit_counts.sum()),
+            }
+
+        result['overall'][dimension] = summarize(slice(0, num_units))
+        for t, topic in enumerate(topics):
+            end = topic_starts[t + 1] if t + 1 < len(topics) else num_units
+            result['topics'][topic]['dimensions'][dimension] = summarize(slice(topic_starts[t], end))
+
+    if include_pairs:
+        unit_raters = np.bincount(unit_index, minlength=num_units)
+        for t, topic in enumerate(topics):
+            end = topic_starts[t + 1] if t + 1 < len(topics) else num_units
+            pairs = []
+            for u in range(topic_starts[t], end):
+                pairs.append({
+                    'hypothesis_ids': [int(unit_low[u]), int(unit_high[u])],
+                    'ratings': int(unit_raters[u]),
+                    'agreement': {dim: _none_if_nan(pair_agreement[dim][u]) for dim in DIMENSIONS},
+                })
+            result['topics'][topic]['pairs'] = pairs
+
+    return result
+
+
+def ratings_cache_key(conn):
+    """缓存键：ratings行数与最大rating_id（删除后再插入也能识别）"""
+    return tuple(conn.execute("SELECT COUNT(*), MAX(rating_id) FROM ratings").fetchone())
+
+
+def get_agreement_report(conn, metric='interval', include_pairs=True):
+    """返回一致性报告；ratings行数未变化时直接使用缓存"""
+    key = (ratings_cache_key(conn), metric, include_pairs)
+    with _cache_lock:
+        cached = _cache.get(key)
+    if cached is not None:
+        return cached
+
+    start = time.perf_counter()
+    data = load_ratings(conn)
+    report = compute_agreement(data, metric=metric, include_pairs=include_pairs)
+    report.update({
+        'metric': metric,
+        'ratings_count': key[0][0],
+        'computed_at': datetime.now().isoformat(timespec='seconds'),
+        'compute_seconds': round(time.perf_counter() - start, 4),
+    })
+
+    with _cache_lock:
+        # 只保留最新的行数对应的结果
+        for stale in [k for k in _cache if k[0] != key[0]]:
+            del _cache[stale]
+        _cache[key] = report
+    return report
+
+
+def print_report(report):
+    """在终端打印一致性报告"""
+    print(f"📊 评分一致性（metric={report['metric']}，共 {report['ratings_count']} 条评分，"
+          f"耗时 {report['compute_seconds']}s）\n")
+    header = f"{'范围':<16}" + ''.join(f"{dim.replace('_score', ''):>24}" for dim in DIMENSIONS)
+    print(header)
+    print(f"{'':<16}" + ''.join(f"{'alpha / kappa / units':>24}" for _ in DIMENSIONS))
+
+    def row(label, dimensions):
+        cells = []
+        for dim in DIMENSIONS:
+            stats = dimensions[dim]
+            alpha = '-' if stats['alpha'] is None else f"{stats['alpha']:.3f}"
+            kappa = '-' if stats['fleiss_kappa'] is None else f"{stats['fleiss_kappa']:.3f}"
+            cells.append(f"{alpha} / {kappa} / {stats['pairable_units']}".rjust(24))
+        print(f"{label:<16}" + ''.join(cells))
+
+    row('ALL', report['overall'])
+    for topic, topic_report in sorted(report['topics'].items()):
+        row(topic, topic_report['dimensions'])
+
+
+def create_benchmark_db(num_ratings, num_topics=11, pool_size=8, seed=0):
+    """生成包含num_ratings条随机评分的内存数据库，用于性能测试"""
+    rng = np.random.default_rng(seed)
+    conn = sqlite3.connect(':memory:')
+    conn.execute(f"""
+        CREATE TABLE ratings (
+            rating_id INTEGER PRIMARY KEY AUTOINCREMENT, session_id TEXT NOT NULL, topic_name TEXT NOT NULL,
+            hypothesis_A_id INTEGER NOT NULL, hypothesis_B_id INTEGER NOT NULL,
+            {', '.join(f'{dim} INTEGER NOT NULL' for dim in DIMENSIONS)}
+        )
+    """)
+    topic = rng.integers(1, num_topics + 1, num_ratings)
+    first = rng.integers(0, pool_size, num_ratings)
+    second = (first + rng.integers(1, pool_size, num_ratings)) % pool_size
+    scores = rng.integers(1, NUM_CATEGORIES + 1, (num_ratings, len(DIMENSIONS)))
+    sessions = rng.integers(0, max(num_ratings // 8, 1), num_ratings)
+    rows = ((f'session-{s}', f'topic{t}', int(t * 100 + a), int(t * 100 + b), *map(int, sc))
+            for s, t, a, b, sc in zip(sessions, topic, first, second, scores))
+    conn.executemany(f"""
+        INSERT INTO ratings (session_id, topic_name, hypothesis_A_id, hypothesis_B_id, {', '.join(DIMENSIONS)})
+        VALUES (?, ?, ?, ?, {', '.join('?' for _ in DIMENSIONS)})
+    """, rows)
+    conn.commit()
+    return conn
+
+
+def benchmark(num_ratings, metric):
+    print(f"🔄 生成 {num_ratings} 条随机评分...")
+    conn = create_benchmark_db(num_ratings)
+
+    start = time.perf_counter()
+    data = load_ratings(conn)
+    load_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    compute_agreement(data, metric=metric, include_pairs=False)
+    compute_seconds = time.perf_counter() - start
+
+    get_agreement_report(conn, metric=metric, include_pairs=False)
+    start = time.perf_counter()
+    get_agreement_report(conn, metric=metric, include_pairs=False)
+    cached_seconds = time.perf_counter() - start
+
+    print(f"   读取: {load_seconds:.3f}s")
+    print(f"   计算: {compute_seconds:.3f}s")
+    print(f"   命中缓存: {cached_seconds * 1000:.2f}ms")
+    conn.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='专家评分一致性分析')
+    parser.add_argument('--db', default=DB_PATH, help='数据库路径')
+    parser.add_argument('--metric', default='interval', choices=METRICS, help='Krippendorff alpha 距离函数')
+    parser.add_argument('--benchmark', type=int, metavar='N', help='用N条随机评分测试性能')
+    args = parser.parse_args()
+
+    if args.benchmark:
+        benchmark(args.benchmark, args.metric)
+    else:
+        conn = sqlite3.connect(args.db)
+        print_report(get_agreement_report(conn, metric=args.metric, include_pairs=False))
+        conn.close()
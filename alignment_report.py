@@ -0,0 +1,374 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+自动评分与专家评分的一致性报告（human-vs-automatic alignment）
+
+- predefined_comparisons 中每个假设的自动评分（novelty/significance/soundness/feasibility/overall_winner）
+  与 ratings 中专家的成对偏好进行比较
+- 专家偏好按 (主题, 假设对, 维度) 汇总到 alignment_pair_stats 表，
+  只增量处理 rating_id 大于水位线的新评分；评分被删除时（rating_counters 的删除计数变化）全量重建
+- 没有新评分也没有删除时只读取 MAX(rating_id) 与删除计数，不获取写锁
+- 报告在NumPy中计算：假设×维度 的自动评分矩阵与专家胜率矩阵，
+  输出主题内 Spearman 等级相关与成对一致率，按维度、model_source、strategy、主题分组
+- 报告按（水位线, 评分数, 假设池）缓存，没有新评分时不重新计算
+
+用法:
+    python alignment_report.py [--db hypothesis_data.db] [--rebuild]
+"""
+
+import argparse
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+
+from rating_counters import deleted_count, ensure_rating_counters
+
+# 配置数据库路径
+DB_PATH = "hypothesis_data.db"
+
+# ratings 中的专家评分维度 -> predefined_comparisons 中对应的自动评分列
+DIMENSION_SCORE_COLUMNS = {
+    'novelty_score': 'novelty_score',
+    'soundness_score': 'soundness_score',
+    'feasibility_score': 'feasibility_score',
+    'significance_score': 'significance_score',
+    'overall_score': 'overall_winner_score',
+}
+DIMENSIONS = list(DIMENSION_SCORE_COLUMNS)
+
+# 分组方式（predefined_comparisons 中的列）
+GROUP_COLUMNS = ('model_source', 'strategy')
+
+_cache = {}
+_cache_lock = threading.Lock()
+
+
+def create_alignment_tables(conn):
+    """创建专家偏好汇总表与水位线表（已存在时只读取表结构，不获取写锁）"""
+    columns = [column[1] for column in conn.execute("PRAGMA table_info(alignment_state)")]
+    if 'deleted' in columns and conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'alignment_pair_stats'").fetchone():
+        return
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS alignment_pair_stats (
+                topic_name TEXT NOT NULL,
+                hypothesis_low INTEGER NOT NULL,
+                hypothesis_high INTEGER NOT NULL,
+                dimension TEXT NOT NULL,
+                low_preferred INTEGER NOT NULL DEFAULT 0,
+                high_preferred INTEGER NOT NULL DEFAULT 0,
+                ties INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (topic_name, hypothesis_low, hypothesis_high, dimension)
+            )
+        """)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS alignment_state (
+                id INTEGER PRIMARY KEY CHECK (id = 1),
+                watermark INTEGER NOT NULL,
+                ratings_count INTEGER NOT NULL,
+                updated_at TIMESTAMP
+            )
+        """)
+        # 汇总时 rating_counters 中的删除计数；旧表没有该列（NULL），下一次刷新时全量重建
+        columns = [column[1] for column in conn.execute("PRAGMA table_info(alignment_state)")]
+        if 'deleted' not in columns:
+            conn.execute("ALTER TABLE alignment_state ADD COLUMN deleted INTEGER")
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+
+def refresh_pair_stats(conn, rebuild=False):
+    """
+    把 rating_id 大于水位线的评分累加到 alignment_pair_stats，返回 (水位线, 已汇总的评分数)
+    没有新评分、也没有评分被删除时只读两个值（MAX(rating_id) 与删除计数）直接返回，不获取写锁；
+    否则在 BEGIN IMMEDIATE 事务中重新检查并更新，多个进程同时刷新也不会重复计数
+    """
+    create_alignment_tables(conn)
+    ensure_rating_counters(conn)
+    state = conn.execute("SELECT watermark, ratings_count, deleted FROM alignment_state WHERE id = 1").fetchone()
+    if state and not rebuild:
+        max_id = conn.execute("SELECT COALESCE(MAX(rating_id), 0) FROM ratings").fetchone()[0]
+        if max_id <= state[0] and state[2] == deleted_count(conn, 'ratings'):
+            return state[0], state[1]
+
+    cursor = conn.cursor()
+    cursor.execute("BEGIN IMMEDIATE")
+    try:
+        state = cursor.execute("SELECT watermark, ratings_count, deleted FROM alignment_state WHERE id = 1").fetchone()
+        watermark, counted, deleted = state if state else (0, 0, None)
+
+        # 评分被删除（删除计数变化，如 archive_ratings.py 归档）时无法增量更新，全量重建
+        current_deleted = deleted_count(conn, 'ratings')
+        if deleted != current_deleted:
+            rebuild = True
+        if rebuild:
+            cursor.execute("DELETE FROM alignment_pair_stats")
+            watermark, counted = 0, 0
+
+        new_watermark, new_count = cursor.execute(
+            "SELECT COALESCE(MAX(rating_id), 0), COUNT(*) FROM ratings WHERE rating_id > ?", (watermark,)
+        ).fetchone()
+
+        if new_count:
+            # 每条评分按较小/较大假设ID定向：1、2 = A更好，4、5 = B更好，3 = 平局
+            for dimension in DIMENSIONS:
+                cursor.execute(f"""
+                    INSERT INTO alignment_pair_stats
+                        (topic_name, hypothesis_low, hypothesis_high, dimension, low_preferred, high_preferred, ties)
+                    SELECT topic_name,
+                           MIN(hypothesis_A_id, hypothesis_B_id),
+                           MAX(hypothesis_A_id, hypothesis_B_id),
+                           ?,
+                           SUM(CASE WHEN (hypothesis_A_id < hypothesis_B_id AND {dimension} < 3)
+                                      OR (hypothesis_A_id > hypothesis_B_id AND {dimension} > 3) THEN 1 ELSE 0 END),
+                           SUM(CASE WHEN (hypothesis_A_id < hypothesis_B_id AND {dimension} > 3)
+                                      OR (hypothesis_A_id > hypothesis_B_id AND {dimension} < 3) THEN 1 ELSE 0 END),
+                           SUM(CASE WHEN {dimension} = 3 THEN 1 ELSE 0 END)
+                    FROM ratings
+                    WHERE rating_id > ? AND rating_id <= ? AND hypothesis_A_id != hypothesis_B_id
+                    GROUP BY 1, 2, 3
+                    ON CONFLICT (topic_name, hypothesis_low, hypothesis_high, dimension) DO UPDATE SET
+                        low_preferred = low_preferred + excluded.low_preferred,
+                        high_preferred = high_preferred + excluded.high_preferred,
+                        ties = ties + excluded.ties
+                """, (dimension, watermark, new_watermark))
+            watermark = new_watermark
+            counted += new_count
+
+        cursor.execute("""
+            INSERT INTO alignment_state (id, watermark, ratings_count, deleted, updated_at) VALUES (1, ?, ?, ?, ?)
+            ON CONFLICT (id) DO UPDATE SET
+                watermark = excluded.watermark, ratings_count = excluded.ratings_count,
+                deleted = excluded.deleted, updated_at = excluded.updated_at
+        """, (watermark, counted, current_deleted, datetime.now().isoformat(timespec='seconds')))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return watermark, counted
+
+
+def load_hypotheses(conn):
+    """读取假设池：元数据列表与 假设×维度 的自动评分矩阵"""
+    rows = conn.execute(f"""
+        SELECT topic_name, original_hypothesis_id, MIN(model_source), MIN(strategy),
+               {', '.join(f'MIN({column})' for column in DIMENSION_SCORE_COLUMNS.values())}
+        FROM predefined_comparisons
+        WHERE original_hypothesis_id IS NOT NULL
+        GROUP BY topic_name, original_hypothesis_id
+        ORDER BY topic_name, original_hypothesis_id
+    """).fetchall()
+    return {
+        'keys': [(row[0], row[1]) for row in rows],
+        'topic': [row[0] for row in rows],
+        'model_source': [row[2] or 'unknown' for row in rows],
+        'strategy': [row[3] or 'unknown' for row in rows],
+        'auto_scores': np.array([[np.nan if v is None else v for v in row[4:]] for row in rows],
+                                dtype=np.float64).reshape(len(rows), len(DIMENSIONS)),
+    }
+
+
+def load_pair_stats(conn, index_by_key):
+    """读取汇总表，返回 假设对×维度 的计数矩阵；不在假设池中的假设对被忽略"""
+    pairs = {}
+    counts = []
+    dimension_index = {dimension: d for d, dimension in enumerate(DIMENSIONS)}
+    for topic, low, high, dimension, low_preferred, high_preferred, ties in conn.execute("""
+        SELECT topic_name, hypothesis_low, hypothesis_high, dimension, low_preferred, high_preferred, ties
+        FROM alignment_pair_stats
+    """):
+        low_index = index_by_key.get((topic, low))
+        high_index = index_by_key.get((topic, high))
+        if low_index is None or high_index is None or dimension not in dimension_index:
+            continue
+        p = pairs.setdefault((low_index, high_index), len(pairs))
+        if p == len(counts):
+            counts.append(np.zeros((len(DIMENSIONS), 3)))
+        counts[p][dimension_index[dimension]] = (low_preferred, high_preferred, ties)
+
+    order = sorted(pairs, key=pairs.get)
+    return (np.array([pair[0] for pair in order], dtype=np.int64),
+            np.array([pair[1] for pair in order], dtype=np.int64),
+            np.array(counts).reshape(len(order), len(DIMENSIONS), 3))
+
+
+def grouped_percentile_ranks(values, groups):
+    """组内平均秩（并列取平均），再除以组大小，使不同主题的秩可以合并比较"""
+    n = len(values)
+    if n == 0:
+        return np.zeros(0)
+    order = np.lexsort((values, groups))
+    sorted_values = values[order]
+    sorted_groups = groups[order]
+    new_group = np.concatenate([[True], sorted_groups[1:] != sorted_groups[:-1]])
+    group_start = np.maximum.accumulate(np.where(new_group, np.arange(n), 0))
+    positions = np.arange(n) - group_start + 1.0
+    new_tie = new_group | np.concatenate([[True], sorted_values[1:] != sorted_values[:-1]])
+    tie_id = np.cumsum(new_tie) - 1
+    average = np.bincount(tie_id, weights=positions) / np.bincount(tie_id)
+    group_sizes = np.bincount(sorted_groups)[sorted_groups]
+
+    ranks = np.empty(n)
+    ranks[order] = (average[tie_id] - 0.5) / group_sizes
+    return ranks
+
+
+def spearman(x_ranks, y_ranks):
+    """对已转换为秩的两列计算相关系数；样本不足或方差为0时返回None"""
+    if len(x_ranks) < 3:
+        return None
+    x = x_ranks - x_ranks.mean()
+    y = y_ranks - y_ranks.mean()
+    denominator = np.sqrt((x * x).sum() * (y * y).sum())
+    if denominator == 0:
+        return None
+    return float((x * y).sum() / denominator)
+
+
+def compute_alignment(hypotheses, low, high, counts):
+    """
+    计算一致性指标
+    - spearman: 主题内，自动评分的秩与专家胜率（胜 + 0.5×平）的秩之间的相关（各主题合并计算）
+    - pairwise_agreement: 专家明确表达偏好的评分中，自动评分给出相同方向的比例（自动评分相等的假设对不计）
+    """
+    num_hypotheses = len(hypotheses['keys'])
+    topic_names = sorted(set(hypotheses['topic']))
+    topic_codes = np.array([topic_names.index(t) for t in hypotheses['topic']], dtype=np.int64)
+    auto = hypotheses['auto_scores']
+
+    low_preferred = counts[:, :, 0]
+    high_preferred = counts[:, :, 1]
+    ties = counts[:, :, 2]
+    games = low_preferred + high_preferred + ties
+
+    # 每个假设、每个维度的专家胜率
+    human_wins = np.zeros((num_hypotheses, len(DIMENSIONS)))
+    human_games = np.zeros((num_hypotheses, len(DIMENSIONS)))
+    np.add.at(human_wins, low, low_preferred + 0.5 * ties)
+    np.add.at(human_wins, high, high_preferred + 0.5 * ties)
+    np.add.at(human_games, low, games)
+    np.add.at(human_games, high, games)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        human_rate = human_wins / human_games
+
+    # 自动评分给出的方向：+1 = 较小ID的假设更好，-1 = 较大ID的假设更好，0 = 相等或缺失
+    auto_direction = np.nan_to_num(np.sign(auto[low] - auto[high])) if len(low) else np.zeros((0, len(DIMENSIONS)))
+    agreeing = np.where(auto_direction > 0, low_preferred, np.where(auto_direction < 0, high_preferred, 0.0))
+    decisive = np.where(auto_direction != 0, low_preferred + high_preferred, 0.0)
+
+    def summarize(hypothesis_mask, pair_mask):
+        result = {}
+        for d, dimension in enumerate(DIMENSIONS):
+            usable = hypothesis_mask & (human_games[:, d] > 0) & ~np.isnan(auto[:, d])
+            spearman_value = None
+            if usable.sum() >= 3:
+                spearman_value = spearman(grouped_percentile_ranks(auto[usable, d], topic_codes[usable]),
+                                          grouped_percentile_ranks(human_rate[usable, d], topic_codes[usable]))
+            judgments = float(decisive[pair_mask, d].sum())
+            result[dimension] = {
+                'spearman': spearman_value,
+                'pairwise_agreement': float(agreeing[pair_mask, d].sum() / judgments) if judgments else None,
+                'decisive_judgments': int(judgments),
+                'ratings': int(games[pair_mask, d].sum()),
+                'hypotheses': int(usable.sum()),
+            }
+        return result
+
+    all_hypotheses = np.ones(num_hypotheses, dtype=bool)
+    all_pairs = np.ones(len(low), dtype=bool)
+    report = {'dimensions': summarize(all_hypotheses, all_pairs)}
+
+    # 分组：包含该组假设的所有假设对都计入成对一致率
+    for column in GROUP_COLUMNS:
+        values = np.array(hypotheses[column], dtype=object)
+        report[column] = {}
+        for value in sorted(set(hypotheses[column])):
+            mask = values == value
+            report[column][value] = summarize(mask, mask[low] | mask[high])
+
+    report['topics'] = {}
+    for t, topic in enumerate(topic_names):
+        mask = topic_codes == t
+        report['topics'][topic] = summarize(mask, mask[low])
+
+    return report
+
+
+def pool_signature(conn):
+    """假设池的签名；重建 predefined_comparisons 后缓存失效"""
+    return tuple(conn.execute("""
+        SELECT COUNT(*), MAX(id), TOTAL(original_hypothesis_id) FROM predefined_comparisons
+    """).fetchone())
+
+
+def get_alignment_report(conn):
+    """增量刷新专家偏好汇总，返回报告；没有新评分且假设池不变时直接使用缓存"""
+    start = time.perf_counter()
+    watermark, counted = refresh_pair_stats(conn)
+    key = (watermark, counted, pool_signature(conn))
+    with _cache_lock:
+        cached = _cache.get(key)
+    if cached is not None:
+        return cached
+
+    hypotheses = load_hypotheses(conn)
+    index_by_key = {key_: i for i, key_ in enumerate(hypotheses['keys'])}
+    low, high, counts = load_pair_stats(conn, index_by_key)
+    report = compute_alignment(hypotheses, low, high, counts)
+    report.update({
+        'watermark': watermark,
+        'ratings_count': counted,
+        'hypotheses_count': len(hypotheses['keys']),
+        'pairs_count': int(len(low)),
+        'computed_at': datetime.now().isoformat(timespec='seconds'),
+        'compute_seconds': round(time.perf_counter() - start, 4),
+    })
+
+    with _cache_lock:
+        _cache.clear()
+        _cache[key] = report
+    return report
+
+
+def print_report(report):
+    """在终端打印一致性报告"""
+    print(f"📊 自动评分与专家评分一致性（{report['hypotheses_count']} 个假设，{report['pairs_count']} 个假设对，"
+          f"水位线 rating_id={report['watermark']}，耗时 {report['compute_seconds']}s）\n")
+    print(f"{'范围':<24}" + ''.join(f"{dim.replace('_score', ''):>22}" for dim in DIMENSIONS))
+    print(f"{'':<24}" + ''.join(f"{'spearman / agree / n':>22}" for _ in DIMENSIONS))
+
+    def row(label, dimensions):
+        cells = []
+        for dim in DIMENSIONS:
+            stats = dimensions[dim]
+            rho = '-' if stats['spearman'] is None else f"{stats['spearman']:.2f}"
+            agree = '-' if stats['pairwise_agreement'] is None else f"{stats['pairwise_agreement']:.2f}"
+            cells.append(f"{rho} / {agree} / {stats['decisive_judgments']}".rjust(22))
+        print(f"{label:<24}" + ''.join(cells))
+
+    row('ALL', report['dimensions'])
+    for column in GROUP_COLUMNS:
+        for value, dimensions in report[column].items():
+            row(f"{column}={value}"[:23], dimensions)
+    for topic, dimensions in report['topics'].items():
+        row(topic, dimensions)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='自动评分与专家评分一致性报告')
+    parser.add_argument('--db', default=DB_PATH, help='数据库路径')
+    parser.add_argument('--rebuild', action='store_true', help='丢弃汇总表，从全部评分重新计算')
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.db)
+    if args.rebuild:
+        refresh_pair_stats(conn, rebuild=True)
+    print_report(get_alignment_report(conn))
+    conn.close()
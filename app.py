@@ -1,19 +1,74 @@
+import os
 import sqlite3
 import json
+import threading
+import time
 import uuid
 from datetime import datetime
 from flask import Flask, render_template, request, jsonify, session, redirect, url_for
 import random
 
+import add_content_columns
+import admin_stream
+import agreement_analysis
+import alignment_report
+import consistency_check
+import content_compression
+import db_maintenance
+import search_index
+import session_funnel
+import http_caching
+import hypothesis_corpus
+import lazy_translation
+import near_duplicates
+import perf_beacon
+import pool_sampler
+import rate_limit
+import rating_counters
+import request_profiler
+import static_assets
+import template_cache
+import warmup
+
 app = Flask(__name__)
 app.secret_key = 'your-secret-key-here'  # 请在生产环境中更改此密钥
 
+# 静态文件指纹URL、预压缩文件、HTML压缩与ETag
+http_caching.init_app(app)
+# 本地化的前端资源包（模板函数 asset_bundle）
+static_assets.init_app(app)
+# 写接口的令牌桶限流与背压（429/503 + Retry-After）
+rate_limit.init_app(app)
+# 模板字节码缓存（新worker不必从源码编译模板）
+template_cache.init_app(app)
+# 按请求开启的性能剖析（环境变量、抽样或签名头），/admin/profiles 查看；未开启时不注册钩子
+request_profiler.init_app(app)
+
 # 数据库路径
 DB_PATH = 'hypothesis_data.db'
 
 # 每个主题的固定假设池（10条假设）
 TOPIC_HYPOTHESIS_POOLS = {}
 
+# 假设池大小、每个会话的比较次数（pool_config.json，可按主题覆盖）
+try:
+    POOL_CONFIG = pool_sampler.load_pool_config()
+except (OSError, ValueError) as e:
+    print(f"⚠️  无法读取 {pool_sampler.POOL_CONFIG_PATH}，使用默认配置: {e}")
+    POOL_CONFIG = dict(pool_sampler.DEFAULT_CONFIG)
+
+# 各主题预定义假设的数量：topic_name -> (加载时间, 数量)
+TOPIC_POOL_SIZE_CACHE = {}
+# 按排名缓存的预定义假设：(topic_name, language, rank) -> (加载时间, 行)，内容JSON已解析；
+# 条目数有上限，内存与池大小无关
+COMPARISON_ROW_CACHE = {}
+COMPARISON_ROW_CACHE_SIZE = int(os.environ.get('COMPARISON_ROW_CACHE_SIZE', 2048))
+COMPARISON_CACHE_TTL = float(os.environ.get('COMPARISON_CACHE_TTL', 300))
+_comparison_cache_lock = threading.Lock()
+
+# 预热时建表、创建假设池等待其他worker写锁的最长时间（秒）
+SCHEMA_LOCK_TIMEOUT = float(os.environ.get('SCHEMA_LOCK_TIMEOUT', 60))
+
 # 主题描述
 TOPIC_DESCRIPTIONS = {
     'topic1': "How can we incorporate existing knowledge bases effectively into LLMs",
@@ -33,15 +88,18 @@ def init_hypothesis_pools():
     """初始化每个主题的固定假设池"""
     global TOPIC_HYPOTHESIS_POOLS
     
-    conn = sqlite3.connect(DB_PATH)
+    conn = sqlite3.connect(DB_PATH, timeout=SCHEMA_LOCK_TIMEOUT)
     cursor = conn.cursor()
     
     # 获取所有主题
     cursor.execute("SELECT DISTINCT topic FROM hypothesis")
     topics = [row[0] for row in cursor.fetchall()]
     
+    corpus = hypothesis_corpus.open_shared_corpus(conn)
+    
     for topic in topics:
         topic_name = f'topic{topic}'
+        pool_size = pool_sampler.topic_setting(POOL_CONFIG, topic_name, 'pool_size')
         
         # 检查是否已经有预定义的假设
         cursor.execute("""
@@ -50,64 +108,76 @@ def init_hypothesis_pools():
         """, (topic_name,))
         
         if cursor.fetchone()[0] == 0:
-            # 如果没有预定义假设，则抽取8个
-            print(f"Creating predefined hypotheses for {topic_name}...")
-            
-            # 为每个主题随机选择8条假设，包含所有字段
+            # 多个worker同时发现主题为空：持有写锁后重新检查，只有一个worker抽取并写入
+            cursor.execute("BEGIN IMMEDIATE")
             cursor.execute("""
-                SELECT id, model_source, topic, sub_topic, strategy, hypothesis_id, 
-                       hypothesis_content, feedback_results, novelty_score, significance_score,
-                       soundness_score, feasibility_score, overall_winner_score
-                FROM hypothesis 
-                WHERE topic = ? 
-                ORDER BY RANDOM() 
-                LIMIT 8
-            """, (topic,))
+                SELECT COUNT(*) FROM predefined_comparisons 
+                WHERE topic_name = ?
+            """, (topic_name,))
+            
+            if cursor.fetchone()[0] == 0:
+                # 如果没有预定义假设，则抽取 pool_size 个
+                print(f"Creating predefined hypotheses for {topic_name}...")
+            
+                # 为每个主题随机选择 pool_size 条假设，包含所有字段
+                cursor.execute("""
+                    SELECT id, model_source, topic, sub_topic, strategy, hypothesis_id, 
+                           hypothesis_content, feedback_results, novelty_score, significance_score,
+                           soundness_score, feasibility_score, overall_winner_score
+                    FROM hypothesis 
+                    WHERE topic = ? 
+                """, (topic,))
             
-            hypotheses = []
-            for row in cursor.fetchall():
-                try:
-                    content = json.loads(row[6]) if row[6] else {}
-                    hypotheses.append({
-                        'id': row[0],
-                        'model_source': row[1],
-                        'topic': row[2],
-                        'sub_topic': row[3],
-                        'strategy': row[4],
-                        'hypothesis_id': row[5],
-                        'content': content,
-                        'feedback_results': row[7],
-                        'novelty_score': row[8],
-                        'significance_score': row[9],
-                        'soundness_score': row[10],
-                        'feasibility_score': row[11],
-                        'overall_winner_score': row[12]
-                    })
-                except json.JSONDecodeError:
-                    continue
+                hypotheses = []
+                # 近似重复的假设（near_duplicates.py 检测结果）最多选一个
+                for row in near_duplicates.sample_distinct(conn, cursor.fetchall(), pool_size):
+                    try:
+                        content = json.loads(content_compression.decode_content(conn, row[6])) if row[6] else {}
+                        hypotheses.append({
+                            'id': row[0],
+                            'model_source': row[1],
+                            'topic': row[2],
+                            'sub_topic': row[3],
+                            'strategy': row[4],
+                            'hypothesis_id': row[5],
+                            'content': content,
+                            'feedback_results': row[7],
+                            'novelty_score': row[8],
+                            'significance_score': row[9],
+                            'soundness_score': row[10],
+                            'feasibility_score': row[11],
+                            'overall_winner_score': row[12]
+                        })
+                    except json.JSONDecodeError:
+                        continue
             
-            # 将8个假设存储到数据库
-            if len(hypotheses) >= 8:
-                # 使用固定的随机种子确保每次生成相同的假设
-                random.seed(42)  # 固定种子
+                # 将 pool_size 个假设存储到数据库
+                if len(hypotheses) >= pool_size:
+                    # 使用固定的随机种子确保每次生成相同的假设
+                    random.seed(42)  # 固定种子
                 
-                for i, hypothesis in enumerate(hypotheses, 1):
-                    cursor.execute("""
-                        INSERT INTO predefined_comparisons 
-                        (topic_name, hypothesis_rank, original_hypothesis_id, model_source, topic, sub_topic,
-                         strategy, hypothesis_id, hypothesis_content_en, feedback_results,
-                         novelty_score, significance_score, soundness_score, feasibility_score, overall_winner_score)
-                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                    """, (topic_name, i, hypothesis['id'], hypothesis['model_source'], hypothesis['topic'],
-                          hypothesis['sub_topic'], hypothesis['strategy'], hypothesis['hypothesis_id'],
-                          json.dumps(hypothesis['content']), hypothesis['feedback_results'],
-                          hypothesis['novelty_score'], hypothesis['significance_score'], hypothesis['soundness_score'],
-                          hypothesis['feasibility_score'], hypothesis['overall_winner_score']))
+                    for i, hypothesis in enumerate(hypotheses, 1):
+                        cursor.execute("""
+                            INSERT INTO predefined_comparisons 
+                            (topic_name, hypothesis_rank, original_hypothesis_id, model_source, topic, sub_topic,
+                             strategy, hypothesis_id, hypothesis_content_en, feedback_results,
+                             novelty_score, significance_score, soundness_score, feasibility_score, overall_winner_score)
+                            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                        """, (topic_name, i, hypothesis['id'], hypothesis['model_source'], hypothesis['topic'],
+                              hypothesis['sub_topic'], hypothesis['strategy'], hypothesis['hypothesis_id'],
+                              json.dumps(hypothesis['content']), hypothesis['feedback_results'],
+                              hypothesis['novelty_score'], hypothesis['significance_score'], hypothesis['soundness_score'],
+                              hypothesis['feasibility_score'], hypothesis['overall_winner_score']))
                 
-                print(f"Created 8 predefined hypotheses for {topic_name}")
+                    print(f"Created {len(hypotheses)} predefined hypotheses for {topic_name}")
             
             conn.commit()
         
+        # 假设池：优先使用内存映射的只读语料，各worker共享页缓存中的一份，假设内容访问时才解析
+        if corpus is not None:
+            TOPIC_HYPOTHESIS_POOLS[topic_name] = corpus.topic_pool(topic)
+            continue
+        
         # 加载假设池到内存（用于获取假设内容）
         cursor.execute("""
             SELECT id, hypothesis_content 
@@ -118,7 +188,7 @@ def init_hypothesis_pools():
         hypotheses = []
         for row in cursor.fetchall():
             try:
-                content = json.loads(row[1])
+                content = json.loads(content_compression.decode_content(conn, row[1]))
                 hypotheses.append({
                     'id': row[0],
                     'content': content
@@ -132,9 +202,13 @@ def init_hypothesis_pools():
 
 def create_rating_tables():
     """创建评分相关的数据库表"""
-    conn = sqlite3.connect(DB_PATH)
+    conn = sqlite3.connect(DB_PATH, timeout=SCHEMA_LOCK_TIMEOUT)
     cursor = conn.cursor()
     
+    # 多个gunicorn worker同时预热：整个迁移在写锁内执行，下面的检查（如 client_request_id 列是否存在）
+    # 都在持有写锁后进行，后启动的worker看到的是已经迁移完成的结构
+    cursor.execute("BEGIN IMMEDIATE")
+    
     # 创建评分表
     cursor.execute("""
         CREATE TABLE IF NOT EXISTS ratings (
@@ -166,7 +240,7 @@ def create_rating_tables():
         )
     """)
     
-    # 创建预定义假设表（存储每个topic的8个假设，包含所有相关字段）
+    # 创建预定义假设表（存储每个topic的假设池，包含所有相关字段）
     cursor.execute("""
         CREATE TABLE IF NOT EXISTS predefined_comparisons (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -192,9 +266,63 @@ def create_rating_tables():
         )
     """)
     
+    # 客户端生成的提交ID，离线队列重发时用于去重
+    for table in ('ratings', 'comments'):
+        cursor.execute(f"PRAGMA table_info({table})")
+        columns = [column[1] for column in cursor.fetchall()]
+        if 'client_request_id' not in columns:
+            cursor.execute(f"ALTER TABLE {table} ADD COLUMN client_request_id TEXT")
+        cursor.execute(f"""
+            CREATE UNIQUE INDEX IF NOT EXISTS idx_{table}_client_request_id
+            ON {table}(client_request_id) WHERE client_request_id IS NOT NULL
+        """)
+    
+    renumber_hypothesis_ranks(cursor)
+    
     conn.commit()
+    
+    # 按主题的评分数、评论数（触发器维护，管理页面推送与一致性报告读取）
+    rating_counters.ensure_rating_counters(conn)
     conn.close()
 
+def renumber_hypothesis_ranks(cursor):
+    """
+    迁移：每个主题的 hypothesis_rank 重新编号为连续的 1..N（按原排名、id排序），
+    并确保 (topic_name, hypothesis_rank) 有唯一索引，按排名选取假设对时只读取两行
+    """
+    cursor.execute("""
+        SELECT COUNT(*) FROM (
+            SELECT topic_name FROM predefined_comparisons
+            GROUP BY topic_name
+            HAVING MIN(hypothesis_rank) != 1 OR MAX(hypothesis_rank) != COUNT(*)
+                OR COUNT(DISTINCT hypothesis_rank) != COUNT(*)
+        )
+    """)
+    topics_to_fix = cursor.fetchone()[0]
+    if topics_to_fix:
+        # 先写成负数再取反，中间状态不会与唯一约束冲突
+        cursor.execute("""
+            UPDATE predefined_comparisons SET hypothesis_rank = -numbered.new_rank
+            FROM (
+                SELECT id, ROW_NUMBER() OVER (PARTITION BY topic_name ORDER BY hypothesis_rank, id) AS new_rank
+                FROM predefined_comparisons
+            ) AS numbered
+            WHERE numbered.id = predefined_comparisons.id
+        """)
+        cursor.execute("UPDATE predefined_comparisons SET hypothesis_rank = -hypothesis_rank")
+        print(f"🔧 已重新编号 {topics_to_fix} 个主题的假设排名")
+    
+    # 用 UNIQUE(topic_name, hypothesis_rank) 建表时已有索引；rebuild_predefined_comparisons.py 的旧表没有
+    cursor.execute("PRAGMA index_list(predefined_comparisons)")
+    for index in cursor.fetchall():
+        cursor.execute(f"PRAGMA index_info({index[1]})")
+        if [column[2] for column in cursor.fetchall()] == ['topic_name', 'hypothesis_rank']:
+            return
+    cursor.execute("""
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_predefined_comparisons_topic_rank
+        ON predefined_comparisons(topic_name, hypothesis_rank)
+    """)
+
 @app.route('/')
 def index():
     """主页 - 显示可用的主题"""
@@ -211,25 +339,16 @@ def index():
     topics = [row[0] for row in cursor.fetchall()]
     conn.close()
     
-    return render_template('index.html', topics=topics, topic_descriptions=TOPIC_DESCRIPTIONS)
+    return render_template('index.html', topics=topics, topic_descriptions=TOPIC_DESCRIPTIONS,
+                         comparisons_per_session=POOL_CONFIG['comparisons_per_session'])
 
 @app.route('/rate/<topic>')
 def rate_topic(topic):
     """主题评估页面"""
     # 检查主题是否有预定义的比较对
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    
-    cursor.execute("""
-        SELECT COUNT(*) FROM predefined_comparisons 
-        WHERE topic_name = ?
-    """, (topic,))
-    
-    if cursor.fetchone()[0] == 0:
-        conn.close()
+    if topic_pool_size(topic) < 2:
         return "主题不存在或没有预定义的比较对", 404
-    
-    conn.close()
+    total_comparisons = comparisons_per_session(topic)
     
     # 初始化会话
     if 'session_id' not in session:
@@ -246,73 +365,175 @@ def rate_topic(topic):
         session['completed_comparisons'] = []
     
     # 检查比较编号是否在有效范围内
-    if session['current_comparison'] > 8:
-        # 如果超过8个比较，重定向到感谢页面
+    if session['current_comparison'] > total_comparisons:
+        # 如果超过本主题的比较次数，重定向到感谢页面
         return redirect(url_for('thank_you'))
     
     # 获取语言偏好（默认为英文）
     language = request.args.get('lang', 'english')
     
+    # 同一次比较内（刷新、切换语言）保持相同的假设对，页面内容不变时ETag可命中
+    pinned = session.get('current_pair')
+    pair_ranks = None
+    if pinned and pinned.get('comparison') == session['current_comparison']:
+        pair_ranks = pinned.get('ranks')
+    
     # 获取当前比较的假设对
-    comparison_data = get_comparison_pair(topic, session['current_comparison'], language)
+    comparison_data = get_comparison_pair(topic, session['current_comparison'], language, pair_ranks)
     
     if not comparison_data:
         return f"无法找到 {topic} 的比较对 {session['current_comparison']}。请检查数据库中的预定义比较对。", 404
     
+    session['current_pair'] = {
+        'comparison': session['current_comparison'],
+        'ranks': [comparison_data['hypothesis_A']['rank'], comparison_data['hypothesis_B']['rank']]
+    }
+    
     return render_template('rate_topic.html', 
                          topic=topic,
                          topic_descriptions=TOPIC_DESCRIPTIONS,
                          comparison_data=comparison_data,
                          current_comparison=session['current_comparison'],
-                         total_comparisons=8)
+                         total_comparisons=total_comparisons,
+                         session_id=session['session_id'])
 
-def get_comparison_pair(topic, comparison_number, language='english'):
-    """从预定义的8个假设中随机选择2个进行比较"""
+def comparisons_per_session(topic):
+    """主题每个会话的比较次数（pool_config.json）"""
+    return pool_sampler.topic_setting(POOL_CONFIG, topic, 'comparisons_per_session')
+
+def topic_pool_size(topic):
+    """主题预定义假设的数量（排名为连续的 1..N，取最大排名只读一个索引项），结果缓存 COMPARISON_CACHE_TTL 秒"""
+    cached = TOPIC_POOL_SIZE_CACHE.get(topic)
+    if cached and time.monotonic() - cached[0] < COMPARISON_CACHE_TTL:
+        return cached[1]
+    
     conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
+    size = conn.execute("SELECT COALESCE(MAX(hypothesis_rank), 0) FROM predefined_comparisons WHERE topic_name = ?",
+                        (topic,)).fetchone()[0]
+    conn.close()
     
-    # 根据语言选择要获取的列
+    # 不存在的主题不缓存，避免任意URL占用内存
+    if size:
+        TOPIC_POOL_SIZE_CACHE[topic] = (time.monotonic(), size)
+    return size
+
+def load_ranked_hypotheses(topic, ranks, language='english', request_translation=True):
+    """
+    按排名读取预定义假设（内容JSON已解析），返回 {rank: 行}；只查询缓存中没有的行
+    中文内容为空时回退到英文（行末的标记为True，不缓存），并提交后台翻译
+    """
+    language = 'chinese' if language == 'chinese' else 'english'
+    now = time.monotonic()
+    hypotheses = {}
+    for rank in ranks:
+        cached = COMPARISON_ROW_CACHE.get((topic, language, rank))
+        if cached and now - cached[0] < COMPARISON_CACHE_TTL:
+            hypotheses[rank] = cached[1]
+    missing = [rank for rank in ranks if rank not in hypotheses]
+    if not missing:
+        return hypotheses
+    
+    # 根据语言选择要获取的列（中文同时读取英文用于回退）
     content_column = "hypothesis_content_zh" if language == 'chinese' else "hypothesis_content_en"
     
-    # 获取该主题的所有预定义假设
+    conn = sqlite3.connect(DB_PATH)
+    cursor = conn.cursor()
     cursor.execute(f"""
         SELECT original_hypothesis_id, hypothesis_rank, {content_column}, model_source, strategy,
-               novelty_score, significance_score, soundness_score, feasibility_score, overall_winner_score
+               novelty_score, significance_score, soundness_score, feasibility_score, overall_winner_score,
+               id, hypothesis_content_en
         FROM predefined_comparisons 
-        WHERE topic_name = ?
-        ORDER BY hypothesis_rank
-    """, (topic,))
+        WHERE topic_name = ? AND hypothesis_rank IN ({', '.join('?' for _ in missing)})
+    """, (topic, *missing))
+    rows = cursor.fetchall()
+    conn.close()
     
-    hypotheses = cursor.fetchall()
-    if len(hypotheses) < 2:
-        print(f"主题 {topic} 的预定义假设数量不足")
+    fallback = []
+    for row in rows:
+        pending = language == 'chinese' and not row[2] and bool(row[11])
+        content_json = row[11] if pending else row[2]
+        if pending:
+            fallback.append(row[10])
+        try:
+            content = json.loads(content_json) if content_json else {}
+        except ValueError as e:
+            # 包括 JSONDecodeError 与误存为压缩BLOB时的 UnicodeDecodeError
+            print(f"JSON解析错误: {e}")
+            content = {}
+        hypotheses[row[1]] = (row[0], row[1], content) + tuple(row[3:10]) + (pending,)
+    
+    translation_service = get_translation_service() if fallback and request_translation else None
+    if translation_service:
+        for predefined_id in fallback:
+            translation_service.request(predefined_id)
+    
+    with _comparison_cache_lock:
+        for rank in missing:
+            if rank in hypotheses and not hypotheses[rank][10]:
+                COMPARISON_ROW_CACHE[(topic, language, rank)] = (now, hypotheses[rank])
+        # 超出上限时淘汰最早加入的条目
+        while len(COMPARISON_ROW_CACHE) > COMPARISON_ROW_CACHE_SIZE:
+            del COMPARISON_ROW_CACHE[next(iter(COMPARISON_ROW_CACHE))]
+    return hypotheses
+
+def build_search_index():
+    """预热：创建全文检索索引，补齐触发器缺失的来源（检索请求中不执行DDL）"""
+    conn = sqlite3.connect(DB_PATH, timeout=SCHEMA_LOCK_TIMEOUT)
+    try:
+        rebuilt = search_index.ensure_search_index(conn)
+    finally:
         conn.close()
-        return None
-    
+    if rebuilt:
+        print(f"✅ 已重建检索索引: {', '.join(rebuilt)}")
+
+def preload_comparisons():
+    """预热：读取各主题的假设数量，并在缓存容量内预先加载中英文两种语言的假设"""
+    conn = sqlite3.connect(DB_PATH)
+    sizes = conn.execute("SELECT topic_name, MAX(hypothesis_rank) FROM predefined_comparisons GROUP BY topic_name").fetchall()
+    conn.close()
     
-    # 随机选择2个不同的假设
-    selected_indices = random.sample(range(len(hypotheses)), 2)
-    hyp_a_data = hypotheses[selected_indices[0]]
-    hyp_b_data = hypotheses[selected_indices[1]]
+    now = time.monotonic()
+    per_topic = COMPARISON_ROW_CACHE_SIZE // max(2 * len(sizes), 1)
+    for topic, size in sizes:
+        TOPIC_POOL_SIZE_CACHE[topic] = (now, size)
+        for language in ('english', 'chinese'):
+            load_ranked_hypotheses(topic, range(1, min(size, per_topic) + 1), language, request_translation=False)
+    return f"{len(sizes)} 个主题"
+
+def get_comparison_pair(topic, comparison_number, language='english', pair_ranks=None):
+    """
+    从主题的假设池中随机选择2个进行比较；给定pair_ranks时返回指定排名的假设对
+    按排名只读取选中的两行，每次请求的开销与池大小无关
+    """
+    pool_size = topic_pool_size(topic)
+    if pool_size < 2:
+        print(f"主题 {topic} 的预定义假设数量不足")
+        return None
     
-    print(f"从 {topic} 的 {len(hypotheses)} 个假设中选择了: A={hyp_a_data[0]}, B={hyp_b_data[0]}")
+    # 优先使用指定的假设对，否则随机选择2个不同的排名
+    valid_pinned = (isinstance(pair_ranks, list) and len(pair_ranks) == 2 and pair_ranks[0] != pair_ranks[1]
+                    and all(isinstance(rank, int) and 1 <= rank <= pool_size for rank in pair_ranks))
+    selected_ranks = pair_ranks if valid_pinned else random.sample(range(1, pool_size + 1), 2)
+    hypotheses = load_ranked_hypotheses(topic, selected_ranks, language)
+    if any(rank not in hypotheses for rank in selected_ranks):
+        print(f"主题 {topic} 缺少排名为 {selected_ranks} 的假设")
+        return None
+    hyp_a_data = hypotheses[selected_ranks[0]]
+    hyp_b_data = hypotheses[selected_ranks[1]]
     
-    # 解析JSON内容
-    try:
-        hypothesis_A_content = json.loads(hyp_a_data[2]) if hyp_a_data[2] else {}
-        hypothesis_B_content = json.loads(hyp_b_data[2]) if hyp_b_data[2] else {}
-    except json.JSONDecodeError as e:
-        print(f"JSON解析错误: {e}")
-        hypothesis_A_content = {}
-        hypothesis_B_content = {}
+    print(f"从 {topic} 的 {pool_size} 个假设中选择了: A={hyp_a_data[0]}, B={hyp_b_data[0]}")
     
-    conn.close()
+    hypothesis_A_content = hyp_a_data[2]
+    hypothesis_B_content = hyp_b_data[2]
     
     print(f"假设内容: A={hypothesis_A_content is not None}, B={hypothesis_B_content is not None}")
     
     return {
+        # 中文译文尚未生成，显示的是英文
+        'translation_pending': hyp_a_data[10] or hyp_b_data[10],
         'hypothesis_A': {
             'id': hyp_a_data[0],
+            'rank': hyp_a_data[1],
             'content': hypothesis_A_content,
             'model_source': hyp_a_data[3],
             'strategy': hyp_a_data[4],
@@ -320,10 +541,12 @@ def get_comparison_pair(topic, comparison_number, language='english'):
             'significance_score': hyp_a_data[6],
             'soundness_score': hyp_a_data[7],
             'feasibility_score': hyp_a_data[8],
-            'overall_winner_score': hyp_a_data[9]
+            'overall_winner_score': hyp_a_data[9],
+            'translation_pending': hyp_a_data[10]
         },
         'hypothesis_B': {
             'id': hyp_b_data[0],
+            'rank': hyp_b_data[1],
             'content': hypothesis_B_content,
             'model_source': hyp_b_data[3],
             'strategy': hyp_b_data[4],
@@ -331,29 +554,56 @@ def get_comparison_pair(topic, comparison_number, language='english'):
             'significance_score': hyp_b_data[6],
             'soundness_score': hyp_b_data[7],
             'feasibility_score': hyp_b_data[8],
-            'overall_winner_score': hyp_b_data[9]
+            'overall_winner_score': hyp_b_data[9],
+            'translation_pending': hyp_b_data[10]
         }
     }
 
-@app.route('/api/submit-rating', methods=['POST'])
-def submit_rating():
-    """提交评分数据"""
-    data = request.json
-    
-    # 保存评分到数据库
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    
+# 评分维度字段
+RATING_SCORE_FIELDS = ['novelty_score', 'soundness_score', 'feasibility_score', 'significance_score', 'overall_score']
+
+def validate_rating(data):
+    """校验单条评分数据，返回错误信息，合法时返回None"""
+    if not isinstance(data, dict):
+        return 'invalid payload'
+    for field in ['comparison_number', 'hypothesis_A_id', 'hypothesis_B_id']:
+        if not isinstance(data.get(field), int):
+            return f'missing or invalid {field}'
+    for field in RATING_SCORE_FIELDS:
+        value = data.get(field)
+        if not isinstance(value, int) or value < 1 or value > 5:
+            return f'missing or invalid {field}'
+    return validate_optional_strings(data, ['client_request_id', 'topic', 'session_id'])
+
+def validate_comment(data):
+    """校验单条评论数据，返回错误信息，合法时返回None"""
+    if not isinstance(data, dict):
+        return 'invalid payload'
+    return validate_optional_strings(data, ['comment', 'email', 'client_request_id', 'topic', 'session_id'])
+
+def validate_optional_strings(data, fields):
+    """可选的字符串字段：缺失或为null时允许，其他类型返回错误信息"""
+    for field in fields:
+        if data.get(field) is not None and not isinstance(data[field], str):
+            return f'invalid {field}'
+    return None
+
+def insert_rating(cursor, session_id, topic_name, data):
+    """
+    写入一条评分；client_request_id重复时忽略，返回是否新插入
+    只忽略 client_request_id 冲突，其他约束错误（如缺少主题）照常抛出 sqlite3.IntegrityError
+    """
     cursor.execute("""
         INSERT INTO ratings (
             session_id, topic_name, comparison_number,
             hypothesis_A_id, hypothesis_B_id,
             novelty_score, soundness_score, feasibility_score,
-            significance_score, overall_score
-        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            significance_score, overall_score, client_request_id
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(client_request_id) WHERE client_request_id IS NOT NULL DO NOTHING
     """, (
-        session['session_id'],
-        session['topic'],
+        session_id,
+        topic_name,
         data['comparison_number'],
         data['hypothesis_A_id'],
         data['hypothesis_B_id'],
@@ -361,22 +611,148 @@ def submit_rating():
         data['soundness_score'],
         data['feasibility_score'],
         data['significance_score'],
-        data['overall_score']
+        data['overall_score'],
+        data.get('client_request_id')
     ))
+    return cursor.rowcount == 1
+
+def insert_comment(cursor, session_id, topic_name, data):
+    """写入一条评论；只忽略 client_request_id 冲突，返回是否新插入"""
+    cursor.execute("""
+        INSERT INTO comments (session_id, topic_name, email, comment_text, client_request_id)
+        VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT(client_request_id) WHERE client_request_id IS NOT NULL DO NOTHING
+    """, (
+        session_id,
+        topic_name,
+        data.get('email', ''),  # 邮箱字段，可选
+        data.get('comment', ''),
+        data.get('client_request_id')
+    ))
+    return cursor.rowcount == 1
+
+def advance_session(comparison_number):
+    """根据已保存的比较编号推进会话进度（重复提交不会重复推进）"""
+    if comparison_number not in session['completed_comparisons']:
+        session['completed_comparisons'].append(comparison_number)
+    session['current_comparison'] = max(session['current_comparison'], comparison_number + 1)
     
-    conn.commit()
-    conn.close()
+    # 检查是否完成了所有比较
+    total_comparisons = comparisons_per_session(session.get('topic'))
+    if session['current_comparison'] > total_comparisons:
+        session['current_comparison'] = total_comparisons  # 防止超出范围
+    session.modified = True
+
+@app.route('/api/submit-rating', methods=['POST'])
+def submit_rating():
+    """提交评分数据"""
+    data = request.json
     
-    # 更新会话状态
-    session['current_comparison'] += 1
-    session['completed_comparisons'].append(data['comparison_number'])
+    error = validate_rating(data)
+    if error:
+        return jsonify({'success': False, 'error': error}), 400
     
-    # 检查是否完成了所有比较
-    if session['current_comparison'] > 8:
-        session['current_comparison'] = 8  # 防止超出范围
+    # 保存评分到数据库
+    conn = sqlite3.connect(DB_PATH)
+    cursor = conn.cursor()
+    try:
+        rate_limit.begin_write(cursor)
+        insert_rating(cursor, session['session_id'], session['topic'], data)
+        conn.commit()
+    except sqlite3.OperationalError as e:
+        conn.rollback()
+        if 'locked' not in str(e) and 'busy' not in str(e):
+            raise
+        return rate_limit.too_many_requests(rate_limit.BACKPRESSURE_RETRY_AFTER, 'server busy', status=503)
+    finally:
+        conn.close()
+    
+    # 更新会话状态
+    advance_session(data['comparison_number'])
     
     return jsonify({'success': True})
 
+@app.route('/api/submit-ratings', methods=['POST'])
+def submit_ratings_bulk():
+    """
+    批量提交评分和评论（客户端离线队列），一个事务内写入，逐条返回状态
+    每条数据带有入队时页面的 session_id 与主题，按它自己的会话保存（离线期间用户可能已开始新的主题）；
+    只有属于当前cookie会话的评分才推进会话进度
+    inserted / duplicate：已保存；invalid：数据不合法，重试也不会成功（客户端从队列中移除并提示）
+    只有数据库忙（锁等待超时）时整批返回503，客户端稍后重试
+    """
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({'success': False, 'error': 'request body must be a JSON object'}), 400
+    ratings = data.get('ratings') or []
+    comments = data.get('comments') or []
+    if not isinstance(ratings, list) or not isinstance(comments, list):
+        return jsonify({'success': False, 'error': 'ratings and comments must be lists'}), 400
+    
+    if 'session_id' not in session:
+        # 会话cookie丢失时仍保存离线队列中的数据，归入新的会话
+        session['session_id'] = str(uuid.uuid4())
+    
+    session_id = session['session_id']
+    session_topic = session.get('topic')
+    rating_results = []
+    comment_results = []
+    saved_comparisons = []
+    
+    def save_items(items, validate, insert, results):
+        for item in items:
+            error = validate(item)
+            # 不合法的条目也返回它的 client_request_id，客户端据此把它移出队列
+            client_request_id = item.get('client_request_id') if isinstance(item, dict) else None
+            if not isinstance(client_request_id, str):
+                client_request_id = None
+            topic_name = (item.get('topic') or session_topic) if not error else None
+            if not error and not topic_name:
+                error = 'missing topic'
+            if error:
+                results.append({'client_request_id': client_request_id, 'status': 'invalid', 'error': error})
+                continue
+            item_session_id = item.get('session_id') or session_id
+            try:
+                inserted = insert(cursor, item_session_id, topic_name, item)
+            except sqlite3.IntegrityError as e:
+                # 约束错误只撤销这一条语句，事务中的其他条目不受影响
+                results.append({'client_request_id': client_request_id, 'status': 'invalid', 'error': str(e)})
+                continue
+            results.append({'client_request_id': client_request_id,
+                            'status': 'inserted' if inserted else 'duplicate'})
+            if insert is insert_rating and item_session_id == session_id and topic_name == session_topic:
+                saved_comparisons.append(item['comparison_number'])
+    
+    conn = sqlite3.connect(DB_PATH)
+    cursor = conn.cursor()
+    try:
+        # 记录等待写锁的时间，争用严重时 rate_limit 提前拒绝新的写请求
+        rate_limit.begin_write(cursor)
+        save_items(ratings, validate_rating, insert_rating, rating_results)
+        save_items(comments, validate_comment, insert_comment, comment_results)
+        conn.commit()
+    except sqlite3.OperationalError as e:
+        conn.rollback()
+        if 'locked' not in str(e) and 'busy' not in str(e):
+            raise
+        print(f"❌ 批量提交失败（数据库忙）: {e}")
+        return rate_limit.too_many_requests(rate_limit.BACKPRESSURE_RETRY_AFTER, 'server busy', status=503)
+    finally:
+        conn.close()
+    
+    if 'current_comparison' in session:
+        for comparison_number in saved_comparisons:
+            advance_session(comparison_number)
+    
+    all_results = rating_results + comment_results
+    return jsonify({
+        'success': all(result['status'] != 'invalid' for result in all_results),
+        'ratings': rating_results,
+        'comments': comment_results,
+        'current_comparison': session.get('current_comparison')
+    })
+
 @app.route('/thank-you')
 def thank_you():
     """感谢页面"""
@@ -394,19 +770,17 @@ def submit_comment():
     
     conn = sqlite3.connect(DB_PATH)
     cursor = conn.cursor()
-    
-    cursor.execute("""
-        INSERT INTO comments (session_id, topic_name, email, comment_text)
-        VALUES (?, ?, ?, ?)
-    """, (
-        session['session_id'],
-        session['topic'],
-        data.get('email', ''),  # 邮箱字段，可选
-        data.get('comment', '')
-    ))
-    
-    conn.commit()
-    conn.close()
+    try:
+        rate_limit.begin_write(cursor)
+        insert_comment(cursor, session['session_id'], session['topic'], data)
+        conn.commit()
+    except sqlite3.OperationalError as e:
+        conn.rollback()
+        if 'locked' not in str(e) and 'busy' not in str(e):
+            raise
+        return rate_limit.too_many_requests(rate_limit.BACKPRESSURE_RETRY_AFTER, 'server busy', status=503)
+    finally:
+        conn.close()
     
     return jsonify({'success': True})
 
@@ -416,9 +790,10 @@ def admin_ratings():
     conn = sqlite3.connect(DB_PATH)
     cursor = conn.cursor()
     
-    # 获取所有评分数据
+    # 获取所有评分数据；只取标题列（触发器维护），不读取完整的假设JSON
+    add_content_columns.ensure_content_columns(conn)
     cursor.execute("""
-        SELECT r.*, h1.hypothesis_content as content_A, h2.hypothesis_content as content_B
+        SELECT r.*, h1.title as title_A, h2.title as title_B
         FROM ratings r
         LEFT JOIN hypothesis h1 ON r.hypothesis_A_id = h1.id
         LEFT JOIN hypothesis h2 ON r.hypothesis_B_id = h2.id
@@ -426,9 +801,103 @@ def admin_ratings():
     """)
     
     ratings = cursor.fetchall()
+    
+    # 实时推送从页面数据之后开始
+    cursor.execute("SELECT COALESCE(MAX(comment_id), 0) FROM comments")
+    stream_from = {
+        'rating_id': max((rating[0] for rating in ratings), default=0),
+        'comment_id': cursor.fetchone()[0]
+    }
     conn.close()
     
-    return render_template('admin_ratings.html', ratings=ratings)
+    return render_template('admin_ratings.html', ratings=ratings, stream_from=stream_from)
+
+@app.route('/admin/agreement')
+def admin_agreement():
+    """管理员接口 - 专家评分一致性（Krippendorff's alpha、Fleiss式一致度）"""
+    metric = request.args.get('metric', 'interval')
+    if metric not in agreement_analysis.METRICS:
+        return jsonify({'error': f'metric must be one of {agreement_analysis.METRICS}'}), 400
+    include_pairs = request.args.get('pairs', '1') != '0'
+    
+    conn = sqlite3.connect(DB_PATH)
+    try:
+        report = agreement_analysis.get_agreement_report(conn, metric=metric, include_pairs=include_pairs)
+    finally:
+        conn.close()
+    
+    return jsonify(report)
+
+@app.route('/admin/alignment')
+def admin_alignment():
+    """管理员接口 - 自动评分与专家评分的一致性（增量刷新，结果缓存）"""
+    conn = sqlite3.connect(DB_PATH)
+    try:
+        report = alignment_report.get_alignment_report(conn)
+    finally:
+        conn.close()
+    
+    return jsonify(report)
+
+@app.route('/admin/consistency')
+def admin_consistency():
+    """管理员接口 - 专家会话内部一致性（循环偏好），结果写入 session_consistency 表"""
+    threshold = request.args.get('threshold', consistency_check.DEFAULT_THRESHOLD, type=float)
+    limit = min(max(request.args.get('limit', 20, type=int), 0), 500)
+    
+    conn = sqlite3.connect(DB_PATH)
+    try:
+        report = consistency_check.get_consistency_report(conn, threshold=threshold, limit=limit, db_path=DB_PATH)
+    finally:
+        conn.close()
+    
+    return jsonify(report)
+
+@app.route('/admin/search')
+def admin_search():
+    """管理员页面 - 假设全文检索（FTS5，中英文）"""
+    query = request.args.get('q', '').strip()
+    source = request.args.get('source') or None
+    lang = request.args.get('lang') or None
+    page = max(request.args.get('page', 1, type=int), 1)
+    per_page = 20
+    
+    results, total, error, rebuilding = [], 0, None, False
+    if query:
+        conn = sqlite3.connect(DB_PATH)
+        try:
+            # 索引在预热时创建；之后表被重建（触发器丢失）时在后台补齐，本次先检索现有索引
+            exists, missing = search_index.missing_sources(conn)
+            if missing:
+                search_index.rebuild_in_background(DB_PATH)
+                rebuilding = True
+            if exists:
+                results, total = search_index.search(conn, query, source=source, lang=lang,
+                                                     limit=per_page, offset=(page - 1) * per_page)
+            else:
+                error = "The search index is being built, please try again shortly."
+        except sqlite3.OperationalError as e:
+            print(f"❌ 检索失败: {e}")
+            error = f"Search is unavailable: {e}"
+        finally:
+            conn.close()
+    
+    return render_template('admin_search.html', query=query, source=source, lang=lang, page=page,
+                           per_page=per_page, results=results, total=total, error=error,
+                           rebuilding=rebuilding)
+
+@app.route('/admin/funnel')
+def admin_funnel():
+    """管理员页面 - 评分会话完成漏斗与流失（format=json 返回JSON）"""
+    conn = sqlite3.connect(DB_PATH)
+    try:
+        report = session_funnel.get_funnel_report(conn, *session_funnel.comparisons_from_config(POOL_CONFIG))
+    finally:
+        conn.close()
+    
+    if request.args.get('format') == 'json':
+        return jsonify(report)
+    return render_template('admin_funnel.html', report=report)
 
 @app.route('/reset-session')
 def reset_session():
@@ -436,6 +905,38 @@ def reset_session():
     session.clear()
     return "会话已重置！<br><a href='/'>返回主页</a>"
 
+# 管理页面实时推送（SSE）：/admin/stream
+admin_stream.init_app(app, DB_PATH)
+
+# 真实用户性能数据：/api/perf-beacon 接收，/admin/performance 查看分位数
+perf_beacon.init_app(app)
+db_maintenance.init_app(app, DB_PATH)
+
+# 按需翻译：中文内容缺失时先显示英文，后台翻译后写回数据库（LAZY_TRANSLATION_BACKEND）
+# 服务在预热或第一次需要翻译时创建：导入app时不加载翻译器，也不访问数据库
+_translation_service = {}
+_translation_service_lock = threading.Lock()
+
+def get_translation_service():
+    """按需翻译服务（每个进程创建一次）；关闭或翻译器不可用时返回None"""
+    with _translation_service_lock:
+        if 'service' not in _translation_service:
+            _translation_service['service'] = lazy_translation.create_service(DB_PATH)
+        return _translation_service['service']
+
+def start_translation_service():
+    """预热：创建按需翻译服务，返回使用的翻译器"""
+    return lazy_translation.LAZY_TRANSLATION_BACKEND if get_translation_service() else 'off'
+
+# /healthz、/readyz 与启动预热：建表、加载假设池、缓存各主题比较数据、创建检索索引、启动按需翻译、编译模板
+warmup.init_app(app, DB_PATH, [
+    ('rating_tables', create_rating_tables),
+    ('hypothesis_pools', init_hypothesis_pools),
+    ('comparisons', preload_comparisons),
+    ('search_index', build_search_index),
+    ('translation_service', start_translation_service),
+])
+
 @app.errorhandler(500)
 def internal_error(error):
     """处理500内部服务器错误"""
@@ -474,14 +975,10 @@ if __name__ == '__main__':
         
         print(f"✅ 数据库文件存在: {DB_PATH}")
         
-        # 初始化假设池和数据库表
-        print("🔄 初始化假设池...")
-        init_hypothesis_pools()
-        print("✅ 假设池初始化完成")
-        
-        print("🔄 创建评分表...")
-        create_rating_tables()
-        print("✅ 评分表创建完成")
+        # 初始化数据库表和假设池，缓存比较数据并编译模板
+        print("🔄 预热...")
+        if not warmup.run(app):
+            exit(1)
         
         # Railway环境变量支持
         port = int(os.environ.get('PORT', 5001))
@@ -0,0 +1,378 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ratings / comments 分区归档
+
+- 已结束的月份（按 timestamp）或已完成的主题（按 topic_name）整体移到 archive/ 下单独的
+  SQLite文件中（每个分区一个文件，可选gzip压缩），热表只保留进行中的数据
+- 移动在一个事务中完成（ATTACH 后 INSERT ... SELECT + DELETE），中途失败不会丢失或重复
+- 归档分区登记在主库的 archive_partitions 表中（文件、行数、主题、时间范围）
+- 读取：iter_rows() 按条件路由到热表和可能包含匹配行的分区；
+  create_union_views() 把全部分区 ATTACH 后建立临时视图 all_ratings / all_comments，供临时SQL查询
+- rating_id / comment_id 是 AUTOINCREMENT，归档后不会复用，跨分区仍然唯一
+- 归档后热表上的一致性等统计只覆盖未归档的数据（alignment_report 会自动重建汇总）
+
+用法:
+    python archive_ratings.py --by month [--before 2026-09] [--compress] [--vacuum]
+    python archive_ratings.py --by topic --topic topic3 [--compress]
+    python archive_ratings.py --list
+    python archive_ratings.py --export ratings.csv [--table ratings|comments] [--topic topic1] [--since 2026-01-01] [--until 2026-07-01]
+    python archive_ratings.py --sql "SELECT topic_name, COUNT(*) FROM all_ratings GROUP BY 1"
+"""
+
+import argparse
+import csv
+import gzip
+import json
+import os
+import re
+import shutil
+import sqlite3
+import sys
+from datetime import datetime, timezone
+
+from add_content_columns import ensure_content_columns
+
+# 配置数据库路径
+DB_PATH = "hypothesis_data.db"
+
+ARCHIVE_DIR = os.environ.get('ARCHIVE_DIR', 'archive')
+
+# 压缩分区解压后的缓存目录（相对 ARCHIVE_DIR）
+ARCHIVE_CACHE_SUBDIR = '.cache'
+
+ARCHIVED_TABLES = ('ratings', 'comments')
+
+# 读取归档分区时使用的 ATTACH 名称
+READ_ALIAS = 'archive_read'
+
+
+def create_registry(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS archive_partitions (
+            partition TEXT PRIMARY KEY,
+            kind TEXT NOT NULL,
+            value TEXT NOT NULL,
+            filename TEXT NOT NULL,
+            compressed INTEGER NOT NULL DEFAULT 0,
+            ratings_count INTEGER NOT NULL DEFAULT 0,
+            comments_count INTEGER NOT NULL DEFAULT 0,
+            topics TEXT NOT NULL DEFAULT '[]',
+            min_timestamp TEXT,
+            max_timestamp TEXT,
+            archived_at TEXT
+        )
+    """)
+    conn.commit()
+
+
+def table_columns(conn, schema, table):
+    return [row[1] for row in conn.execute(f"PRAGMA {schema}.table_info({table})")]
+
+
+def partition_filter(kind, value):
+    """分区对应的WHERE条件；月份用区间比较，可以使用timestamp上的索引"""
+    if kind == 'topic':
+        return "topic_name = ?", (value,)
+    year, month = (int(part) for part in value.split('-'))
+    next_month = f"{year + month // 12:04d}-{month % 12 + 1:02d}"
+    return "timestamp >= ? AND timestamp < ?", (f"{value}-01", f"{next_month}-01")
+
+
+def closed_months(conn, before):
+    """timestamp 早于 before 月份（YYYY-MM）的热数据所在的月份"""
+    months = set()
+    for table in ARCHIVED_TABLES:
+        months.update(row[0] for row in conn.execute(f"""
+            SELECT DISTINCT strftime('%Y-%m', timestamp) FROM {table}
+            WHERE timestamp < ? AND timestamp IS NOT NULL
+        """, (f"{before}-01",)))
+    return sorted(month for month in months if month)
+
+
+def compress_file(path):
+    with open(path, 'rb') as src, gzip.open(path + '.gz', 'wb') as dst:
+        shutil.copyfileobj(src, dst)
+    os.remove(path)
+
+
+def decompress_file(path_gz, path):
+    with gzip.open(path_gz, 'rb') as src, open(path + '.tmp', 'wb') as dst:
+        shutil.copyfileobj(src, dst)
+    os.replace(path + '.tmp', path)
+
+
+def readable_path(archive_dir, filename, compressed):
+    """分区的SQLite文件路径；压缩的分区解压到缓存目录（压缩文件更新后重新解压）"""
+    path = os.path.join(archive_dir, filename)
+    # 压缩前中断（或正在追加）时，登记为压缩的分区仍是未压缩文件
+    if not compressed or not os.path.exists(path + '.gz'):
+        return path
+    cached = os.path.join(archive_dir, ARCHIVE_CACHE_SUBDIR, filename)
+    if not os.path.exists(cached) or os.path.getmtime(cached) < os.path.getmtime(path + '.gz'):
+        os.makedirs(os.path.dirname(cached), exist_ok=True)
+        decompress_file(path + '.gz', cached)
+    return cached
+
+
+def archive_partition(conn, kind, value, archive_dir=ARCHIVE_DIR, compress=False):
+    """
+    把一个分区的 ratings / comments 移到归档文件，返回 {表: 移动行数}
+    分区已存在时追加（例如已归档主题又收到迟到的评分）
+    """
+    create_registry(conn)
+    partition = f"{kind}:{value}"
+    filename = f"{kind}_{value}.db"
+    path = os.path.join(archive_dir, filename)
+    os.makedirs(archive_dir, exist_ok=True)
+
+    # 已压缩的分区先解压，追加后重新压缩
+    if os.path.exists(path + '.gz'):
+        decompress_file(path + '.gz', path)
+        os.remove(path + '.gz')
+
+    where, params = partition_filter(kind, value)
+    moved = {}
+    conn.execute("ATTACH DATABASE ? AS archive", (path,))
+    try:
+        cursor = conn.cursor()
+        cursor.execute("BEGIN IMMEDIATE")
+        try:
+            for table in ARCHIVED_TABLES:
+                sql = cursor.execute("SELECT sql FROM main.sqlite_master WHERE type = 'table' AND name = ?",
+                                     (table,)).fetchone()
+                if sql is None:
+                    moved[table] = 0
+                    continue
+                # 归档文件使用热表的建表语句；热表之后新增的列在读取时补NULL
+                create_sql, replaced = re.subn(rf'^CREATE TABLE\s+(["`]?){table}\1', f"CREATE TABLE IF NOT EXISTS archive.{table}",
+                                               sql[0], count=1)
+                if not replaced:
+                    raise RuntimeError(f"无法解析 {table} 的建表语句")
+                cursor.execute(create_sql)
+                archived = set(table_columns(conn, 'archive', table))
+                columns = ', '.join(c for c in table_columns(conn, 'main', table) if c in archived)
+                cursor.execute(f"INSERT INTO archive.{table} ({columns}) SELECT {columns} FROM main.{table} WHERE {where}",
+                               params)
+                cursor.execute(f"DELETE FROM main.{table} WHERE {where}", params)
+                moved[table] = cursor.rowcount
+
+            topics = sorted({row[0] for table in ARCHIVED_TABLES if table_columns(conn, 'archive', table)
+                             for row in cursor.execute(f"SELECT DISTINCT topic_name FROM archive.{table}")})
+            bounds = cursor.execute(" UNION ALL ".join(
+                f"SELECT MIN(timestamp), MAX(timestamp) FROM archive.{table}"
+                for table in ARCHIVED_TABLES if table_columns(conn, 'archive', table)
+            )).fetchall()
+            lows = [low for low, _ in bounds if low]
+            highs = [high for _, high in bounds if high]
+            counts = {table: cursor.execute(f"SELECT COUNT(*) FROM archive.{table}").fetchone()[0]
+                      if table_columns(conn, 'archive', table) else 0 for table in ARCHIVED_TABLES}
+
+            cursor.execute("""
+                INSERT INTO archive_partitions
+                    (partition, kind, value, filename, compressed, ratings_count, comments_count,
+                     topics, min_timestamp, max_timestamp, archived_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (partition) DO UPDATE SET
+                    compressed = excluded.compressed,
+                    ratings_count = excluded.ratings_count,
+                    comments_count = excluded.comments_count,
+                    topics = excluded.topics,
+                    min_timestamp = excluded.min_timestamp,
+                    max_timestamp = excluded.max_timestamp,
+                    archived_at = excluded.archived_at
+            """, (partition, kind, value, filename, int(compress), counts['ratings'], counts['comments'],
+                  json.dumps(topics), min(lows) if lows else None, max(highs) if highs else None,
+                  datetime.now().isoformat(timespec='seconds')))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    finally:
+        conn.execute("DETACH DATABASE archive")
+
+    if compress:
+        compress_file(path)
+    return moved
+
+
+def load_partitions(conn, topic=None, since=None, until=None):
+    """登记的分区；给定条件时只返回可能包含匹配行的分区"""
+    create_registry(conn)
+    partitions = []
+    for row in conn.execute("""
+        SELECT partition, filename, compressed, topics, min_timestamp, max_timestamp, ratings_count, comments_count
+        FROM archive_partitions ORDER BY min_timestamp, partition
+    """):
+        partition, filename, compressed, topics, low, high, ratings_count, comments_count = row
+        if topic is not None and topic not in json.loads(topics):
+            continue
+        if since is not None and high is not None and high < since:
+            continue
+        if until is not None and low is not None and low >= until:
+            continue
+        partitions.append({
+            'partition': partition, 'filename': filename, 'compressed': bool(compressed),
+            'topics': json.loads(topics), 'min_timestamp': low, 'max_timestamp': high,
+            'ratings_count': ratings_count, 'comments_count': comments_count,
+        })
+    return partitions
+
+
+def row_filter(topic=None, since=None, until=None):
+    clauses, params = [], []
+    if topic is not None:
+        clauses.append("topic_name = ?")
+        params.append(topic)
+    if since is not None:
+        clauses.append("timestamp >= ?")
+        params.append(since)
+    if until is not None:
+        clauses.append("timestamp < ?")
+        params.append(until)
+    return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+
+def iter_rows(conn, table, topic=None, since=None, until=None, archive_dir=ARCHIVE_DIR):
+    """
+    查询路由：依次生成热表和归档分区中满足条件的 (来源, 行)
+    列为热表当前的列；分区中缺少的列为NULL。返回 (列名, 生成器)
+    """
+    columns = table_columns(conn, 'main', table)
+    where, params = row_filter(topic, since, until)
+    partitions = load_partitions(conn, topic, since, until)
+
+    def generate():
+        cursor = conn.execute(f"SELECT {', '.join(columns)} FROM main.{table}{where} ORDER BY 1", params)
+        for row in cursor:
+            yield 'hot', row
+        for partition in partitions:
+            path = readable_path(archive_dir, partition['filename'], partition['compressed'])
+            conn.execute("ATTACH DATABASE ? AS " + READ_ALIAS, (path,))
+            cursor = None
+            try:
+                archived = set(table_columns(conn, READ_ALIAS, table))
+                if not archived:
+                    continue
+                select = ', '.join(c if c in archived else 'NULL' for c in columns)
+                cursor = conn.execute(f"SELECT {select} FROM {READ_ALIAS}.{table}{where} ORDER BY 1", params)
+                for row in cursor:
+                    yield partition['partition'], row
+            finally:
+                if cursor is not None:
+                    cursor.close()
+                conn.execute("DETACH DATABASE " + READ_ALIAS)
+
+    return columns, generate()
+
+
+def create_union_views(conn, archive_dir=ARCHIVE_DIR):
+    """
+    ATTACH 全部分区，建立临时视图 all_ratings / all_comments（热表 UNION ALL 各分区）
+    分区数超过SQLite的ATTACH上限时抛出异常，此时请使用 iter_rows()
+    """
+    partitions = load_partitions(conn)
+    limit = conn.getlimit(sqlite3.SQLITE_LIMIT_ATTACHED) if hasattr(conn, 'getlimit') else 10
+    if len(partitions) > limit:
+        raise RuntimeError(f"归档分区数 {len(partitions)} 超过 ATTACH 上限 {limit}，请使用 iter_rows()")
+
+    aliases = []
+    for i, partition in enumerate(partitions):
+        alias = f"archive_{i}"
+        conn.execute(f"ATTACH DATABASE ? AS {alias}",
+                     (readable_path(archive_dir, partition['filename'], partition['compressed']),))
+        aliases.append(alias)
+
+    for table in ARCHIVED_TABLES:
+        columns = table_columns(conn, 'main', table)
+        selects = [f"SELECT {', '.join(columns)} FROM main.{table}"]
+        for alias in aliases:
+            archived = set(table_columns(conn, alias, table))
+            if archived:
+                selects.append(f"SELECT {', '.join(c if c in archived else 'NULL' for c in columns)} FROM {alias}.{table}")
+        conn.execute(f"DROP VIEW IF EXISTS temp.all_{table}")
+        conn.execute(f"CREATE TEMP VIEW all_{table} AS {' UNION ALL '.join(selects)}")
+    return aliases
+
+
+def export_csv(conn, output, table='ratings', topic=None, since=None, until=None, archive_dir=ARCHIVE_DIR):
+    """把热表与归档中的数据导出为CSV；ratings 附带两个假设的标题，返回行数"""
+    columns, rows = iter_rows(conn, table, topic, since, until, archive_dir)
+    titles = {}
+    if table == 'ratings':
+        ensure_content_columns(conn)
+        titles = dict(conn.execute("SELECT id, title FROM hypothesis"))
+        a, b = columns.index('hypothesis_A_id'), columns.index('hypothesis_B_id')
+
+    count = 0
+    with open(output, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(['source'] + columns + (['title_A', 'title_B'] if table == 'ratings' else []))
+        for source, row in rows:
+            extra = [titles.get(row[a]), titles.get(row[b])] if table == 'ratings' else []
+            writer.writerow([source] + list(row) + extra)
+            count += 1
+    return count
+
+
+def print_partitions(conn):
+    partitions = load_partitions(conn)
+    hot = {table: conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0] for table in ARCHIVED_TABLES}
+    print(f"🔥 热表: ratings {hot['ratings']} 行，comments {hot['comments']} 行")
+    if not partitions:
+        print("ℹ️  没有归档分区")
+    for partition in partitions:
+        print(f"📦 {partition['partition']:<20} ratings {partition['ratings_count']:>6}  comments {partition['comments_count']:>5}  "
+              f"{partition['min_timestamp']} ~ {partition['max_timestamp']}  "
+              f"{partition['filename']}{'.gz' if partition['compressed'] else ''}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='ratings / comments 分区归档')
+    parser.add_argument('--db', default=DB_PATH, help='数据库路径')
+    parser.add_argument('--archive-dir', default=ARCHIVE_DIR, help='归档目录')
+    parser.add_argument('--by', choices=['month', 'topic'], help='按月份或主题归档')
+    parser.add_argument('--before', help='归档该月份（YYYY-MM）之前的所有月份，默认当前月份')
+    parser.add_argument('--topic', help='主题（--by topic 时必填；导出时用于筛选）')
+    parser.add_argument('--compress', action='store_true', help='gzip压缩归档文件')
+    parser.add_argument('--vacuum', action='store_true', help='归档后VACUUM主库，缩小文件')
+    parser.add_argument('--list', action='store_true', help='列出归档分区')
+    parser.add_argument('--export', metavar='CSV', help='导出热表与归档数据到CSV')
+    parser.add_argument('--table', default='ratings', choices=ARCHIVED_TABLES, help='导出的表')
+    parser.add_argument('--since', help='导出 timestamp >= 该值的行')
+    parser.add_argument('--until', help='导出 timestamp < 该值的行')
+    parser.add_argument('--sql', help='在 all_ratings / all_comments 视图上执行查询')
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.db)
+    if args.by == 'month':
+        before = args.before or datetime.now(timezone.utc).strftime('%Y-%m')
+        months = closed_months(conn, before)
+        if not months:
+            print(f"ℹ️  {before} 之前没有需要归档的数据")
+        for month in months:
+            moved = archive_partition(conn, 'month', month, args.archive_dir, args.compress)
+            print(f"✅ month:{month}: ratings {moved['ratings']} 行，comments {moved['comments']} 行")
+    elif args.by == 'topic':
+        if not args.topic:
+            parser.error('--by topic 需要 --topic')
+        moved = archive_partition(conn, 'topic', args.topic, args.archive_dir, args.compress)
+        print(f"✅ topic:{args.topic}: ratings {moved['ratings']} 行，comments {moved['comments']} 行")
+    elif args.export:
+        count = export_csv(conn, args.export, args.table, args.topic, args.since, args.until, args.archive_dir)
+        print(f"✅ 导出 {count} 行到 {args.export}")
+    elif args.sql:
+        create_union_views(conn, args.archive_dir)
+        writer = csv.writer(sys.stdout)
+        cursor = conn.execute(args.sql)
+        writer.writerow([column[0] for column in cursor.description])
+        writer.writerows(cursor)
+    elif not args.list:
+        parser.print_help()
+
+    if args.by and args.vacuum:
+        print("🔄 VACUUM...")
+        conn.execute("VACUUM")
+    if args.by or args.list:
+        print_partitions(conn)
+    conn.close()
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+冷启动首个请求耗时测量
+
+每次运行都启动一个新的Python进程（模拟刚部署的worker），分别测量：
+- 不预热：导入 app 后直接请求评分页面（改动前 gunicorn worker 的情况）
+- 预热：先执行 warmup.run()（即 /readyz 就绪前完成的工作），再请求评分页面
+- 以上两种情况各自在 有/没有 模板字节码缓存（template_cache.py）时的表现
+输出 导入耗时、预热耗时、首个请求耗时、第二个请求耗时 的中位数。
+
+操作系统的文件缓存在两次运行之间不会清空，数据库页面的冷读取开销需要在
+真实部署环境中测量（例如重启容器后观察 /readyz 中的 latency_ms）。
+
+用法: python bench_cold_start.py [topic] [--db hypothesis_data.db] [--runs 10]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+
+def child(topic, db_path, warm):
+    """在当前进程中测量一次冷启动，结果以JSON输出到stdout的最后一行"""
+    start = time.perf_counter()
+    import app as rating_app
+    import warmup
+    rating_app.DB_PATH = db_path
+    imported = time.perf_counter()
+
+    warmup_ms = 0.0
+    if warm:
+        warmup.run(rating_app.app)
+        warmup_ms = (time.perf_counter() - imported) * 1000
+
+    client = rating_app.app.test_client()
+    timings = []
+    for _ in range(2):
+        request_start = time.perf_counter()
+        response = client.get(f'/rate/{topic}')
+        timings.append((time.perf_counter() - request_start) * 1000)
+        if response.status_code != 200:
+            raise SystemExit(f"❌ /rate/{topic} 返回 {response.status_code}")
+
+    print(json.dumps({
+        'import_ms': (imported - start) * 1000,
+        'warmup_ms': warmup_ms,
+        'first_ms': timings[0],
+        'second_ms': timings[1],
+    }))
+
+
+# (名称, 是否预热, 是否使用模板字节码缓存)
+CONFIGURATIONS = [
+    ('不预热', False, False),
+    ('不预热+字节码', False, True),
+    ('预热', True, False),
+    ('预热+字节码', True, True),
+]
+
+
+def run_child(topic, db_path, warm, env):
+    here = os.path.dirname(os.path.abspath(__file__))
+    output = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), topic, '--db', db_path, '--child']
+        + (['--warm'] if warm else []),
+        capture_output=True, text=True, check=True, cwd=os.getcwd(),
+        env=dict(os.environ, PYTHONPATH=here, **env),
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def bench(topic, db_path, runs):
+    results = {label: [] for label, _, _ in CONFIGURATIONS}
+    with tempfile.TemporaryDirectory() as cache_dir:
+        # 第一个进程编译模板并写入缓存（相当于 build_static.py 预编译），不计入结果
+        run_child(topic, db_path, True, {'JINJA_BYTECODE_CACHE': '1', 'JINJA_CACHE_DIR': cache_dir})
+        for _ in range(runs):
+            for label, warm, bytecode_cache in CONFIGURATIONS:
+                env = {'JINJA_BYTECODE_CACHE': '1' if bytecode_cache else '0', 'JINJA_CACHE_DIR': cache_dir}
+                results[label].append(run_child(topic, db_path, warm, env))
+
+    print(f"📊 冷启动 /rate/{topic}（{runs} 个新进程，取中位数）\n")
+    print(f"{'':<16}{'导入ms':>10}{'预热ms':>10}{'首个请求ms':>14}{'第二个请求ms':>14}")
+    for label, samples in results.items():
+        medians = {key: statistics.median(sample[key] for sample in samples) for key in samples[0]}
+        print(f"{label:<16}{medians['import_ms']:>10.1f}{medians['warmup_ms']:>10.1f}"
+              f"{medians['first_ms']:>14.2f}{medians['second_ms']:>14.2f}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='冷启动首个请求耗时测量')
+    parser.add_argument('topic', nargs='?', default='topic1')
+    parser.add_argument('--db', default='hypothesis_data.db', help='数据库路径')
+    parser.add_argument('--runs', type=int, default=10, help='进程数')
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--warm', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.topic, args.db, args.warm)
+    else:
+        bench(args.topic, args.db, args.runs)
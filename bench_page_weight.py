@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+评分页面传输量与服务端耗时测量
+
+用Flask测试客户端请求评分页面及其引用的本地静态文件，分别统计：
+- 不压缩 / gzip（/ br）时的传输字节数
+- 服务端生成页面的耗时
+- 带 If-None-Match 的重复访问（304）传输字节数
+
+浏览器端的可交互时间（TTI）需要在真实浏览器中测量，脚本输出的传输量
+可以和 DevTools / Lighthouse 的结果对照。
+
+用法: python bench_page_weight.py [topic] [--db hypothesis_data.db] [--runs 20]
+"""
+
+import argparse
+import re
+import statistics
+import time
+
+import app as rating_app
+
+ASSET_RE = re.compile(r'(?:href|src)="(/static/[^"]+)"')
+
+
+def wire_size(response):
+    """响应体在网络上的字节数（已压缩则为压缩后大小）"""
+    return len(response.get_data())
+
+
+def measure(client, path, accept_encoding, runs):
+    """多次请求同一路径，返回 (字节数, 耗时中位数ms, 最后一次响应)"""
+    timings = []
+    response = None
+    for _ in range(runs):
+        start = time.perf_counter()
+        response = client.get(path, headers={'Accept-Encoding': accept_encoding})
+        timings.append((time.perf_counter() - start) * 1000)
+    return wire_size(response), statistics.median(timings), response
+
+
+def bench(topic, runs):
+    client = rating_app.app.test_client()
+    page = f'/rate/{topic}'
+
+    print(f"📊 评分页面: {page}（每项 {runs} 次取中位数）\n")
+    print(f"{'资源':<48}{'identity':>12}{'gzip':>12}{'br':>12}{'服务端ms':>12}")
+
+    totals = {'identity': 0, 'gzip': 0, 'br': 0}
+    raw_size, raw_ms, response = measure(client, page, 'identity', runs)
+    gz_size, gz_ms, _ = measure(client, page, 'gzip', runs)
+    br_size, _, _ = measure(client, page, 'br, gzip', 1)
+    print(f"{page:<48}{raw_size:>12}{gz_size:>12}{br_size:>12}{gz_ms:>12.2f}")
+    totals['identity'] += raw_size
+    totals['gzip'] += gz_size
+    totals['br'] += br_size
+
+    html = response.get_data(as_text=True)
+    for asset in ASSET_RE.findall(html):
+        a_raw, _, asset_response = measure(client, asset, 'identity', 1)
+        a_gz, _, _ = measure(client, asset, 'gzip', 1)
+        a_br, a_ms, _ = measure(client, asset, 'br, gzip', runs)
+        print(f"{asset:<48}{a_raw:>12}{a_gz:>12}{a_br:>12}{a_ms:>12.2f}")
+        print(f"    Cache-Control: {asset_response.headers.get('Cache-Control')}")
+        totals['identity'] += a_raw
+        totals['gzip'] += a_gz
+        totals['br'] += a_br
+
+    print(f"\n{'首次访问合计':<44}{totals['identity']:>12}{totals['gzip']:>12}{totals['br']:>12}")
+
+    # 重复访问：静态文件命中浏览器缓存（immutable），HTML走条件GET
+    etag = response.headers.get('ETag')
+    revisit = client.get(page, headers={'Accept-Encoding': 'gzip', 'If-None-Match': etag})
+    print(f"重复访问HTML: HTTP {revisit.status_code}, {wire_size(revisit)} B（ETag {etag}）")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='评分页面传输量测量')
+    parser.add_argument('topic', nargs='?', default='topic1')
+    parser.add_argument('--db', default=rating_app.DB_PATH, help='数据库路径')
+    parser.add_argument('--runs', type=int, default=20, help='每项请求次数')
+    args = parser.parse_args()
+
+    rating_app.DB_PATH = args.db
+    bench(args.topic, args.runs)
@@ -0,0 +1,334 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Bradley-Terry 排名批处理
+
+- 把每条成对评分转换为胜负（1、2 = A胜，4、5 = B胜，3 = 各记半场胜利）
+- 对所有主题、所有维度一次性拟合：稀疏胜负边 + 向量化MM算法（Hunter 2004），
+  同一主题的假设之间额外加入少量虚拟平局，保证全胜/全负时估计仍然有限
+- Bootstrap 置信区间按（主题, 批次）拆分到进程池并行计算，
+  每个主题的全部批次完成后立即写入 rankings 表
+
+用法:
+    python bradley_terry.py [--db hypothesis_data.db] [--bootstrap 1000] [--workers 4]
+    python bradley_terry.py --benchmark-workers 1,2,4,8 [--benchmark-ratings 200000]
+"""
+
+import argparse
+import os
+import sqlite3
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from agreement_analysis import DIMENSIONS, create_benchmark_db, load_ratings
+
+# 配置数据库路径
+DB_PATH = "hypothesis_data.db"
+
+# 每个假设的虚拟平局场数（正则化强度）
+PRIOR_GAMES = 0.5
+
+# MM算法收敛阈值（log强度的最大变化）与最大迭代次数
+TOLERANCE = 1e-8
+MAX_ITERATIONS = 5000
+
+# 每个进程任务包含的bootstrap次数
+BOOTSTRAP_CHUNK_SIZE = 25
+
+
+def create_rankings_table(conn):
+    """创建排名结果表"""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS rankings (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            run_id TEXT NOT NULL,
+            topic_name TEXT NOT NULL,
+            dimension TEXT NOT NULL,
+            hypothesis_id INTEGER NOT NULL,
+            rank INTEGER NOT NULL,
+            strength REAL NOT NULL,
+            ci_low REAL,
+            ci_high REAL,
+            comparisons INTEGER NOT NULL,
+            wins REAL NOT NULL,
+            bootstrap_samples INTEGER NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE(topic_name, dimension, hypothesis_id)
+        )
+    """)
+    conn.commit()
+
+
+def comparison_edges(a_index, b_index, scores):
+    """
+    把评分转换为有向胜负边 (winner, loser, weight)
+    平局拆成两条权重0.5的边，因此每次比较的总权重都是1
+    """
+    a_wins = scores < 3
+    b_wins = scores > 3
+    ties = scores == 3
+    winner = np.concatenate([a_index[a_wins], b_index[b_wins], a_index[ties], b_index[ties]])
+    loser = np.concatenate([b_index[a_wins], a_index[b_wins], b_index[ties], a_index[ties]])
+    weight = np.concatenate([np.ones(a_wins.sum()), np.ones(b_wins.sum()),
+                             np.full(ties.sum(), 0.5), np.full(ties.sum(), 0.5)])
+    return winner, loser, weight
+
+
+def sparse_win_matrix(winner, loser, weight, num_items):
+    """合并重复的 (winner, loser) 边，得到稀疏胜负矩阵的COO表示"""
+    if len(winner) == 0:
+        return winner, loser, weight
+    keys = winner.astype(np.int64) * num_items + loser
+    unique_keys, inverse = np.unique(keys, return_inverse=True)
+    summed = np.bincount(inverse, weights=weight)
+    return unique_keys // num_items, unique_keys % num_items, summed
+
+
+def prior_edges(block_starts, block_size, prior=PRIOR_GAMES):
+    """
+    正则化：每个块（同一主题、维度、重采样内的假设）中任意两个假设之间加入少量虚拟平局，
+    每个假设合计 prior 场，保证全胜/全负时估计仍然有限，且不破坏强度的尺度不变性
+    """
+    if block_size < 2 or prior <= 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64), np.zeros(0)
+    first, second = np.nonzero(~np.eye(block_size, dtype=bool))
+    starts = np.asarray(block_starts, dtype=np.int64)[:, None]
+    winner = (starts + first).ravel()
+    loser = (starts + second).ravel()
+    return winner, loser, np.full(len(winner), prior / (2.0 * (block_size - 1)))
+
+
+def fit_bradley_terry(winner, loser, weight, num_items, groups=None,
+                      tol=TOLERANCE, max_iter=MAX_ITERATIONS):
+    """
+    向量化MM算法：p_i ← W_i / Σ_j n_ij / (p_i + p_j)，每步后把每组的平均log强度归一为0
+    相互独立的多个问题（不同主题、维度、bootstrap样本）用 groups 区分，在同一次调用中一起求解
+    返回log强度
+    """
+    if num_items == 0:
+        return np.zeros(0)
+    groups = np.zeros(num_items, dtype=np.int64) if groups is None else groups
+    group_sizes = np.bincount(groups)
+    winner, loser, weight = sparse_win_matrix(winner, loser, weight, num_items)
+    wins = np.bincount(winner, weights=weight, minlength=num_items)
+    # 没有任何胜场（且没有虚拟对局）的假设无法估计，固定在log强度0附近
+    wins = np.maximum(wins, 1e-12)
+    log_strength = np.zeros(num_items)
+    for _ in range(max_iter):
+        strength = np.exp(log_strength)
+        inverse = weight / (strength[winner] + strength[loser])
+        denominator = (np.bincount(winner, weights=inverse, minlength=num_items)
+                       + np.bincount(loser, weights=inverse, minlength=num_items))
+        updated = np.log(wins) - np.log(np.maximum(denominator, 1e-300))
+        updated -= (np.bincount(groups, weights=updated) / group_sizes)[groups]
+        change = np.max(np.abs(updated - log_strength))
+        log_strength = updated
+        if change < tol:
+            break
+    return log_strength
+
+
+def split_by_topic(data):
+    """按主题拆分评分，并把假设ID压缩为主题内的连续编码"""
+    topics = []
+    for t, topic_name in enumerate(data['topics']):
+        mask = data['topic'] == t
+        hyp_a = data['hypothesis_A_id'][mask]
+        hyp_b = data['hypothesis_B_id'][mask]
+        hypothesis_ids, codes = np.unique(np.concatenate([hyp_a, hyp_b]), return_inverse=True)
+        topics.append({
+            'topic_name': topic_name,
+            'hypothesis_ids': hypothesis_ids,
+            'a': codes[:len(hyp_a)],
+            'b': codes[len(hyp_a):],
+            'scores': data['scores'][mask],
+        })
+    return topics
+
+
+def fit_topic_replicates(a, b, scores, num_hypotheses, samples):
+    """
+    对一个主题的多组重采样（samples: 重采样次数×评分数 的下标矩阵）同时拟合全部维度
+    返回 log强度，形状为 (重采样次数, 维度数, 假设数)
+    """
+    num_samples = len(samples)
+    num_blocks = num_samples * len(DIMENSIONS)
+    block_starts = np.arange(num_blocks) * num_hypotheses
+    winners, losers, weights = [], [], []
+    for d in range(len(DIMENSIONS)):
+        offsets = (np.arange(num_samples) * len(DIMENSIONS) * num_hypotheses + d * num_hypotheses)[:, None]
+        winner, loser, weight = comparison_edges((a[samples] + offsets).ravel(),
+                                                 (b[samples] + offsets).ravel(),
+                                                 scores[samples, d].ravel())
+        winners.append(winner)
+        losers.append(loser)
+        weights.append(weight)
+    winner, loser, weight = prior_edges(block_starts, num_hypotheses)
+    winners.append(winner)
+    losers.append(loser)
+    weights.append(weight)
+
+    num_items = num_blocks * num_hypotheses
+    strengths = fit_bradley_terry(np.concatenate(winners), np.concatenate(losers), np.concatenate(weights),
+                                  num_items, groups=np.arange(num_items) // num_hypotheses)
+    return strengths.reshape(num_samples, len(DIMENSIONS), num_hypotheses)
+
+
+def bootstrap_task(topic_index, a, b, scores, num_hypotheses, seed, replicates):
+    """进程池任务：一个主题的一批bootstrap重采样"""
+    rng = np.random.default_rng(seed)
+    samples = rng.integers(0, len(a), size=(replicates, len(a)))
+    return topic_index, fit_topic_replicates(a, b, scores, num_hypotheses, samples)
+
+
+def fit_point_estimates(topics):
+    """所有主题、所有维度放在一次MM迭代中拟合点估计"""
+    winners, losers, weights, groups = [], [], [], []
+    offsets = []
+    offset = 0
+    for topic in topics:
+        offsets.append(offset)
+        n = len(topic['hypothesis_ids'])
+        for d in range(len(DIMENSIONS)):
+            for winner, loser, weight in (
+                    comparison_edges(topic['a'] + offset, topic['b'] + offset, topic['scores'][:, d]),
+                    prior_edges([offset], n)):
+                winners.append(winner)
+                losers.append(loser)
+                weights.append(weight)
+            groups.append(np.full(n, len(groups)))
+            offset += n
+    if offset == 0:
+        return []
+    strengths = fit_bradley_terry(np.concatenate(winners), np.concatenate(losers), np.concatenate(weights),
+                                  offset, groups=np.concatenate(groups))
+
+    return [strengths[start:start + len(DIMENSIONS) * len(topic['hypothesis_ids'])]
+            .reshape(len(DIMENSIONS), len(topic['hypothesis_ids']))
+            for topic, start in zip(topics, offsets)]
+
+
+def write_topic_rankings(conn, run_id, topic, estimate, replicates, confidence):
+    """写入一个主题所有维度的排名，替换该主题之前的结果"""
+    n = len(topic['hypothesis_ids'])
+    comparisons = np.bincount(np.concatenate([topic['a'], topic['b']]), minlength=n)
+    alpha = (1.0 - confidence) / 2.0
+    if replicates is not None and len(replicates):
+        ci_low = np.quantile(replicates, alpha, axis=0)
+        ci_high = np.quantile(replicates, 1.0 - alpha, axis=0)
+    else:
+        ci_low = ci_high = None
+
+    rows = []
+    for d, dimension in enumerate(DIMENSIONS):
+        winner, _, weight = comparison_edges(topic['a'], topic['b'], topic['scores'][:, d])
+        wins = np.bincount(winner, weights=weight, minlength=n)
+        order = np.argsort(-estimate[d], kind='stable')
+        ranks = np.empty(n, dtype=np.int64)
+        ranks[order] = np.arange(1, n + 1)
+        for i in range(n):
+            rows.append((
+                run_id, topic['topic_name'], dimension, int(topic['hypothesis_ids'][i]), int(ranks[i]),
+                float(estimate[d, i]),
+                None if ci_low is None else float(ci_low[d, i]),
+                None if ci_high is None else float(ci_high[d, i]),
+                int(comparisons[i]), float(wins[i]), 0 if replicates is None else len(replicates),
+            ))
+
+    conn.execute("DELETE FROM rankings WHERE topic_name = ?", (topic['topic_name'],))
+    conn.executemany("""
+        INSERT INTO rankings (run_id, topic_name, dimension, hypothesis_id, rank, strength,
+                              ci_low, ci_high, comparisons, wins, bootstrap_samples)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """, rows)
+    conn.commit()
+
+
+def run_rankings(conn, bootstrap=1000, workers=None, seed=42, confidence=0.95,
+                 chunk_size=BOOTSTRAP_CHUNK_SIZE, verbose=True):
+    """拟合所有主题并写入rankings表，返回耗时（秒）"""
+    start = time.perf_counter()
+    create_rankings_table(conn)
+    run_id = str(uuid.uuid4())
+
+    topics = split_by_topic(load_ratings(conn))
+    estimates = fit_point_estimates(topics)
+    if verbose:
+        print(f"📊 {len(topics)} 个主题点估计完成（{time.perf_counter() - start:.2f}s）")
+
+    if bootstrap <= 0:
+        for topic, estimate in zip(topics, estimates):
+            write_topic_rankings(conn, run_id, topic, estimate, None, confidence)
+        return time.perf_counter() - start
+
+    # 任务 = (主题, 一批重采样)；每个任务使用独立的随机数种子
+    tasks = []
+    seeds = np.random.SeedSequence(seed).spawn(len(topics) * ((bootstrap + chunk_size - 1) // chunk_size))
+    for t, topic in enumerate(topics):
+        for batch_start in range(0, bootstrap, chunk_size):
+            replicates = min(chunk_size, bootstrap - batch_start)
+            tasks.append((t, topic['a'], topic['b'], topic['scores'], len(topic['hypothesis_ids']),
+                          seeds[len(tasks)], replicates))
+
+    pending = {t: sum(1 for task in tasks if task[0] == t) for t in range(len(topics))}
+    collected = {t: [] for t in range(len(topics))}
+
+    def collect(topic_index, samples):
+        collected[topic_index].append(samples)
+        pending[topic_index] -= 1
+        if pending[topic_index] == 0:
+            replicates = np.concatenate(collected.pop(topic_index))
+            topic = topics[topic_index]
+            write_topic_rankings(conn, run_id, topic, estimates[topic_index], replicates, confidence)
+            if verbose:
+                print(f"   ✅ {topic['topic_name']}: {len(topic['hypothesis_ids'])} 个假设，"
+                      f"{len(replicates)} 次bootstrap（{time.perf_counter() - start:.2f}s）")
+
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        for task in tasks:
+            collect(*bootstrap_task(*task))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(bootstrap_task, *task) for task in tasks]
+            for future in as_completed(futures):
+                collect(*future.result())
+
+    return time.perf_counter() - start
+
+
+def benchmark(worker_counts, num_ratings, bootstrap):
+    """比较不同进程数下的总耗时"""
+    print(f"🔄 生成 {num_ratings} 条随机评分，bootstrap {bootstrap} 次，CPU核数 {os.cpu_count()}")
+    conn = create_benchmark_db(num_ratings)
+    baseline = None
+    print(f"{'进程数':>8}{'耗时(s)':>12}{'加速比':>10}")
+    for workers in worker_counts:
+        elapsed = run_rankings(conn, bootstrap=bootstrap, workers=workers, verbose=False)
+        baseline = baseline or elapsed
+        print(f"{workers:>8}{elapsed:>12.2f}{baseline / elapsed:>10.2f}")
+    conn.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Bradley-Terry 排名批处理')
+    parser.add_argument('--db', default=DB_PATH, help='数据库路径')
+    parser.add_argument('--bootstrap', type=int, default=1000, help='bootstrap重采样次数（0表示不计算置信区间）')
+    parser.add_argument('--workers', type=int, default=None, help='进程数（默认CPU核数）')
+    parser.add_argument('--seed', type=int, default=42, help='随机数种子')
+    parser.add_argument('--confidence', type=float, default=0.95, help='置信水平')
+    parser.add_argument('--benchmark-workers', help='逗号分隔的进程数列表，例如 1,2,4,8')
+    parser.add_argument('--benchmark-ratings', type=int, default=100000, help='性能测试使用的随机评分数')
+    args = parser.parse_args()
+
+    if args.benchmark_workers:
+        benchmark([int(w) for w in args.benchmark_workers.split(',')], args.benchmark_ratings, args.bootstrap)
+    else:
+        conn = sqlite3.connect(args.db)
+        elapsed = run_rankings(conn, bootstrap=args.bootstrap, workers=args.workers,
+                               seed=args.seed, confidence=args.confidence)
+        conn.close()
+        print(f"✅ 排名计算完成，总耗时 {elapsed:.2f}s")
@@ -0,0 +1,402 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+静态文件构建脚本
+
+1. vendor: 把 Bootstrap、Font Awesome（固定版本）下载到 static/vendor/
+2. build:  先下载缺少的vendor文件，然后为每种页面类型生成一个带哈希的CSS包
+           （Bootstrap + 精简后的Font Awesome + style.css，已压缩），以及所有页面共用的JS包；
+           再为 static/ 下的文本类文件生成内容哈希清单（static/manifest.json）和
+           .gz（安装了brotli时还有 .br）预压缩文件；最后预编译模板。
+           vendor文件无法获得时构建失败（退出码1），不会生成回退到CDN的页面
+3. templates: 只预编译Jinja模板，写入字节码缓存（template_cache.py）
+
+用法:
+    python build_static.py vendor
+    python build_static.py [build]
+    python build_static.py templates
+"""
+
+import glob
+import gzip
+import json
+import os
+import re
+import shutil
+import sys
+import urllib.request
+
+from http_caching import STATIC_MANIFEST_NAME, file_content_hash, fingerprint_filename
+from static_assets import (APP_CSS, APP_JS, PAGE_BUNDLES, SHARED_JS_BUNDLE, VENDOR_ASSETS,
+                           VENDOR_CSS, VENDOR_JS)
+
+try:
+    import brotli
+except ImportError:  # brotli为可选依赖
+    brotli = None
+
+try:
+    from fontTools import subset as font_subset
+except ImportError:  # fonttools为可选依赖，缺失时不裁剪字体文件
+    font_subset = None
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+STATIC_DIR = os.path.join(BASE_DIR, 'static')
+TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
+
+# 资源包输出目录（相对static）
+DIST_DIR = 'dist'
+
+# 需要预压缩的文件类型（图片、字体等已压缩格式不再处理）
+COMPRESSIBLE_EXTENSIONS = {'.css', '.js', '.svg', '.json', '.html', '.txt', '.map', '.ttf'}
+
+# 压缩后不小于原文件该比例时不保留压缩文件
+MIN_COMPRESSION_GAIN = 0.95
+
+ICON_CLASS_RE = re.compile(r'\bfa-[a-z0-9-]+')
+ICON_SELECTOR_RE = re.compile(r'^\.fa-([a-z0-9-]+)::?before$')
+ICON_CODEPOINT_RE = re.compile(r'content:\s*"\\([0-9a-fA-F]+)"')
+CSS_URL_RE = re.compile(r'url\(\s*([\'"]?)(?!data:)([^\'")]+)\1\s*\)')
+SOURCE_MAP_RE = re.compile(r'^\s*//# sourceMappingURL=.*$', re.MULTILINE)
+
+# Font Awesome 字体风格：使用了对应class才保留该字体
+FONT_STYLE_CLASSES = {
+    'fa-regular-400': {'far', 'fa-regular'},
+    'fa-brands-400': {'fab', 'fa-brands'},
+}
+
+
+def missing_vendor_assets(static_dir=STATIC_DIR):
+    """static/vendor/ 中缺少的第三方文件"""
+    return [f for f in VENDOR_ASSETS if not os.path.isfile(os.path.join(static_dir, f))]
+
+
+def download_vendor_assets(static_dir=STATIC_DIR, filenames=None):
+    """下载第三方文件到 static/vendor/；filenames 为None时下载全部"""
+    for filename in VENDOR_ASSETS if filenames is None else filenames:
+        url = VENDOR_ASSETS[filename]
+        target = os.path.join(static_dir, filename)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        print(f"⬇️  {url}")
+        with urllib.request.urlopen(url, timeout=30) as response:
+            data = response.read()
+        with open(target, 'wb') as f:
+            f.write(data)
+        print(f"   -> {filename} ({len(data)} B)")
+
+
+def read_text(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return f.read()
+
+
+def minify_css(css):
+    """简单的CSS压缩：去注释、合并空白、去掉符号两侧多余空格"""
+    css = re.sub(r'/\*.*?\*/', '', css, flags=re.DOTALL)
+    css = re.sub(r'\s+', ' ', css)
+    css = re.sub(r'\s*([{};,>])\s*', r'\1', css)
+    # 冒号前的空格可能是后代选择器（如 ".a :hover"），只去掉冒号后的空格
+    css = re.sub(r':\s+', ':', css)
+    css = css.replace(';}', '}')
+    return css.strip()
+
+
+def split_css_rules(css):
+    """按顶层花括号切分CSS，返回 [(prelude, body), ...]；@media等嵌套块整体保留"""
+    rules = []
+    depth = 0
+    start = 0
+    prelude_end = None
+    quote = None
+    for i, ch in enumerate(css):
+        if quote:
+            if ch == quote and css[i - 1] != '\\':
+                quote = None
+            continue
+        if ch in ('"', "'"):
+            quote = ch
+        elif ch == '{':
+            if depth == 0:
+                prelude_end = i
+            depth += 1
+        elif ch == '}':
+            depth -= 1
+            if depth == 0:
+                rules.append((css[start:prelude_end].strip(), css[prelude_end + 1:i]))
+                start = i + 1
+        elif ch == ';' and depth == 0:
+            # 顶层的 @charset / @import 等语句
+            rules.append((css[start:i].strip(), None))
+            start = i + 1
+    return rules
+
+
+def join_css_rules(rules):
+    parts = []
+    for prelude, body in rules:
+        if body is None:
+            parts.append(prelude + ';')
+        else:
+            parts.append(prelude + '{' + body + '}')
+    return ''.join(parts)
+
+
+def collect_icon_classes(template_patterns):
+    """扫描模板与app.js中用到的 fa-* class"""
+    classes = set()
+    paths = [os.path.join(TEMPLATES_DIR, 'base.html')]
+    for pattern in template_patterns:
+        paths.extend(glob.glob(os.path.join(TEMPLATES_DIR, pattern)))
+    paths.extend(os.path.join(STATIC_DIR, f) for f in APP_JS)
+    for path in paths:
+        if os.path.isfile(path):
+            text = read_text(path)
+            classes.update(ICON_CLASS_RE.findall(text))
+            classes.update(re.findall(r'\bfa[srb]\b', text))
+    return classes
+
+
+def subset_fontawesome_css(css, used_classes):
+    """只保留用到的图标规则，并去掉未使用字体风格的 @font-face"""
+    kept = []
+    for prelude, body in split_css_rules(css):
+        if body is None:
+            kept.append((prelude, body))
+            continue
+
+        if prelude.startswith('@font-face'):
+            unused_style = any(font in body and not (classes & used_classes)
+                               for font, classes in FONT_STYLE_CLASSES.items())
+            if unused_style:
+                continue
+            kept.append((prelude, body))
+            continue
+
+        selectors = [s.strip() for s in prelude.split(',')]
+        icon_matches = [ICON_SELECTOR_RE.match(s) for s in selectors]
+        if prelude.startswith('@') or not all(icon_matches):
+            kept.append((prelude, body))
+            continue
+
+        used = [s for s, m in zip(selectors, icon_matches) if f'fa-{m.group(1)}' in used_classes]
+        if used:
+            kept.append((','.join(used), body))
+    return join_css_rules(kept)
+
+
+def icon_codepoints(css):
+    """从图标规则中提取字体码位，用于裁剪字体文件"""
+    return {int(cp, 16) for cp in ICON_CODEPOINT_RE.findall(css)}
+
+
+def build_font(static_dir, source, codepoints):
+    """复制（可裁剪）字体文件到 dist/fonts/，返回带哈希的相对路径"""
+    fonts_dir = os.path.join(static_dir, DIST_DIR, 'fonts')
+    os.makedirs(fonts_dir, exist_ok=True)
+    temp_target = os.path.join(fonts_dir, os.path.basename(source))
+
+    subsetted = False
+    if font_subset is not None and codepoints:
+        flavor = 'woff2' if source.endswith('.woff2') else None
+        if flavor != 'woff2' or brotli is not None:
+            options = font_subset.Options()
+            options.flavor = flavor
+            font = font_subset.load_font(source, options)
+            subsetter = font_subset.Subsetter(options)
+            subsetter.populate(unicodes=codepoints)
+            subsetter.subset(font)
+            font_subset.save_font(font, temp_target, options)
+            subsetted = True
+    if not subsetted:
+        shutil.copyfile(source, temp_target)
+
+    name = fingerprint_filename(os.path.basename(source), file_content_hash(temp_target))
+    os.replace(temp_target, os.path.join(fonts_dir, name))
+    return f'fonts/{name}'
+
+
+def rewrite_font_urls(css, css_dir, static_dir, codepoints, built_fonts):
+    """把 @font-face 中的相对字体路径替换为 dist/fonts/ 下的带哈希文件；本地不存在的字体规则直接丢弃"""
+    kept = []
+    for prelude, body in split_css_rules(css):
+        if body is not None and prelude.startswith('@font-face'):
+            missing = False
+
+            def replace(match):
+                nonlocal missing
+                relative = match.group(2).split('?')[0].split('#')[0]
+                source = os.path.normpath(os.path.join(css_dir, relative))
+                if not os.path.isfile(source):
+                    missing = True
+                    return match.group(0)
+                if source not in built_fonts:
+                    built_fonts[source] = build_font(static_dir, source, codepoints)
+                return f'url({built_fonts[source]})'
+
+            body = CSS_URL_RE.sub(replace, body)
+            if missing:
+                continue
+        kept.append((prelude, body))
+    return join_css_rules(kept)
+
+
+def write_bundle(static_dir, name, ext, content):
+    """写出带内容哈希文件名的资源包，返回相对static的路径"""
+    dist_dir = os.path.join(static_dir, DIST_DIR)
+    os.makedirs(dist_dir, exist_ok=True)
+    temp_path = os.path.join(dist_dir, f'{name}{ext}')
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        f.write(content)
+    filename = fingerprint_filename(f'{name}{ext}', file_content_hash(temp_path))
+    os.replace(temp_path, os.path.join(dist_dir, filename))
+    return f'{DIST_DIR}/{filename}'
+
+
+def build_bundles(static_dir=STATIC_DIR):
+    """为每种页面类型生成CSS包，并生成共用JS包；缺少vendor文件时抛出 RuntimeError"""
+    missing = [f for f in VENDOR_CSS + VENDOR_JS if not os.path.isfile(os.path.join(static_dir, f))]
+    if missing:
+        raise RuntimeError(f"缺少vendor文件: {', '.join(missing)}（先运行: python build_static.py vendor）")
+
+    shutil.rmtree(os.path.join(static_dir, DIST_DIR), ignore_errors=True)
+
+    bootstrap_css, fontawesome_css = (read_text(os.path.join(static_dir, f)) for f in VENDOR_CSS)
+    app_css = ''.join(read_text(os.path.join(static_dir, f)) for f in APP_CSS)
+    fontawesome_dir = os.path.dirname(os.path.join(static_dir, VENDOR_CSS[1]))
+
+    # 字体文件所有页面共用，按全部页面用到的图标裁剪
+    page_classes = {page: collect_icon_classes(patterns) for page, patterns in PAGE_BUNDLES.items()}
+    all_classes = set().union(*page_classes.values())
+    codepoints = icon_codepoints(subset_fontawesome_css(fontawesome_css, all_classes))
+    built_fonts = {}
+
+    bundles = {}
+    for page, used_classes in sorted(page_classes.items()):
+        icons_css = subset_fontawesome_css(fontawesome_css, used_classes)
+        icons_css = rewrite_font_urls(icons_css, fontawesome_dir, static_dir, codepoints, built_fonts)
+        css = minify_css(bootstrap_css) + '\n' + minify_css(icons_css) + '\n' + minify_css(app_css)
+        bundles[page] = {'css': write_bundle(static_dir, page, '.css', css)}
+        icon_count = len({c for c in used_classes if c.startswith('fa-')})
+        print(f"   {page}: {bundles[page]['css']}（{icon_count} 个fa class，{len(css)} B）")
+
+    scripts = []
+    for filename in VENDOR_JS + APP_JS:
+        scripts.append(SOURCE_MAP_RE.sub('', read_text(os.path.join(static_dir, filename))).strip())
+    bundles[SHARED_JS_BUNDLE] = {'js': write_bundle(static_dir, SHARED_JS_BUNDLE, '.js', ';\n'.join(scripts) + '\n')}
+    print(f"   {SHARED_JS_BUNDLE}: {bundles[SHARED_JS_BUNDLE]['js']}")
+    if font_subset is None:
+        print("   ℹ️  未安装fonttools，字体文件未裁剪")
+    return bundles
+
+
+def iter_static_files(static_dir):
+    """遍历静态目录，跳过构建产物本身"""
+    for root, _, files in os.walk(static_dir):
+        for name in sorted(files):
+            if name.endswith(('.gz', '.br')) or name == STATIC_MANIFEST_NAME:
+                continue
+            path = os.path.join(root, name)
+            yield os.path.relpath(path, static_dir).replace(os.sep, '/'), path
+
+
+def write_compressed(path, data, suffix, compress):
+    """写出压缩文件；压缩收益太小时删除旧文件并返回None"""
+    target = path + suffix
+    compressed = compress(data)
+    if len(compressed) >= len(data) * MIN_COMPRESSION_GAIN:
+        if os.path.exists(target):
+            os.remove(target)
+        return None
+    with open(target, 'wb') as f:
+        f.write(compressed)
+    return len(compressed)
+
+
+def build_static(static_dir=STATIC_DIR):
+    """构建资源包，生成清单与预压缩文件，返回清单内容"""
+    print("🔄 构建页面资源包...")
+    bundles = build_bundles(static_dir)
+
+    files = {}
+    total_raw = total_gzip = total_br = 0
+
+    print("\n🔄 生成清单与预压缩文件...")
+    for filename, path in iter_static_files(static_dir):
+        stat = os.stat(path)
+        entry = {
+            'hash': file_content_hash(path),
+            'mtime': int(stat.st_mtime),
+            'size': stat.st_size,
+        }
+
+        if os.path.splitext(filename)[1] in COMPRESSIBLE_EXTENSIONS:
+            with open(path, 'rb') as f:
+                data = f.read()
+            gz_size = write_compressed(path, data, '.gz', lambda d: gzip.compress(d, compresslevel=9, mtime=0))
+            br_size = None
+            if brotli is not None:
+                br_size = write_compressed(path, data, '.br', lambda d: brotli.compress(d, quality=11))
+            if gz_size:
+                entry['gzip_size'] = gz_size
+            if br_size:
+                entry['br_size'] = br_size
+
+            total_raw += stat.st_size
+            total_gzip += gz_size or stat.st_size
+            total_br += br_size or gz_size or stat.st_size
+            print(f"   {filename}: {stat.st_size} B -> gzip {gz_size or '-'} B, br {br_size or '-'} B")
+
+        files[filename] = entry
+
+    manifest = {'files': files, 'bundles': bundles}
+    with open(os.path.join(static_dir, STATIC_MANIFEST_NAME), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+
+    print(f"\n📦 共处理 {len(files)} 个静态文件，{len(bundles)} 个资源包")
+    print(f"   可压缩文件原始大小: {total_raw} B")
+    print(f"   gzip后: {total_gzip} B")
+    if brotli is not None:
+        print(f"   brotli后: {total_br} B")
+    else:
+        print("   ℹ️  未安装brotli，跳过 .br 文件生成")
+    return manifest
+
+
+def precompile_templates():
+    """用应用的Jinja环境编译全部模板，写入字节码缓存"""
+    import template_cache
+    from app import app
+
+    names = template_cache.precompile_templates(app)
+    if names:
+        print(f"📦 已预编译 {len(names)} 个模板到 {template_cache.JINJA_CACHE_DIR}: {', '.join(names)}")
+    return names
+
+
+if __name__ == '__main__':
+    command = sys.argv[1] if len(sys.argv) > 1 else 'build'
+    if command == 'vendor':
+        print(f"🔄 下载第三方前端文件到: {STATIC_DIR}/vendor")
+        download_vendor_assets()
+        print("✅ 下载完成")
+    elif command == 'build':
+        print(f"🔄 构建静态文件: {STATIC_DIR}")
+        try:
+            missing = missing_vendor_assets()
+            if missing:
+                print(f"🔄 下载缺少的 {len(missing)} 个vendor文件...")
+                download_vendor_assets(filenames=missing)
+            build_static()
+        except (OSError, RuntimeError) as e:
+            print(f"❌ 静态文件构建失败: {e}")
+            sys.exit(1)
+        print("✅ 静态文件构建完成")
+        print("\n🔄 预编译模板...")
+        precompile_templates()
+    elif command == 'templates':
+        print("🔄 预编译模板...")
+        precompile_templates()
+        print("✅ 模板预编译完成")
+    else:
+        print("使用方法: python build_static.py [vendor|build|templates]")
+        sys.exit(1)
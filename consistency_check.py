@@ -0,0 +1,441 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+专家会话内部一致性（传递性）检查
+
+- 同一会话中，专家的成对判断可能形成循环，例如 overall_score 上 A>B、B>C、C>A
+- 每个会话的假设重新编号为 0..m-1，按维度构造偏好张量 W[会话, 维度, i, j]（i 净胜 j 为1），
+  所有会话一起做批量矩阵乘法：循环三元组数 = trace(W³)/3，
+  三对都有明确偏好的三元组数 = trace(S³)/6（S = W + Wᵀ）
+- 一致性 = 1 - 循环三元组数 / 三元组数；会话中没有完整三元组时为NULL
+- 平局（评分3）不算偏好；同一对假设在会话中出现相反的偏好时记为矛盾（contradictions）
+- 会话按假设数分组、分块处理，每块的张量按组内的假设数分配（少数大会话不会放大其他会话的张量），
+  耗时与会话数成线性关系
+- 结果写入 session_consistency 表：每个会话每个维度一行，另有 dimension='all' 的汇总行；
+  只写入结果有变化的行，删除已不存在的会话
+- /admin/consistency 在有新评分时先返回上一次的结果（stale=true），距上次计算超过
+  CONSISTENCY_REFRESH_SECONDS 秒才在后台线程中重新计算，请求中不读取全部评分
+
+用法:
+    python consistency_check.py [--db hypothesis_data.db] [--threshold 0.8] [--limit 20]
+    python consistency_check.py --benchmark 10000,20000,40000
+
+环境变量:
+    CONSISTENCY_REFRESH_SECONDS=300   两次后台重新计算的最短间隔（秒）
+"""
+
+import argparse
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+
+from rating_counters import deleted_count, ensure_rating_counters
+
+# 配置数据库路径
+DB_PATH = "hypothesis_data.db"
+
+CONSISTENCY_REFRESH_SECONDS = float(os.environ.get('CONSISTENCY_REFRESH_SECONDS', 300))
+
+# 评分维度（ratings表中的列名）
+DIMENSIONS = ['novelty_score', 'soundness_score', 'feasibility_score', 'significance_score', 'overall_score']
+
+# 5点量表的中点：小于3表示A更好，大于3表示B更好
+TIE_SCORE = 3
+
+# 一致性低于该值的会话视为不可靠
+DEFAULT_THRESHOLD = 0.8
+
+# 每块偏好张量的元素数上限（float32，约16MB）
+MAX_BLOCK_ELEMENTS = 4 * 1024 * 1024
+
+# 分批读取的行数
+FETCH_BATCH_SIZE = 100000
+
+_cache = {}
+_cache_lock = threading.Lock()
+
+
+def create_consistency_table(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS session_consistency (
+            session_id TEXT NOT NULL,
+            dimension TEXT NOT NULL,
+            topic_name TEXT,
+            comparisons INTEGER NOT NULL,
+            triads INTEGER NOT NULL,
+            cyclic_triads INTEGER NOT NULL,
+            contradictions INTEGER NOT NULL,
+            consistency REAL,
+            computed_at TIMESTAMP,
+            PRIMARY KEY (session_id, dimension)
+        )
+    """)
+    conn.commit()
+
+
+def load_session_judgments(conn):
+    """
+    按 (session_id, rating_id) 顺序读取全部评分，返回：
+    session_ids、topics（每个会话一个）、starts（每个会话第一行的位置）、
+    hypothesis_A_id、hypothesis_B_id、scores（n×5）
+    """
+    # 与 session_funnel.py 相同的索引，按会话顺序读取不需要排序
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_ratings_session_rating ON ratings(session_id, rating_id)")
+    cursor = conn.cursor()
+    cursor.execute(f"""
+        SELECT session_id, topic_name, hypothesis_A_id, hypothesis_B_id, {', '.join(DIMENSIONS)}
+        FROM ratings
+        ORDER BY session_id, rating_id
+    """)
+    ids, topics, chunks = [], [], []
+    while True:
+        rows = cursor.fetchmany(FETCH_BATCH_SIZE)
+        if not rows:
+            break
+        batch_ids, batch_topics, *numbers = zip(*rows)
+        ids.extend(batch_ids)
+        topics.extend(batch_topics)
+        chunks.append(np.array(numbers, dtype=np.int64).T)
+    data = np.concatenate(chunks) if chunks else np.zeros((0, 2 + len(DIMENSIONS)), dtype=np.int64)
+
+    ids = np.array(ids, dtype=object)
+    first = np.ones(len(ids), dtype=bool)
+    first[1:] = ids[1:] != ids[:-1]
+    starts = np.flatnonzero(first)
+    return {
+        'session_ids': [str(session_id) for session_id in ids[starts]],
+        'topics': [topics[start] for start in starts],
+        'starts': starts,
+        'hypothesis_A_id': data[:, 0],
+        'hypothesis_B_id': data[:, 1],
+        'scores': data[:, 2:],
+    }
+
+
+def local_hypothesis_codes(session, hyp_a, hyp_b):
+    """把每个会话中出现的假设编号为 0..m-1，返回 (A的编号, B的编号, 最大的m)"""
+    if len(session) == 0:
+        return hyp_a, hyp_b, 0
+    span = int(max(hyp_a.max(), hyp_b.max())) + 1
+    keys = session * span + np.concatenate([hyp_a, hyp_b]).reshape(2, -1)
+    unique_keys, codes = np.unique(keys, return_inverse=True)
+    codes = codes.reshape(2, -1)
+    # 每个会话第一个假设在 unique_keys 中的位置
+    offsets = np.searchsorted(unique_keys, session * span)
+    local = codes - offsets
+    return local[0], local[1], int(local.max()) + 1
+
+
+def count_triads(session, code_a, code_b, scores, num_sessions, size):
+    """
+    一块会话的批量计算；session 为块内的会话编号（0..num_sessions-1）
+    返回 形状为 (num_sessions, 维度) 的 triads、cyclic_triads、contradictions
+    """
+    num_dims = scores.shape[1]
+    preference = np.sign(TIE_SCORE - scores)            # +1: A更好，-1: B更好，0: 平局
+    winner = np.where(preference > 0, code_a[:, None], code_b[:, None])
+    loser = np.where(preference > 0, code_b[:, None], code_a[:, None])
+    strict = preference != 0
+
+    # wins[s, d, i, j] = 会话s在维度d上判断 i 优于 j 的次数
+    cell = (session[:, None] * num_dims + np.arange(num_dims)) * size
+    flat = (cell + winner) * size + loser
+    wins = np.bincount(flat[strict], minlength=num_sessions * num_dims * size * size)
+    wins = wins.reshape(num_sessions, num_dims, size, size)
+
+    wins_t = wins.swapaxes(-1, -2)
+    contradictions = ((wins > 0) & (wins_t > 0)).sum(axis=(-1, -2)) // 2
+    beats = (wins > wins_t).astype(np.float32)
+    decided = beats + beats.swapaxes(-1, -2)
+
+    # trace(W³) = Σ (W·W)ᵢⱼ·Wⱼᵢ，每个循环被计数3次；无向图中每个三角形被计数6次
+    cyclic = np.einsum('sdij,sdji->sd', beats @ beats, beats) / 3
+    triads = np.einsum('sdij,sdji->sd', decided @ decided, decided) / 6
+    return np.rint(triads).astype(np.int64), np.rint(cyclic).astype(np.int64), contradictions
+
+
+def compute_consistency(data):
+    """返回每个会话的 comparisons、以及 (会话数, 维度) 形状的 triads / cyclic_triads / contradictions"""
+    starts = data['starts']
+    num_sessions = len(starts)
+    num_rows = len(data['scores'])
+    comparisons = np.diff(np.append(starts, num_rows))
+    session = np.repeat(np.arange(num_sessions), comparisons)
+    code_a, code_b, _ = local_hypothesis_codes(session, data['hypothesis_A_id'], data['hypothesis_B_id'])
+
+    num_dims = len(DIMENSIONS)
+    triads = np.zeros((num_sessions, num_dims), dtype=np.int64)
+    cyclic = np.zeros_like(triads)
+    contradictions = np.zeros_like(triads)
+    if num_sessions == 0:
+        return {'comparisons': comparisons, 'triads': triads, 'cyclic_triads': cyclic,
+                'contradictions': contradictions}
+
+    # 每个会话的假设数；会话按假设数排序，评分行随之重排，使同一组的会话连续
+    sizes = np.maximum.reduceat(np.maximum(code_a, code_b), starts) + 1
+    order = np.argsort(sizes, kind='stable')
+    rank = np.empty(num_sessions, dtype=np.int64)
+    rank[order] = np.arange(num_sessions)
+    row_order = np.argsort(rank[session], kind='stable')
+    sorted_session = rank[session][row_order]
+    row_starts = np.append(0, np.cumsum(comparisons[order]))
+    sorted_sizes = sizes[order]
+    bounds = np.concatenate([[0], np.flatnonzero(np.diff(sorted_sizes)) + 1, [num_sessions]]).tolist()
+
+    for group_first, group_last in zip(bounds[:-1], bounds[1:]):
+        size = int(sorted_sizes[group_first])
+        block = max(1, MAX_BLOCK_ELEMENTS // (num_dims * size ** 2))
+        for first in range(group_first, group_last, block):
+            last = min(first + block, group_last)
+            positions = slice(row_starts[first], row_starts[last])
+            rows = row_order[positions]
+            result = count_triads(sorted_session[positions] - first, code_a[rows], code_b[rows], data['scores'][rows],
+                                  last - first, size)
+            sessions = order[first:last]
+            triads[sessions], cyclic[sessions], contradictions[sessions] = result
+
+    return {
+        'comparisons': comparisons,
+        'triads': triads,
+        'cyclic_triads': cyclic,
+        'contradictions': contradictions,
+    }
+
+
+def consistency_scores(triads, cyclic):
+    """1 - 循环三元组 / 三元组；没有三元组时为NaN"""
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(triads > 0, 1.0 - cyclic / triads, np.nan)
+
+
+def save_consistency(conn, data, result):
+    """写入 session_consistency 表：只写入结果有变化的行，删除已不存在的会话；返回写入的行数"""
+    create_consistency_table(conn)
+    computed_at = datetime.now().isoformat(timespec='seconds')
+    triads = np.column_stack([result['triads'], result['triads'].sum(axis=1)])
+    cyclic = np.column_stack([result['cyclic_triads'], result['cyclic_triads'].sum(axis=1)])
+    contradictions = np.column_stack([result['contradictions'], result['contradictions'].sum(axis=1)])
+    scores = consistency_scores(triads, cyclic)
+    dimensions = DIMENSIONS + ['all']
+
+    existing = {(row[0], row[1]): row[2:] for row in conn.execute("""
+        SELECT session_id, dimension, topic_name, comparisons, triads, cyclic_triads, contradictions, consistency
+        FROM session_consistency
+    """)}
+    changed = []
+    for s, session_id in enumerate(data['session_ids']):
+        for d, dimension in enumerate(dimensions):
+            score = scores[s, d]
+            values = (data['topics'][s], int(result['comparisons'][s]), int(triads[s, d]), int(cyclic[s, d]),
+                      int(contradictions[s, d]), None if np.isnan(score) else float(score))
+            if existing.pop((session_id, dimension), None) != values:
+                changed.append((session_id, dimension) + values + (computed_at,))
+
+    with conn:
+        # existing 中剩下的是评分已被删除（或归档）的会话
+        conn.executemany("DELETE FROM session_consistency WHERE session_id = ? AND dimension = ?", list(existing))
+        conn.executemany("""
+            INSERT OR REPLACE INTO session_consistency (session_id, dimension, topic_name, comparisons, triads,
+                                                        cyclic_triads, contradictions, consistency, computed_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, changed)
+    return len(changed)
+
+
+def run_check(conn):
+    """读取评分、计算并写入数据库，返回 (data, result)"""
+    data = load_session_judgments(conn)
+    result = compute_consistency(data)
+    save_consistency(conn, data, result)
+    return data, result
+
+
+def summarize(data, result, threshold=DEFAULT_THRESHOLD, limit=20):
+    """报告：每个维度的循环比例、低于阈值的会话"""
+    triads = result['triads'].sum(axis=1)
+    cyclic = result['cyclic_triads'].sum(axis=1)
+    scores = consistency_scores(triads, cyclic)
+    checked = ~np.isnan(scores)
+    flagged = np.flatnonzero(checked & (scores < threshold))
+    flagged = flagged[np.argsort(scores[flagged], kind='stable')]
+
+    dimensions = {}
+    for d, dimension in enumerate(DIMENSIONS):
+        total = int(result['triads'][:, d].sum())
+        dimensions[dimension] = {
+            'triads': total,
+            'cyclic_triads': int(result['cyclic_triads'][:, d].sum()),
+            'cyclic_rate': round(int(result['cyclic_triads'][:, d].sum()) / total, 4) if total else None,
+            'contradictions': int(result['contradictions'][:, d].sum()),
+        }
+
+    return {
+        'sessions': len(data['session_ids']),
+        'checked_sessions': int(checked.sum()),
+        'threshold': threshold,
+        'flagged_sessions': int(len(flagged)),
+        'mean_consistency': round(float(scores[checked].mean()), 4) if checked.any() else None,
+        'dimensions': dimensions,
+        'least_consistent': [{
+            'session_id': data['session_ids'][s],
+            'topic_name': data['topics'][s],
+            'comparisons': int(result['comparisons'][s]),
+            'triads': int(triads[s]),
+            'cyclic_triads': int(cyclic[s]),
+            'consistency': round(float(scores[s]), 4),
+        } for s in flagged[:limit]],
+    }
+
+
+def ratings_cache_key(conn):
+    """(最大 rating_id, 删除计数)：只读主键末尾与 rating_counters，不扫描评分表"""
+    ensure_rating_counters(conn)
+    max_id = conn.execute("SELECT COALESCE(MAX(rating_id), 0) FROM ratings").fetchone()[0]
+    return max_id, deleted_count(conn, 'ratings')
+
+
+def refresh(conn):
+    """重新计算并写入数据库，更新缓存"""
+    key = ratings_cache_key(conn)
+    start = time.perf_counter()
+    data, result = run_check(conn)
+    cached = {'key': key, 'data': data, 'result': result, 'refreshed': time.monotonic(),
+              'computed_at': datetime.now().isoformat(timespec='seconds'),
+              'compute_seconds': round(time.perf_counter() - start, 4)}
+    with _cache_lock:
+        _cache['result'] = cached
+    return cached
+
+
+def refresh_in_background(db_path):
+    """在后台线程中重新计算；已有线程在计算时不重复启动"""
+    with _cache_lock:
+        if _cache.get('refreshing'):
+            return None
+        _cache['refreshing'] = True
+
+    def run():
+        try:
+            conn = sqlite3.connect(db_path)
+            try:
+                refresh(conn)
+            finally:
+                conn.close()
+        except Exception as e:
+            print(f"❌ 会话一致性后台计算失败: {e}")
+        finally:
+            with _cache_lock:
+                _cache['refreshing'] = False
+
+    thread = threading.Thread(target=run, name='consistency-refresh', daemon=True)
+    thread.start()
+    return thread
+
+
+def get_consistency_report(conn, threshold=DEFAULT_THRESHOLD, limit=20, db_path=None):
+    """
+    返回一致性报告；有新评分时：
+    给定 db_path（Web请求）则返回上一次的结果（stale=true），距上次计算超过 CONSISTENCY_REFRESH_SECONDS
+    时在后台重新计算；没有 db_path（命令行）或还没有结果时同步计算
+    """
+    key = ratings_cache_key(conn)
+    with _cache_lock:
+        cached = _cache.get('result')
+    if cached is None or (cached['key'] != key and db_path is None):
+        cached = refresh(conn)
+    elif cached['key'] != key and time.monotonic() - cached['refreshed'] >= CONSISTENCY_REFRESH_SECONDS:
+        refresh_in_background(db_path)
+
+    report = summarize(cached['data'], cached['result'], threshold=threshold, limit=limit)
+    report.update({'ratings_count': len(cached['data']['scores']), 'computed_at': cached['computed_at'],
+                   'compute_seconds': cached['compute_seconds'], 'stale': cached['key'] != key})
+    return report
+
+
+def print_report(report):
+    """在终端打印一致性报告"""
+    print(f"📊 会话一致性（{report['ratings_count']} 条评分，{report['sessions']} 个会话，"
+          f"耗时 {report['compute_seconds']}s）")
+    print(f"   有完整三元组的会话: {report['checked_sessions']}，平均一致性: {report['mean_consistency']}，"
+          f"低于 {report['threshold']}: {report['flagged_sessions']}\n")
+    for dimension, stats in report['dimensions'].items():
+        print(f"   {dimension:<20} 三元组 {stats['triads']:>8}  循环 {stats['cyclic_triads']:>6}  "
+              f"循环比例 {stats['cyclic_rate']}  矛盾 {stats['contradictions']}")
+    if report['least_consistent']:
+        print("\n⚠️  一致性最低的会话:")
+        for item in report['least_consistent']:
+            print(f"   {item['session_id']} ({item['topic_name']}): {item['consistency']} "
+                  f"（{item['cyclic_triads']}/{item['triads']} 个三元组循环，{item['comparisons']} 次比较）")
+
+
+def create_benchmark_db(num_sessions, comparisons=8, pool_size=8, noise_share=0.1, seed=0):
+    """生成随机会话的内存数据库：大多数专家按潜在质量评分，noise_share 比例的专家随机评分"""
+    rng = np.random.default_rng(seed)
+    conn = sqlite3.connect(':memory:')
+    conn.execute(f"""
+        CREATE TABLE ratings (
+            rating_id INTEGER PRIMARY KEY AUTOINCREMENT, session_id TEXT NOT NULL, topic_name TEXT NOT NULL,
+            comparison_number INTEGER NOT NULL, hypothesis_A_id INTEGER NOT NULL, hypothesis_B_id INTEGER NOT NULL,
+            {', '.join(f'{dim} INTEGER NOT NULL' for dim in DIMENSIONS)}, timestamp TIMESTAMP
+        )
+    """)
+    quality = rng.normal(size=10 * pool_size)
+
+    def rows():
+        for session in range(num_sessions):
+            topic = int(rng.integers(10))
+            noisy = rng.random() < noise_share
+            for k in range(1, comparisons + 1):
+                a, b = rng.choice(pool_size, 2, replace=False) + topic * pool_size
+                if noisy:
+                    scores = rng.integers(1, 6, len(DIMENSIONS))
+                else:
+                    diff = quality[b] - quality[a] + rng.normal(scale=0.3, size=len(DIMENSIONS))
+                    scores = np.clip(np.rint(3 + 2 * diff), 1, 5).astype(int)
+                yield (f"s{session}", f"topic{topic + 1}", k, int(a), int(b), *map(int, scores))
+
+    conn.executemany(f"""
+        INSERT INTO ratings (session_id, topic_name, comparison_number, hypothesis_A_id, hypothesis_B_id,
+                             {', '.join(DIMENSIONS)})
+        VALUES (?, ?, ?, ?, ?, {', '.join('?' for _ in DIMENSIONS)})
+    """, rows())
+    conn.commit()
+    return conn
+
+
+def benchmark(session_counts):
+    """不同会话数下的耗时（读取、批量计算、写入），用于确认线性扩展"""
+    print(f"{'会话数':>10}{'评分数':>10}{'读取s':>10}{'计算s':>10}{'写入s':>10}{'每千会话ms':>14}")
+    for num_sessions in session_counts:
+        conn = create_benchmark_db(num_sessions)
+        start = time.perf_counter()
+        data = load_session_judgments(conn)
+        loaded = time.perf_counter()
+        result = compute_consistency(data)
+        computed = time.perf_counter()
+        save_consistency(conn, data, result)
+        saved = time.perf_counter()
+        total = saved - start
+        print(f"{num_sessions:>10}{len(data['scores']):>10}{loaded - start:>10.2f}{computed - loaded:>10.2f}"
+              f"{saved - computed:>10.2f}{total / num_sessions * 1e6:>14.1f}")
+        conn.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='专家会话内部一致性（传递性）检查')
+    parser.add_argument('--db', default=DB_PATH, help='数据库路径')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD, help='不可靠会话的一致性阈值')
+    parser.add_argument('--limit', type=int, default=20, help='列出的会话数')
+    parser.add_argument('--benchmark', metavar='N1,N2,...', help='用随机会话测试不同会话数的耗时')
+    args = parser.parse_args()
+
+    if args.benchmark:
+        benchmark([int(n) for n in args.benchmark.split(',')])
+    else:
+        conn = sqlite3.connect(args.db)
+        print_report(get_consistency_report(conn, threshold=args.threshold, limit=args.limit))
+        conn.close()
@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+假设内容的 zstd 字典压缩存储（可选）
+
+- hypothesis.hypothesis_content 是缩进的JSON，键相同、用词相近，占数据库的大部分；
+  compress 在这些内容上训练一个 zstd 字典，把每条内容改写为用字典压缩的 zstd 帧（BLOB）
+- 字典存放在 content_dictionaries 表，字典ID写在每个 zstd 帧的帧头中；
+  之后重新训练的字典使用新的ID，旧的帧仍然可以解压
+- 读取内容统一经过 decode_content()：TEXT 原样返回，BLOB 按帧头中的字典ID解压，
+  字典与解压器按线程缓存；未压缩的数据库不需要安装 zstandard
+- 请求路径读取的是 hypothesis_corpus.py 导出的内存映射语料（导出时已解压），压缩只影响导出和离线脚本
+- SQL 中的 JSON 函数无法读取压缩后的内容：hypothesis.title 是触发器维护的普通列（add_content_columns.py），
+  写入BLOB时触发器不更新标题，压缩前的标题保留；全文检索索引中 hypothesis 部分在 Python 中解压后重建；
+  decompress 恢复为文本时触发器重新提取标题
+
+用法:
+    python content_compression.py compress [--db hypothesis_data.db] [--level 19]
+    python content_compression.py decompress [--db hypothesis_data.db]
+    python content_compression.py info
+    python content_compression.py --benchmark [--runs 5]
+"""
+
+import argparse
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+
+try:
+    import zstandard
+except ImportError:  # zstandard为可选依赖，未安装时只能读取未压缩的内容
+    zstandard = None
+
+from add_content_columns import _bytes_read, ensure_content_columns
+
+# 配置数据库路径
+DB_PATH = "hypothesis_data.db"
+
+DICTIONARY_TABLE = 'content_dictionaries'
+
+# 字典大小（zstd 推荐约100KB）与压缩级别（只在压缩时耗时，解压速度与级别无关）
+DICTIONARY_SIZE = 112640
+COMPRESSION_LEVEL = 19
+
+# 训练字典最多使用的样本数
+TRAINING_SAMPLES = 20000
+
+_local = threading.local()
+
+
+def ensure_dictionary_table(conn):
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {DICTIONARY_TABLE} (
+            dict_id INTEGER PRIMARY KEY,
+            dictionary BLOB NOT NULL,
+            samples INTEGER NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+
+def _require_zstandard():
+    if zstandard is None:
+        raise RuntimeError("假设内容使用了zstd压缩，需要安装 zstandard（pip install zstandard）")
+
+
+def _decompressor(conn, dict_id):
+    """字典ID对应的解压器；ZstdDecompressor 不能跨线程共用，每个线程缓存一份"""
+    decompressors = getattr(_local, 'decompressors', None)
+    if decompressors is None:
+        decompressors = _local.decompressors = {}
+    decompressor = decompressors.get(dict_id)
+    if decompressor is None:
+        row = conn.execute(f"SELECT dictionary FROM {DICTIONARY_TABLE} WHERE dict_id = ?", (dict_id,)).fetchone()
+        if row is None:
+            raise ValueError(f"缺少压缩字典 {dict_id}")
+        decompressor = zstandard.ZstdDecompressor(dict_data=zstandard.ZstdCompressionDict(row[0]))
+        decompressors[dict_id] = decompressor
+    return decompressor
+
+
+def decode_content(conn, value):
+    """hypothesis_content 的值 -> JSON文本；未压缩的文本（以及NULL）原样返回"""
+    if not isinstance(value, bytes):
+        return value
+    _require_zstandard()
+    dict_id = zstandard.get_frame_parameters(value).dict_id
+    return _decompressor(conn, dict_id).decompress(value).decode('utf-8')
+
+
+def content_stats(conn):
+    """各存储方式的行数与内容字节数"""
+    return {kind: {'rows': rows, 'bytes': total or 0} for kind, rows, total in conn.execute("""
+        SELECT typeof(hypothesis_content), COUNT(*), SUM(LENGTH(CAST(hypothesis_content AS BLOB)))
+        FROM hypothesis GROUP BY 1
+    """)}
+
+
+def _rebuild_search_index(conn):
+    import search_index
+    if conn.execute("SELECT 1 FROM sqlite_master WHERE name = ?", (search_index.FTS_TABLE,)).fetchone():
+        search_index.rebuild_source(conn, 'hypothesis')
+
+
+def train_dictionary(conn, dict_size=DICTIONARY_SIZE, level=COMPRESSION_LEVEL, seed=0):
+    """在未压缩的内容上训练字典并保存，返回 ZstdCompressionDict"""
+    _require_zstandard()
+    samples = [row[0].encode('utf-8') for row in conn.execute(
+        "SELECT hypothesis_content FROM hypothesis WHERE typeof(hypothesis_content) = 'text'")]
+    if len(samples) > TRAINING_SAMPLES:
+        samples = random.Random(seed).sample(samples, TRAINING_SAMPLES)
+    try:
+        dictionary = zstandard.train_dictionary(dict_size, samples, level=level)
+    except zstandard.ZstdError as e:
+        raise ValueError(f"训练字典失败（{len(samples)} 个样本）: {e}")
+    ensure_dictionary_table(conn)
+    conn.execute(f"INSERT OR REPLACE INTO {DICTIONARY_TABLE} (dict_id, dictionary, samples) VALUES (?, ?, ?)",
+                 (dictionary.dict_id(), dictionary.as_bytes(), len(samples)))
+    return dictionary
+
+
+def compress_database(conn, level=COMPRESSION_LEVEL, dict_size=DICTIONARY_SIZE):
+    """训练字典并压缩所有未压缩的内容，返回 (字典ID, 压缩的行数)；之后需要 VACUUM 才会缩小文件"""
+    _require_zstandard()
+    if not conn.execute("SELECT 1 FROM hypothesis WHERE typeof(hypothesis_content) = 'text' LIMIT 1").fetchone():
+        return None, 0
+
+    # 标题在压缩前提取好，之后不再从内容中读取
+    ensure_content_columns(conn)
+    with conn:
+        dictionary = train_dictionary(conn, dict_size, level)
+        compressor = zstandard.ZstdCompressor(level=level, dict_data=dictionary)
+        rows = conn.execute(
+            "SELECT id, hypothesis_content FROM hypothesis WHERE typeof(hypothesis_content) = 'text'").fetchall()
+        conn.executemany("UPDATE hypothesis SET hypothesis_content = ? WHERE id = ?",
+                         ((compressor.compress(content.encode('utf-8')), hypothesis_id)
+                          for hypothesis_id, content in rows))
+        _rebuild_search_index(conn)
+    return dictionary.dict_id(), len(rows)
+
+
+def decompress_database(conn):
+    """把压缩的内容恢复为文本（触发器随之更新 title），返回恢复的行数"""
+    ensure_content_columns(conn)
+    with conn:
+        rows = conn.execute(
+            "SELECT id, hypothesis_content FROM hypothesis WHERE typeof(hypothesis_content) = 'blob'").fetchall()
+        # 全文检索与标题列的UPDATE触发器会用恢复后的文本重新索引、提取标题
+        conn.executemany("UPDATE hypothesis SET hypothesis_content = ? WHERE id = ?",
+                         ((decode_content(conn, content), hypothesis_id) for hypothesis_id, content in rows))
+        conn.execute(f"DROP TABLE IF EXISTS {DICTIONARY_TABLE}")
+    return len(rows)
+
+
+def print_info(db_path):
+    conn = sqlite3.connect(db_path)
+    try:
+        stats = content_stats(conn)
+        print(f"📊 {db_path}: {os.path.getsize(db_path) / 1024 / 1024:.1f} MB")
+        for kind, row in stats.items():
+            label = {'text': '文本', 'blob': 'zstd压缩'}.get(kind, kind)
+            print(f"   {label}: {row['rows']} 条，{row['bytes'] / 1024 / 1024:.1f} MB")
+        if 'blob' in stats:
+            for dict_id, size, samples, created_at in conn.execute(
+                    f"SELECT dict_id, LENGTH(dictionary), samples, created_at FROM {DICTIONARY_TABLE}"):
+                print(f"   字典 {dict_id}: {size / 1024:.0f} KB，{samples} 个样本，{created_at}")
+    finally:
+        conn.close()
+
+
+def _cold_read(db_path, query, params, runs):
+    """每次使用新连接（SQLite页缓存为空）读取并解析内容，返回 (耗时中位数ms, 读取文件字节数, 行数)"""
+    timings, file_bytes = [], []
+    for _ in range(runs):
+        conn = sqlite3.connect(db_path)
+        before = _bytes_read()
+        start = time.perf_counter()
+        count = 0
+        for row in conn.execute(query, params):
+            json.loads(decode_content(conn, row[0]))
+            count += 1
+        timings.append((time.perf_counter() - start) * 1000)
+        after = _bytes_read()
+        if before is not None and after is not None:
+            file_bytes.append(after - before)
+        conn.close()
+    timings.sort()
+    return timings[len(timings) // 2], (min(file_bytes) if file_bytes else None), count
+
+
+def _decode_latency(db_path):
+    """每条内容的解码耗时（微秒）：解压、解压+解析JSON"""
+    conn = sqlite3.connect(db_path)
+    values = [row[0] for row in conn.execute("SELECT hypothesis_content FROM hypothesis")]
+    for value in values[:10]:
+        decode_content(conn, value)
+    start = time.perf_counter()
+    texts = [decode_content(conn, value) for value in values]
+    decoded = time.perf_counter()
+    for text in texts:
+        json.loads(text)
+    parsed = time.perf_counter()
+    conn.close()
+    per_row = 1e6 / max(len(values), 1)
+    return (decoded - start) * per_row, (parsed - start) * per_row
+
+
+def benchmark(db_path, runs, level=COMPRESSION_LEVEL):
+    """对比文本存储与zstd字典压缩：数据库大小、冷读取的文件读取量与耗时、每条内容的解码耗时"""
+    import tempfile
+
+    _require_zstandard()
+    with tempfile.TemporaryDirectory() as tmp:
+        text_db = os.path.join(tmp, 'text.db')
+        zstd_db = os.path.join(tmp, 'zstd.db')
+        source = sqlite3.connect(db_path)
+        source.execute("VACUUM INTO ?", (text_db,))
+        source.close()
+
+        conn = sqlite3.connect(text_db)
+        if 'blob' in content_stats(conn):
+            decompress_database(conn)
+            conn.execute("VACUUM")
+        conn.execute("VACUUM INTO ?", (zstd_db,))
+        conn.close()
+
+        conn = sqlite3.connect(zstd_db)
+        start = time.perf_counter()
+        dict_id, count = compress_database(conn, level=level)
+        conn.execute("VACUUM")
+        conn.close()
+        print(f"📦 压缩 {count} 条内容（字典 {dict_id}，级别 {level}）耗时 {time.perf_counter() - start:.1f}s\n")
+
+        conn = sqlite3.connect(text_db)
+        ids = [row[0] for row in conn.execute("SELECT id FROM hypothesis")]
+        conn.close()
+        sample_ids = random.Random(0).sample(ids, min(200, len(ids)))
+        point_query = f"SELECT hypothesis_content FROM hypothesis WHERE id IN ({', '.join('?' for _ in sample_ids)})"
+
+        print(f"{'存储':<10}{'数据库MB':>10}{'内容MB':>10}{'全表ms':>10}{'全表读取MB':>12}"
+              f"{'200条ms':>10}{'200条读取KB':>13}{'解压us':>10}{'解压+解析us':>14}")
+        for label, path in (('文本', text_db), ('zstd字典', zstd_db)):
+            conn = sqlite3.connect(path)
+            content_bytes = sum(row['bytes'] for row in content_stats(conn).values())
+            conn.close()
+            scan_ms, scan_bytes, _ = _cold_read(path, "SELECT hypothesis_content FROM hypothesis", (), runs)
+            point_ms, point_bytes, _ = _cold_read(path, point_query, sample_ids, runs)
+            decode_us, parse_us = _decode_latency(path)
+            print(f"{label:<10}{os.path.getsize(path) / 1024 / 1024:>10.2f}{content_bytes / 1024 / 1024:>10.2f}"
+                  f"{scan_ms:>10.1f}{(scan_bytes or 0) / 1024 / 1024:>12.2f}"
+                  f"{point_ms:>10.1f}{(point_bytes or 0) / 1024:>13.0f}{decode_us:>10.1f}{parse_us:>14.1f}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='假设内容的zstd字典压缩存储')
+    parser.add_argument('command', nargs='?', choices=['compress', 'decompress', 'info'], default='info')
+    parser.add_argument('--db', default=DB_PATH, help='数据库路径')
+    parser.add_argument('--level', type=int, default=COMPRESSION_LEVEL, help='zstd压缩级别')
+    parser.add_argument('--benchmark', action='store_true', help='对比文本存储与压缩存储（使用数据库的副本）')
+    parser.add_argument('--runs', type=int, default=5, help='性能测试次数')
+    args = parser.parse_args()
+
+    if args.benchmark:
+        benchmark(args.db, args.runs, args.level)
+    elif args.command == 'info':
+        print_info(args.db)
+    else:
+        conn = sqlite3.connect(args.db)
+        if args.command == 'compress':
+            dict_id, count = compress_database(conn, level=args.level)
+            print(f"✅ 已压缩 {count} 条内容" + (f"（字典 {dict_id}）" if dict_id else ""))
+        else:
+            print(f"✅ 已恢复 {decompress_database(conn)} 条内容")
+        # VACUUM 之后文件大小才会变化
+        conn.execute("VACUUM")
+        conn.close()
+        print_info(args.db)
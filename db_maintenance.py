@@ -0,0 +1,477 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+数据库后台维护（空闲时执行）
+
+- 任务：PRAGMA optimize（每小时）、ANALYZE（每天）、incremental_vacuum（auto_vacuum=INCREMENTAL 时，每小时）、
+  WAL检查点（journal_mode=WAL 时，每10分钟）；重建脚本 DROP / 重建表留下的空闲页由 incremental_vacuum 归还，
+  数据库还不是 INCREMENTAL 模式时用 `vacuum --incremental` 转换一次
+- 每个worker在第一个请求时启动一个后台线程，定期检查：本进程最近 DB_MAINTENANCE_IDLE_SECONDS 秒没有请求、
+  最近一条评分 / 评论也早于这个时间，才视为空闲窗口
+- maintenance_lock 表中的租约保证同一时间只有一个worker执行维护；各任务上次执行的时间取自 maintenance_log，
+  多个worker共享，不会重复执行
+- 维护连接的忙等待很短，遇到正在写入的请求时放弃本次任务，下一个空闲窗口再执行
+- 每次执行记录耗时、页数、空闲页数、文件大小（含WAL）的变化，写入 maintenance_log 并打印
+- explain 输出代表性查询的执行计划与耗时，--save / --compare 用于对比一次评分活动前后的变化
+
+环境变量:
+    DB_MAINTENANCE_ENABLED=1          是否在worker中启动后台维护
+    DB_MAINTENANCE_IDLE_SECONDS=300   空闲多久后开始维护
+    DB_MAINTENANCE_CHECK_INTERVAL=60  检查间隔（秒）
+
+用法:
+    python db_maintenance.py status [--db hypothesis_data.db]
+    python db_maintenance.py run [--task analyze] [--force]
+    python db_maintenance.py vacuum [--incremental]
+    python db_maintenance.py explain [--save before.json] [--compare before.json]
+    python db_maintenance.py --benchmark 200000
+"""
+
+import argparse
+import json
+import os
+import random
+import socket
+import sqlite3
+import threading
+import time
+
+from flask import request
+
+from add_content_columns import ensure_content_columns
+from session_funnel import ensure_funnel_indexes
+
+# 配置数据库路径
+DB_PATH = "hypothesis_data.db"
+
+DB_MAINTENANCE_ENABLED = os.environ.get('DB_MAINTENANCE_ENABLED', '1') == '1'
+DB_MAINTENANCE_IDLE_SECONDS = float(os.environ.get('DB_MAINTENANCE_IDLE_SECONDS', 300))
+DB_MAINTENANCE_CHECK_INTERVAL = float(os.environ.get('DB_MAINTENANCE_CHECK_INTERVAL', 60))
+
+# 维护租约的有效期（秒）；持有租约的worker异常退出后，过期即可由其他worker接手
+LOCK_LEASE_SECONDS = 600
+
+# 维护连接等待写锁的时间（秒），不与评分写入争抢
+BUSY_TIMEOUT = 0.5
+
+# 每次 incremental_vacuum 最多归还的页数，限制单次持有写锁的时间
+MAX_VACUUM_PAGES = 2000
+
+# PRAGMA optimize 中 ANALYZE 每个索引最多检查的行数
+ANALYSIS_LIMIT = 1000
+
+# 代表性查询：名称 -> (SQL, 参数名)；参数取自数据库中的真实值
+PLAN_QUERIES = {
+    'session_ratings': ("SELECT rating_id, comparison_number FROM ratings WHERE session_id = ? ORDER BY rating_id",
+                        ('session_id',)),
+    'topic_counts': ("SELECT topic_name, COUNT(*) FROM ratings GROUP BY topic_name", ()),
+    'ratings_after_watermark': ("SELECT COUNT(*), MAX(rating_id) FROM ratings WHERE rating_id > ?", ('watermark',)),
+    'hypothesis_pair_ratings': ("SELECT COUNT(*) FROM ratings WHERE topic_name = ? AND hypothesis_A_id = ?",
+                                ('topic_name', 'hypothesis_id')),
+    'admin_ratings_page': ("""
+        SELECT r.rating_id, h1.title, h2.title FROM ratings r
+        LEFT JOIN hypothesis h1 ON r.hypothesis_A_id = h1.id
+        LEFT JOIN hypothesis h2 ON r.hypothesis_B_id = h2.id
+        ORDER BY r.timestamp DESC LIMIT 100
+    """, ()),
+    'comparison_pair': ("""
+        SELECT original_hypothesis_id, hypothesis_content_en FROM predefined_comparisons
+        WHERE topic_name = ? AND hypothesis_rank IN (1, 2)
+    """, ('topic_name',)),
+    'session_comments': ("SELECT comment_id FROM comments WHERE session_id = ?", ('session_id',)),
+}
+
+
+def ensure_maintenance_tables(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS maintenance_log (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            task TEXT NOT NULL,
+            started_at REAL NOT NULL,
+            duration_ms REAL,
+            status TEXT NOT NULL,
+            pages_before INTEGER,
+            pages_after INTEGER,
+            freelist_before INTEGER,
+            freelist_after INTEGER,
+            bytes_before INTEGER,
+            bytes_after INTEGER,
+            detail TEXT
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_maintenance_log_task ON maintenance_log(task, started_at)")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS maintenance_lock (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            holder TEXT NOT NULL,
+            expires_at REAL NOT NULL
+        )
+    """)
+    conn.commit()
+
+
+def database_stats(conn, db_path):
+    """页数、空闲页数、页大小，以及文件大小（含WAL）"""
+    pages = conn.execute("PRAGMA page_count").fetchone()[0]
+    freelist = conn.execute("PRAGMA freelist_count").fetchone()[0]
+    page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+    size = sum(os.path.getsize(path) for path in (db_path, f"{db_path}-wal") if os.path.exists(path))
+    return {'pages': pages, 'freelist': freelist, 'page_size': page_size, 'bytes': size}
+
+
+def task_optimize(conn):
+    conn.execute(f"PRAGMA analysis_limit = {ANALYSIS_LIMIT}")
+    # 0x10002：检查所有表（SQLite 3.46 起支持，旧版本只检查本连接用过的表，每天的 ANALYZE 兜底）
+    conn.execute("PRAGMA optimize(0x10002)").fetchall()
+    return None
+
+
+def task_analyze(conn):
+    conn.execute("PRAGMA analysis_limit = 0")
+    conn.execute("ANALYZE")
+    return f"{conn.execute('SELECT COUNT(*) FROM sqlite_stat1').fetchone()[0]} 条统计"
+
+
+def task_incremental_vacuum(conn):
+    if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+        return 'skipped: auto_vacuum 不是 INCREMENTAL（运行 vacuum --incremental 转换）'
+    # incremental_vacuum 每一步归还一页，execute 只执行第一步；executescript 会执行到结束
+    conn.executescript(f"PRAGMA incremental_vacuum({MAX_VACUUM_PAGES});")
+    return None
+
+
+def task_wal_checkpoint(conn):
+    if conn.execute("PRAGMA journal_mode").fetchone()[0] != 'wal':
+        return 'skipped: 不是WAL模式'
+    busy, log_frames, checkpointed = conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchone()
+    return f"busy={busy} frames={log_frames} checkpointed={checkpointed}"
+
+
+# 任务名 -> (间隔秒数, 函数)
+TASKS = {
+    'wal_checkpoint': (600, task_wal_checkpoint),
+    'incremental_vacuum': (3600, task_incremental_vacuum),
+    'optimize': (3600, task_optimize),
+    'analyze': (86400, task_analyze),
+}
+
+
+def acquire_lock(conn, holder, lease=LOCK_LEASE_SECONDS, now=None):
+    """获取（或续期）维护租约；其他worker持有未过期的租约时返回False"""
+    now = time.time() if now is None else now
+    with conn:
+        cursor = conn.execute("""
+            INSERT INTO maintenance_lock (id, holder, expires_at) VALUES (1, ?, ?)
+            ON CONFLICT(id) DO UPDATE SET holder = excluded.holder, expires_at = excluded.expires_at
+            WHERE maintenance_lock.expires_at < ? OR maintenance_lock.holder = excluded.holder
+        """, (holder, now + lease, now))
+    return cursor.rowcount == 1
+
+
+def release_lock(conn, holder):
+    with conn:
+        conn.execute("DELETE FROM maintenance_lock WHERE holder = ?", (holder,))
+
+
+def due_tasks(conn, now=None):
+    """到期的任务（距上次执行超过间隔；因忙而放弃的不算执行过）"""
+    now = time.time() if now is None else now
+    last = dict(conn.execute(
+        "SELECT task, MAX(started_at) FROM maintenance_log WHERE status IN ('ok', 'skipped') GROUP BY task"))
+    return [name for name, (interval, _) in TASKS.items() if now - last.get(name, 0) >= interval]
+
+
+def seconds_since_last_write(conn):
+    """距最近一条评分 / 评论的秒数（按主键取最后一行，不扫描表）；没有数据时返回None"""
+    latest = None
+    for table, key in (('ratings', 'rating_id'), ('comments', 'comment_id')):
+        try:
+            row = conn.execute(f"""
+                SELECT (julianday('now') - julianday(timestamp)) * 86400 FROM {table} ORDER BY {key} DESC LIMIT 1
+            """).fetchone()
+        except sqlite3.OperationalError:
+            continue
+        if row and row[0] is not None:
+            latest = row[0] if latest is None else min(latest, row[0])
+    return latest
+
+
+def run_task(conn, db_path, name):
+    """执行一个任务并记录，返回日志字典"""
+    _, task = TASKS[name]
+    before = database_stats(conn, db_path)
+    started_at = time.time()
+    start = time.perf_counter()
+    try:
+        detail = task(conn)
+        conn.commit()
+        status = 'skipped' if detail and detail.startswith('skipped') else 'ok'
+    except sqlite3.OperationalError as e:
+        # 通常是 database is locked：有请求正在写入，下一个空闲窗口再执行
+        conn.rollback()
+        detail, status = str(e), 'busy'
+    duration = (time.perf_counter() - start) * 1000
+    after = database_stats(conn, db_path)
+
+    entry = {
+        'task': name, 'started_at': started_at, 'duration_ms': round(duration, 2), 'status': status,
+        'pages_before': before['pages'], 'pages_after': after['pages'],
+        'freelist_before': before['freelist'], 'freelist_after': after['freelist'],
+        'bytes_before': before['bytes'], 'bytes_after': after['bytes'], 'detail': detail,
+    }
+    try:
+        with conn:
+            conn.execute(f"INSERT INTO maintenance_log ({', '.join(entry)}) VALUES ({', '.join('?' for _ in entry)})",
+                         list(entry.values()))
+    except sqlite3.OperationalError as e:
+        print(f"⚠️  维护日志写入失败: {e}")
+    print(f"🧹 维护 {name}: {status} {duration:.1f} ms，页数 {before['pages']} -> {after['pages']}，"
+          f"空闲页 {before['freelist']} -> {after['freelist']}，"
+          f"大小 {before['bytes'] / 1024 / 1024:.2f} -> {after['bytes'] / 1024 / 1024:.2f} MB"
+          + (f"（{detail}）" if detail else ""))
+    return entry
+
+
+def run_maintenance(db_path, holder=None, tasks=None, force=False):
+    """取得租约后执行到期的任务（tasks 限定范围，force 忽略执行间隔）；租约被其他worker持有时返回None"""
+    holder = holder or f"{socket.gethostname()}:{os.getpid()}"
+    conn = sqlite3.connect(db_path, timeout=BUSY_TIMEOUT)
+    try:
+        ensure_maintenance_tables(conn)
+        if not acquire_lock(conn, holder):
+            return None
+        try:
+            names = tasks or list(TASKS)
+            if not force:
+                due = due_tasks(conn)
+                names = [name for name in names if name in due]
+            return [run_task(conn, db_path, name) for name in names]
+        finally:
+            release_lock(conn, holder)
+    finally:
+        conn.close()
+
+
+def init_app(app, db_path=DB_PATH, idle_seconds=None, check_interval=None):
+    """记录请求时间；每个worker在第一个请求时启动后台维护线程（gunicorn fork 之后）"""
+    if not DB_MAINTENANCE_ENABLED:
+        return app
+    idle_seconds = DB_MAINTENANCE_IDLE_SECONDS if idle_seconds is None else idle_seconds
+    check_interval = DB_MAINTENANCE_CHECK_INTERVAL if check_interval is None else check_interval
+    state = {'last_request': time.monotonic(), 'pid': None, 'lock': threading.Lock()}
+    app.extensions['db_maintenance'] = state
+
+    def is_idle():
+        if time.monotonic() - state['last_request'] < idle_seconds:
+            return False
+        conn = sqlite3.connect(db_path, timeout=BUSY_TIMEOUT)
+        try:
+            since_write = seconds_since_last_write(conn)
+        finally:
+            conn.close()
+        return since_write is None or since_write >= idle_seconds
+
+    def loop():
+        while True:
+            # 加入随机抖动，避免多个worker同时检查
+            time.sleep(check_interval * random.uniform(0.8, 1.2))
+            try:
+                if is_idle():
+                    run_maintenance(db_path)
+            except sqlite3.Error as e:
+                print(f"⚠️  数据库维护失败: {e}")
+
+    @app.before_request
+    def record_request_time():
+        state['last_request'] = time.monotonic()
+        if state['pid'] != os.getpid():
+            with state['lock']:
+                if state['pid'] != os.getpid():
+                    state['pid'] = os.getpid()
+                    threading.Thread(target=loop, name='db-maintenance', daemon=True).start()
+
+    return app
+
+
+def _query_params(conn):
+    """代表性查询的参数：最近一个会话、评分最多的主题与假设、水位线"""
+    params = {'session_id': '', 'topic_name': 'topic1', 'hypothesis_id': 0, 'watermark': 0}
+    row = conn.execute("SELECT session_id, topic_name, hypothesis_A_id, rating_id FROM ratings "
+                       "ORDER BY rating_id DESC LIMIT 1").fetchone()
+    if row:
+        params.update(session_id=row[0], topic_name=row[1], hypothesis_id=row[2], watermark=max(row[3] - 1000, 0))
+    return params
+
+
+def explain_queries(db_path, runs=5):
+    """代表性查询的执行计划与耗时中位数（每次新连接）"""
+    conn = sqlite3.connect(db_path)
+    params = _query_params(conn)
+    results = {}
+    for name, (query, names) in PLAN_QUERIES.items():
+        values = [params[key] for key in names]
+        try:
+            plan = [row[-1] for row in conn.execute(f"EXPLAIN QUERY PLAN {query}", values)]
+        except sqlite3.OperationalError as e:
+            results[name] = {'plan': [f"error: {e}"], 'ms': None}
+            continue
+        timings = []
+        for _ in range(runs):
+            run_conn = sqlite3.connect(db_path)
+            start = time.perf_counter()
+            run_conn.execute(query, values).fetchall()
+            timings.append((time.perf_counter() - start) * 1000)
+            run_conn.close()
+        timings.sort()
+        results[name] = {'plan': plan, 'ms': round(timings[len(timings) // 2], 3)}
+    stats = database_stats(conn, db_path)
+    conn.close()
+    return {'stats': stats, 'queries': results}
+
+
+def print_explain(snapshot, baseline=None):
+    """打印执行计划与耗时；给定 baseline 时标出变化"""
+    stats = snapshot['stats']
+    print(f"📊 页数 {stats['pages']}，空闲页 {stats['freelist']}，{stats['bytes'] / 1024 / 1024:.2f} MB")
+    for name, result in snapshot['queries'].items():
+        old = (baseline or {}).get('queries', {}).get(name)
+        timing = f"{result['ms']} ms" if result['ms'] is not None else '-'
+        if old and old['ms'] is not None and result['ms'] is not None:
+            timing = f"{old['ms']} -> {result['ms']} ms"
+        changed = old is not None and old['plan'] != result['plan']
+        print(f"\n{'🔀' if changed else '  '} {name}: {timing}")
+        if changed:
+            print('\n'.join(f"      - {line}" for line in old['plan']))
+        print('\n'.join(f"      {'+' if changed else ' '} {line}" for line in result['plan']))
+
+
+def print_status(db_path, limit=20):
+    conn = sqlite3.connect(db_path)
+    try:
+        ensure_maintenance_tables(conn)
+        stats = database_stats(conn, db_path)
+        print(f"📊 {db_path}: {stats['bytes'] / 1024 / 1024:.2f} MB，页数 {stats['pages']}，空闲页 {stats['freelist']}，"
+              f"auto_vacuum={conn.execute('PRAGMA auto_vacuum').fetchone()[0]}，"
+              f"journal_mode={conn.execute('PRAGMA journal_mode').fetchone()[0]}")
+        print(f"   到期任务: {', '.join(due_tasks(conn)) or '无'}\n")
+        for task, started_at, duration, status, pages_before, pages_after, detail in conn.execute("""
+            SELECT task, started_at, duration_ms, status, pages_before, pages_after, detail
+            FROM maintenance_log ORDER BY id DESC LIMIT ?
+        """, (limit,)):
+            print(f"   {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(started_at))} {task:<20}{status:<8}"
+                  f"{duration:>10.1f} ms  页数 {pages_before} -> {pages_after}" + (f"  {detail}" if detail else ""))
+    finally:
+        conn.close()
+
+
+def vacuum(db_path, incremental=False):
+    """完整 VACUUM（需要独占数据库，应在维护窗口手动执行）；incremental=True 时同时转换为 INCREMENTAL 模式"""
+    conn = sqlite3.connect(db_path)
+    try:
+        before = database_stats(conn, db_path)
+        if incremental:
+            conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        start = time.perf_counter()
+        conn.execute("VACUUM")
+        after = database_stats(conn, db_path)
+    finally:
+        conn.close()
+    print(f"✅ VACUUM {(time.perf_counter() - start) * 1000:.0f} ms，页数 {before['pages']} -> {after['pages']}，"
+          f"{before['bytes'] / 1024 / 1024:.2f} -> {after['bytes'] / 1024 / 1024:.2f} MB")
+
+
+def simulate_campaign(conn, num_ratings, seed=0):
+    """模拟一次评分活动：num_ratings 条评分与少量评论，以及一次重建表留下的空闲页"""
+    rng = random.Random(seed)
+    topics = [row[0] for row in conn.execute("SELECT DISTINCT topic_name FROM predefined_comparisons")] or ['topic1']
+    hypothesis_ids = [row[0] for row in conn.execute("SELECT id FROM hypothesis")] or [1, 2]
+    rows, comments, session = [], [], None
+    for i in range(num_ratings):
+        comparison = i % 8 + 1
+        if comparison == 1:
+            session = (f"campaign-{seed}-{i}", rng.choice(topics))
+            if rng.random() < 0.3:
+                comments.append((session[0], session[1], 'campaign comment'))
+        a, b = rng.sample(hypothesis_ids, 2)
+        rows.append((session[0], session[1], comparison, a, b, *(rng.randint(1, 5) for _ in range(5))))
+    with conn:
+        conn.executemany("""
+            INSERT INTO ratings (session_id, topic_name, comparison_number, hypothesis_A_id, hypothesis_B_id,
+                                 novelty_score, soundness_score, feasibility_score, significance_score, overall_score)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, rows)
+        conn.executemany("INSERT INTO comments (session_id, topic_name, comment_text) VALUES (?, ?, ?)", comments)
+        # 与 rebuild_predefined_comparisons.py 一样 DROP 一张表，留下空闲页
+        conn.execute("CREATE TABLE campaign_scratch AS SELECT * FROM ratings")
+        conn.execute("DROP TABLE campaign_scratch")
+
+
+def benchmark(num_ratings, db_path=DB_PATH, runs=5):
+    """在数据库副本上：活动开始前、活动结束后（未维护）、维护之后，对比执行计划与耗时"""
+    import tempfile
+
+    with tempfile.TemporaryDirectory() as tmp:
+        bench_db = os.path.join(tmp, 'bench.db')
+        source = sqlite3.connect(db_path)
+        source.execute("VACUUM INTO ?", (bench_db,))
+        source.close()
+
+        conn = sqlite3.connect(bench_db)
+        # 与线上一样先建好管理页面用到的索引与标题列
+        ensure_funnel_indexes(conn)
+        ensure_content_columns(conn)
+        conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        conn.execute("VACUUM")
+        # 活动开始前的统计信息（之后不再更新，模拟从不维护的数据库）
+        conn.execute("ANALYZE")
+        conn.commit()
+        before = explain_queries(bench_db, runs)
+        print(f"🔄 模拟 {num_ratings} 条评分...")
+        simulate_campaign(conn, num_ratings)
+        conn.close()
+
+        print("\n===== 活动结束，未维护 =====")
+        stale = explain_queries(bench_db, runs)
+        print_explain(stale, before)
+
+        print("\n===== 执行维护 =====")
+        run_maintenance(bench_db, tasks=list(TASKS), force=True)
+
+        print("\n===== 维护之后（对比未维护） =====")
+        print_explain(explain_queries(bench_db, runs), stale)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='数据库后台维护')
+    parser.add_argument('command', nargs='?', choices=['status', 'run', 'vacuum', 'explain'], default='status')
+    parser.add_argument('--db', default=DB_PATH, help='数据库路径')
+    parser.add_argument('--task', action='append', choices=list(TASKS), help='只执行指定任务（可重复）')
+    parser.add_argument('--force', action='store_true', help='忽略执行间隔')
+    parser.add_argument('--incremental', action='store_true', help='VACUUM 时转换为 auto_vacuum=INCREMENTAL')
+    parser.add_argument('--save', help='把执行计划与耗时保存为JSON')
+    parser.add_argument('--compare', help='与保存的JSON对比')
+    parser.add_argument('--runs', type=int, default=5, help='每个查询的执行次数')
+    parser.add_argument('--benchmark', type=int, metavar='N', help='在数据库副本上模拟N条评分的活动并对比维护前后')
+    args = parser.parse_args()
+
+    if args.benchmark:
+        benchmark(args.benchmark, args.db, args.runs)
+    elif args.command == 'run':
+        results = run_maintenance(args.db, tasks=args.task, force=args.force or bool(args.task))
+        if results is None:
+            print("⏳ 其他进程正在维护")
+    elif args.command == 'vacuum':
+        vacuum(args.db, args.incremental)
+    elif args.command == 'explain':
+        snapshot = explain_queries(args.db, args.runs)
+        baseline = None
+        if args.compare:
+            with open(args.compare, 'r', encoding='utf-8') as f:
+                baseline = json.load(f)
+        print_explain(snapshot, baseline)
+        if args.save:
+            with open(args.save, 'w', encoding='utf-8') as f:
+                json.dump(snapshot, f, ensure_ascii=False, indent=2)
+            print(f"\n💾 已保存: {args.save}")
+    else:
+        print_status(args.db)
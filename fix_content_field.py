@@ -3,6 +3,8 @@
 
 import sqlite3
 
+from content_compression import decode_content
+
 # 配置数据库路径
 DB_PATH = "hypothesis_data.db"
 
@@ -37,7 +39,7 @@ def fix_content_field():
                     UPDATE predefined_comparisons 
                     SET hypothesis_content_en = ? 
                     WHERE id = ?
-                """, (result[0], record_id))
+                """, (decode_content(conn, result[0]), record_id))
                 print(f"   ✅ {topic_name} rank{hypothesis_rank}: 已更新hypothesis_content_en")
             else:
                 print(f"   ⚠️  {topic_name} rank{hypothesis_rank}: 未找到原始内容")
@@ -0,0 +1,24 @@
+# -*- coding: utf-8 -*-
+"""
+gunicorn 配置（gunicorn 启动时自动读取当前目录下的 gunicorn.conf.py）
+
+每个worker启动后在后台预热（建表、加载假设池、缓存比较数据、编译模板），
+预热完成前 /readyz 返回503，负载均衡器据此决定何时开始转发流量
+"""
+
+import os
+
+# 每个worker使用多个线程：管理页面的SSE推送（/admin/stream）是长连接，
+# 同步worker会被一个推送连接占满，并在超过 timeout 后被杀掉
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+
+
+def on_starting(server):
+    # 把实际的线程数（包括命令行 --threads）传给worker：
+    # admin_stream 据此检查 ADMIN_STREAM_MAX_CLIENTS，推送连接不能占满全部线程
+    os.environ['GUNICORN_THREADS'] = str(server.cfg.threads)
+
+
+def post_worker_init(worker):
+    import warmup
+    warmup.start(worker.wsgi)
@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+HTTP缓存与压缩
+
+- 静态文件使用内容哈希指纹URL（css/style.<hash>.css），并返回 Cache-Control: immutable
+- 优先发送 build_static.py 预先生成的 .br / .gz 文件
+- 超过阈值的HTML响应动态gzip压缩
+- HTML响应带弱ETag，支持条件GET（304）
+"""
+
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import re
+
+from flask import request, send_from_directory
+
+# 静态文件清单（由 build_static.py 生成）
+STATIC_MANIFEST_NAME = 'manifest.json'
+
+# 指纹长度（十六进制字符数）
+FINGERPRINT_LENGTH = 12
+
+# 指纹URL的缓存时间：一年
+STATIC_IMMUTABLE_MAX_AGE = 31536000
+
+# 未带指纹的静态文件只缓存较短时间
+STATIC_DEFAULT_MAX_AGE = 300
+
+# 小于该字节数的HTML不压缩（压缩收益不足以抵消CPU开销）
+HTML_COMPRESS_MIN_SIZE = int(os.environ.get('HTML_COMPRESS_MIN_SIZE', 1024))
+HTML_COMPRESS_LEVEL = int(os.environ.get('HTML_COMPRESS_LEVEL', 6))
+
+# 预压缩文件后缀，按优先级排列
+PRECOMPRESSED_ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+_FINGERPRINT_RE = re.compile(r'^(?P<stem>.+)\.(?P<hash>[0-9a-f]{%d})(?P<ext>\.[^./]+)$' % FINGERPRINT_LENGTH)
+
+# filename -> (mtime, size, hash)
+_hash_cache = {}
+_manifest = None
+
+
+def file_content_hash(path):
+    """计算文件内容哈希（截断的md5）"""
+    digest = hashlib.md5()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(65536), b''):
+            digest.update(chunk)
+    return digest.hexdigest()[:FINGERPRINT_LENGTH]
+
+
+def load_static_manifest(static_folder):
+    """读取构建时生成的静态文件清单，不存在时返回空字典"""
+    path = os.path.join(static_folder, STATIC_MANIFEST_NAME)
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f).get('files', {})
+    except (OSError, ValueError):
+        return {}
+
+
+def static_file_hash(static_folder, filename):
+    """获取静态文件的内容指纹；清单过期或缺失时按需计算"""
+    global _manifest
+    if _manifest is None:
+        _manifest = load_static_manifest(static_folder)
+
+    path = os.path.join(static_folder, filename)
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+
+    entry = _manifest.get(filename)
+    if entry and entry.get('mtime') == int(stat.st_mtime) and entry.get('size') == stat.st_size:
+        return entry['hash']
+
+    cached = _hash_cache.get(filename)
+    if cached and cached[0] == stat.st_mtime and cached[1] == stat.st_size:
+        return cached[2]
+
+    content_hash = file_content_hash(path)
+    _hash_cache[filename] = (stat.st_mtime, stat.st_size, content_hash)
+    return content_hash
+
+
+def fingerprint_filename(filename, content_hash):
+    """css/style.css -> css/style.<hash>.css"""
+    stem, ext = os.path.splitext(filename)
+    return f"{stem}.{content_hash}{ext}"
+
+
+def split_fingerprint(filename):
+    """css/style.<hash>.css -> (css/style.css, <hash>)；无指纹时返回 (filename, None)"""
+    match = _FINGERPRINT_RE.match(filename)
+    if not match:
+        return filename, None
+    return match.group('stem') + match.group('ext'), match.group('hash')
+
+
+def _accepted_encodings():
+    """按客户端 Accept-Encoding 过滤可用的压缩格式"""
+    accepted = []
+    for encoding, suffix in PRECOMPRESSED_ENCODINGS:
+        if request.accept_encodings[encoding] > 0:
+            accepted.append((encoding, suffix))
+    return accepted
+
+
+def init_app(app):
+    """为Flask应用注册静态文件指纹、预压缩与HTML缓存处理"""
+    static_folder = app.static_folder
+
+    @app.url_defaults
+    def add_static_fingerprint(endpoint, values):
+        """url_for('static', filename=...) 自动生成带指纹的URL"""
+        if endpoint != 'static' or 'filename' not in values:
+            return
+        filename = values['filename']
+        if split_fingerprint(filename)[1]:
+            return
+        content_hash = static_file_hash(static_folder, filename)
+        if content_hash:
+            values['filename'] = fingerprint_filename(filename, content_hash)
+
+    def serve_static(filename):
+        """静态文件：去掉指纹后发送，优先使用预压缩文件"""
+        original, fingerprint = split_fingerprint(filename)
+        source_path = os.path.join(static_folder, original)
+        if fingerprint is not None and os.path.isfile(source_path):
+            immutable = fingerprint == static_file_hash(static_folder, original)
+        else:
+            # 构建产物（资源包、字体）的文件名本身就带有内容哈希
+            original = filename
+            source_path = os.path.join(static_folder, original)
+            immutable = fingerprint is not None and fingerprint == static_file_hash(static_folder, original)
+
+        send_name, content_encoding = original, None
+        if os.path.isfile(source_path):
+            source_mtime = os.path.getmtime(source_path)
+            for encoding, suffix in _accepted_encodings():
+                candidate = os.path.join(static_folder, original + suffix)
+                # 预压缩文件比源文件旧说明构建产物已过期
+                if os.path.isfile(candidate) and os.path.getmtime(candidate) >= source_mtime:
+                    send_name, content_encoding = original + suffix, encoding
+                    break
+
+        mimetype = mimetypes.guess_type(original)[0] or 'application/octet-stream'
+        response = send_from_directory(static_folder, send_name, mimetype=mimetype,
+                                       max_age=STATIC_DEFAULT_MAX_AGE)
+
+        if content_encoding:
+            response.headers['Content-Encoding'] = content_encoding
+        response.vary.add('Accept-Encoding')
+        if immutable:
+            response.cache_control.public = True
+            response.cache_control.max_age = STATIC_IMMUTABLE_MAX_AGE
+            response.cache_control.immutable = True
+        return response
+
+    app.view_functions['static'] = serve_static
+
+    @app.after_request
+    def cache_and_compress_html(response):
+        """HTML：弱ETag + 条件GET，超过阈值时gzip压缩"""
+        if (request.method not in ('GET', 'HEAD') or response.status_code != 200
+                or response.mimetype != 'text/html' or response.direct_passthrough
+                or 'Content-Encoding' in response.headers):
+            return response
+
+        data = response.get_data()
+        # 页面内容与会话相关：允许浏览器缓存，但每次都要重新验证
+        response.cache_control.private = True
+        response.cache_control.no_cache = True
+        response.set_etag(hashlib.md5(data).hexdigest(), weak=True)
+        response.make_conditional(request)
+        if response.status_code == 304:
+            return response
+
+        response.vary.add('Accept-Encoding')
+        if len(data) >= HTML_COMPRESS_MIN_SIZE and request.accept_encodings['gzip'] > 0:
+            response.set_data(gzip.compress(data, compresslevel=HTML_COMPRESS_LEVEL))
+            response.headers['Content-Encoding'] = 'gzip'
+        return response
+
+    return app
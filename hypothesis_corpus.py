@@ -0,0 +1,327 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+内存映射的只读假设语料（各worker共享）
+
+- export 把 hypothesis 表导出为一个紧凑的二进制文件：文件头 + 元数据JSON + 各条假设内容（UTF-8 JSON）
+  + 按ID排序的偏移索引（id, topic, offset, length）
+- worker 用 mmap 只读打开，索引用 np.frombuffer 直接映射，不复制；读取某条假设时才切片、解析JSON，
+  文件内容只在操作系统页缓存中保存一份，不随worker数量增加
+- app.py 的 TOPIC_HYPOTHESIS_POOLS 中每个主题是一个按需解析的序列（CorpusPool），接口与原来的字典列表相同
+- get_hypothesis_content() 是读取假设内容的数据访问层：优先读语料文件，文件不存在或没有该ID时查询数据库；
+  数据库中zstd压缩的内容（content_compression.py）在导出和查询时解压，语料文件中保存的是解压后的JSON
+- 元数据记录导出时 hypothesis 表的行数、最大ID和内容总长度，不一致时视为过期并重新导出
+
+环境变量:
+    HYPOTHESIS_CORPUS_PATH=hypothesis_corpus.bin   语料文件
+    HYPOTHESIS_CORPUS_AUTO_EXPORT=1                启动时语料不存在或过期则自动导出
+
+用法:
+    python hypothesis_corpus.py export [--db hypothesis_data.db] [--out hypothesis_corpus.bin]
+    python hypothesis_corpus.py info
+    python hypothesis_corpus.py --benchmark [--workers 4] [--scale 20]
+"""
+
+import argparse
+import json
+import mmap
+import os
+import sqlite3
+import struct
+import threading
+from collections.abc import Sequence
+from datetime import datetime
+
+import numpy as np
+
+from content_compression import decode_content
+
+# 配置数据库路径
+DB_PATH = "hypothesis_data.db"
+
+HYPOTHESIS_CORPUS_PATH = os.environ.get('HYPOTHESIS_CORPUS_PATH', 'hypothesis_corpus.bin')
+HYPOTHESIS_CORPUS_AUTO_EXPORT = os.environ.get('HYPOTHESIS_CORPUS_AUTO_EXPORT', '1') == '1'
+
+MAGIC = b'HYPC'
+FORMAT_VERSION = 1
+
+# 文件头：magic、版本、记录数、索引偏移、元数据长度
+HEADER = struct.Struct('<4sIQQI')
+
+INDEX_DTYPE = np.dtype([('id', '<i8'), ('topic', '<i8'), ('offset', '<u8'), ('length', '<u8')])
+
+_shared = {}
+_shared_lock = threading.Lock()
+
+
+def source_stats(conn):
+    """hypothesis 表的行数、最大ID、内容总长度，用于判断语料是否过期"""
+    count, max_id, total = conn.execute(
+        "SELECT COUNT(*), MAX(id), SUM(LENGTH(hypothesis_content)) FROM hypothesis").fetchone()
+    return [count, max_id, total]
+
+
+def export_corpus(conn, path=HYPOTHESIS_CORPUS_PATH):
+    """导出语料；先写临时文件再替换，正在使用旧文件的worker不受影响。返回写入的记录数"""
+    stats = source_stats(conn)
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    entries = []
+    try:
+        with open(temp_path, 'wb') as f:
+            meta = json.dumps({'source': stats, 'created_at': datetime.now().isoformat(timespec='seconds')}).encode()
+            f.write(b'\0' * HEADER.size)
+            f.write(meta)
+            offset = HEADER.size + len(meta)
+            for hypothesis_id, topic, content in conn.execute(
+                    "SELECT id, topic, hypothesis_content FROM hypothesis ORDER BY id"):
+                # 无法解析的内容与原来加载假设池时一样跳过；重新序列化为紧凑格式
+                try:
+                    data = json.dumps(json.loads(decode_content(conn, content)), ensure_ascii=False,
+                                      separators=(',', ':')).encode()
+                except (TypeError, json.JSONDecodeError):
+                    continue
+                f.write(data)
+                entries.append((hypothesis_id, topic if topic is not None else -1, offset, len(data)))
+                offset += len(data)
+
+            # 索引按8字节对齐，np.frombuffer 可以直接映射
+            padding = -offset % 8
+            f.write(b'\0' * padding)
+            index_offset = offset + padding
+            f.write(np.array(entries, dtype=INDEX_DTYPE).tobytes())
+            f.seek(0)
+            f.write(HEADER.pack(MAGIC, FORMAT_VERSION, len(entries), index_offset, len(meta)))
+        os.replace(temp_path, path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+    return len(entries)
+
+
+class HypothesisCorpus:
+    """只读打开语料文件；记录在访问时才从映射中解析"""
+
+    def __init__(self, path=HYPOTHESIS_CORPUS_PATH):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            magic, version, count, index_offset, meta_length = HEADER.unpack_from(self._mmap, 0)
+            if magic != MAGIC or version != FORMAT_VERSION:
+                raise ValueError(f"{path}: 不是语料文件或版本不支持")
+            self.meta = json.loads(self._mmap[HEADER.size:HEADER.size + meta_length])
+            self.index = np.frombuffer(self._mmap, dtype=INDEX_DTYPE, count=count, offset=index_offset)
+        except (struct.error, ValueError):
+            self._mmap.close()
+            raise
+
+    def __len__(self):
+        return len(self.index)
+
+    def _position(self, hypothesis_id):
+        ids = self.index['id']
+        position = int(np.searchsorted(ids, hypothesis_id))
+        if position < len(ids) and ids[position] == hypothesis_id:
+            return position
+        return None
+
+    def __contains__(self, hypothesis_id):
+        return self._position(hypothesis_id) is not None
+
+    def raw(self, hypothesis_id):
+        """记录的UTF-8 JSON（memoryview，不复制）；不存在时返回None"""
+        position = self._position(hypothesis_id)
+        if position is None:
+            return None
+        entry = self.index[position]
+        start = int(entry['offset'])
+        return memoryview(self._mmap)[start:start + int(entry['length'])]
+
+    def get(self, hypothesis_id):
+        """解析后的假设内容；不存在时返回None"""
+        data = self.raw(hypothesis_id)
+        if data is None:
+            return None
+        try:
+            return json.loads(bytes(data))
+        finally:
+            data.release()
+
+    def topic_ids(self, topic):
+        return [int(hypothesis_id) for hypothesis_id in self.index['id'][self.index['topic'] == topic]]
+
+    def topic_pool(self, topic):
+        return CorpusPool(self, self.topic_ids(topic))
+
+    def is_current(self, conn):
+        return self.meta.get('source') == source_stats(conn)
+
+    def close(self):
+        # 先释放映射到文件的numpy数组，否则mmap无法关闭
+        self.index = None
+        self._mmap.close()
+
+
+class CorpusPool(Sequence):
+    """一个主题的假设池：元素为 {'id': ..., 'content': {...}}，访问时才解析"""
+
+    def __init__(self, corpus, ids):
+        self.corpus = corpus
+        self.ids = ids
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        hypothesis_id = self.ids[i]
+        return {'id': hypothesis_id, 'content': self.corpus.get(hypothesis_id)}
+
+
+def open_shared_corpus(conn=None, path=HYPOTHESIS_CORPUS_PATH, auto_export=HYPOTHESIS_CORPUS_AUTO_EXPORT):
+    """
+    返回本进程共用的语料（每个进程只打开一次）；给定conn时检查是否过期，必要时重新导出
+    语料不可用时返回None，调用方回退到数据库
+    """
+    with _shared_lock:
+        corpus = _shared.get(path)
+        try:
+            if corpus is not None and conn is not None and not corpus.is_current(conn):
+                # 旧的假设池可能仍在使用旧映射，不主动关闭，没有引用后自动释放
+                del _shared[path]
+                corpus = None
+            if corpus is None:
+                if conn is not None and auto_export:
+                    try:
+                        stale = HypothesisCorpus(path)
+                        current = stale.is_current(conn)
+                        stale.close()
+                    except (OSError, ValueError):
+                        current = False
+                    if not current:
+                        count = export_corpus(conn, path)
+                        print(f"📦 已导出假设语料: {path}（{count} 条）")
+                corpus = HypothesisCorpus(path)
+                _shared[path] = corpus
+        except (OSError, ValueError, sqlite3.Error) as e:
+            if conn is not None:
+                print(f"⚠️  假设语料不可用，使用数据库: {e}")
+            return None
+    return corpus
+
+
+def get_hypothesis_content(hypothesis_id, db_path=DB_PATH):
+    """读取一条假设的内容（已解析的JSON）；不存在时返回None"""
+    corpus = open_shared_corpus()
+    if corpus is not None:
+        content = corpus.get(hypothesis_id)
+        if content is not None:
+            return content
+
+    conn = sqlite3.connect(db_path)
+    try:
+        row = conn.execute("SELECT hypothesis_content FROM hypothesis WHERE id = ?", (hypothesis_id,)).fetchone()
+        return json.loads(decode_content(conn, row[0])) if row and row[0] else None
+    except json.JSONDecodeError:
+        return None
+    finally:
+        conn.close()
+
+
+def memory_usage(pid='self'):
+    """进程的 RSS、PSS（KB），来自 /proc/<pid>/smaps_rollup（Linux）"""
+    usage = {}
+    with open(f'/proc/{pid}/smaps_rollup') as f:
+        for line in f:
+            key, _, value = line.partition(':')
+            if key in ('Rss', 'Pss'):
+                usage[key.lower()] = int(value.split()[0])
+    return usage
+
+
+def benchmark_child(mode, db_path, corpus_path):
+    """一个模拟的worker：加载全部假设并读取每一条，报告后等待父进程结束它"""
+    import sys
+    touched = 0
+    if mode == 'dict':
+        # 原来的方式：每个进程把整张表解析进字典
+        conn = sqlite3.connect(db_path)
+        cache = {row[0]: json.loads(decode_content(conn, row[1]))
+                 for row in conn.execute("SELECT id, hypothesis_content FROM hypothesis")}
+        conn.close()
+        touched = sum(len(content) for content in cache.values())
+    elif mode == 'mmap':
+        corpus = HypothesisCorpus(corpus_path)
+        touched = sum(len(corpus.get(int(hypothesis_id))) for hypothesis_id in corpus.index['id'])
+    print(json.dumps({'touched': touched}), flush=True)
+    sys.stdin.read()
+
+
+def benchmark(workers, scale, db_path=DB_PATH):
+    """比较 每个进程字典缓存 与 共享mmap语料 时各进程的 RSS / PSS；baseline 为只导入模块的进程"""
+    import subprocess
+    import sys
+    import tempfile
+
+    with tempfile.TemporaryDirectory() as tmp:
+        bench_db = os.path.join(tmp, 'bench.db')
+        source = sqlite3.connect(db_path)
+        # 压缩的内容在复制时解压：基准库中没有压缩字典
+        rows = [(topic, decode_content(source, content))
+                for topic, content in source.execute("SELECT topic, hypothesis_content FROM hypothesis")]
+        source.close()
+        conn = sqlite3.connect(bench_db)
+        conn.execute("CREATE TABLE hypothesis (id INTEGER PRIMARY KEY, topic INTEGER, hypothesis_content TEXT)")
+        # 复制 scale 份，模拟更大的语料
+        conn.executemany("INSERT INTO hypothesis (topic, hypothesis_content) VALUES (?, ?)", rows * scale)
+        conn.commit()
+        corpus_path = os.path.join(tmp, 'corpus.bin')
+        count = export_corpus(conn, corpus_path)
+        conn.close()
+        print(f"📊 {count} 条假设，语料文件 {os.path.getsize(corpus_path) / 1024 / 1024:.1f} MB，{workers} 个进程\n")
+        print(f"{'方式':<10}{'平均RSS MB':>12}{'平均PSS MB':>12}{'PSS增量 MB':>12}{'总PSS增量 MB':>14}")
+
+        baseline_pss = None
+        for mode in ('baseline', 'dict', 'mmap'):
+            processes = [subprocess.Popen(
+                [sys.executable, os.path.abspath(__file__), '--benchmark-child', mode, '--db', bench_db,
+                 '--out', corpus_path],
+                stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True) for _ in range(workers)]
+            # 所有进程都加载完成后再读取内存，PSS 才能反映共享的页面
+            for process in processes:
+                process.stdout.readline()
+            usages = [memory_usage(process.pid) for process in processes]
+            for process in processes:
+                process.communicate('')
+
+            rss = sum(usage['rss'] for usage in usages) / workers / 1024
+            pss = sum(usage['pss'] for usage in usages) / workers / 1024
+            baseline_pss = pss if baseline_pss is None else baseline_pss
+            print(f"{mode:<10}{rss:>12.1f}{pss:>12.1f}{pss - baseline_pss:>12.1f}{(pss - baseline_pss) * workers:>14.1f}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='内存映射的只读假设语料')
+    parser.add_argument('command', nargs='?', choices=['export', 'info'], default='info')
+    parser.add_argument('--db', default=DB_PATH, help='数据库路径')
+    parser.add_argument('--out', default=HYPOTHESIS_CORPUS_PATH, help='语料文件路径')
+    parser.add_argument('--benchmark', action='store_true', help='比较字典缓存与mmap语料的每进程内存')
+    parser.add_argument('--workers', type=int, default=4, help='基准测试的进程数')
+    parser.add_argument('--scale', type=int, default=20, help='基准测试中语料复制的份数')
+    parser.add_argument('--benchmark-child', choices=['baseline', 'dict', 'mmap'], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.benchmark_child:
+        benchmark_child(args.benchmark_child, args.db, args.out)
+    elif args.benchmark:
+        benchmark(args.workers, args.scale, args.db)
+    elif args.command == 'export':
+        conn = sqlite3.connect(args.db)
+        count = export_corpus(conn, args.out)
+        conn.close()
+        print(f"✅ 已导出 {count} 条假设到 {args.out}（{os.path.getsize(args.out) / 1024:.0f} KB）")
+    else:
+        corpus = HypothesisCorpus(args.out)
+        print(f"📦 {args.out}: {len(corpus)} 条假设，导出时间 {corpus.meta.get('created_at')}，来源 {corpus.meta.get('source')}")
+        corpus.close()
@@ -0,0 +1,555 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+基于租约的持久化任务队列（SQLite）
+
+- 重建假设池、修复英文内容、翻译等批量任务拆成若干工作项（job_items），保存在业务数据库中；
+  中途崩溃后重新运行即可从未完成的工作项继续，多个worker进程可以并行处理
+- worker 用一条 UPDATE ... RETURNING 原子地领取工作项并获得租约（lease_expires_at）；
+  租约过期（worker崩溃或被杀）的工作项会被其他worker重新领取
+- 处理函数的写入与"标记完成"在同一个事务中提交，提交前检查租约仍属于自己，
+  租约已被他人接手时回滚，不会重复写入；处理函数应先完成读取与耗时的计算，最后写入
+- 失败的工作项按指数退避重试，超过 max_attempts 次后标记为失败；其他工作项照常处理，
+  只阻塞 stage 更大的工作项，没有可处理的工作项后任务标记为失败；`retry` 重新排队
+- stage 较大的工作项要等同一任务中 stage 较小的全部完成后才能领取（重建任务最后一步替换表）
+
+任务类型:
+    fix_content   用 hypothesis 表的内容修复 predefined_comparisons.hypothesis_content_en（每项50行）
+    translate     翻译 hypothesis_content_zh 为空的行（每项5行，翻译器由 LAZY_TRANSLATION_BACKEND 选择）
+    rebuild       按 pool_config.json 重建 predefined_comparisons：每个子主题池一项，最后一项替换表
+
+用法:
+    python job_queue.py enqueue fix_content [--chunk-size 50]
+    python job_queue.py enqueue rebuild [--config pool_config.json]
+    python job_queue.py run [--workers 4] [--job 1]
+    python job_queue.py status [--job 1]
+    python job_queue.py retry --job 1
+    python job_queue.py cancel --job 1
+    python job_queue.py --benchmark [--workers 1,2,4,8] [--items 200] [--delay 0.05]
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import socket
+import sqlite3
+import time
+
+from content_compression import decode_content
+from near_duplicates import detect_near_duplicates, load_clusters
+from pool_sampler import HYPOTHESIS_COLUMNS, POOL_CONFIG_PATH, load_pool_config, sample_pool
+
+# 配置数据库路径
+DB_PATH = "hypothesis_data.db"
+
+# 默认租约时长（秒）与最大尝试次数
+LEASE_SECONDS = 300
+MAX_ATTEMPTS = 5
+
+# 第n次失败后等待 RETRY_DELAY * 2^(n-1) 秒再重试
+RETRY_DELAY = 5
+
+# 没有可领取的工作项时的轮询间隔（秒）
+POLL_INTERVAL = 1
+
+# 等待写锁的时间（秒）
+BUSY_TIMEOUT = 30
+
+# 翻译请求之间的间隔（秒），避免API限流
+TRANSLATE_DELAY = 2
+
+_translator = {}
+
+
+def ensure_queue_tables(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS jobs (
+            job_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            kind TEXT NOT NULL,
+            params TEXT NOT NULL DEFAULT '{}',
+            status TEXT NOT NULL DEFAULT 'pending',
+            max_attempts INTEGER NOT NULL,
+            lease_seconds REAL NOT NULL,
+            created_at REAL NOT NULL,
+            started_at REAL,
+            finished_at REAL
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS job_items (
+            item_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            job_id INTEGER NOT NULL REFERENCES jobs(job_id),
+            stage INTEGER NOT NULL DEFAULT 0,
+            seq INTEGER NOT NULL,
+            payload TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'pending',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            available_at REAL NOT NULL DEFAULT 0,
+            lease_owner TEXT,
+            lease_expires_at REAL,
+            last_error TEXT,
+            result TEXT,
+            updated_at REAL,
+            UNIQUE(job_id, stage, seq)
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_job_items_status ON job_items(status, job_id, stage, seq)")
+    conn.commit()
+
+
+def _chunks(ids, size):
+    return [ids[i:i + size] for i in range(0, len(ids), size)]
+
+
+# ---------- fix_content ----------
+
+def plan_fix_content(conn, params):
+    ids = [row[0] for row in conn.execute("SELECT id FROM predefined_comparisons ORDER BY id")]
+    return [(0, chunk) for chunk in _chunks(ids, params['chunk_size'])]
+
+
+def handle_fix_content(conn, params, payload):
+    rows = conn.execute(f"""
+        SELECT p.id, h.hypothesis_content FROM predefined_comparisons p
+        JOIN hypothesis h ON h.id = p.original_hypothesis_id
+        WHERE p.id IN ({', '.join('?' for _ in payload)}) AND h.hypothesis_content IS NOT NULL
+    """, payload).fetchall()
+    conn.executemany("UPDATE predefined_comparisons SET hypothesis_content_en = ? WHERE id = ?",
+                     [(decode_content(conn, content), row_id) for row_id, content in rows])
+    return {'updated': len(rows), 'missing': len(payload) - len(rows)}
+
+
+# ---------- translate ----------
+
+def plan_translate(conn, params):
+    ids = [row[0] for row in conn.execute("""
+        SELECT id FROM predefined_comparisons
+        WHERE hypothesis_content_zh IS NULL OR hypothesis_content_zh = ''
+        ORDER BY topic_name, hypothesis_rank
+    """)]
+    return [(0, chunk) for chunk in _chunks(ids, params['chunk_size'])]
+
+
+def _translate(content):
+    """lazy_translation.py 中的翻译器（默认 Gemini）；每个进程只创建一次"""
+    if 'translate' not in _translator:
+        from lazy_translation import LAZY_TRANSLATION_BACKEND, TRANSLATORS
+        _translator['translate'] = TRANSLATORS[LAZY_TRANSLATION_BACKEND]()
+    return _translator['translate'](content)
+
+
+def handle_translate(conn, params, payload):
+    """
+    已有译文的行跳过（重试、重复领取时不会重复调用API）；
+    部分行翻译失败时照常完成工作项，已翻译的行随完成一起提交，失败的行ID记录在结果的 failed 中
+    （译文仍为空，再次 enqueue translate 或按需翻译时补齐）
+    """
+    rows = conn.execute(f"""
+        SELECT id, hypothesis_content_en FROM predefined_comparisons
+        WHERE id IN ({', '.join('?' for _ in payload)})
+          AND (hypothesis_content_zh IS NULL OR hypothesis_content_zh = '')
+    """, payload).fetchall()
+    translated, failed = [], []
+    for row_id, content_en in rows:
+        result = _translate(json.loads(content_en)) if content_en else None
+        if result:
+            translated.append((json.dumps(result, ensure_ascii=False, indent=2), row_id))
+        else:
+            failed.append(row_id)
+        time.sleep(params.get('delay', TRANSLATE_DELAY))
+    if rows and not translated:
+        # 整项都失败（如API不可用）：没有需要保留的写入，按工作项退避重试
+        raise ValueError(f"翻译失败: {failed}")
+    conn.executemany("UPDATE predefined_comparisons SET hypothesis_content_zh = ? WHERE id = ?", translated)
+    return {'translated': len(translated), 'skipped': len(payload) - len(rows), 'failed': failed}
+
+
+# ---------- rebuild ----------
+
+def ensure_rebuild_table(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS predefined_rebuild_selection (
+            job_id INTEGER NOT NULL,
+            pool_index INTEGER NOT NULL,
+            pool_seq INTEGER NOT NULL,
+            topic_name TEXT NOT NULL,
+            hypothesis_id INTEGER NOT NULL,
+            PRIMARY KEY (job_id, pool_index, pool_seq)
+        )
+    """)
+
+
+def plan_rebuild(conn, params):
+    """检测近似重复并保存配置快照；每个子主题池一项，最后一项（stage 1）替换表"""
+    detect_near_duplicates(conn, verbose=False)
+    ensure_rebuild_table(conn)
+    conn.commit()
+    params['config'] = load_pool_config(params.get('config_path', POOL_CONFIG_PATH))
+    return [(0, {'pool': i}) for i in range(len(params['config']['pools']))] + [(1, {'finalize': True})]
+
+
+def handle_rebuild(conn, params, payload, job_id):
+    config = params['config']
+    if payload.get('finalize'):
+        return finalize_rebuild(conn, job_id)
+
+    pool = config['pools'][payload['pool']]
+    selected, scanned = sample_pool(conn, pool, config, load_clusters(conn))
+    ensure_rebuild_table(conn)
+    conn.execute("DELETE FROM predefined_rebuild_selection WHERE job_id = ? AND pool_index = ?",
+                 (job_id, payload['pool']))
+    conn.executemany("""
+        INSERT INTO predefined_rebuild_selection (job_id, pool_index, pool_seq, topic_name, hypothesis_id)
+        VALUES (?, ?, ?, ?, ?)
+    """, [(job_id, payload['pool'], seq, pool['topic_name'], row[0]) for seq, row in enumerate(selected)])
+    return {'topic_name': pool['topic_name'], 'sub_topic': pool['sub_topic'], 'scanned': scanned,
+            'selected': len(selected)}
+
+
+def finalize_rebuild(conn, job_id):
+    """按池的顺序为每个主题编号，在一个事务中替换 predefined_comparisons"""
+    from rebuild_predefined_comparisons import create_predefined_table, insert_predefined_row
+
+    rows = conn.execute(f"""
+        SELECT s.topic_name, {', '.join('h.' + column for column in HYPOTHESIS_COLUMNS)}
+        FROM predefined_rebuild_selection s JOIN hypothesis h ON h.id = s.hypothesis_id
+        WHERE s.job_id = ?
+        ORDER BY s.topic_name, s.pool_index, s.pool_seq
+    """, (job_id,)).fetchall()
+    # 显式开始事务：DDL 不会自动开始事务，替换表需要与写入一起提交
+    conn.execute("BEGIN IMMEDIATE")
+    conn.execute("DROP TABLE IF EXISTS predefined_comparisons")
+    create_predefined_table(conn.cursor())
+    ranks = {}
+    for row in rows:
+        ranks[row[0]] = ranks.get(row[0], 0) + 1
+        insert_predefined_row(conn, row[0], ranks[row[0]], row[1:])
+    conn.execute("DELETE FROM predefined_rebuild_selection WHERE job_id = ?", (job_id,))
+    return {'inserted': len(rows), 'topics': ranks}
+
+
+# ---------- benchmark ----------
+
+def plan_sleep(conn, params):
+    return [(0, [i]) for i in range(params['items'])]
+
+
+def handle_sleep(conn, params, payload):
+    """模拟调用外部API：等待 delay 秒"""
+    time.sleep(params['delay'])
+    return {'pid': os.getpid()}
+
+
+# 任务类型 -> (生成工作项, 处理一个工作项, 默认每项行数)
+JOB_KINDS = {
+    'fix_content': (plan_fix_content, handle_fix_content, 50),
+    'translate': (plan_translate, handle_translate, 5),
+    'rebuild': (plan_rebuild, handle_rebuild, None),
+    'sleep': (plan_sleep, handle_sleep, None),
+}
+
+
+def enqueue_job(conn, kind, params=None, chunk_size=None, max_attempts=MAX_ATTEMPTS, lease_seconds=LEASE_SECONDS):
+    """生成任务与全部工作项，返回 (job_id, 工作项数)"""
+    ensure_queue_tables(conn)
+    plan, _, default_chunk = JOB_KINDS[kind]
+    params = dict(params or {}, chunk_size=chunk_size or default_chunk)
+    items = plan(conn, params)
+    with conn:
+        job_id = conn.execute("""
+            INSERT INTO jobs (kind, params, max_attempts, lease_seconds, created_at) VALUES (?, ?, ?, ?, ?)
+        """, (kind, json.dumps(params, ensure_ascii=False), max_attempts, lease_seconds, time.time())).lastrowid
+        conn.executemany("INSERT INTO job_items (job_id, stage, seq, payload) VALUES (?, ?, ?, ?)",
+                         [(job_id, stage, seq, json.dumps(payload)) for seq, (stage, payload) in enumerate(items)])
+        refresh_job(conn, job_id)
+    return job_id, len(items)
+
+
+def claim_item(conn, owner, job_id=None, now=None):
+    """领取一个工作项（包括租约已过期的），返回 (item_id, job_id, payload, attempts)；没有时返回None"""
+    now = time.time() if now is None else now
+    with conn:
+        # 租约过期且已用完尝试次数的工作项标记为失败
+        expired = conn.execute("""
+            UPDATE job_items SET status = 'failed', lease_owner = NULL, updated_at = ?,
+                   last_error = COALESCE(last_error, 'lease expired')
+            WHERE status = 'leased' AND lease_expires_at < ?
+              AND attempts >= (SELECT max_attempts FROM jobs WHERE jobs.job_id = job_items.job_id)
+            RETURNING job_id
+        """, (now, now)).fetchall()
+        for failed_job in {row[0] for row in expired}:
+            refresh_job(conn, failed_job)
+
+        row = conn.execute("""
+            UPDATE job_items SET status = 'leased', lease_owner = :owner, attempts = attempts + 1, updated_at = :now,
+                   lease_expires_at = :now + (SELECT lease_seconds FROM jobs WHERE jobs.job_id = job_items.job_id)
+            WHERE item_id = (
+                SELECT i.item_id FROM job_items i JOIN jobs j ON j.job_id = i.job_id
+                WHERE j.status IN ('pending', 'running')
+                  AND (i.status = 'pending' OR (i.status = 'leased' AND i.lease_expires_at < :now))
+                  AND i.available_at <= :now
+                  AND (:job_id IS NULL OR i.job_id = :job_id)
+                  AND NOT EXISTS (SELECT 1 FROM job_items o
+                                  WHERE o.job_id = i.job_id AND o.stage < i.stage AND o.status != 'done')
+                ORDER BY i.job_id, i.stage, i.seq
+                LIMIT 1
+            )
+            RETURNING item_id, job_id, payload, attempts
+        """, {'owner': owner, 'now': now, 'job_id': job_id}).fetchone()
+        if row:
+            conn.execute("UPDATE jobs SET status = 'running', started_at = COALESCE(started_at, ?) "
+                         "WHERE job_id = ? AND status = 'pending'", (now, row[1]))
+    return (row[0], row[1], json.loads(row[2]), row[3]) if row else None
+
+
+def complete_item(conn, item_id, job_id, owner, result):
+    """与处理函数的写入一起提交；租约已被他人接手时回滚并返回False"""
+    updated = conn.execute("""
+        UPDATE job_items SET status = 'done', result = ?, lease_owner = NULL, lease_expires_at = NULL, updated_at = ?
+        WHERE item_id = ? AND lease_owner = ? AND status = 'leased'
+    """, (json.dumps(result, ensure_ascii=False), time.time(), item_id, owner)).rowcount
+    if updated != 1:
+        conn.rollback()
+        return False
+    refresh_job(conn, job_id)
+    conn.commit()
+    return True
+
+
+def fail_item(conn, item_id, job_id, owner, error):
+    """回滚处理函数的写入；未用完尝试次数时退避后重新排队"""
+    conn.rollback()
+    now = time.time()
+    with conn:
+        conn.execute("""
+            UPDATE job_items SET
+                status = CASE WHEN attempts >= (SELECT max_attempts FROM jobs WHERE jobs.job_id = job_items.job_id)
+                              THEN 'failed' ELSE 'pending' END,
+                available_at = ? + ? * (1 << (attempts - 1)),
+                last_error = ?, lease_owner = NULL, lease_expires_at = NULL, updated_at = ?
+            WHERE item_id = ? AND lease_owner = ?
+        """, (now, RETRY_DELAY, error[:1000], now, item_id, owner))
+        refresh_job(conn, job_id)
+
+
+def refresh_job(conn, job_id):
+    """
+    按工作项状态更新任务状态（已取消的任务不变）
+    有工作项失败时，其他工作项照常处理，只有 stage 更大的工作项（重建的替换表）被阻塞；
+    没有可处理的工作项后任务才标记为失败
+    """
+    counts = dict(conn.execute("SELECT status, COUNT(*) FROM job_items WHERE job_id = ? GROUP BY status", (job_id,)))
+    runnable = counts.get('failed') and conn.execute("""
+        SELECT 1 FROM job_items i
+        WHERE i.job_id = ? AND (i.status = 'leased' OR (i.status = 'pending' AND NOT EXISTS (
+            SELECT 1 FROM job_items o WHERE o.job_id = i.job_id AND o.stage < i.stage AND o.status = 'failed')))
+        LIMIT 1
+    """, (job_id,)).fetchone()
+    if counts.get('failed') and not runnable:
+        status = 'failed'
+    elif counts.get('done', 0) == sum(counts.values()):
+        status = 'done'
+    elif counts.get('done') or counts.get('leased') or counts.get('failed'):
+        status = 'running'
+    else:
+        status = 'pending'
+    conn.execute("""
+        UPDATE jobs SET status = ?, finished_at = CASE WHEN ? IN ('done', 'failed') THEN ? END
+        WHERE job_id = ? AND status != 'cancelled'
+    """, (status, status, time.time(), job_id))
+
+
+def has_open_items(conn, job_id=None):
+    """是否还有未结束的工作项（包括其他worker持有租约的）"""
+    return conn.execute("""
+        SELECT 1 FROM job_items i JOIN jobs j ON j.job_id = i.job_id
+        WHERE j.status IN ('pending', 'running') AND i.status IN ('pending', 'leased')
+          AND (? IS NULL OR i.job_id = ?)
+        LIMIT 1
+    """, (job_id, job_id)).fetchone() is not None
+
+
+def run_worker(db_path=DB_PATH, owner=None, job_id=None, poll_interval=POLL_INTERVAL):
+    """领取并处理工作项，直到没有未结束的工作项为止，返回处理的工作项数"""
+    owner = owner or f"{socket.gethostname()}:{os.getpid()}"
+    conn = sqlite3.connect(db_path, timeout=BUSY_TIMEOUT)
+    ensure_queue_tables(conn)
+    jobs = {}
+    processed = 0
+    try:
+        while True:
+            item = claim_item(conn, owner, job_id)
+            if item is None:
+                if not has_open_items(conn, job_id):
+                    break
+                # 其他worker持有租约或在退避中：等待完成、过期或到期
+                time.sleep(poll_interval)
+                continue
+
+            item_id, item_job, payload, attempts = item
+            if item_job not in jobs:
+                kind, params = conn.execute("SELECT kind, params FROM jobs WHERE job_id = ?", (item_job,)).fetchone()
+                jobs[item_job] = (kind, json.loads(params))
+            kind, params = jobs[item_job]
+            _, handle, _ = JOB_KINDS[kind]
+            try:
+                if kind == 'rebuild':
+                    result = handle(conn, params, payload, item_job)
+                else:
+                    result = handle(conn, params, payload)
+            except Exception as e:
+                fail_item(conn, item_id, item_job, owner, f"{type(e).__name__}: {e}")
+                print(f"⚠️  [{owner}] 任务 {item_job} 工作项 {item_id} 第 {attempts} 次失败: {e}")
+                continue
+            if complete_item(conn, item_id, item_job, owner, result):
+                processed += 1
+            else:
+                print(f"⚠️  [{owner}] 工作项 {item_id} 的租约已过期，结果已丢弃")
+    finally:
+        conn.close()
+    return processed
+
+
+def run_workers(db_path, workers, job_id=None):
+    """启动 workers 个进程处理队列，全部结束后返回"""
+    if workers <= 1:
+        return run_worker(db_path, job_id=job_id)
+    processes = [multiprocessing.Process(target=run_worker, args=(db_path,), kwargs={'job_id': job_id})
+                 for _ in range(workers)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+
+
+def job_status(conn, job_id=None):
+    """各任务的状态、工作项计数、进度与吞吐量"""
+    ensure_queue_tables(conn)
+    jobs = []
+    for row in conn.execute("""
+        SELECT job_id, kind, status, created_at, started_at, finished_at FROM jobs
+        WHERE ? IS NULL OR job_id = ? ORDER BY job_id
+    """, (job_id, job_id)).fetchall():
+        counts = dict(conn.execute("SELECT status, COUNT(*) FROM job_items WHERE job_id = ? GROUP BY status",
+                                   (row[0],)))
+        total = sum(counts.values())
+        elapsed = ((row[5] or time.time()) - row[4]) if row[4] else None
+        errors = conn.execute("""
+            SELECT item_id, attempts, last_error FROM job_items
+            WHERE job_id = ? AND last_error IS NOT NULL AND status != 'done' ORDER BY updated_at DESC LIMIT 5
+        """, (row[0],)).fetchall()
+        # 完成的工作项中未能处理的行（如翻译失败的行）
+        failed_rows = conn.execute("""
+            SELECT COALESCE(SUM(json_array_length(result, '$.failed')), 0) FROM job_items
+            WHERE job_id = ? AND status = 'done' AND json_type(result, '$.failed') = 'array'
+        """, (row[0],)).fetchone()[0]
+        jobs.append({
+            'job_id': row[0], 'kind': row[1], 'status': row[2], 'items': total, 'counts': counts,
+            'failed_rows': failed_rows,
+            'progress': round(counts.get('done', 0) / total, 4) if total else None,
+            'elapsed_seconds': round(elapsed, 2) if elapsed is not None else None,
+            'items_per_second': round(counts.get('done', 0) / elapsed, 2) if elapsed else None,
+            'errors': [{'item_id': e[0], 'attempts': e[1], 'error': e[2]} for e in errors],
+        })
+    return jobs
+
+
+def print_status(jobs):
+    if not jobs:
+        print("ℹ️  没有任务")
+    for job in jobs:
+        counts = ', '.join(f"{status} {count}" for status, count in sorted(job['counts'].items()))
+        print(f"📋 任务 {job['job_id']} {job['kind']:<12}{job['status']:<10}{job['items']} 项（{counts}）"
+              + (f"，{job['items_per_second']} 项/秒" if job['items_per_second'] else ""))
+        if job['failed_rows']:
+            print(f"   ⚠️  {job['failed_rows']} 行未能处理，重新 enqueue {job['kind']} 可补齐")
+        for error in job['errors']:
+            print(f"   ⚠️  工作项 {error['item_id']}（第 {error['attempts']} 次）: {error['error']}")
+
+
+def retry_job(conn, job_id):
+    """失败的工作项重新排队（尝试次数清零）"""
+    with conn:
+        count = conn.execute("""
+            UPDATE job_items SET status = 'pending', attempts = 0, available_at = 0, updated_at = ?
+            WHERE job_id = ? AND status = 'failed'
+        """, (time.time(), job_id)).rowcount
+        conn.execute("UPDATE jobs SET status = 'running', finished_at = NULL WHERE job_id = ?", (job_id,))
+        refresh_job(conn, job_id)
+    return count
+
+
+def cancel_job(conn, job_id):
+    """取消任务：未领取的工作项不再处理，正在处理的工作项完成后结束"""
+    with conn:
+        conn.execute("UPDATE jobs SET status = 'cancelled', finished_at = ? WHERE job_id = ?", (time.time(), job_id))
+
+
+def benchmark(worker_counts, items, delay):
+    """每项等待 delay 秒（模拟翻译API的延迟），比较不同worker数的吞吐量，并检查每项只完成一次"""
+    import tempfile
+
+    print(f"📊 {items} 项，每项 {delay * 1000:.0f} ms\n")
+    print(f"{'workers':>8}{'耗时s':>10}{'项/秒':>10}{'加速比':>10}{'重复领取':>10}")
+    baseline = None
+    for workers in worker_counts:
+        with tempfile.TemporaryDirectory() as tmp:
+            db_path = os.path.join(tmp, 'queue.db')
+            conn = sqlite3.connect(db_path)
+            job_id, _ = enqueue_job(conn, 'sleep', {'items': items, 'delay': delay})
+            start = time.perf_counter()
+            run_workers(db_path, workers, job_id)
+            elapsed = time.perf_counter() - start
+            done, extra_attempts = conn.execute(
+                "SELECT SUM(status = 'done'), SUM(attempts - 1) FROM job_items WHERE job_id = ?", (job_id,)).fetchone()
+            conn.close()
+        baseline = baseline or elapsed
+        print(f"{workers:>8}{elapsed:>10.2f}{done / elapsed:>10.1f}{baseline / elapsed:>10.2f}{extra_attempts:>10}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='基于租约的持久化任务队列')
+    parser.add_argument('command', nargs='?', choices=['enqueue', 'run', 'status', 'retry', 'cancel'],
+                        default='status')
+    parser.add_argument('kind', nargs='?', choices=[kind for kind in JOB_KINDS if kind != 'sleep'],
+                        help='enqueue 的任务类型')
+    parser.add_argument('--db', default=DB_PATH, help='数据库路径')
+    parser.add_argument('--job', type=int, help='任务ID')
+    parser.add_argument('--workers', default='1', help='worker进程数（--benchmark 时为逗号分隔的列表）')
+    parser.add_argument('--chunk-size', type=int, help='每个工作项的行数')
+    parser.add_argument('--config', default=POOL_CONFIG_PATH, help='rebuild 使用的抽样配置')
+    parser.add_argument('--delay', type=float, help='translate：请求间隔秒数；--benchmark：每项耗时')
+    parser.add_argument('--max-attempts', type=int, default=MAX_ATTEMPTS, help='最大尝试次数')
+    parser.add_argument('--lease', type=float, default=LEASE_SECONDS, help='租约时长（秒）')
+    parser.add_argument('--benchmark', action='store_true', help='比较不同worker数的吞吐量')
+    parser.add_argument('--items', type=int, default=200, help='性能测试的工作项数')
+    args = parser.parse_args()
+
+    if args.benchmark:
+        benchmark([int(n) for n in args.workers.split(',')], args.items, 0.05 if args.delay is None else args.delay)
+    elif args.command == 'run':
+        run_workers(args.db, int(args.workers), args.job)
+        print_status(job_status(sqlite3.connect(args.db), args.job))
+    else:
+        conn = sqlite3.connect(args.db, timeout=BUSY_TIMEOUT)
+        ensure_queue_tables(conn)
+        if args.command == 'enqueue':
+            if not args.kind:
+                parser.error('enqueue 需要任务类型')
+            params = {'config_path': args.config} if args.kind == 'rebuild' else {}
+            if args.kind == 'translate' and args.delay is not None:
+                params['delay'] = args.delay
+            job_id, count = enqueue_job(conn, args.kind, params, args.chunk_size, args.max_attempts, args.lease)
+            print(f"✅ 已创建任务 {job_id}（{args.kind}，{count} 项），运行: python job_queue.py run --workers 4")
+        elif args.command in ('retry', 'cancel'):
+            if args.job is None:
+                parser.error(f'{args.command} 需要 --job')
+            if args.command == 'retry':
+                print(f"🔁 {retry_job(conn, args.job)} 个失败的工作项已重新排队")
+            else:
+                cancel_job(conn, args.job)
+                print(f"⏹️  任务 {args.job} 已取消")
+        else:
+            print_status(job_status(conn, args.job))
+        conn.close()
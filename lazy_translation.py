@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+按需翻译（中文内容缺失时先显示英文）
+
+- 请求中文而 predefined_comparisons.hypothesis_content_zh 为空时，app.py 立即返回英文内容并提交后台翻译；
+  译文写回数据库，之后的请求直接读到中文（行缓存不保存英文回退的行）
+- 单飞去重：同一进程内同一假设只有一个翻译任务；多个worker进程之间用 lazy_translations 表中的
+  认领记录去重（认领超过 CLAIM_SECONDS 秒仍未完成时视为失效，可以重新认领）
+- 翻译失败的假设在 FAILURE_COOLDOWN 秒内不再重试
+- 翻译器可替换：gemini（translate_now.py，需要 google-genai 与API key）或 stub（本地测试用，不调用API）
+
+环境变量:
+    LAZY_TRANSLATION_BACKEND=gemini   翻译器：gemini / stub / off
+    LAZY_TRANSLATION_WORKERS=2        每个进程的后台翻译线程数
+
+用法:
+    python lazy_translation.py [--backend stub] [--limit 10]   翻译缺少中文的假设（同步）
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+LAZY_TRANSLATION_BACKEND = os.environ.get('LAZY_TRANSLATION_BACKEND', 'gemini')
+LAZY_TRANSLATION_WORKERS = int(os.environ.get('LAZY_TRANSLATION_WORKERS', 2))
+
+# 配置数据库路径
+DB_PATH = "hypothesis_data.db"
+
+# 认领记录的有效期（秒）：超过后其他进程可以重新翻译
+CLAIM_SECONDS = 300
+
+# 翻译失败后多久再重试（秒）
+FAILURE_COOLDOWN = 600
+
+# 需要翻译的字段
+CONTENT_FIELDS = ('title', 'Problem_Statement', 'Motivation', 'Proposed_Method',
+                  'Step_by_Step_Experiment_Plan', 'Test_Case_Examples', 'Fallback_Plan')
+
+
+def stub_translator():
+    """本地测试用：在每个字段前加 [zh]，不调用API"""
+    def translate(content):
+        return {field: f"[zh] {content.get(field, '')}" for field in CONTENT_FIELDS}
+    return translate
+
+
+def gemini_translator():
+    """translate_now.py 中的 Gemini 翻译；缺少 google-genai 或API key时抛出 RuntimeError"""
+    try:
+        from translate_now import load_gemini_key, translate_hypothesis_content
+    except ImportError as e:
+        raise RuntimeError(f"无法加载Gemini翻译（需要 google-genai）: {e}")
+    api_key = load_gemini_key()
+    if not api_key:
+        raise RuntimeError("无法加载Gemini API key")
+    return lambda content: translate_hypothesis_content(content, api_key)
+
+
+# 翻译器名 -> 工厂函数；翻译函数接收英文内容字典，返回中文内容字典，失败时返回None
+TRANSLATORS = {
+    'stub': stub_translator,
+    'gemini': gemini_translator,
+}
+
+
+def ensure_claims_table(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS lazy_translations (
+            predefined_id INTEGER PRIMARY KEY,
+            status TEXT NOT NULL,
+            claimed_by TEXT NOT NULL,
+            updated_at REAL NOT NULL,
+            error TEXT
+        )
+    """)
+    conn.commit()
+
+
+def claim(conn, predefined_id, owner, now=None):
+    """认领一个假设的翻译；其他进程正在翻译或最近失败时返回False"""
+    now = time.time() if now is None else now
+    with conn:
+        return conn.execute("""
+            INSERT INTO lazy_translations (predefined_id, status, claimed_by, updated_at)
+            VALUES (?, 'running', ?, ?)
+            ON CONFLICT(predefined_id) DO UPDATE SET
+                status = 'running', claimed_by = excluded.claimed_by, updated_at = excluded.updated_at, error = NULL
+            WHERE (lazy_translations.status = 'running' AND lazy_translations.updated_at < ?)
+               OR (lazy_translations.status = 'failed' AND lazy_translations.updated_at < ?)
+        """, (predefined_id, owner, now, now - CLAIM_SECONDS, now - FAILURE_COOLDOWN)).rowcount == 1
+
+
+def translate_row(conn, predefined_id, translate, owner):
+    """翻译一行并写回（只在中文仍为空时写入），返回是否写入了译文"""
+    row = conn.execute("""
+        SELECT hypothesis_content_en, hypothesis_content_zh FROM predefined_comparisons WHERE id = ?
+    """, (predefined_id,)).fetchone()
+    if not row or row[1] or not row[0]:
+        return False
+    if not claim(conn, predefined_id, owner):
+        return False
+
+    try:
+        result = translate(json.loads(row[0]))
+        error = None if result else "翻译器没有返回结果"
+    except Exception as e:
+        result, error = None, f"{type(e).__name__}: {e}"
+    with conn:
+        if result:
+            conn.execute("""
+                UPDATE predefined_comparisons SET hypothesis_content_zh = ?
+                WHERE id = ? AND (hypothesis_content_zh IS NULL OR hypothesis_content_zh = '')
+            """, (json.dumps(result, ensure_ascii=False, indent=2), predefined_id))
+            conn.execute("DELETE FROM lazy_translations WHERE predefined_id = ?", (predefined_id,))
+        else:
+            conn.execute("""
+                UPDATE lazy_translations SET status = 'failed', updated_at = ?, error = ?
+                WHERE predefined_id = ? AND claimed_by = ?
+            """, (time.time(), error, predefined_id, owner))
+    if error:
+        print(f"⚠️  假设 {predefined_id} 翻译失败: {error}")
+    return bool(result)
+
+
+class TranslationService:
+    """后台翻译线程池；同一进程内同一假设只提交一次"""
+
+    def __init__(self, db_path, translate, workers=LAZY_TRANSLATION_WORKERS):
+        self.db_path = db_path
+        self.translate = translate
+        self.owner = f"{os.getpid()}:{id(self)}"
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='lazy-translation')
+        self.inflight = {}
+        self.lock = threading.Lock()
+        conn = sqlite3.connect(db_path)
+        ensure_claims_table(conn)
+        conn.close()
+
+    def request(self, predefined_id):
+        """提交翻译（不等待）；已在翻译中时返回已有的 Future"""
+        with self.lock:
+            future = self.inflight.get(predefined_id)
+            if future is None:
+                future = self.executor.submit(self._run, predefined_id)
+                self.inflight[predefined_id] = future
+            return future
+
+    def _run(self, predefined_id):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            return translate_row(conn, predefined_id, self.translate, self.owner)
+        except sqlite3.Error as e:
+            print(f"⚠️  假设 {predefined_id} 的译文写入失败: {e}")
+            return False
+        finally:
+            conn.close()
+            with self.lock:
+                self.inflight.pop(predefined_id, None)
+
+
+def create_service(db_path=DB_PATH, backend=LAZY_TRANSLATION_BACKEND):
+    """创建后台翻译服务；关闭或翻译器不可用时返回None（仍显示英文）"""
+    if backend == 'off':
+        return None
+    if backend not in TRANSLATORS:
+        raise ValueError(f"未知的翻译器: {backend}（可选: {', '.join(TRANSLATORS)}, off）")
+    try:
+        translate = TRANSLATORS[backend]()
+    except RuntimeError as e:
+        print(f"⚠️  按需翻译已关闭: {e}")
+        return None
+    return TranslationService(db_path, translate)
+
+
+def translate_missing(db_path=DB_PATH, backend='stub', limit=None):
+    """同步翻译缺少中文的假设，返回写入的行数"""
+    translate = TRANSLATORS[backend]()
+    conn = sqlite3.connect(db_path, timeout=30)
+    ensure_claims_table(conn)
+    ids = [row[0] for row in conn.execute("""
+        SELECT id FROM predefined_comparisons
+        WHERE hypothesis_content_zh IS NULL OR hypothesis_content_zh = ''
+        ORDER BY topic_name, hypothesis_rank
+    """)]
+    translated = sum(translate_row(conn, row_id, translate, f"cli:{os.getpid()}") for row_id in ids[:limit])
+    conn.close()
+    return translated
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='翻译缺少中文的假设')
+    parser.add_argument('--db', default=DB_PATH, help='数据库路径')
+    parser.add_argument('--backend', default=LAZY_TRANSLATION_BACKEND, choices=list(TRANSLATORS), help='翻译器')
+    parser.add_argument('--limit', type=int, help='最多翻译的行数')
+    args = parser.parse_args()
+
+    print(f"✅ 已翻译 {translate_missing(args.db, args.backend, args.limit)} 个假设")
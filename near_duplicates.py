@@ -0,0 +1,295 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+假设近似重复检测（MinHash + LSH）
+
+- 每条假设取 title、Problem_Statement、Motivation、Proposed_Method 文本，
+  切分为词级 shingle（连续3个词），crc32 哈希后计算 MinHash 签名（NumPy向量化）
+- LSH：签名分为若干 band，同一 band 完全相同的假设成为候选对，
+  候选对的签名相似度超过阈值才算近似重复，用并查集合并为簇
+- 整张 hypothesis 表只需一次遍历，不做两两比较
+- 结果写入 hypothesis_duplicates 表；构建主题假设池时每个簇最多选一个假设
+
+用法:
+    python near_duplicates.py [--db hypothesis_data.db] [--threshold 0.8]
+    python near_duplicates.py --benchmark 20000
+"""
+
+import argparse
+import json
+import random
+import re
+import sqlite3
+import time
+import zlib
+from collections import defaultdict
+
+import numpy as np
+
+from content_compression import decode_content
+
+# 配置数据库路径
+DB_PATH = "hypothesis_data.db"
+
+# 参与比较的内容字段
+TEXT_FIELDS = ['title', 'Problem_Statement', 'Motivation', 'Proposed_Method']
+
+# shingle 长度（词数）
+SHINGLE_SIZE = 3
+
+# MinHash 签名长度 = BANDS × ROWS_PER_BAND；Jaccard相似度约为 (1/BANDS)^(1/ROWS_PER_BAND) 时成为候选的概率为50%
+BANDS = 16
+ROWS_PER_BAND = 8
+NUM_PERMUTATIONS = BANDS * ROWS_PER_BAND
+
+# 签名相似度（Jaccard估计值）达到该阈值才视为近似重复
+SIMILARITY_THRESHOLD = 0.8
+
+# 超过该大小的LSH桶只与桶内第一个文档配对
+MAX_BUCKET_SIZE = 100
+
+# 每批计算的 shingle 数，控制内存
+HASH_BATCH_SIZE = 20000
+
+WORD_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def hypothesis_text(content):
+    """从假设JSON中取出参与比较的文本"""
+    try:
+        data = json.loads(content) if content else {}
+    except (TypeError, ValueError):
+        return str(content or '')
+    if not isinstance(data, dict):
+        return str(data)
+    return ' '.join(str(data.get(field) or '') for field in TEXT_FIELDS)
+
+
+def shingles(text, size=SHINGLE_SIZE):
+    """词级shingle的crc32哈希集合（uint32数组）"""
+    words = WORD_RE.findall(text.lower())
+    if len(words) < size:
+        grams = [' '.join(words)] if words else []
+    else:
+        grams = [' '.join(words[i:i + size]) for i in range(len(words) - size + 1)]
+    return np.unique(np.array([zlib.crc32(g.encode('utf-8')) for g in grams], dtype=np.uint64))
+
+
+def hash_parameters(num_permutations=NUM_PERMUTATIONS, seed=1):
+    """乘移位哈希 h(x) = ((a·x + b) mod 2^64) >> 32 的参数，a为奇数"""
+    rng = np.random.default_rng(seed)
+    a = rng.integers(1, 2 ** 63, num_permutations, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+    b = rng.integers(0, 2 ** 63, num_permutations, dtype=np.uint64)
+    return a, b
+
+
+def minhash_signatures(shingle_sets, num_permutations=NUM_PERMUTATIONS, seed=1):
+    """
+    计算所有文档的 MinHash 签名（文档数 × num_permutations，uint32）
+    所有shingle拼接后分批哈希，再用 np.minimum.reduceat 按文档取最小值
+    """
+    a, b = hash_parameters(num_permutations, seed)
+    signatures = np.full((len(shingle_sets), num_permutations), np.iinfo(np.uint32).max, dtype=np.uint32)
+    lengths = np.array([len(s) for s in shingle_sets], dtype=np.int64)
+    non_empty = np.flatnonzero(lengths)
+
+    start = 0
+    while start < len(non_empty):
+        # 按文档切分批次，保证一个文档的shingle在同一批
+        cumulative = np.cumsum(lengths[non_empty[start:]])
+        end = start + max(1, int(np.searchsorted(cumulative, HASH_BATCH_SIZE, side='right')))
+        docs = non_empty[start:end]
+        values = np.concatenate([shingle_sets[d] for d in docs])
+        # 原地运算，避免为每一步分配 shingle数×签名长度 的临时数组
+        hashed = np.multiply(values[:, None], a[None, :])
+        hashed += b
+        hashed >>= np.uint64(32)
+        offsets = np.concatenate([[0], np.cumsum(lengths[docs])[:-1]])
+        signatures[docs] = np.minimum.reduceat(hashed, offsets, axis=0).astype(np.uint32)
+        start = end
+    return signatures
+
+
+def lsh_candidate_pairs(signatures, docs, bands=BANDS, rows_per_band=ROWS_PER_BAND):
+    """
+    同一band签名完全相同的文档成为候选对
+    过大的桶（大量完全相同的模板文本）只与桶内第一个文档配对，避免候选对数量平方增长
+    """
+    candidates = set()
+    for band in range(bands):
+        buckets = defaultdict(list)
+        band_values = np.ascontiguousarray(signatures[docs, band * rows_per_band:(band + 1) * rows_per_band])
+        for doc, key in zip(docs, band_values):
+            buckets[key.tobytes()].append(int(doc))
+        for bucket in buckets.values():
+            if len(bucket) > MAX_BUCKET_SIZE:
+                candidates.update((bucket[0], other) for other in bucket[1:])
+            elif len(bucket) > 1:
+                candidates.update((bucket[i], bucket[j])
+                                  for i in range(len(bucket)) for j in range(i + 1, len(bucket)))
+    return candidates
+
+
+def find_clusters(signatures, empty, threshold=SIMILARITY_THRESHOLD, bands=BANDS, rows_per_band=ROWS_PER_BAND):
+    """
+    候选对中签名相似度不低于阈值的合并为簇（并查集）；没有文本的文档不参与
+    返回 ({文档: 根文档}, {(文档, 文档): 相似度})
+    """
+    parent = list(range(len(signatures)))
+
+    def find(x):
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    similarities = {}
+    for i, j in lsh_candidate_pairs(signatures, np.flatnonzero(~empty), bands, rows_per_band):
+        similarity = float(np.mean(signatures[i] == signatures[j]))
+        if similarity >= threshold:
+            similarities[(i, j)] = similarity
+            parent[find(i)] = find(j)
+    return {doc: find(doc) for doc in range(len(signatures))}, similarities
+
+
+def create_duplicates_table(conn):
+    """创建近似重复簇表：只记录属于某个簇（至少2条假设）的假设"""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS hypothesis_duplicates (
+            hypothesis_id INTEGER PRIMARY KEY,
+            cluster_id INTEGER NOT NULL,
+            representative_id INTEGER NOT NULL,
+            max_similarity REAL NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_hypothesis_duplicates_cluster ON hypothesis_duplicates(cluster_id)")
+    conn.commit()
+
+
+def detect_near_duplicates(conn, threshold=SIMILARITY_THRESHOLD, verbose=True):
+    """对整张 hypothesis 表检测近似重复并写入 hypothesis_duplicates，返回簇列表"""
+    start = time.perf_counter()
+    rows = conn.execute("SELECT id, hypothesis_content, overall_winner_score FROM hypothesis ORDER BY id").fetchall()
+    ids = [row[0] for row in rows]
+    shingle_sets = [shingles(hypothesis_text(decode_content(conn, row[1]))) for row in rows]
+    signatures = minhash_signatures(shingle_sets)
+    empty = np.array([len(s) == 0 for s in shingle_sets])
+    roots, similarities = find_clusters(signatures, empty, threshold)
+
+    members = defaultdict(list)
+    for doc, root in roots.items():
+        members[root].append(doc)
+    best_similarity = defaultdict(float)
+    for (i, j), similarity in similarities.items():
+        best_similarity[i] = max(best_similarity[i], similarity)
+        best_similarity[j] = max(best_similarity[j], similarity)
+
+    clusters = []
+    records = []
+    for docs in members.values():
+        if len(docs) < 2:
+            continue
+        # 代表：自动评分最高的假设，其次ID最小
+        representative = min(docs, key=lambda d: (-(rows[d][2] or 0), ids[d]))
+        cluster_id = min(ids[d] for d in docs)
+        clusters.append({'cluster_id': cluster_id, 'representative_id': ids[representative],
+                         'hypothesis_ids': sorted(ids[d] for d in docs)})
+        for d in docs:
+            records.append((ids[d], cluster_id, ids[representative], best_similarity[d]))
+
+    create_duplicates_table(conn)
+    conn.execute("DELETE FROM hypothesis_duplicates")
+    conn.executemany("""
+        INSERT INTO hypothesis_duplicates (hypothesis_id, cluster_id, representative_id, max_similarity)
+        VALUES (?, ?, ?, ?)
+    """, records)
+    conn.commit()
+
+    if verbose:
+        print(f"🔍 {len(rows)} 条假设，发现 {len(clusters)} 个近似重复簇（{len(records)} 条假设），"
+              f"耗时 {time.perf_counter() - start:.2f}s")
+    return clusters
+
+
+def load_clusters(conn):
+    """{hypothesis_id: cluster_id}；尚未运行检测时返回空字典"""
+    try:
+        return dict(conn.execute("SELECT hypothesis_id, cluster_id FROM hypothesis_duplicates"))
+    except sqlite3.OperationalError:
+        return {}
+
+
+def sample_distinct(conn, rows, k, id_index=0, rng=random):
+    """
+    从候选行中随机选k个，每个近似重复簇最多选一个；
+    不重复的假设不足k个时才用簇内其他假设补足
+    """
+    clusters = load_clusters(conn)
+    shuffled = list(rows)
+    rng.shuffle(shuffled)
+
+    selected, skipped, used_clusters = [], [], set()
+    for row in shuffled:
+        cluster = clusters.get(row[id_index])
+        if cluster is not None and cluster in used_clusters:
+            skipped.append(row)
+            continue
+        if cluster is not None:
+            used_clusters.add(cluster)
+        selected.append(row)
+        if len(selected) == k:
+            return selected
+
+    if skipped and len(selected) < k:
+        print(f"   ⚠️  去重后只有 {len(selected)} 个不同的假设，用 {min(k - len(selected), len(skipped))} 个近似重复假设补足")
+    return selected + skipped[:k - len(selected)]
+
+
+def benchmark(num_docs, duplicate_rate=0.1, seed=0):
+    """随机生成文档（部分为轻微改写的副本），测试检测耗时与召回"""
+    rng = random.Random(seed)
+    vocabulary = [f'w{i}' for i in range(5000)]
+    texts, originals = [], {}
+    for d in range(num_docs):
+        if texts and rng.random() < duplicate_rate:
+            source = rng.randrange(len(texts))
+            words = texts[source].split()
+            for _ in range(max(1, len(words) // 50)):
+                words[rng.randrange(len(words))] = rng.choice(vocabulary)
+            originals[d] = source
+            texts.append(' '.join(words))
+        else:
+            texts.append(' '.join(rng.choice(vocabulary) for _ in range(200)))
+
+    start = time.perf_counter()
+    shingle_sets = [shingles(text) for text in texts]
+    shingle_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    signatures = minhash_signatures(shingle_sets)
+    signature_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    roots, _ = find_clusters(signatures, np.zeros(num_docs, dtype=bool))
+    lsh_seconds = time.perf_counter() - start
+
+    found = sum(1 for d, source in originals.items() if roots[d] == roots[source])
+    print(f"📊 {num_docs} 篇文档，{len(originals)} 篇为近似副本")
+    print(f"   shingle: {shingle_seconds:.2f}s  MinHash: {signature_seconds:.2f}s  LSH+验证: {lsh_seconds:.2f}s")
+    print(f"   召回: {found}/{len(originals)}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='假设近似重复检测（MinHash + LSH）')
+    parser.add_argument('--db', default=DB_PATH, help='数据库路径')
+    parser.add_argument('--threshold', type=float, default=SIMILARITY_THRESHOLD, help='Jaccard相似度阈值')
+    parser.add_argument('--benchmark', type=int, metavar='N', help='用N篇随机文档测试性能')
+    args = parser.parse_args()
+
+    if args.benchmark:
+        benchmark(args.benchmark)
+    else:
+        conn = sqlite3.connect(args.db)
+        clusters = detect_near_duplicates(conn, threshold=args.threshold)
+        for cluster in sorted(clusters, key=lambda c: -len(c['hypothesis_ids']))[:20]:
+            print(f"   簇 {cluster['cluster_id']}: {cluster['hypothesis_ids']}（保留 {cluster['representative_id']}）")
+        conn.close()
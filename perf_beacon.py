@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+真实用户性能数据（RUM beacon）
+
+- static/js/app.js 在页面中收集 Navigation Timing（TTFB、服务器耗时、DOMContentLoaded、load、
+  首次内容绘制、静态资源加载完成时间）以及提交评分的往返时间，
+  页面隐藏时用 navigator.sendBeacon 一次发送到 /api/perf-beacon
+- 页面的路由（端点名）与主题来自 base.html 中 <body> 的 data-route / data-topic，不记录URL参数与会话
+- 样本写入单独的SQLite文件（不使用业务数据库，避免与评分写入争抢写锁）；
+  每个IP有单独的令牌桶，超出时直接丢弃（beacon无法重试，也不影响评分接口的限流额度）
+- /admin/performance 按 路由 × 主题 × 指标 给出 p50 / p75 / p95 / p99
+
+环境变量:
+    PERF_BEACON_ENABLED=1          是否在页面中收集并接收数据
+    PERF_BEACON_SAMPLE_RATE=1      采样比例（0~1，按页面浏览）
+    PERF_BEACON_DB=perf_beacon.db  样本数据库文件
+    PERF_BEACON_RETENTION_DAYS=30  样本保留天数
+
+用法:
+    python perf_beacon.py [--db perf_beacon.db] [--days 7]
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import time
+
+import numpy as np
+from flask import jsonify, render_template, request
+
+from rate_limit import MemoryBuckets, client_ip
+
+PERF_BEACON_ENABLED = os.environ.get('PERF_BEACON_ENABLED', '1') == '1'
+PERF_BEACON_SAMPLE_RATE = float(os.environ.get('PERF_BEACON_SAMPLE_RATE', 1))
+PERF_BEACON_DB = os.environ.get('PERF_BEACON_DB', 'perf_beacon.db')
+PERF_BEACON_RETENTION_DAYS = float(os.environ.get('PERF_BEACON_RETENTION_DAYS', 30))
+
+# 接受的指标名（毫秒）
+METRICS = ('ttfb', 'server', 'dom_content_loaded', 'load', 'fcp', 'assets', 'submit_rtt')
+
+# 单个beacon的大小与样本数上限
+MAX_BEACON_BYTES = 8192
+MAX_SAMPLES_PER_BEACON = 50
+
+# 超出范围的数值（时钟异常、页面在后台挂起）丢弃
+MAX_VALUE_MS = 120000
+
+MAX_LABEL_LENGTH = 64
+
+# 每个IP每秒允许的beacon数与桶容量
+BEACON_IP_RATE = 1.0
+BEACON_IP_BURST = 30
+
+PERCENTILES = (50, 75, 95, 99)
+
+# 不收集管理页面（只关心专家感受到的延迟）
+EXCLUDED_ENDPOINT_PREFIXES = ('admin',)
+
+
+def connect(db_path=PERF_BEACON_DB):
+    conn = sqlite3.connect(db_path, timeout=1)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS perf_samples (
+            sample_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            received_at REAL NOT NULL,
+            route TEXT NOT NULL,
+            topic TEXT NOT NULL DEFAULT '',
+            metric TEXT NOT NULL,
+            value_ms REAL NOT NULL
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_perf_samples_received ON perf_samples(received_at)")
+    return conn
+
+
+def parse_beacon(body):
+    """解析beacon正文，返回有效样本 [(route, topic, metric, value_ms)]；格式不对时返回空列表"""
+    try:
+        data = json.loads(body)
+        route = str(data.get('route') or '')[:MAX_LABEL_LENGTH]
+        topic = str(data.get('topic') or '')[:MAX_LABEL_LENGTH]
+        samples = data.get('samples') or []
+    except (ValueError, AttributeError):
+        return []
+    if not route or not isinstance(samples, list):
+        return []
+
+    valid = []
+    for sample in samples[:MAX_SAMPLES_PER_BEACON]:
+        if not isinstance(sample, dict) or sample.get('metric') not in METRICS:
+            continue
+        value = sample.get('value')
+        if isinstance(value, bool) or not isinstance(value, (int, float)) or not 0 <= value <= MAX_VALUE_MS:
+            continue
+        valid.append((route, topic, sample['metric'], round(float(value), 1)))
+    return valid
+
+
+def store_samples(conn, samples, now=None):
+    now = time.time() if now is None else now
+    with conn:
+        conn.executemany("INSERT INTO perf_samples (received_at, route, topic, metric, value_ms) VALUES (?, ?, ?, ?, ?)",
+                         [(now,) + sample for sample in samples])
+
+
+def prune_samples(conn, retention_days=PERF_BEACON_RETENTION_DAYS, now=None):
+    now = time.time() if now is None else now
+    with conn:
+        return conn.execute("DELETE FROM perf_samples WHERE received_at < ?",
+                            (now - retention_days * 86400,)).rowcount
+
+
+def compute_percentiles(conn, days=7, now=None):
+    """最近days天的样本，按 (路由, 主题, 指标) 分组计算分位数"""
+    now = time.time() if now is None else now
+    rows = conn.execute("""
+        SELECT route, topic, metric, value_ms FROM perf_samples
+        WHERE received_at >= ?
+        ORDER BY route, topic, metric
+    """, (now - days * 86400,)).fetchall()
+    if not rows:
+        return []
+
+    labels = [row[:3] for row in rows]
+    values = np.array([row[3] for row in rows], dtype=np.float64)
+    # 行已按分组排序，分组边界处标签发生变化
+    starts = [0] + [i for i in range(1, len(labels)) if labels[i] != labels[i - 1]] + [len(labels)]
+
+    groups = []
+    for start, end in zip(starts, starts[1:]):
+        route, topic, metric = labels[start]
+        quantiles = np.percentile(values[start:end], PERCENTILES)
+        groups.append({
+            'route': route,
+            'topic': topic,
+            'metric': metric,
+            'count': end - start,
+            **{f"p{p}": round(float(q), 1) for p, q in zip(PERCENTILES, quantiles)},
+        })
+    return groups
+
+
+def get_performance_report(conn, days=7):
+    prune_samples(conn)
+    start = time.perf_counter()
+    groups = compute_percentiles(conn, days=days)
+    return {
+        'days': days,
+        'samples': sum(group['count'] for group in groups),
+        'metrics': list(METRICS),
+        'groups': groups,
+        'compute_seconds': round(time.perf_counter() - start, 4),
+    }
+
+
+def init_app(app, db_path=PERF_BEACON_DB):
+    """注册 /api/perf-beacon、/admin/performance 以及模板变量 perf_beacon"""
+    buckets = MemoryBuckets()
+
+    @app.context_processor
+    def perf_beacon_processor():
+        endpoint = request.endpoint or ''
+        enabled = PERF_BEACON_ENABLED and not endpoint.startswith(EXCLUDED_ENDPOINT_PREFIXES)
+        return {'perf_beacon': {
+            'url': '/api/perf-beacon' if enabled else None,
+            'sample_rate': PERF_BEACON_SAMPLE_RATE,
+        }}
+
+    @app.route('/api/perf-beacon', methods=['POST'])
+    def perf_beacon():
+        """接收页面性能数据（navigator.sendBeacon），总是返回204"""
+        if not PERF_BEACON_ENABLED or (request.content_length or 0) > MAX_BEACON_BYTES:
+            return '', 204
+        allowed, _ = buckets.take(f"ip:{client_ip()}", BEACON_IP_RATE, BEACON_IP_BURST)
+        samples = parse_beacon(request.get_data(cache=False)) if allowed else []
+        if samples:
+            try:
+                conn = connect(db_path)
+                try:
+                    store_samples(conn, samples)
+                finally:
+                    conn.close()
+            except sqlite3.Error as e:
+                print(f"⚠️  性能样本写入失败: {e}")
+        return '', 204
+
+    @app.route('/admin/performance')
+    def admin_performance():
+        """管理员页面 - 真实用户性能分位数（format=json 返回JSON）"""
+        days = min(max(request.args.get('days', 7, type=float), 0.01), PERF_BEACON_RETENTION_DAYS)
+        conn = connect(db_path)
+        try:
+            report = get_performance_report(conn, days=days)
+        finally:
+            conn.close()
+
+        if request.args.get('format') == 'json':
+            return jsonify(report)
+        return render_template('admin_performance.html', report=report)
+
+    return app
+
+
+def print_report(report):
+    """在终端打印分位数"""
+    print(f"📊 真实用户性能（最近 {report['days']} 天，{report['samples']} 个样本）\n")
+    print(f"{'路由':<16}{'主题':<10}{'指标':<20}{'样本':>8}" + ''.join(f"{'p' + str(p):>10}" for p in PERCENTILES))
+    for group in report['groups']:
+        print(f"{group['route']:<16}{group['topic']:<10}{group['metric']:<20}{group['count']:>8}"
+              + ''.join(f"{group['p' + str(p)]:>10}" for p in PERCENTILES))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='真实用户性能数据')
+    parser.add_argument('--db', default=PERF_BEACON_DB, help='样本数据库路径')
+    parser.add_argument('--days', type=float, default=7, help='统计最近几天的样本')
+    args = parser.parse_args()
+
+    conn = connect(args.db)
+    print_report(get_performance_report(conn, days=args.days))
+    conn.close()
@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+主题假设池的分层流式抽样
+
+- 抽样配置（主题/子主题组合、池大小、随机种子、配额）放在 pool_config.json；
+  每个会话的比较次数（comparisons_per_session）也在这里配置，topics 中可以按主题覆盖 pool_size / comparisons_per_session
+- 逐行遍历数据库游标，按 (model_source, strategy) 分层做蓄水池抽样，
+  内存只与 分层数 × 池大小 有关，与假设总数无关
+- 从各层轮流选取，每个 model_source / strategy 的数量不超过配额；
+  配额无法凑满池子时放宽配额并给出提示
+- 每个近似重复簇（near_duplicates.py）最多选一个假设
+- 每个池使用由全局种子和 (topic, sub_topic) 派生的随机数生成器，结果可复现
+
+用法:
+    python pool_sampler.py [--config pool_config.json] [--db hypothesis_data.db]   # 只预览，不写数据库
+"""
+
+import argparse
+import json
+import random
+import sqlite3
+from collections import Counter, defaultdict
+
+from near_duplicates import load_clusters
+
+# 配置数据库路径
+DB_PATH = "hypothesis_data.db"
+
+POOL_CONFIG_PATH = "pool_config.json"
+
+DEFAULT_CONFIG = {
+    'seed': 42,
+    'pool_size': 8,
+    'comparisons_per_session': 8,
+    'topics': {},
+    'stratify_by': ['model_source', 'strategy'],
+    'quotas': {},
+    'pools': [],
+}
+
+# 抽样时读取的hypothesis列
+HYPOTHESIS_COLUMNS = ['id', 'model_source', 'topic', 'sub_topic', 'strategy', 'hypothesis_id', 'hypothesis_content',
+                      'feedback_results', 'novelty_score', 'significance_score', 'soundness_score',
+                      'feasibility_score', 'overall_winner_score']
+COLUMN_INDEX = {column: i for i, column in enumerate(HYPOTHESIS_COLUMNS)}
+
+# 每层蓄水池的容量 = 池大小 × 该系数，为近似重复排除留出余量
+RESERVOIR_FACTOR = 2
+
+
+def load_pool_config(path=POOL_CONFIG_PATH):
+    """读取抽样配置，缺省项使用默认值"""
+    with open(path, 'r', encoding='utf-8') as f:
+        config = dict(DEFAULT_CONFIG, **json.load(f))
+    for pool in config['pools']:
+        pool.setdefault('topic_name', f"topic{pool['topic']}")
+    return config
+
+
+def topic_setting(config, topic_name, key):
+    """主题的 pool_size / comparisons_per_session：topics 中的覆盖值优先，否则使用全局值"""
+    return config['topics'].get(topic_name, {}).get(key, config[key])
+
+
+def quota_for(config, column, value):
+    """某个 model_source / strategy 取值的配额；None 表示不限制"""
+    quotas = config['quotas'].get(column, {})
+    return quotas.get(value, quotas.get('*'))
+
+
+def reservoir_by_stratum(rows, stratify_by, capacity, rng):
+    """
+    对行迭代器逐行做分层蓄水池抽样（Algorithm R），返回 ({分层: [行]}, 扫描行数)
+    每层只保留 capacity 行
+    """
+    reservoirs = defaultdict(list)
+    seen = Counter()
+    scanned = 0
+    for row in rows:
+        scanned += 1
+        stratum = tuple(row[COLUMN_INDEX[column]] for column in stratify_by)
+        seen[stratum] += 1
+        reservoir = reservoirs[stratum]
+        if len(reservoir) < capacity:
+            reservoir.append(row)
+        else:
+            j = rng.randrange(seen[stratum])
+            if j < capacity:
+                reservoir[j] = row
+    return reservoirs, scanned
+
+
+def select_with_quotas(reservoirs, k, config, rng, clusters=None):
+    """
+    各层轮流各取一个假设，直到选满k个：
+    超出配额的层停止选取，同一近似重复簇只取一个；
+    仍不足k个时依次放宽配额、允许近似重复
+    """
+    clusters = clusters or {}
+    stratify_by = config['stratify_by']
+    strata = sorted(reservoirs, key=lambda s: tuple(str(v) for v in s))
+    rng.shuffle(strata)
+    candidates = {}
+    for stratum in strata:
+        candidates[stratum] = list(reservoirs[stratum])
+        rng.shuffle(candidates[stratum])
+
+    selected, used_clusters = [], set()
+    counts = {column: Counter() for column in stratify_by}
+    duplicates = []
+
+    def within_quota(stratum):
+        for column, value in zip(stratify_by, stratum):
+            quota = quota_for(config, column, value)
+            if quota is not None and counts[column][value] >= quota:
+                return False
+        return True
+
+    def take(stratum, row):
+        cluster = clusters.get(row[COLUMN_INDEX['id']])
+        if cluster is not None:
+            used_clusters.add(cluster)
+        for column, value in zip(stratify_by, stratum):
+            counts[column][value] += 1
+        selected.append(row)
+
+    def next_candidate(stratum):
+        while candidates[stratum]:
+            row = candidates[stratum].pop()
+            cluster = clusters.get(row[COLUMN_INDEX['id']])
+            if cluster is not None and cluster in used_clusters:
+                duplicates.append((stratum, row))
+                continue
+            return row
+        return None
+
+    # 1. 遵守配额的轮流选取
+    active = list(strata)
+    while len(selected) < k and active:
+        for stratum in list(active):
+            if len(selected) == k:
+                break
+            row = next_candidate(stratum) if within_quota(stratum) else None
+            if row is None:
+                active.remove(stratum)
+            else:
+                take(stratum, row)
+
+    # 2. 配额无法满足时放宽配额
+    if len(selected) < k:
+        remaining = [(stratum, row) for stratum in strata for row in candidates[stratum]]
+        rng.shuffle(remaining)
+        relaxed = 0
+        for stratum, row in remaining:
+            if len(selected) == k:
+                break
+            cluster = clusters.get(row[COLUMN_INDEX['id']])
+            if cluster is not None and cluster in used_clusters:
+                duplicates.append((stratum, row))
+                continue
+            take(stratum, row)
+            relaxed += 1
+        if relaxed:
+            print(f"   ⚠️  配额无法凑满 {k} 个假设，超出配额选取了 {relaxed} 个")
+
+    # 3. 最后才使用近似重复的假设
+    if len(selected) < k and duplicates:
+        filled = duplicates[:k - len(selected)]
+        for stratum, row in filled:
+            take(stratum, row)
+        print(f"   ⚠️  去重后假设不足，用 {len(filled)} 个近似重复假设补足")
+
+    return selected
+
+
+def sample_pool(conn, pool, config, clusters=None):
+    """为一个 (topic, sub_topic) 流式抽取假设，返回 (选中的行, 扫描行数)"""
+    k = pool.get('pool_size', topic_setting(config, pool['topic_name'], 'pool_size'))
+    rng = random.Random(f"{config['seed']}:{pool['topic']}:{pool['sub_topic']}")
+    cursor = conn.execute(f"""
+        SELECT {', '.join(HYPOTHESIS_COLUMNS)}
+        FROM hypothesis
+        WHERE topic = ? AND sub_topic = ?
+        ORDER BY id
+    """, (pool['topic'], pool['sub_topic']))
+    reservoirs, scanned = reservoir_by_stratum(cursor, config['stratify_by'], k * RESERVOIR_FACTOR, rng)
+    return select_with_quotas(reservoirs, k, config, rng, clusters), scanned
+
+
+def iter_pools(conn, config):
+    """
+    依次抽取配置中的每个池，生成 (pool, 起始rank, 选中的行, 扫描行数)
+    同一主题的多个子主题池共用一个主题，rank 顺延，不会重复
+    """
+    clusters = load_clusters(conn)
+    next_rank = Counter()
+    for pool in config['pools']:
+        selected, scanned = sample_pool(conn, pool, config, clusters)
+        yield pool, next_rank[pool['topic_name']] + 1, selected, scanned
+        next_rank[pool['topic_name']] += len(selected)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='主题假设池分层抽样（预览）')
+    parser.add_argument('--config', default=POOL_CONFIG_PATH, help='抽样配置文件')
+    parser.add_argument('--db', default=DB_PATH, help='数据库路径')
+    args = parser.parse_args()
+
+    config = load_pool_config(args.config)
+    conn = sqlite3.connect(args.db)
+    for pool, first_rank, selected, scanned in iter_pools(conn, config):
+        sources = Counter(row[COLUMN_INDEX['model_source']] for row in selected)
+        strategies = Counter(row[COLUMN_INDEX['strategy']] for row in selected)
+        print(f"📊 {pool['topic_name']} subtopic{pool['sub_topic']}: 扫描 {scanned} 个，选中 {len(selected)} 个"
+              f"（rank {first_rank}-{first_rank + len(selected) - 1}）")
+        print(f"   model_source: {dict(sources)}  strategy: {dict(strategies)}")
+    conn.close()
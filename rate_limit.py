@@ -0,0 +1,325 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+写接口的限流与背压
+
+- 令牌桶：每个会话、每个IP各一个桶，超出时返回 429 与 Retry-After
+- 桶状态默认保存在进程内；RATE_LIMIT_BACKEND=sqlite 时保存在单独的SQLite文件中，
+  多个gunicorn worker共享（不使用业务数据库，避免与评分写入争抢写锁）
+- 背压：写接口通过 begin_write() 开始事务，记录等待SQLite写锁的时间（按时间衰减的滑动平均）
+  与锁等待超时；平均等待超过 WRITE_WAIT_THRESHOLD 秒或刚发生过锁超时时，新的写请求直接返回 503，
+  让客户端稍后重试，而不是继续在写锁上排队。没有新样本时平均值随时间衰减，写入会自动恢复
+- 批量接口按条目数消耗令牌
+
+环境变量:
+    RATE_LIMIT_ENABLED=1                  是否启用
+    RATE_LIMIT_SESSION_RATE=0.5           每个会话每秒补充的令牌数
+    RATE_LIMIT_SESSION_BURST=20           每个会话的桶容量
+    RATE_LIMIT_IP_RATE=2                  每个IP每秒补充的令牌数
+    RATE_LIMIT_IP_BURST=120               每个IP的桶容量
+    RATE_LIMIT_PROXY_COUNT=0              前置代理层数（Railway/Render等设为1，从X-Forwarded-For取真实IP）
+    RATE_LIMIT_BACKEND=memory|sqlite
+    RATE_LIMIT_DB=rate_limit.db           sqlite后端的数据库文件
+    WRITE_WAIT_THRESHOLD=0.25             写锁平均等待超过该秒数时开始拒绝写请求
+    WRITE_WAIT_HALF_LIFE=5                写锁等待平均值的半衰期（秒）
+
+用法:
+    python rate_limit.py --benchmark [--iterations 100000]
+"""
+
+import argparse
+import math
+import os
+import sqlite3
+import threading
+import time
+
+from flask import jsonify, request, session
+
+RATE_LIMIT_ENABLED = os.environ.get('RATE_LIMIT_ENABLED', '1') == '1'
+SESSION_RATE = float(os.environ.get('RATE_LIMIT_SESSION_RATE', 0.5))
+SESSION_BURST = float(os.environ.get('RATE_LIMIT_SESSION_BURST', 20))
+IP_RATE = float(os.environ.get('RATE_LIMIT_IP_RATE', 2))
+IP_BURST = float(os.environ.get('RATE_LIMIT_IP_BURST', 120))
+PROXY_COUNT = int(os.environ.get('RATE_LIMIT_PROXY_COUNT', 0))
+BACKEND = os.environ.get('RATE_LIMIT_BACKEND', 'memory')
+RATE_LIMIT_DB = os.environ.get('RATE_LIMIT_DB', 'rate_limit.db')
+WRITE_WAIT_THRESHOLD = float(os.environ.get('WRITE_WAIT_THRESHOLD', 0.25))
+WRITE_WAIT_HALF_LIFE = float(os.environ.get('WRITE_WAIT_HALF_LIFE', 5))
+
+# 受限流保护的写接口（端点名）
+WRITE_ENDPOINTS = ('submit_rating', 'submit_ratings_bulk', 'submit_comment')
+
+# 背压时建议客户端等待的秒数
+BACKPRESSURE_RETRY_AFTER = 1
+
+# 进程内桶的数量超过该值时清理已经补满的桶
+MEMORY_PRUNE_THRESHOLD = 10000
+
+# 每检查多少次清理一次已经补满的桶
+PRUNE_INTERVAL = 1000
+
+
+class MemoryBuckets:
+    """进程内令牌桶：key -> (令牌数, 更新时间, 补满所需秒数)"""
+
+    def __init__(self):
+        self.buckets = {}
+        self.lock = threading.Lock()
+        self.takes = 0
+
+    def take(self, key, rate, burst, cost=1.0, now=None):
+        """尝试消耗cost个令牌，返回 (是否允许, 需要等待的秒数)；cost不超过桶容量"""
+        now = time.monotonic() if now is None else now
+        cost = min(cost, burst)
+        with self.lock:
+            tokens, updated, _ = self.buckets.get(key, (burst, now, 0))
+            tokens = min(burst, tokens + (now - updated) * rate)
+            if tokens >= cost:
+                self.buckets[key] = (tokens - cost, now, burst / rate)
+                allowed, wait = True, 0.0
+            else:
+                self.buckets[key] = (tokens, now, burst / rate)
+                allowed, wait = False, (cost - tokens) / rate
+            # 每 PRUNE_INTERVAL 次检查最多扫描一次，桶都未补满时也不会每次都扫描
+            self.takes += 1
+            if self.takes >= PRUNE_INTERVAL and len(self.buckets) > MEMORY_PRUNE_THRESHOLD:
+                self.takes = 0
+                self.prune(now)
+        return allowed, wait
+
+    def prune(self, now):
+        """删除已经补满的桶（按每个桶自己的容量与速率；重新创建时同样是满的，不影响限流结果）"""
+        for key in [k for k, (_, updated, full_after) in self.buckets.items() if now - updated >= full_after]:
+            del self.buckets[key]
+
+
+class SQLiteBuckets:
+    """SQLite中的令牌桶，多个进程共享；每次检查是一条 UPSERT ... RETURNING 语句"""
+
+    def __init__(self, path):
+        self.path = path
+        self.local = threading.local()
+        self.takes = 0
+        # 见过的桶中补满所需的最长时间（秒）
+        self.full_after = 0.0
+
+    def connection(self):
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=1, isolation_level=None)
+            # 限流状态丢失无关紧要，换取更低的写入开销
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=OFF")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS rate_limit_buckets (
+                    key TEXT PRIMARY KEY,
+                    tokens REAL NOT NULL,
+                    updated_at REAL NOT NULL,
+                    allowed INTEGER NOT NULL
+                ) WITHOUT ROWID
+            """)
+            self.local.conn = conn
+        return conn
+
+    def take(self, key, rate, burst, cost=1.0, now=None):
+        now = time.time() if now is None else now
+        cost = min(cost, burst)
+        tokens, allowed = self.connection().execute("""
+            INSERT INTO rate_limit_buckets (key, tokens, updated_at, allowed)
+            VALUES (:key, :burst - :cost, :now, 1)
+            ON CONFLICT (key) DO UPDATE SET
+                allowed = MIN(:burst, tokens + MAX(:now - updated_at, 0) * :rate) >= :cost,
+                tokens = MIN(:burst, tokens + MAX(:now - updated_at, 0) * :rate)
+                         - CASE WHEN MIN(:burst, tokens + MAX(:now - updated_at, 0) * :rate) >= :cost
+                                THEN :cost ELSE 0 END,
+                updated_at = :now
+            RETURNING tokens, allowed
+        """, {'key': key, 'rate': rate, 'burst': burst, 'cost': cost, 'now': now}).fetchone()
+        self.full_after = max(self.full_after, burst / rate)
+        self.takes += 1
+        if self.takes >= PRUNE_INTERVAL:
+            self.takes = 0
+            self.prune(now - self.full_after)
+        if allowed:
+            return True, 0.0
+        return False, (cost - tokens) / rate
+
+    def prune(self, older_than):
+        """删除 older_than 之后未使用的桶（take() 每 PRUNE_INTERVAL 次按最长的补满时间调用）"""
+        self.connection().execute("DELETE FROM rate_limit_buckets WHERE updated_at < ?", (older_than,))
+
+
+class WriteContention:
+    """
+    进程内观测到的SQLite写锁争用：等待写锁时间的滑动平均（按时间衰减）与最近一次锁超时
+    写锁是整个数据库共享的，每个进程自己的观测就能反映全局的争用
+    """
+
+    def __init__(self, threshold=WRITE_WAIT_THRESHOLD, half_life=WRITE_WAIT_HALF_LIFE):
+        self.threshold = threshold
+        self.half_life = half_life
+        self.average = 0.0
+        self.updated = time.monotonic()
+        self.busy_until = 0.0
+        self.lock = threading.Lock()
+
+    def _decayed(self, now):
+        return self.average * 0.5 ** (max(now - self.updated, 0) / self.half_life)
+
+    def record(self, wait, busy=False, now=None):
+        """记录一次开始写事务的等待时间；busy 表示等待超时没有拿到写锁"""
+        now = time.monotonic() if now is None else now
+        with self.lock:
+            # 新样本的权重为 1/4，旧值先按经过的时间衰减
+            self.average = self._decayed(now) * 0.75 + wait * 0.25
+            self.updated = now
+            if busy:
+                self.busy_until = now + BACKPRESSURE_RETRY_AFTER
+
+    def overloaded(self, now=None):
+        """返回 (是否应拒绝新的写请求, 建议等待的秒数)"""
+        now = time.monotonic() if now is None else now
+        with self.lock:
+            if now < self.busy_until:
+                return True, self.busy_until - now
+            average = self._decayed(now)
+        if average <= self.threshold:
+            return False, 0.0
+        # 衰减到阈值以下所需的时间
+        return True, self.half_life * math.log2(average / self.threshold)
+
+
+# 本进程的写锁争用统计，app.py 的写接口通过 begin_write() 记录
+WRITE_CONTENTION = WriteContention()
+
+
+def begin_write(cursor, contention=None):
+    """BEGIN IMMEDIATE 获取写锁，并记录等待时间；锁等待超时时记录后重新抛出"""
+    contention = contention or WRITE_CONTENTION
+    start = time.monotonic()
+    try:
+        cursor.execute("BEGIN IMMEDIATE")
+    except sqlite3.OperationalError as e:
+        if 'locked' in str(e) or 'busy' in str(e):
+            contention.record(time.monotonic() - start, busy=True)
+        raise
+    contention.record(time.monotonic() - start)
+
+
+def create_buckets(backend=BACKEND, path=RATE_LIMIT_DB):
+    if backend == 'sqlite':
+        return SQLiteBuckets(path)
+    return MemoryBuckets()
+
+
+def client_ip():
+    """客户端IP；经过 PROXY_COUNT 层代理时取 X-Forwarded-For 中对应的地址"""
+    if PROXY_COUNT > 0:
+        forwarded = [ip.strip() for ip in request.headers.get('X-Forwarded-For', '').split(',') if ip.strip()]
+        if len(forwarded) >= PROXY_COUNT:
+            return forwarded[-PROXY_COUNT]
+    return request.remote_addr or 'unknown'
+
+
+def request_cost():
+    """批量接口按条目数计费，其余请求消耗1个令牌"""
+    if request.endpoint != 'submit_ratings_bulk':
+        return 1.0
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return 1.0
+    items = 0
+    for field in ('ratings', 'comments'):
+        if isinstance(data.get(field), list):
+            items += len(data[field])
+    return float(max(items, 1))
+
+
+def too_many_requests(retry_after, message, status):
+    """限流（429）或背压（503）响应，带 Retry-After"""
+    retry_after = max(1, math.ceil(retry_after))
+    response = jsonify({'success': False, 'error': message, 'retry_after': retry_after})
+    response.status_code = status
+    response.headers['Retry-After'] = str(retry_after)
+    return response
+
+
+def init_app(app, buckets=None, endpoints=WRITE_ENDPOINTS, contention=None):
+    """为写接口注册限流与背压"""
+    if not RATE_LIMIT_ENABLED:
+        return app
+
+    buckets = buckets or create_buckets()
+    contention = contention or WRITE_CONTENTION
+    app.extensions['rate_limit'] = {'buckets': buckets, 'contention': contention}
+
+    @app.before_request
+    def limit_write_requests():
+        if request.endpoint not in endpoints:
+            return None
+
+        cost = request_cost()
+        allowed, wait = buckets.take(f"ip:{client_ip()}", IP_RATE, IP_BURST, cost)
+        session_id = session.get('session_id')
+        if allowed and session_id:
+            allowed, wait = buckets.take(f"session:{session_id}", SESSION_RATE, SESSION_BURST, cost)
+        if not allowed:
+            print(f"⚠️  限流: {request.endpoint} ip={client_ip()} session={session_id}")
+            return too_many_requests(wait, 'rate limited', status=429)
+
+        overloaded, wait = contention.overloaded()
+        if overloaded:
+            return too_many_requests(wait, 'server busy', status=503)
+        return None
+
+    return app
+
+
+def benchmark(iterations):
+    """每次限流检查的耗时，以及注册/不注册限流时写请求往返的耗时"""
+    import tempfile
+    from flask import Flask
+
+    global IP_RATE, IP_BURST, SESSION_RATE, SESSION_BURST
+    # 测量开销而不是限流效果：桶足够大，所有请求都被允许
+    IP_RATE = IP_BURST = SESSION_RATE = SESSION_BURST = 1e9
+
+    print(f"📊 令牌桶检查（{iterations} 次）")
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, buckets in (('memory', MemoryBuckets()), ('sqlite', SQLiteBuckets(os.path.join(tmp, 'check.db')))):
+            start = time.perf_counter()
+            for i in range(iterations):
+                buckets.take(f"session:{i % 1000}", IP_RATE, IP_BURST)
+            elapsed = time.perf_counter() - start
+            print(f"   {name:<8}{elapsed / iterations * 1e6:>10.2f} µs/次")
+
+        # 同一个空的写接口，分别不注册/注册限流，差值即为热路径上的开销
+        requests_count = max(iterations // 20, 100)
+        print(f"\n📊 写接口往返（Flask测试客户端，{requests_count} 次）")
+        for label, buckets in (('关闭', None), ('memory', MemoryBuckets()),
+                               ('sqlite', SQLiteBuckets(os.path.join(tmp, 'requests.db')))):
+            bench_app = Flask(__name__)
+            bench_app.secret_key = 'benchmark'
+            bench_app.add_url_rule('/api/submit-rating', 'submit_rating',
+                                   lambda: jsonify({'success': True}), methods=['POST'])
+            if buckets is not None:
+                init_app(bench_app, buckets)
+            client = bench_app.test_client()
+            start = time.perf_counter()
+            for _ in range(requests_count):
+                client.post('/api/submit-rating', json={})
+            elapsed = time.perf_counter() - start
+            print(f"   {label:<8}{elapsed / requests_count * 1e6:>10.2f} µs/请求")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='写接口限流')
+    parser.add_argument('--benchmark', action='store_true', help='测量限流检查的开销')
+    parser.add_argument('--iterations', type=int, default=100000, help='检查次数')
+    args = parser.parse_args()
+
+    if args.benchmark:
+        benchmark(args.iterations)
+    else:
+        parser.print_help()
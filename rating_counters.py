@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+按主题的评分数、评论数（触发器维护的计数表）
+
+- rating_counters 表保存 ratings / comments 每个主题的行数与被删除的行数，
+  由 INSERT / DELETE / UPDATE OF topic_name 触发器在同一事务中更新，读取时不需要扫描评分表
+- 管理页面的实时推送用它给出主题计数；一致性报告用删除计数判断是否有评分被删除或归档
+- 第一次创建时在 BEGIN IMMEDIATE 事务中按现有数据初始化，多个进程同时创建也只初始化一次
+
+用法:
+    python rating_counters.py [--db hypothesis_data.db] [--rebuild]
+"""
+
+import argparse
+import sqlite3
+
+# 配置数据库路径
+DB_PATH = "hypothesis_data.db"
+
+# 计数的表 -> 主键列
+COUNTED_TABLES = {'ratings': 'rating_id', 'comments': 'comment_id'}
+
+
+def _trigger_names(table):
+    return [f"rating_counters_{table}_{event}" for event in ('insert', 'delete', 'update')]
+
+
+def _create_triggers(cursor, table):
+    insert, delete, update = _trigger_names(table)
+    increment = f"""
+        INSERT INTO rating_counters (table_name, topic_name, row_count, deleted) VALUES ('{table}', NEW.topic_name, 1, 0)
+        ON CONFLICT (table_name, topic_name) DO UPDATE SET row_count = row_count + 1;
+    """
+    decrement = f"""
+        UPDATE rating_counters SET row_count = row_count - 1, deleted = deleted + 1
+        WHERE table_name = '{table}' AND topic_name = OLD.topic_name;
+    """
+    cursor.execute(f"CREATE TRIGGER {insert} AFTER INSERT ON {table} BEGIN {increment} END")
+    cursor.execute(f"CREATE TRIGGER {delete} AFTER DELETE ON {table} BEGIN {decrement} END")
+    # 修改主题相当于从旧主题删除、加入新主题；删除计数随之增加，依赖它的缓存会重建
+    cursor.execute(f"""
+        CREATE TRIGGER {update} AFTER UPDATE OF topic_name ON {table}
+        WHEN OLD.topic_name IS NOT NEW.topic_name
+        BEGIN {decrement} {increment} END
+    """)
+
+
+def ensure_rating_counters(conn, rebuild=False):
+    """创建计数表与触发器（已存在时只读一次 sqlite_master）；rebuild 时按现有数据重新计数"""
+    names = [name for table in COUNTED_TABLES for name in _trigger_names(table)]
+    existing = {row[0] for row in conn.execute(
+        f"SELECT name FROM sqlite_master WHERE type = 'trigger' AND name IN ({', '.join('?' for _ in names)})", names)}
+    if len(existing) == len(names) and not rebuild:
+        return
+
+    cursor = conn.cursor()
+    cursor.execute("BEGIN IMMEDIATE")
+    try:
+        # 持有写锁后重新检查：其他进程可能刚刚完成初始化
+        existing = {row[0] for row in cursor.execute(
+            f"SELECT name FROM sqlite_master WHERE type = 'trigger' AND name IN ({', '.join('?' for _ in names)})",
+            names)}
+        if len(existing) < len(names) or rebuild:
+            for name in existing:
+                cursor.execute(f"DROP TRIGGER {name}")
+            cursor.execute("DROP TABLE IF EXISTS rating_counters")
+            cursor.execute("""
+                CREATE TABLE rating_counters (
+                    table_name TEXT NOT NULL,
+                    topic_name TEXT NOT NULL,
+                    row_count INTEGER NOT NULL,
+                    deleted INTEGER NOT NULL DEFAULT 0,
+                    PRIMARY KEY (table_name, topic_name)
+                ) WITHOUT ROWID
+            """)
+            for table in COUNTED_TABLES:
+                cursor.execute(f"""
+                    INSERT INTO rating_counters (table_name, topic_name, row_count)
+                    SELECT '{table}', topic_name, COUNT(*) FROM {table} GROUP BY topic_name
+                """)
+                _create_triggers(cursor, table)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+
+def topic_counts(conn, table):
+    """{topic_name: 当前行数}"""
+    return dict(conn.execute("SELECT topic_name, row_count FROM rating_counters WHERE table_name = ? AND row_count > 0",
+                             (table,)))
+
+
+def deleted_count(conn, table):
+    """表创建计数以来被删除（或修改主题）的行数，只增不减"""
+    return conn.execute("SELECT COALESCE(SUM(deleted), 0) FROM rating_counters WHERE table_name = ?",
+                        (table,)).fetchone()[0]
+
+
+def topic_counts_at(conn, table, watermark):
+    """主键不超过 watermark 的各主题行数：当前计数减去水位线之后的行（只读取水位线之后的主键范围）"""
+    counts = topic_counts(conn, table)
+    for topic, count in conn.execute(
+            f"SELECT topic_name, COUNT(*) FROM {table} WHERE {COUNTED_TABLES[table]} > ? GROUP BY topic_name",
+            (watermark,)):
+        counts[topic] = counts.get(topic, 0) - count
+        if counts[topic] <= 0:
+            del counts[topic]
+    return counts
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='按主题的评分数、评论数')
+    parser.add_argument('--db', default=DB_PATH, help='数据库路径')
+    parser.add_argument('--rebuild', action='store_true', help='按现有数据重新计数')
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.db)
+    ensure_rating_counters(conn, rebuild=args.rebuild)
+    for table in COUNTED_TABLES:
+        counts = topic_counts(conn, table)
+        print(f"📊 {table}: {sum(counts.values())} 行（已删除 {deleted_count(conn, table)}）")
+        for topic, count in sorted(counts.items()):
+            print(f"   {topic}: {count}")
+    conn.close()
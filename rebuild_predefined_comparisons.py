@@ -3,26 +3,64 @@
 
 import sqlite3
 import json
-import random
+
+from content_compression import decode_content
+from near_duplicates import detect_near_duplicates
+from pool_sampler import COLUMN_INDEX, POOL_CONFIG_PATH, iter_pools, load_pool_config
 
 # 配置数据库路径
 DB_PATH = "hypothesis_data.db"
 
-# 定义需要抽取的topic和subtopic组合
-TOPIC_SUBTOPIC_PAIRS = [
-    (1, 1),   # topic1中的subtop1
-    (2, 0),   # topic2中的subtop0
-    (3, 2),   # topic3中的subtop2
-    (4, 0),   # topic4中的subtop0
-    (5, 3),   # topic5中的subtop3
-    (6, 2),   # topic6中的subtop2
-    (7, 0),   # topic7中的subtop0
-    (8, 2),   # topic8中的subtop2
-    (9, 2),   # topic9中的subtop2
-    (10, 0),  # topic10中的subtop0
-    (10, 4),  # topic10中的subtop4
-    (11, 3),  # topic11中的subtop3
-]
+def create_predefined_table(cursor):
+    """创建predefined_comparisons表（job_queue.py 的重建任务也使用）"""
+    cursor.execute("""
+        CREATE TABLE predefined_comparisons (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            topic_name TEXT NOT NULL,
+            hypothesis_rank INTEGER NOT NULL,
+            -- 原始hypothesis表的所有字段
+            original_hypothesis_id INTEGER,
+            model_source TEXT,
+            topic INTEGER,
+            sub_topic INTEGER,
+            strategy TEXT,
+            hypothesis_content_en TEXT,
+            hypothesis_content_zh TEXT,
+            novelty_score REAL,
+            significance_score REAL,
+            soundness_score REAL,
+            feasibility_score REAL,
+            overall_winner_score REAL,
+            timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE(topic_name, hypothesis_rank)
+        )
+    """)
+
+def insert_predefined_row(conn, topic_name, rank, hypothesis):
+    """把一行 hypothesis（pool_sampler.HYPOTHESIS_COLUMNS 顺序）作为主题的第rank个假设写入"""
+    conn.execute("""
+        INSERT INTO predefined_comparisons (
+            topic_name, hypothesis_rank, original_hypothesis_id, model_source,
+            topic, sub_topic, strategy, hypothesis_content_en, hypothesis_content_zh,
+            novelty_score, significance_score, soundness_score, feasibility_score,
+            overall_winner_score
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """, (
+        topic_name,
+        rank,
+        hypothesis[COLUMN_INDEX['id']],
+        hypothesis[COLUMN_INDEX['model_source']],
+        hypothesis[COLUMN_INDEX['topic']],
+        hypothesis[COLUMN_INDEX['sub_topic']],
+        hypothesis[COLUMN_INDEX['strategy']],
+        decode_content(conn, hypothesis[COLUMN_INDEX['hypothesis_content']]),
+        '',  # hypothesis_content_zh (空字符串)
+        hypothesis[COLUMN_INDEX['novelty_score']],
+        hypothesis[COLUMN_INDEX['significance_score']],
+        hypothesis[COLUMN_INDEX['soundness_score']],
+        hypothesis[COLUMN_INDEX['feasibility_score']],
+        hypothesis[COLUMN_INDEX['overall_winner_score']]
+    ))
 
 def rebuild_predefined_comparisons():
     """重新构建predefined_comparisons表格"""
@@ -32,87 +70,35 @@ def rebuild_predefined_comparisons():
         
         print("🔄 开始重新构建predefined_comparisons表格...")
         
+        # 0. 检测近似重复的假设，抽样时每个簇最多选一个
+        detect_near_duplicates(conn)
+        
         # 1. 删除现有的predefined_comparisons表
         print("🗑️  删除现有的predefined_comparisons表...")
         cursor.execute("DROP TABLE IF EXISTS predefined_comparisons")
         
         # 2. 重新创建predefined_comparisons表
         print("🏗️  创建新的predefined_comparisons表...")
-        cursor.execute("""
-            CREATE TABLE predefined_comparisons (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                topic_name TEXT NOT NULL,
-                hypothesis_rank INTEGER NOT NULL,
-                -- 原始hypothesis表的所有字段
-                original_hypothesis_id INTEGER,
-                model_source TEXT,
-                topic INTEGER,
-                sub_topic INTEGER,
-                strategy TEXT,
-                hypothesis_content_en TEXT,
-                hypothesis_content_zh TEXT,
-                novelty_score REAL,
-                significance_score REAL,
-                soundness_score REAL,
-                feasibility_score REAL,
-                overall_winner_score REAL,
-                timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
+        create_predefined_table(cursor)
         
-        # 3. 为每个topic-subtopic组合抽取8个假设
-        for topic, subtopic in TOPIC_SUBTOPIC_PAIRS:
-            topic_name = f"topic{topic}"
-            print(f"\n📊 处理 {topic_name} 的 subtopic{subtopic}...")
-            
-            # 从hypothesis表中查询该topic和subtopic的所有假设
-            cursor.execute("""
-                SELECT id, model_source, topic, sub_topic, strategy, hypothesis_id, hypothesis_content,
-                       feedback_results, novelty_score, significance_score, soundness_score,
-                       feasibility_score, overall_winner_score
-                FROM hypothesis 
-                WHERE topic = ? AND sub_topic = ?
-            """, (topic, subtopic))
-            
-            hypotheses = cursor.fetchall()
-            print(f"   找到 {len(hypotheses)} 个假设")
+        # 3. 按 pool_config.json 为每个topic-subtopic组合分层抽取假设
+        config = load_pool_config(POOL_CONFIG_PATH)
+        for pool, first_rank, selected_hypotheses, scanned in iter_pools(conn, config):
+            topic_name = pool['topic_name']
+            print(f"\n📊 处理 {topic_name} 的 subtopic{pool['sub_topic']}...")
+            print(f"   扫描了 {scanned} 个假设")
             
-            if len(hypotheses) == 0:
-                print(f"   ⚠️  警告：{topic_name} subtopic{subtopic} 没有找到假设")
+            if not selected_hypotheses:
+                print(f"   ⚠️  警告：{topic_name} subtopic{pool['sub_topic']} 没有找到假设")
                 continue
             
-            # 随机选择8个假设（如果总数少于8个，则选择全部）
-            num_to_select = min(8, len(hypotheses))
-            selected_hypotheses = random.sample(hypotheses, num_to_select)
-            print(f"   随机选择了 {num_to_select} 个假设")
+            print(f"   分层抽样选择了 {len(selected_hypotheses)} 个假设")
             
-            # 将选中的假设插入到predefined_comparisons表
-            for rank, hypothesis in enumerate(selected_hypotheses, 1):
-                cursor.execute("""
-                    INSERT INTO predefined_comparisons (
-                        topic_name, hypothesis_rank, original_hypothesis_id, model_source,
-                        topic, sub_topic, strategy, hypothesis_content_en, hypothesis_content_zh,
-                        novelty_score, significance_score, soundness_score, feasibility_score,
-                        overall_winner_score
-                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                """, (
-                    topic_name,
-                    rank,
-                    hypothesis[0],  # id
-                    hypothesis[1],  # model_source
-                    hypothesis[2],  # topic
-                    hypothesis[3],  # sub_topic
-                    hypothesis[4],  # strategy
-                    hypothesis[5],  # hypothesis_id (作为content_en)
-                    '',  # hypothesis_content_zh (空字符串)
-                    hypothesis[8],  # novelty_score
-                    hypothesis[9],  # significance_score
-                    hypothesis[10], # soundness_score
-                    hypothesis[11], # feasibility_score
-                    hypothesis[12]  # overall_winner_score
-                ))
+            # 将选中的假设插入到predefined_comparisons表（同一主题的多个子主题rank顺延）
+            for rank, hypothesis in enumerate(selected_hypotheses, first_rank):
+                insert_predefined_row(conn, topic_name, rank, hypothesis)
             
-            print(f"   ✅ {topic_name} 完成，插入了 {num_to_select} 个假设")
+            print(f"   ✅ {topic_name} 完成，插入了 {len(selected_hypotheses)} 个假设")
         
         # 4. 提交更改
         conn.commit()
@@ -0,0 +1,302 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+按请求开启的性能剖析（生产环境排查慢路由）
+
+- 三种触发方式：REQUEST_PROFILER_ENABLED=1 剖析全部请求；REQUEST_PROFILER_SAMPLE_RATE 按比例抽样；
+  设置 REQUEST_PROFILER_SECRET 后，带有效签名头 X-Profile-Request 的请求（签名绑定路径与过期时间）
+- sampling 模式：后台线程每 REQUEST_PROFILER_INTERVAL 秒读取请求线程的调用栈，输出 collapsed stack（.folded），
+  可以直接导入 speedscope 或 flamegraph.pl；cprofile 模式：输出 pstats 文件（.prof），可用 snakeviz 查看
+- 每个剖析结果旁边有一个 .json 元数据文件（路由、状态码、耗时、最耗时的函数）；目录中最多保留 REQUEST_PROFILER_MAX_FILES 个
+- /admin/profiles 列出剖析结果并提供下载
+- 三种触发方式都未开启时不注册任何请求钩子，没有额外开销
+
+环境变量:
+    REQUEST_PROFILER_ENABLED=0          剖析全部请求
+    REQUEST_PROFILER_SAMPLE_RATE=0      抽样比例（0~1）
+    REQUEST_PROFILER_SECRET=            签名头的密钥
+    REQUEST_PROFILER_MODE=sampling      sampling / cprofile
+    REQUEST_PROFILER_INTERVAL=0.005     采样间隔（秒）
+    REQUEST_PROFILER_DIR=profiles       输出目录
+    REQUEST_PROFILER_MAX_FILES=200      最多保留的剖析结果数
+
+用法:
+    python request_profiler.py sign /rate/topic1 [--ttl 600]   生成签名头
+    python request_profiler.py list                              列出剖析结果
+    python request_profiler.py top <文件名> [--limit 20]         打印最耗时的函数
+"""
+
+import argparse
+import cProfile
+import hashlib
+import hmac
+import io
+import json
+import os
+import pstats
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+
+REQUEST_PROFILER_ENABLED = os.environ.get('REQUEST_PROFILER_ENABLED', '0') == '1'
+REQUEST_PROFILER_SAMPLE_RATE = float(os.environ.get('REQUEST_PROFILER_SAMPLE_RATE', 0))
+REQUEST_PROFILER_SECRET = os.environ.get('REQUEST_PROFILER_SECRET', '')
+REQUEST_PROFILER_MODE = os.environ.get('REQUEST_PROFILER_MODE', 'sampling')
+REQUEST_PROFILER_INTERVAL = float(os.environ.get('REQUEST_PROFILER_INTERVAL', 0.005))
+REQUEST_PROFILER_DIR = os.environ.get('REQUEST_PROFILER_DIR', 'profiles')
+REQUEST_PROFILER_MAX_FILES = int(os.environ.get('REQUEST_PROFILER_MAX_FILES', 200))
+
+PROFILE_HEADER = 'X-Profile-Request'
+
+# 不剖析的端点（剖析结果页面本身与静态文件）
+EXCLUDED_ENDPOINTS = ('admin_profiles', 'admin_profile_file', 'static')
+
+# 元数据中保留的最耗时函数数
+TOP_FUNCTIONS = 10
+
+PROFILE_NAME_PATTERN = re.compile(r'^[\w.-]+\.(folded|prof)$')
+
+
+def sign(path, expires, secret=REQUEST_PROFILER_SECRET):
+    """签名头的值：<过期时间戳>.<HMAC-SHA256(路径:过期时间)>"""
+    digest = hmac.new(secret.encode(), f"{path}:{int(expires)}".encode(), hashlib.sha256).hexdigest()
+    return f"{int(expires)}.{digest}"
+
+
+def verify(value, path, secret=REQUEST_PROFILER_SECRET, now=None):
+    """签名与路径匹配且未过期"""
+    if not secret or not value or '.' not in value:
+        return False
+    expires, _ = value.split('.', 1)
+    if not expires.isdigit() or int(expires) < (time.time() if now is None else now):
+        return False
+    return hmac.compare_digest(value, sign(path, int(expires), secret))
+
+
+def frame_label(frame):
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class StackSampler:
+    """后台线程定时读取目标线程的调用栈，按 collapsed stack 计数"""
+
+    def __init__(self, thread_id, interval=REQUEST_PROFILER_INTERVAL):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._run, name='request-profiler', daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+        self.thread.join()
+
+    def _run(self):
+        while not self.stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(frame_label(frame))
+                frame = frame.f_back
+            if stack:
+                self.stacks[';'.join(reversed(stack))] += 1
+
+    def write(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+    def top_functions(self, limit=TOP_FUNCTIONS):
+        """按自身采样数（栈顶函数）排序"""
+        leaves = Counter()
+        for stack, count in self.stacks.items():
+            leaves[stack.rsplit(';', 1)[-1]] += count
+        total = sum(leaves.values()) or 1
+        return [{'function': name, 'samples': count, 'percent': round(100 * count / total, 1)}
+                for name, count in leaves.most_common(limit)]
+
+
+class CProfileRecorder:
+    """cProfile：确定性记录，开销较大，适合少量请求"""
+
+    def __init__(self):
+        self.profile = cProfile.Profile()
+
+    def start(self):
+        self.profile.enable()
+
+    def stop(self):
+        self.profile.disable()
+
+    def write(self, path):
+        self.profile.dump_stats(path)
+
+    def top_functions(self, limit=TOP_FUNCTIONS):
+        """按自身耗时排序"""
+        stats = pstats.Stats(self.profile, stream=io.StringIO())
+        rows = sorted(stats.stats.items(), key=lambda item: item[1][2], reverse=True)[:limit]
+        return [{'function': f"{name} ({os.path.basename(filename)}:{line})", 'calls': calls,
+                 'self_ms': round(tottime * 1000, 2), 'cumulative_ms': round(cumtime * 1000, 2)}
+                for (filename, line, name), (_, calls, tottime, cumtime, _) in rows]
+
+
+def should_profile(path, header_value, enabled=None, sample_rate=None, secret=None):
+    """返回触发方式（'env' / 'signed' / 'sampled'），不剖析时返回None"""
+    if REQUEST_PROFILER_ENABLED if enabled is None else enabled:
+        return 'env'
+    if header_value and verify(header_value, path, REQUEST_PROFILER_SECRET if secret is None else secret):
+        return 'signed'
+    rate = REQUEST_PROFILER_SAMPLE_RATE if sample_rate is None else sample_rate
+    if rate > 0 and random.random() < rate:
+        return 'sampled'
+    return None
+
+
+def save_profile(recorder, directory, meta):
+    """写入剖析结果与元数据，超出上限时删除最早的结果，返回文件名"""
+    os.makedirs(directory, exist_ok=True)
+    extension = 'prof' if isinstance(recorder, CProfileRecorder) else 'folded'
+    endpoint = re.sub(r'[^\w-]', '_', meta['endpoint'] or 'unknown')
+    name = f"{time.strftime('%Y%m%d-%H%M%S')}-{int(time.time() * 1000) % 1000:03d}-{endpoint}-{meta['duration_ms']:.0f}ms.{extension}"
+    recorder.write(os.path.join(directory, name))
+    meta = dict(meta, file=name, top_functions=recorder.top_functions())
+    with open(os.path.join(directory, name + '.json'), 'w', encoding='utf-8') as f:
+        json.dump(meta, f, ensure_ascii=False, indent=2)
+    prune_profiles(directory)
+    return name
+
+
+def list_profiles(directory=REQUEST_PROFILER_DIR):
+    """剖析结果的元数据，最新的在前"""
+    if not os.path.isdir(directory):
+        return []
+    profiles = []
+    for name in os.listdir(directory):
+        if not name.endswith('.json'):
+            continue
+        try:
+            with open(os.path.join(directory, name), encoding='utf-8') as f:
+                profiles.append(json.load(f))
+        except (OSError, ValueError):
+            continue
+    return sorted(profiles, key=lambda meta: meta.get('started_at', 0), reverse=True)
+
+
+def prune_profiles(directory, max_files=REQUEST_PROFILER_MAX_FILES):
+    for meta in list_profiles(directory)[max_files:]:
+        for name in (meta['file'], meta['file'] + '.json'):
+            try:
+                os.remove(os.path.join(directory, name))
+            except OSError:
+                pass
+
+
+def init_app(app, directory=REQUEST_PROFILER_DIR, mode=REQUEST_PROFILER_MODE):
+    """注册 /admin/profiles；开启了某种触发方式时才注册剖析钩子"""
+    from flask import abort, g, render_template, request, send_from_directory
+
+    if mode not in ('sampling', 'cprofile'):
+        raise ValueError(f"未知的剖析模式: {mode}（可选: sampling, cprofile）")
+    directory = os.path.abspath(directory)
+
+    @app.route('/admin/profiles')
+    def admin_profiles():
+        """管理员页面 - 请求剖析结果"""
+        return render_template('admin_profiles.html', profiles=list_profiles(directory), mode=mode,
+                               enabled=REQUEST_PROFILER_ENABLED, sample_rate=REQUEST_PROFILER_SAMPLE_RATE,
+                               signed=bool(REQUEST_PROFILER_SECRET))
+
+    @app.route('/admin/profiles/<name>')
+    def admin_profile_file(name):
+        """下载一个剖析结果"""
+        if not PROFILE_NAME_PATTERN.match(name):
+            abort(404)
+        return send_from_directory(directory, name, as_attachment=True)
+
+    if not (REQUEST_PROFILER_ENABLED or REQUEST_PROFILER_SAMPLE_RATE > 0 or REQUEST_PROFILER_SECRET):
+        return app
+
+    @app.before_request
+    def start_profile():
+        if request.endpoint in EXCLUDED_ENDPOINTS:
+            return
+        trigger = should_profile(request.path, request.headers.get(PROFILE_HEADER))
+        if trigger is None:
+            return
+        recorder = CProfileRecorder() if mode == 'cprofile' else StackSampler(threading.get_ident())
+        g.request_profile = (recorder, trigger, time.time(), time.perf_counter())
+        recorder.start()
+
+    @app.after_request
+    def record_status(response):
+        if 'request_profile' in g:
+            g.request_profile_status = response.status_code
+        return response
+
+    @app.teardown_request
+    def stop_profile(exc):
+        profile = g.pop('request_profile', None)
+        if profile is None:
+            return
+        recorder, trigger, started_at, start = profile
+        recorder.stop()
+        try:
+            name = save_profile(recorder, directory, {
+                'endpoint': request.endpoint, 'method': request.method, 'path': request.path,
+                'status': g.pop('request_profile_status', 500), 'trigger': trigger, 'mode': mode,
+                'started_at': started_at, 'duration_ms': round((time.perf_counter() - start) * 1000, 2),
+            })
+            print(f"🔬 已剖析 {request.method} {request.path}: {name}")
+        except OSError as e:
+            print(f"⚠️  剖析结果写入失败: {e}")
+
+    return app
+
+
+def print_top(directory, name, limit):
+    """终端打印一个剖析结果中最耗时的函数"""
+    path = os.path.join(directory, name)
+    if name.endswith('.prof'):
+        pstats.Stats(path).sort_stats('cumulative').print_stats(limit)
+        return
+    leaves = Counter()
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            stack, count = line.rstrip('\n').rsplit(' ', 1)
+            leaves[stack.rsplit(';', 1)[-1]] += int(count)
+    total = sum(leaves.values()) or 1
+    for function, count in leaves.most_common(limit):
+        print(f"{count:>8}{100 * count / total:>8.1f}%  {function}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='请求性能剖析')
+    parser.add_argument('command', choices=['sign', 'list', 'top'])
+    parser.add_argument('target', nargs='?', help='sign: 请求路径；top: 剖析结果文件名')
+    parser.add_argument('--dir', default=REQUEST_PROFILER_DIR, help='剖析结果目录')
+    parser.add_argument('--ttl', type=int, default=600, help='签名有效期（秒）')
+    parser.add_argument('--limit', type=int, default=20, help='打印的函数数')
+    args = parser.parse_args()
+
+    if args.command == 'sign':
+        if not REQUEST_PROFILER_SECRET or not args.target:
+            parser.error('sign 需要请求路径，并设置 REQUEST_PROFILER_SECRET')
+        print(f"{PROFILE_HEADER}: {sign(args.target, time.time() + args.ttl)}")
+    elif args.command == 'list':
+        profiles = list_profiles(args.dir)
+        if not profiles:
+            print("ℹ️  没有剖析结果")
+        for meta in profiles:
+            print(f"🔬 {meta['file']}  {meta['method']} {meta['path']}  {meta['status']}  "
+                  f"{meta['duration_ms']} ms  ({meta['trigger']})")
+    else:
+        if not args.target:
+            parser.error('top 需要剖析结果文件名')
+        print_top(args.dir, args.target, args.limit)
@@ -0,0 +1,330 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+假设全文检索（SQLite FTS5）
+
+- 索引 hypothesis.hypothesis_content 以及 predefined_comparisons 中英文/中文内容的
+  title、Problem_Statement、Motivation、Proposed_Method 四个字段
+- 使用 trigram 分词器：按3个字符切分，中文不需要分词也能检索子串
+- rowid 编码来源：hypothesis.id*4 + 0，predefined_comparisons.id*4 + 1（英文）/ +2（中文）
+- 触发器在插入、更新、删除时同步索引；重建 predefined_comparisons（DROP TABLE）会删除触发器，
+  ensure_search_index() 检测到触发器缺失时重建对应部分的索引
+- 索引在启动预热和命令行中创建/重建；检索请求只读取一次 sqlite_master 检查，
+  需要重建时交给后台线程（rebuild_in_background），不在请求中执行DDL
+
+用法:
+    python search_index.py --rebuild
+    python search_index.py "retrieval augmented" [--source predefined] [--lang zh]
+"""
+
+import argparse
+import json
+import sqlite3
+import threading
+
+from markupsafe import Markup, escape
+
+# 配置数据库路径
+DB_PATH = "hypothesis_data.db"
+
+FTS_TABLE = 'hypothesis_fts'
+
+# 被索引的JSON字段 -> FTS列名
+INDEXED_FIELDS = {
+    'title': 'title',
+    'Problem_Statement': 'problem_statement',
+    'Motivation': 'motivation',
+    'Proposed_Method': 'proposed_method',
+}
+
+# 索引来源：名称 -> (表名, 内容列, rowid偏移, 语言)
+SOURCES = {
+    'hypothesis': ('hypothesis', 'hypothesis_content', 0, 'en'),
+    'predefined_en': ('predefined_comparisons', 'hypothesis_content_en', 1, 'en'),
+    'predefined_zh': ('predefined_comparisons', 'hypothesis_content_zh', 2, 'zh'),
+}
+ROWID_STRIDE = 4
+
+# trigram 分词器无法用 MATCH 检索少于3个字符的词
+MIN_MATCH_LENGTH = 3
+
+# snippet() 使用的高亮标记（控制字符不会出现在正文中，转义后再替换为 <mark>）
+HIGHLIGHT_START = '\x02'
+HIGHLIGHT_END = '\x03'
+SNIPPET_TOKENS = 64
+
+_rebuild_lock = threading.Lock()
+_rebuild_state = {'running': False}
+
+
+def _field_expressions(column):
+    """从JSON内容中取出各个字段的SQL表达式（非法JSON视为空）"""
+    return [f"CASE WHEN json_valid({column}) THEN json_extract({column}, '$.{field}') END"
+            for field in INDEXED_FIELDS]
+
+
+def _field_values(content):
+    """与 _field_expressions 相同的取值（已解析的JSON）：对象、数组与 json_extract 一样保留为JSON文本"""
+    values = []
+    for field in INDEXED_FIELDS:
+        value = content.get(field) if isinstance(content, dict) else None
+        values.append(json.dumps(value, ensure_ascii=False, separators=(',', ':'))
+                      if isinstance(value, (dict, list)) else value)
+    return values
+
+
+def _trigger_sql(name, table, column, offset):
+    """为一个来源生成 INSERT / UPDATE / DELETE 触发器"""
+    fts_columns = ', '.join(INDEXED_FIELDS.values())
+    new_values = ', '.join(_field_expressions(f'NEW.{column}'))
+    insert = f"""
+        INSERT INTO {FTS_TABLE} (rowid, {fts_columns})
+        VALUES (NEW.id * {ROWID_STRIDE} + {offset}, {new_values});
+    """
+    delete = f"DELETE FROM {FTS_TABLE} WHERE rowid = OLD.id * {ROWID_STRIDE} + {offset};"
+    return [
+        f"CREATE TRIGGER IF NOT EXISTS {name}_fts_insert AFTER INSERT ON {table} BEGIN {insert} END",
+        f"CREATE TRIGGER IF NOT EXISTS {name}_fts_update AFTER UPDATE OF {column} ON {table} "
+        f"BEGIN {delete} {insert} END",
+        f"CREATE TRIGGER IF NOT EXISTS {name}_fts_delete AFTER DELETE ON {table} BEGIN {delete} END",
+    ]
+
+
+def _existing(conn, kind):
+    return {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = ?", (kind,))}
+
+
+def rebuild_source(conn, name):
+    """重建一个来源的索引内容；zstd压缩的内容（content_compression.py）在Python中解压后索引"""
+    table, column, offset, _ = SOURCES[name]
+    fts_columns = ', '.join(INDEXED_FIELDS.values())
+    conn.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid % {ROWID_STRIDE} = ?", (offset,))
+    conn.execute(f"""
+        INSERT INTO {FTS_TABLE} (rowid, {fts_columns})
+        SELECT id * {ROWID_STRIDE} + {offset}, {', '.join(_field_expressions(column))}
+        FROM {table} WHERE typeof({column}) != 'blob'
+    """)
+    compressed = conn.execute(f"SELECT id, {column} FROM {table} WHERE typeof({column}) = 'blob'").fetchall()
+    if compressed:
+        from content_compression import decode_content
+        rows = []
+        for row_id, value in compressed:
+            try:
+                content = json.loads(decode_content(conn, value))
+            except json.JSONDecodeError:
+                content = None
+            rows.append((row_id * ROWID_STRIDE + offset, *_field_values(content)))
+        conn.executemany(f"INSERT INTO {FTS_TABLE} (rowid, {fts_columns}) VALUES (?{', ?' * len(INDEXED_FIELDS)})",
+                         rows)
+
+
+def _trigger_names(name):
+    return [f"{name}_fts_{event}" for event in ('insert', 'update', 'delete')]
+
+
+def missing_sources(conn):
+    """
+    需要（重新）填充索引的来源：FTS表不存在时是全部来源，否则是触发器缺失（表被重建过）的来源
+    返回 (FTS表是否存在, 来源列表)；只读取一次 sqlite_master
+    """
+    objects = set(conn.execute("SELECT type, name FROM sqlite_master WHERE type IN ('table', 'trigger')"))
+    exists = ('table', FTS_TABLE) in objects
+    missing = [name for name, (table, _, _, _) in SOURCES.items()
+               if ('table', table) in objects
+               and (not exists or any(('trigger', trigger) not in objects for trigger in _trigger_names(name)))]
+    return exists, missing
+
+
+def ensure_search_index(conn, rebuild=False):
+    """
+    创建FTS表与触发器；新建的或触发器缺失（表被重建过）的来源会重新填充索引
+    都已存在时只读取一次 sqlite_master，不执行DDL也不提交。返回本次重建的来源列表
+    """
+    exists, missing = missing_sources(conn)
+    if exists and not missing and not rebuild:
+        return []
+
+    # 多个进程同时创建：持有写锁后重新检查（调用方已在事务中时直接在该事务中执行）
+    if not conn.in_transaction:
+        conn.execute("BEGIN IMMEDIATE")
+    try:
+        exists, missing = missing_sources(conn)
+        if not exists:
+            conn.execute(f"""
+                CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5(
+                    {', '.join(INDEXED_FIELDS.values())},
+                    tokenize = 'trigram'
+                )
+            """)
+        tables = _existing(conn, 'table')
+        rebuilt = []
+        for name, (table, column, offset, _) in SOURCES.items():
+            if table not in tables or (name not in missing and not rebuild):
+                continue
+            for statement in _trigger_sql(name, table, column, offset):
+                conn.execute(statement)
+            rebuild_source(conn, name)
+            rebuilt.append(name)
+        if rebuilt:
+            conn.execute(f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('optimize')")
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return rebuilt
+
+
+def rebuild_in_background(db_path):
+    """在后台线程中补齐缺失的索引；已有线程在重建时不重复启动"""
+    with _rebuild_lock:
+        if _rebuild_state['running']:
+            return None
+        _rebuild_state['running'] = True
+
+    def run():
+        try:
+            conn = sqlite3.connect(db_path, timeout=30)
+            try:
+                rebuilt = ensure_search_index(conn)
+            finally:
+                conn.close()
+            if rebuilt:
+                print(f"✅ 已重建检索索引: {', '.join(rebuilt)}")
+        except Exception as e:
+            print(f"❌ 检索索引后台重建失败: {e}")
+        finally:
+            with _rebuild_lock:
+                _rebuild_state['running'] = False
+
+    thread = threading.Thread(target=run, name='search-index-rebuild', daemon=True)
+    thread.start()
+    return thread
+
+
+def build_query(text):
+    """
+    把用户输入转换为检索条件：
+    不少于3个字符的词作为FTS5短语（双引号转义）用 MATCH 检索，
+    更短的词（例如两个汉字）退化为对索引列的 LIKE 过滤
+    """
+    match_terms, like_terms = [], []
+    for term in text.split():
+        if len(term) >= MIN_MATCH_LENGTH:
+            match_terms.append('"' + term.replace('"', '""') + '"')
+        else:
+            like_terms.append('%' + term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%')
+    return ' '.join(match_terms), like_terms
+
+
+def highlight(snippet):
+    """转义snippet中的HTML，再把高亮标记替换为 <mark>"""
+    escaped = str(escape(snippet or ''))
+    return Markup(escaped.replace(HIGHLIGHT_START, '<mark>').replace(HIGHLIGHT_END, '</mark>'))
+
+
+def _source_of(rowid):
+    offset = rowid % ROWID_STRIDE
+    for name, (_, _, source_offset, lang) in SOURCES.items():
+        if source_offset == offset:
+            return name, lang
+    return None, None
+
+
+def _load_metadata(conn, results):
+    """为检索结果补充主题、模型来源等信息"""
+    hypothesis_ids = [r['id'] for r in results if r['source'] == 'hypothesis']
+    predefined_ids = [r['id'] for r in results if r['source'] != 'hypothesis']
+    metadata = {}
+    if hypothesis_ids:
+        for row in conn.execute(f"""
+            SELECT id, 'topic' || topic, model_source, strategy, NULL, id FROM hypothesis
+            WHERE id IN ({', '.join('?' for _ in hypothesis_ids)})
+        """, hypothesis_ids):
+            metadata[('hypothesis', row[0])] = row[1:]
+    if predefined_ids:
+        for row in conn.execute(f"""
+            SELECT id, topic_name, model_source, strategy, hypothesis_rank, original_hypothesis_id
+            FROM predefined_comparisons WHERE id IN ({', '.join('?' for _ in predefined_ids)})
+        """, predefined_ids):
+            metadata[('predefined', row[0])] = row[1:]
+
+    for result in results:
+        key = ('hypothesis' if result['source'] == 'hypothesis' else 'predefined', result['id'])
+        topic, model_source, strategy, rank, hypothesis_id = metadata.get(key, (None,) * 5)
+        result.update({'topic': topic, 'model_source': model_source, 'strategy': strategy,
+                       'rank': rank, 'hypothesis_id': hypothesis_id})
+    return results
+
+
+def search(conn, text, source=None, lang=None, limit=20, offset=0):
+    """
+    检索假设，按 bm25 相关度排序（标题权重最高），返回 (结果列表, 总数)
+    source: 'hypothesis' / 'predefined'；lang: 'en' / 'zh'
+    """
+    match, like_terms = build_query(text)
+    if not match and not like_terms:
+        return [], 0
+
+    conditions, params = [], []
+    if match:
+        conditions.append(f"{FTS_TABLE} MATCH ?")
+        params.append(match)
+    for pattern in like_terms:
+        conditions.append('(' + ' OR '.join(f"{column} LIKE ? ESCAPE '\\'" for column in INDEXED_FIELDS.values()) + ')')
+        params.extend([pattern] * len(INDEXED_FIELDS))
+    offsets = [o for name, (_, _, o, source_lang) in SOURCES.items()
+               if (source is None or name.startswith(source)) and (lang is None or source_lang == lang)]
+    if not offsets:
+        return [], 0
+    conditions.append(f"rowid % {ROWID_STRIDE} IN ({', '.join(str(o) for o in offsets)})")
+    where = ' AND '.join(conditions)
+
+    total = conn.execute(f"SELECT COUNT(*) FROM {FTS_TABLE} WHERE {where}", params).fetchone()[0]
+    # 只有 LIKE 条件时没有相关度，按rowid排序
+    order = f"bm25({FTS_TABLE}, 10.0, 2.0, 1.0, 1.0)" if match else "rowid"
+    rows = conn.execute(f"""
+        SELECT rowid, title,
+               snippet({FTS_TABLE}, -1, ?, ?, '…', {SNIPPET_TOKENS}),
+               {order}
+        FROM {FTS_TABLE}
+        WHERE {where}
+        ORDER BY {order}
+        LIMIT ? OFFSET ?
+    """, [HIGHLIGHT_START, HIGHLIGHT_END] + params + [limit, offset]).fetchall()
+
+    results = []
+    for rowid, title, snippet, score in rows:
+        name, result_lang = _source_of(rowid)
+        results.append({
+            'id': rowid // ROWID_STRIDE,
+            'source': name,
+            'lang': result_lang,
+            'title': title,
+            'snippet': highlight(snippet),
+            'score': score if match else None,
+        })
+    return _load_metadata(conn, results), total
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='假设全文检索')
+    parser.add_argument('query', nargs='?', help='检索词')
+    parser.add_argument('--db', default=DB_PATH, help='数据库路径')
+    parser.add_argument('--rebuild', action='store_true', help='重建全部索引')
+    parser.add_argument('--source', choices=['hypothesis', 'predefined'], help='只检索某个来源')
+    parser.add_argument('--lang', choices=['en', 'zh'], help='只检索某种语言')
+    parser.add_argument('--limit', type=int, default=10, help='返回条数')
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.db)
+    rebuilt = ensure_search_index(conn, rebuild=args.rebuild)
+    if rebuilt:
+        print(f"✅ 已重建索引: {', '.join(rebuilt)}")
+    if args.query:
+        results, total = search(conn, args.query, source=args.source, lang=args.lang, limit=args.limit)
+        print(f"🔍 \"{args.query}\" 共 {total} 条结果")
+        for result in results:
+            snippet = result['snippet'].replace('<mark>', '[').replace('</mark>', ']')
+            print(f"\n[{result['source']}#{result['id']}] {result['topic']} {result['title']}")
+            print(f"   {snippet}")
+    conn.close()
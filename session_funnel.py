@@ -0,0 +1,318 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+评分会话完成漏斗与流失分析
+
+- 一次窗口函数查询按 (session_id, rating_id) 顺序遍历 ratings，得到每条评分与同一会话上一条评分的时间间隔；
+  会话级的信息（主题、session_id）只在会话的第一行返回
+- NumPy 按会话边界（reduceat）得到每个会话到达的最大比较编号与时长，再汇总每个主题的漏斗
+  （到达第k个比较的会话数）、在第k个比较后流失的会话数、完成率、评论率、每个比较编号的用时中位数
+- 结果缓存：FUNNEL_CACHE_TTL 秒内直接返回；之后 ratings / comments 的行数与最大ID不变时仍用缓存
+- 每个会话的比较次数来自 pool_config.json，可以按主题不同；会话按所在主题的比较次数判断是否完成
+- 只记录了提交评分的时间，会话中第1个比较的用时（从打开页面到提交）无法得到；
+  没有提交过任何评分的会话也不在统计范围内
+
+用法:
+    python session_funnel.py [--db hypothesis_data.db]
+    python session_funnel.py --benchmark 1000000
+"""
+
+import argparse
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+from pool_sampler import DEFAULT_CONFIG, POOL_CONFIG_PATH, load_pool_config
+
+# 配置数据库路径
+DB_PATH = "hypothesis_data.db"
+
+# 每个会话的默认比较次数（pool_config.json 中未配置时）
+COMPARISONS_PER_SESSION = DEFAULT_CONFIG['comparisons_per_session']
+
+FUNNEL_CACHE_TTL = float(os.environ.get('FUNNEL_CACHE_TTL', 30))
+
+# 分批读取的行数
+FETCH_BATCH_SIZE = 100000
+
+_cache = {}
+_cache_lock = threading.Lock()
+
+
+def ensure_funnel_indexes(conn):
+    """窗口按 (session_id, rating_id) 分区排序，索引让SQLite按顺序读取而不必整体排序"""
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_ratings_session_rating ON ratings(session_id, rating_id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_comments_session ON comments(session_id)")
+    conn.commit()
+
+
+def load_session_rows(conn):
+    """
+    一次窗口函数查询，返回 (主题列表, 会话数组, 评分数组)
+    会话数组：topic（编码）、reached、duration_seconds、commented
+    评分数组：topic（编码）、comparison_number、gap_seconds（会话第一条为-1）
+    """
+    # julianday 在子查询中每行只计算一次；(session_id, rating_id) 索引提供窗口需要的顺序，
+    # ORDER BY 写在子查询内与窗口顺序相同，不需要临时B树再排序一次
+    cursor = conn.cursor()
+    cursor.execute("""
+        WITH r AS (
+            SELECT session_id, rating_id, topic_name, comparison_number, julianday(timestamp) AS jd
+            FROM ratings
+        )
+        SELECT CASE WHEN first THEN session_id END, CASE WHEN first THEN topic_name END, comparison_number, gap
+        FROM (
+            SELECT session_id, rating_id, topic_name, comparison_number,
+                   LAG(rating_id) OVER w IS NULL AS first,
+                   COALESCE((jd - LAG(jd) OVER w) * 86400, -1) AS gap
+            FROM r
+            WINDOW w AS (PARTITION BY session_id ORDER BY rating_id)
+            ORDER BY session_id, rating_id
+        )
+    """)
+    session_ids, session_topics, firsts, comparisons, gaps = [], [], [], [], []
+    while True:
+        rows = cursor.fetchmany(FETCH_BATCH_SIZE)
+        if not rows:
+            break
+        ids, topics, numbers, batch_gaps = zip(*rows)
+        firsts.append(np.array([session_id is not None for session_id in ids]))
+        session_ids.extend(session_id for session_id in ids if session_id is not None)
+        session_topics.extend(topic for session_id, topic in zip(ids, topics) if session_id is not None)
+        comparisons.append(np.array(numbers, dtype=np.int64))
+        gaps.append(np.array(batch_gaps, dtype=np.float64))
+
+    commented = {row[0] for row in conn.execute("SELECT DISTINCT session_id FROM comments")}
+    if not session_ids:
+        empty = np.zeros(0, dtype=np.int64)
+        return [], {'topic': empty, 'reached': empty, 'duration_seconds': np.zeros(0), 'commented': empty.astype(bool)}, \
+            {'topic': empty, 'comparison_number': empty, 'gap_seconds': np.zeros(0)}
+
+    first = np.concatenate(firsts)
+    comparison_number = np.concatenate(comparisons)
+    gap_seconds = np.concatenate(gaps)
+    starts = np.flatnonzero(first)
+    topics, session_topic = np.unique(np.array(session_topics, dtype=object), return_inverse=True)
+
+    sessions = {
+        'topic': session_topic,
+        'reached': np.maximum.reduceat(comparison_number, starts),
+        # 相邻评分间隔之和 = 最后一条与第一条评分的时间差
+        'duration_seconds': np.add.reduceat(np.maximum(gap_seconds, 0), starts),
+        'commented': np.array([session_id in commented for session_id in session_ids]),
+    }
+    rows = {
+        'topic': session_topic[np.cumsum(first) - 1],
+        'comparison_number': comparison_number,
+        'gap_seconds': gap_seconds,
+    }
+    return [str(topic) for topic in topics], sessions, rows
+
+
+def _median(values):
+    return round(float(np.median(values)), 1) if len(values) else None
+
+
+def _rate(count, total):
+    return round(count / total, 4) if total else None
+
+
+def summarize(sessions, rows, comparisons):
+    """
+    一组会话（主题或全部）的漏斗统计；rows 为这些会话的全部评分
+    comparisons 为比较次数，或每个会话所在主题的比较次数（数组）
+    """
+    total = len(sessions['reached'])
+    targets = np.broadcast_to(np.asarray(comparisons, dtype=np.int64), sessions['reached'].shape)
+    max_steps = int(np.max(comparisons, initial=0))
+    reached = np.clip(sessions['reached'], 0, targets)
+    # 到达第k个比较的会话数 = 最大比较编号 >= k 的会话数
+    reached_counts = np.bincount(reached, minlength=max_steps + 1)
+    at_least = np.cumsum(reached_counts[::-1])[::-1]
+    completed = reached >= targets
+    dropped_counts = np.bincount(reached[~completed], minlength=max_steps + 1)
+
+    steps = []
+    for k in range(1, max_steps + 1):
+        gaps = rows['gap_seconds'][(rows['comparison_number'] == k) & (rows['gap_seconds'] >= 0)]
+        steps.append({
+            'comparison': k,
+            'sessions': int(at_least[k]),
+            'rate': _rate(int(at_least[k]), total),
+            'dropped_after': int(dropped_counts[k]),
+            'median_seconds': _median(gaps),
+        })
+
+    durations = sessions['duration_seconds']
+    return {
+        'sessions': total,
+        'completed': int(completed.sum()),
+        'completion_rate': _rate(int(completed.sum()), total),
+        'commented': int(sessions['commented'].sum()),
+        'comment_rate': _rate(int(sessions['commented'].sum()), total),
+        'median_duration_completed': _median(durations[completed]),
+        'median_duration_dropped': _median(durations[~completed]),
+        'steps': steps,
+    }
+
+
+def compute_funnel(topics, sessions, rows, comparisons=COMPARISONS_PER_SESSION, topic_comparisons=None):
+    """按主题和全部会话计算漏斗；topic_comparisons 为按主题覆盖的比较次数 {topic_name: 次数}"""
+    topic_comparisons = topic_comparisons or {}
+    per_topic = np.array([topic_comparisons.get(topic, comparisons) for topic in topics] or [comparisons],
+                         dtype=np.int64)
+    result = {
+        'comparisons_per_session': comparisons,
+        'topic_comparisons': {topic: int(n) for topic, n in zip(topics, per_topic)},
+        'overall': summarize(sessions, rows, per_topic[sessions['topic']]),
+        'topics': {},
+    }
+    for code, topic in enumerate(topics):
+        in_topic = sessions['topic'] == code
+        rows_in_topic = rows['topic'] == code
+        result['topics'][topic] = summarize({column: values[in_topic] for column, values in sessions.items()},
+                                            {column: values[rows_in_topic] for column, values in rows.items()},
+                                            int(per_topic[code]))
+    return result
+
+
+def comparisons_from_config(config):
+    """从抽样配置（pool_config.json）得到 (默认比较次数, 按主题覆盖的比较次数)"""
+    return config['comparisons_per_session'], {
+        topic: settings['comparisons_per_session']
+        for topic, settings in config['topics'].items() if 'comparisons_per_session' in settings
+    }
+
+
+def funnel_cache_key(conn):
+    """缓存键：ratings、comments 的行数与最大ID"""
+    ratings = conn.execute("SELECT COUNT(*), MAX(rating_id) FROM ratings").fetchone()
+    comments = conn.execute("SELECT COUNT(*), MAX(comment_id) FROM comments").fetchone()
+    return tuple(ratings) + tuple(comments)
+
+
+def get_funnel_report(conn, comparisons=COMPARISONS_PER_SESSION, topic_comparisons=None):
+    """返回漏斗报告；TTL 内直接使用缓存，TTL 过后数据未变化时也使用缓存"""
+    with _cache_lock:
+        cached = _cache.get('report')
+    if cached is not None and time.monotonic() - cached['checked_at'] < FUNNEL_CACHE_TTL:
+        return cached['report']
+
+    key = funnel_cache_key(conn) + (comparisons, tuple(sorted((topic_comparisons or {}).items())))
+    if cached is not None and cached['key'] == key:
+        with _cache_lock:
+            cached['checked_at'] = time.monotonic()
+        return cached['report']
+
+    start = time.perf_counter()
+    ensure_funnel_indexes(conn)
+    topics, sessions, rows = load_session_rows(conn)
+    report = compute_funnel(topics, sessions, rows, comparisons, topic_comparisons)
+    report.update({
+        'ratings_count': key[0],
+        'computed_at': datetime.now().isoformat(timespec='seconds'),
+        'compute_seconds': round(time.perf_counter() - start, 4),
+    })
+    with _cache_lock:
+        _cache['report'] = {'key': key, 'report': report, 'checked_at': time.monotonic()}
+    return report
+
+
+def print_report(report):
+    """在终端打印漏斗"""
+    print(f"📊 会话漏斗（{report['ratings_count']} 条评分，耗时 {report['compute_seconds']}s）\n")
+
+    def show(label, stats):
+        print(f"{label}: {stats['sessions']} 个会话，完成率 {stats['completion_rate']}，评论率 {stats['comment_rate']}，"
+              f"时长中位数 完成 {stats['median_duration_completed']}s / 流失 {stats['median_duration_dropped']}s")
+        print("   " + "  ".join(f"#{step['comparison']} {step['sessions']}(-{step['dropped_after']}, "
+                                 f"{step['median_seconds']}s)" for step in stats['steps']))
+
+    show('ALL', report['overall'])
+    for topic, stats in sorted(report['topics'].items()):
+        show(topic, stats)
+
+
+def create_benchmark_db(num_ratings, num_topics=11, comparisons=COMPARISONS_PER_SESSION, seed=0):
+    """生成约num_ratings条评分的内存数据库：会话随机在某个比较后流失"""
+    rng = np.random.default_rng(seed)
+    conn = sqlite3.connect(':memory:')
+    conn.execute("""
+        CREATE TABLE ratings (
+            rating_id INTEGER PRIMARY KEY AUTOINCREMENT, session_id TEXT NOT NULL, topic_name TEXT NOT NULL,
+            comparison_number INTEGER NOT NULL, timestamp TIMESTAMP
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE comments (
+            comment_id INTEGER PRIMARY KEY AUTOINCREMENT, session_id TEXT NOT NULL, topic_name TEXT NOT NULL
+        )
+    """)
+    num_sessions = max(1, num_ratings * 2 // (comparisons + 2))
+    lengths = np.minimum(rng.geometric(0.15, num_sessions), comparisons)
+    topics = rng.integers(1, num_topics + 1, num_sessions)
+    starts = rng.integers(0, 30 * 86400, num_sessions)
+    base = datetime(2026, 1, 1, tzinfo=timezone.utc).timestamp()
+
+    def rows():
+        for session in range(num_sessions):
+            elapsed = starts[session]
+            for k in range(1, lengths[session] + 1):
+                elapsed += int(rng.integers(20, 400))
+                yield (f"s{session}", f"topic{topics[session]}", k,
+                       datetime.fromtimestamp(base + elapsed, timezone.utc).strftime('%Y-%m-%d %H:%M:%S'))
+
+    conn.executemany("INSERT INTO ratings (session_id, topic_name, comparison_number, timestamp) VALUES (?, ?, ?, ?)",
+                     rows())
+    completed = np.flatnonzero(lengths == comparisons)
+    conn.executemany("INSERT INTO comments (session_id, topic_name) VALUES (?, ?)",
+                     ((f"s{s}", f"topic{topics[s]}") for s in completed[::2]))
+    conn.commit()
+    return conn
+
+
+def benchmark(num_ratings):
+    """在随机数据上测量漏斗计算耗时（有/无会话索引）"""
+    print(f"🔄 生成约 {num_ratings} 条评分...")
+    conn = create_benchmark_db(num_ratings)
+    count = conn.execute("SELECT COUNT(*) FROM ratings").fetchone()[0]
+
+    for label in ('无索引', '有索引'):
+        if label == '有索引':
+            ensure_funnel_indexes(conn)
+        start = time.perf_counter()
+        topics, sessions, rows = load_session_rows(conn)
+        loaded = time.perf_counter()
+        compute_funnel(topics, sessions, rows)
+        done = time.perf_counter()
+        print(f"📊 {label}: {count} 条评分，查询 {loaded - start:.2f}s，汇总 {done - loaded:.2f}s")
+
+    _cache.clear()
+    get_funnel_report(conn)
+    start = time.perf_counter()
+    get_funnel_report(conn)
+    print(f"📊 缓存命中: {(time.perf_counter() - start) * 1000:.3f} ms")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='评分会话完成漏斗')
+    parser.add_argument('--db', default=DB_PATH, help='数据库路径')
+    parser.add_argument('--config', default=POOL_CONFIG_PATH, help='抽样配置文件（每个会话的比较次数）')
+    parser.add_argument('--benchmark', type=int, metavar='N', help='用N条随机评分测试性能')
+    args = parser.parse_args()
+
+    if args.benchmark:
+        benchmark(args.benchmark)
+    else:
+        try:
+            comparisons, topic_comparisons = comparisons_from_config(load_pool_config(args.config))
+        except (OSError, ValueError) as e:
+            print(f"⚠️  无法读取 {args.config}，使用默认比较次数: {e}")
+            comparisons, topic_comparisons = COMPARISONS_PER_SESSION, {}
+        conn = sqlite3.connect(args.db)
+        print_report(get_funnel_report(conn, comparisons, topic_comparisons))
+        conn.close()
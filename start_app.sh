@@ -17,6 +17,10 @@ source venv/bin/activate
 echo "安装依赖包..."
 pip install -r requirements.txt
 
+# 生成静态文件指纹清单与预压缩文件，预编译模板
+echo "构建静态文件..."
+python build_static.py
+
 # 启动应用
 echo "启动Flask应用..."
 echo "访问地址: http://localhost:5001"
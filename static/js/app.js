@@ -2,6 +2,17 @@
 let isSubmitting = false;
 let currentLanguage = 'english'; // 默认英文
 
+// Offline submission queue (persisted in localStorage until the server confirms)
+const PENDING_QUEUE_KEY = 'pendingSubmissions';
+const FLUSH_RETRY_BASE_MS = 2000;
+const FLUSH_RETRY_MAX_MS = 30000;
+let flushInProgress = null;
+let flushRetryTimer = null;
+let flushRetryDelay = FLUSH_RETRY_BASE_MS;
+
+// Real-user performance samples for this page view (null when not collected)
+let perfSamples = null;
+
 // Initialize when page loads
 document.addEventListener('DOMContentLoaded', function() {
     // Check if we need to scroll to top after page reload
@@ -30,8 +41,149 @@ document.addEventListener('DOMContentLoaded', function() {
     if (translateBtn) {
         translateBtn.addEventListener('click', toggleLanguage);
     }
+    
+    // Live rating feed on the admin page
+    const liveFeed = document.getElementById('liveFeed');
+    if (liveFeed && window.EventSource) {
+        startLiveFeed(liveFeed);
+    }
+    
+    // Send anything left over from a previous page or a lost connection
+    if (loadPendingQueue().length > 0) {
+        flushPendingQueue();
+    }
+    window.addEventListener('online', () => flushPendingQueue());
+    
+    initPerfBeacon();
 });
 
+// Last chance to deliver queued items when the page goes away; the server
+// ignores duplicates by client_request_id, so the items stay queued until confirmed.
+window.addEventListener('pagehide', function() {
+    const queue = loadPendingQueue();
+    if (queue.length > 0 && navigator.sendBeacon) {
+        navigator.sendBeacon('/api/submit-ratings', new Blob([JSON.stringify(buildBulkPayload(queue))], { type: 'application/json' }));
+    }
+});
+
+// Generate an id the server uses to de-duplicate resent items
+function generateRequestId() {
+    if (window.crypto && crypto.randomUUID) {
+        return crypto.randomUUID();
+    }
+    return Date.now().toString(36) + '-' + Math.random().toString(36).slice(2, 12);
+}
+
+function loadPendingQueue() {
+    try {
+        return JSON.parse(localStorage.getItem(PENDING_QUEUE_KEY)) || [];
+    } catch (error) {
+        return [];
+    }
+}
+
+function savePendingQueue(queue) {
+    try {
+        localStorage.setItem(PENDING_QUEUE_KEY, JSON.stringify(queue));
+    } catch (error) {
+        console.error('Unable to persist pending submissions:', error);
+    }
+}
+
+function enqueueSubmission(kind, payload) {
+    const item = Object.assign({ client_request_id: generateRequestId() }, payload);
+    const queue = loadPendingQueue();
+    queue.push({ kind: kind, item: item, queued_at: Date.now() });
+    savePendingQueue(queue);
+    return item.client_request_id;
+}
+
+function buildBulkPayload(queue) {
+    return {
+        ratings: queue.filter(entry => entry.kind === 'rating').map(entry => entry.item),
+        comments: queue.filter(entry => entry.kind === 'comment').map(entry => entry.item)
+    };
+}
+
+// Send every queued item in one request. Resolves to a map of
+// client_request_id -> {status, error}; rejects on network/server failure.
+function flushPendingQueue() {
+    if (flushInProgress) {
+        return flushInProgress;
+    }
+    const queue = loadPendingQueue();
+    if (queue.length === 0) {
+        return Promise.resolve({});
+    }
+    
+    clearTimeout(flushRetryTimer);
+    const sentAt = performance.now();
+    flushInProgress = fetch('/api/submit-ratings', {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+        },
+        body: JSON.stringify(buildBulkPayload(queue))
+    }).then(async response => {
+        recordPerfSample('submit_rtt', performance.now() - sentAt);
+        if (!response.ok) {
+            // Rate limited (429) or busy (503): wait at least as long as the server asks
+            const retryAfter = parseInt(response.headers.get('Retry-After'), 10);
+            if (retryAfter > 0) {
+                flushRetryDelay = Math.max(flushRetryDelay, retryAfter * 1000);
+            }
+            throw new Error('Server responded with ' + response.status);
+        }
+        const result = await response.json();
+        const statuses = {};
+        (result.ratings || []).concat(result.comments || []).forEach(entry => {
+            if (entry.client_request_id) {
+                statuses[entry.client_request_id] = entry;
+            }
+        });
+        // Drop everything the server has answered for (saved, duplicate or rejected);
+        // keep items queued meanwhile by other tabs.
+        const remaining = loadPendingQueue().filter(entry => !(entry.item.client_request_id in statuses));
+        savePendingQueue(remaining);
+        flushRetryDelay = FLUSH_RETRY_BASE_MS;
+        return statuses;
+    }).catch(error => {
+        scheduleFlushRetry();
+        throw error;
+    }).finally(() => {
+        flushInProgress = null;
+    });
+    return flushInProgress;
+}
+
+function scheduleFlushRetry() {
+    clearTimeout(flushRetryTimer);
+    flushRetryTimer = setTimeout(() => flushPendingQueue().catch(() => {}), flushRetryDelay);
+    flushRetryDelay = Math.min(flushRetryDelay * 2, FLUSH_RETRY_MAX_MS);
+}
+
+// Resolve once the given item has been confirmed by the server, retrying in the background
+function waitForDelivery(clientRequestId, onRetry) {
+    return new Promise(resolve => {
+        const attempt = () => {
+            flushPendingQueue().then(statuses => {
+                if (clientRequestId in statuses) {
+                    resolve(statuses[clientRequestId]);
+                } else if (!loadPendingQueue().some(entry => entry.item.client_request_id === clientRequestId)) {
+                    // Confirmed by a flush started elsewhere (another tab or the online handler)
+                    resolve({ status: 'inserted' });
+                } else {
+                    setTimeout(attempt, flushRetryDelay);
+                }
+            }).catch(() => {
+                onRetry();
+                setTimeout(attempt, flushRetryDelay);
+            });
+        };
+        attempt();
+    });
+}
+
 // Handle rating submission
 async function handleRatingSubmission(event) {
     event.preventDefault();
@@ -68,46 +220,40 @@ async function handleRatingSubmission(event) {
     submitBtn.textContent = 'Submitting...';
     submitBtn.disabled = true;
     
-    try {
-        // Send rating data
-        const response = await fetch('/api/submit-rating', {
-            method: 'POST',
-            headers: {
-                'Content-Type': 'application/json',
-            },
-            body: JSON.stringify(ratingData)
-        });
-        
-        const result = await response.json();
-        
-        if (result.success) {
-            showSuccess('Rating submitted successfully!');
-            
-            // Check if all comparisons are completed
-            if (ratingData.comparison_number >= 8) {
-                // Redirect to thank you page
-                setTimeout(() => {
-                    window.location.href = '/thank-you';
-                }, 1000);
-            } else {
-                // Refresh page to show next comparison
-                setTimeout(() => {
-                    // Store scroll position in sessionStorage before reload
-                    sessionStorage.setItem('scrollToTop', 'true');
-                    window.location.reload();
-                }, 1000);
-            }
-        } else {
-            showError('Failed to submit rating. Please try again.');
-        }
-    } catch (error) {
-        console.error('Error:', error);
-        showError('Network error. Please check your connection and try again.');
-    } finally {
-        // Restore button state
+    // Persist first so a network failure cannot lose the rating; the item keeps the
+    // session it belongs to, in case it is sent after the user has started another topic
+    ratingData.topic = event.target.dataset.topic;
+    ratingData.session_id = event.target.dataset.sessionId || null;
+    const clientRequestId = enqueueSubmission('rating', ratingData);
+    
+    const delivery = await waitForDelivery(clientRequestId, () => {
+        submitBtn.textContent = 'Saved on this device, retrying...';
+        showError('Network error. Your rating is saved on this device and will be sent automatically when the connection is back.');
+    });
+    
+    if (delivery.status === 'invalid') {
+        showError('Failed to submit rating. Please try again.');
         submitBtn.textContent = originalText;
         submitBtn.disabled = false;
         isSubmitting = false;
+        return;
+    }
+    
+    showSuccess('Rating submitted successfully!');
+    
+    // Check if all comparisons are completed
+    if (ratingData.comparison_number >= parseInt(event.target.dataset.totalComparisons, 10)) {
+        // Redirect to thank you page
+        setTimeout(() => {
+            window.location.href = '/thank-you';
+        }, 1000);
+    } else {
+        // Refresh page to show next comparison
+        setTimeout(() => {
+            // Store scroll position in sessionStorage before reload
+            sessionStorage.setItem('scrollToTop', 'true');
+            window.location.reload();
+        }, 1000);
     }
 }
 
@@ -133,43 +279,35 @@ async function handleCommentSubmission(event) {
     submitBtn.textContent = 'Submitting...';
     submitBtn.disabled = true;
     
-    try {
-        // Send comment data
-        const response = await fetch('/api/submit-comment', {
-            method: 'POST',
-            headers: {
-                'Content-Type': 'application/json',
-            },
-            body: JSON.stringify(commentData)
-        });
-        
-        const result = await response.json();
-        
-        if (result.success) {
-            showSuccess('Feedback submitted successfully! Thank you for your participation.');
-            
-            // Clear form
-            event.target.reset();
-            
-            // Disable form
-            submitBtn.textContent = 'Submitted';
-            submitBtn.disabled = true;
-            document.getElementById('comment-text').disabled = true;
-            document.getElementById('email-input').disabled = true;
-        } else {
-            showError('Failed to submit feedback. Please try again.');
-        }
-    } catch (error) {
-        console.error('Error:', error);
-        showError('Network error. Please check your connection and try again.');
-    } finally {
-        // Restore button state
-        if (submitBtn.textContent !== 'Submitted') {
-            submitBtn.textContent = originalText;
-            submitBtn.disabled = false;
-        }
+    // Persist first so a network failure cannot lose the feedback
+    commentData.topic = event.target.dataset.topic;
+    commentData.session_id = event.target.dataset.sessionId || null;
+    const clientRequestId = enqueueSubmission('comment', commentData);
+    
+    const delivery = await waitForDelivery(clientRequestId, () => {
+        submitBtn.textContent = 'Saved on this device, retrying...';
+        showError('Network error. Your feedback is saved on this device and will be sent automatically when the connection is back.');
+    });
+    
+    if (delivery.status === 'invalid') {
+        showError('Failed to submit feedback. Please try again.');
+        submitBtn.textContent = originalText;
+        submitBtn.disabled = false;
         isSubmitting = false;
+        return;
     }
+    
+    showSuccess('Feedback submitted successfully! Thank you for your participation.');
+    
+    // Clear form
+    event.target.reset();
+    
+    // Disable form
+    submitBtn.textContent = 'Submitted';
+    submitBtn.disabled = true;
+    document.getElementById('comment-text').disabled = true;
+    document.getElementById('email-input').disabled = true;
+    isSubmitting = false;
 }
 
 // Validate rating data
@@ -199,6 +337,137 @@ function toggleFullContent(hypothesisId) {
     }
 }
 
+// Subscribe to /admin/stream; the browser reconnects with Last-Event-ID after
+// the server closes the stream, so no rating is shown twice or skipped.
+function startLiveFeed(container) {
+    const status = document.getElementById('liveFeedStatus');
+    const counters = document.getElementById('liveFeedCounters');
+    const tbody = document.getElementById('ratingsTableBody');
+    const source = new EventSource(container.dataset.streamUrl);
+    
+    const setStatus = (text, className) => {
+        status.className = 'badge ' + className;
+        status.lastChild.textContent = text;
+    };
+    source.onopen = () => setStatus('Live', 'bg-success');
+    source.onerror = () => setStatus('Reconnecting...', 'bg-warning');
+    
+    source.addEventListener('counters', event => {
+        const data = JSON.parse(event.data);
+        counters.replaceChildren(...Object.keys(data).sort().map(topic => {
+            const badge = document.createElement('span');
+            badge.className = 'badge bg-light text-dark ms-2';
+            badge.textContent = `${topic}: ${data[topic].ratings} ratings, ${data[topic].comments} comments`;
+            return badge;
+        }));
+    });
+    
+    source.addEventListener('rating', event => {
+        const rating = JSON.parse(event.data);
+        document.getElementById('noRatingsAlert').hidden = true;
+        tbody.closest('.table-responsive').hidden = false;
+        
+        const row = document.createElement('tr');
+        row.className = 'table-success';
+        const cell = (text, badgeClass, subtitle) => {
+            const td = document.createElement('td');
+            const content = document.createElement('span');
+            if (badgeClass) {
+                content.className = 'badge ' + badgeClass;
+            }
+            content.textContent = text;
+            td.appendChild(content);
+            if (subtitle) {
+                const small = document.createElement('small');
+                small.className = 'text-muted';
+                small.textContent = subtitle;
+                td.append(document.createElement('br'), small);
+            }
+            row.appendChild(td);
+        };
+        const session = document.createElement('td');
+        const code = document.createElement('code');
+        code.textContent = rating.session_id.slice(0, 8) + '...';
+        session.appendChild(code);
+        row.appendChild(session);
+        cell(rating.topic_name, 'bg-primary');
+        cell(rating.comparison_number);
+        cell(rating.hypothesis_A_id, null, rating.title_A);
+        cell(rating.hypothesis_B_id, null, rating.title_B);
+        cell(rating.novelty_score, 'bg-warning');
+        cell(rating.soundness_score, 'bg-info');
+        cell(rating.feasibility_score, 'bg-success');
+        cell(rating.significance_score, 'bg-danger');
+        cell(rating.overall_score, 'bg-dark');
+        cell(rating.timestamp);
+        tbody.insertBefore(row, tbody.firstChild);
+    });
+}
+
+// Real-user performance beacon: Navigation Timing and submit round-trips are
+// collected per page view and sent in one beacon when the page is hidden.
+function initPerfBeacon() {
+    const url = document.body.dataset.perfBeacon;
+    if (!url || !navigator.sendBeacon || !window.performance || !performance.getEntriesByType) {
+        return;
+    }
+    if (Math.random() >= parseFloat(document.body.dataset.perfSampleRate || '1')) {
+        return;
+    }
+    perfSamples = [];
+    
+    // loadEventEnd is only set once the load handlers have returned
+    if (document.readyState === 'complete') {
+        collectNavigationTiming();
+    } else {
+        window.addEventListener('load', () => setTimeout(collectNavigationTiming, 0));
+    }
+    document.addEventListener('visibilitychange', () => {
+        if (document.visibilityState === 'hidden') {
+            sendPerfBeacon();
+        }
+    });
+    window.addEventListener('pagehide', sendPerfBeacon);
+}
+
+function collectNavigationTiming() {
+    const navigation = performance.getEntriesByType('navigation')[0];
+    if (navigation) {
+        recordPerfSample('ttfb', navigation.responseStart);
+        recordPerfSample('server', navigation.responseStart - navigation.requestStart);
+        recordPerfSample('dom_content_loaded', navigation.domContentLoadedEventEnd);
+        recordPerfSample('load', navigation.loadEventEnd);
+    }
+    const paint = performance.getEntriesByName('first-contentful-paint')[0];
+    if (paint) {
+        recordPerfSample('fcp', paint.startTime);
+    }
+    // Stylesheets and scripts (local or CDN) referenced by the page
+    const assets = performance.getEntriesByType('resource')
+        .filter(entry => entry.initiatorType === 'link' || entry.initiatorType === 'script');
+    if (assets.length > 0) {
+        recordPerfSample('assets', Math.max(...assets.map(entry => entry.responseEnd)));
+    }
+}
+
+function recordPerfSample(metric, value) {
+    if (perfSamples && value >= 0) {
+        perfSamples.push({ metric: metric, value: Math.round(value) });
+    }
+}
+
+function sendPerfBeacon() {
+    if (!perfSamples || perfSamples.length === 0) {
+        return;
+    }
+    const payload = {
+        route: document.body.dataset.route,
+        topic: document.body.dataset.topic,
+        samples: perfSamples.splice(0)
+    };
+    navigator.sendBeacon(document.body.dataset.perfBeacon, new Blob([JSON.stringify(payload)], { type: 'application/json' }));
+}
+
 // Show success message
 function showSuccess(message) {
     // Remove existing messages
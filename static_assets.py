@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+前端资源配置与页面资源包解析
+
+- VENDOR_ASSETS: 需要本地化的第三方文件（Bootstrap、Font Awesome）及其CDN来源
+- PAGE_BUNDLES: 每种页面类型使用的模板，build_static.py 按此为每种页面生成一个CSS包
+- 模板通过 asset_bundle() 获取当前页面应引用的CSS/JS：
+  已构建资源包 > 本地vendor文件 > CDN（仅在两者都不存在时回退，例如未构建的本地开发环境，
+  回退时打印一次警告）；部署时 Procfile 先执行 build_static.py，构建失败则不启动
+"""
+
+import json
+import os
+
+from flask import request, url_for
+
+from http_caching import STATIC_MANIFEST_NAME
+
+# 第三方文件：static下的本地路径 -> CDN地址（固定版本）
+BOOTSTRAP_VERSION = '5.3.0'
+FONTAWESOME_VERSION = '6.0.0'
+
+BOOTSTRAP_CDN = f'https://cdn.jsdelivr.net/npm/bootstrap@{BOOTSTRAP_VERSION}/dist'
+FONTAWESOME_CDN = f'https://cdnjs.cloudflare.com/ajax/libs/font-awesome/{FONTAWESOME_VERSION}'
+
+VENDOR_ASSETS = {
+    'vendor/bootstrap/css/bootstrap.min.css': f'{BOOTSTRAP_CDN}/css/bootstrap.min.css',
+    'vendor/bootstrap/js/bootstrap.bundle.min.js': f'{BOOTSTRAP_CDN}/js/bootstrap.bundle.min.js',
+    'vendor/fontawesome/css/all.min.css': f'{FONTAWESOME_CDN}/css/all.min.css',
+    'vendor/fontawesome/webfonts/fa-solid-900.woff2': f'{FONTAWESOME_CDN}/webfonts/fa-solid-900.woff2',
+    'vendor/fontawesome/webfonts/fa-solid-900.ttf': f'{FONTAWESOME_CDN}/webfonts/fa-solid-900.ttf',
+    'vendor/fontawesome/webfonts/fa-regular-400.woff2': f'{FONTAWESOME_CDN}/webfonts/fa-regular-400.woff2',
+    'vendor/fontawesome/webfonts/fa-regular-400.ttf': f'{FONTAWESOME_CDN}/webfonts/fa-regular-400.ttf',
+    'vendor/fontawesome/webfonts/fa-brands-400.woff2': f'{FONTAWESOME_CDN}/webfonts/fa-brands-400.woff2',
+    'vendor/fontawesome/webfonts/fa-brands-400.ttf': f'{FONTAWESOME_CDN}/webfonts/fa-brands-400.ttf',
+}
+
+# 页面引用顺序
+VENDOR_CSS = ['vendor/bootstrap/css/bootstrap.min.css', 'vendor/fontawesome/css/all.min.css']
+VENDOR_JS = ['vendor/bootstrap/js/bootstrap.bundle.min.js']
+APP_CSS = ['css/style.css']
+APP_JS = ['js/app.js']
+
+# 页面类型 -> 模板（glob），base.html 对所有页面类型都生效
+PAGE_BUNDLES = {
+    'home': ['index.html'],
+    'rate': ['rate_topic.html'],
+    'thank_you': ['thank_you.html'],
+    'admin': ['admin_*.html'],
+}
+
+# 路由端点 -> 页面类型
+ENDPOINT_BUNDLES = {
+    'index': 'home',
+    'rate_topic': 'rate',
+    'thank_you': 'thank_you',
+}
+
+# 所有页面共用的JS包名
+SHARED_JS_BUNDLE = 'app'
+
+_bundle_cache = {'mtime': None, 'bundles': {}}
+
+# 已提示过回退到CDN的文件
+_cdn_warned = set()
+
+
+def load_asset_bundles(static_folder):
+    """读取清单中的资源包信息，清单文件更新后自动重新加载"""
+    path = os.path.join(static_folder, STATIC_MANIFEST_NAME)
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return {}
+    if _bundle_cache['mtime'] != mtime:
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                _bundle_cache['bundles'] = json.load(f).get('bundles', {})
+        except (OSError, ValueError):
+            _bundle_cache['bundles'] = {}
+        _bundle_cache['mtime'] = mtime
+    return _bundle_cache['bundles']
+
+
+def page_bundle_name(endpoint):
+    """根据路由端点确定页面类型"""
+    if endpoint in ENDPOINT_BUNDLES:
+        return ENDPOINT_BUNDLES[endpoint]
+    if endpoint and endpoint.startswith('admin'):
+        return 'admin'
+    return 'home'
+
+
+def _local_or_cdn(static_folder, filenames):
+    """本地vendor文件存在时使用本地文件，否则回退到CDN"""
+    urls = []
+    for filename in filenames:
+        if os.path.isfile(os.path.join(static_folder, filename)):
+            urls.append(url_for('static', filename=filename))
+        else:
+            if filename not in _cdn_warned:
+                _cdn_warned.add(filename)
+                print(f"⚠️  未构建静态资源，{filename} 回退到CDN（运行: python build_static.py）")
+            urls.append(VENDOR_ASSETS[filename])
+    return urls
+
+
+def init_app(app):
+    """注册模板函数 asset_bundle()"""
+    static_folder = app.static_folder
+
+    @app.context_processor
+    def asset_bundle_processor():
+        def asset_bundle():
+            """返回当前页面需要引用的 {'css': [...], 'js': [...]}"""
+            bundles = load_asset_bundles(static_folder)
+            page = bundles.get(page_bundle_name(request.endpoint))
+            shared_js = bundles.get(SHARED_JS_BUNDLE)
+            if page and shared_js:
+                return {
+                    'css': [url_for('static', filename=page['css'])],
+                    'js': [url_for('static', filename=shared_js['js'])],
+                }
+            return {
+                'css': _local_or_cdn(static_folder, VENDOR_CSS) + [url_for('static', filename=f) for f in APP_CSS],
+                'js': _local_or_cdn(static_folder, VENDOR_JS) + [url_for('static', filename=f) for f in APP_JS],
+            }
+        return {'asset_bundle': asset_bundle}
+
+    return app
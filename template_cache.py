@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Jinja模板字节码缓存
+
+- 模板编译结果保存在 JINJA_CACHE_DIR 中，新的gunicorn worker直接加载字节码，不再从源码编译
+- 缓存按模板源码校验和与Python版本区分，模板修改或升级Python后自动重新编译
+- python build_static.py（或 python build_static.py templates）预编译全部模板；
+  未预编译时，第一个worker编译后写入缓存，之后的worker复用
+
+环境变量:
+    JINJA_BYTECODE_CACHE=1       是否启用
+    JINJA_CACHE_DIR=.jinja_cache 缓存目录
+"""
+
+import os
+
+from jinja2 import FileSystemBytecodeCache
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+JINJA_BYTECODE_CACHE = os.environ.get('JINJA_BYTECODE_CACHE', '1') == '1'
+JINJA_CACHE_DIR = os.environ.get('JINJA_CACHE_DIR', os.path.join(BASE_DIR, '.jinja_cache'))
+
+
+def create_bytecode_cache(directory=JINJA_CACHE_DIR):
+    """创建文件系统字节码缓存；目录不可写时返回None"""
+    try:
+        os.makedirs(directory, exist_ok=True)
+    except OSError as e:
+        print(f"⚠️  无法创建模板缓存目录 {directory}: {e}")
+        return None
+    if not os.access(directory, os.W_OK):
+        print(f"⚠️  模板缓存目录不可写: {directory}")
+        return None
+    return FileSystemBytecodeCache(directory)
+
+
+def init_app(app, directory=JINJA_CACHE_DIR):
+    """为应用的Jinja环境配置字节码缓存"""
+    if not JINJA_BYTECODE_CACHE:
+        return app
+    cache = create_bytecode_cache(directory)
+    if cache is not None:
+        app.jinja_env.bytecode_cache = cache
+    return app
+
+
+def precompile_templates(app):
+    """
+    用应用自己的Jinja环境编译全部HTML模板并写入字节码缓存
+    （编译结果与环境的autoescape等设置有关，不能用单独的Environment生成）
+    """
+    if app.jinja_env.bytecode_cache is None:
+        print("ℹ️  未启用模板字节码缓存，跳过预编译")
+        return []
+    # 清空内存中的模板，确保每个模板都经过字节码缓存
+    if app.jinja_env.cache is not None:
+        app.jinja_env.cache.clear()
+    names = sorted(name for name in app.jinja_env.list_templates() if name.endswith('.html'))
+    for name in names:
+        app.jinja_env.get_template(name)
+    return names
@@ -127,6 +127,1538 @@ def test_hypothesis_content():
         print(f"   ✗ 假设内容测试失败: {e}")
         return False
 
+def test_agreement_analysis():
+    """测试评分一致性计算"""
+    print("6. 测试评分一致性计算...")
+    try:
+        import numpy as np
+        from agreement_analysis import DIMENSIONS, compute_agreement
+        
+        # 三位专家对同一对假设给出一致评分（其中一位看到的A/B顺序相反）
+        data = {
+            'topics': ['topic1'],
+            'rating_id': np.array([1, 2, 3, 4, 5, 6]),
+            'topic': np.array([0, 0, 0, 0, 0, 0]),
+            'hypothesis_A_id': np.array([1, 1, 2, 1, 1, 3]),
+            'hypothesis_B_id': np.array([2, 2, 1, 3, 3, 1]),
+            'scores': np.array([[1] * 5, [1] * 5, [5] * 5, [4] * 5, [4] * 5, [2] * 5], dtype=np.int8),
+        }
+        report = compute_agreement(data)
+        
+        for dimension in DIMENSIONS:
+            alpha = report['topics']['topic1']['dimensions'][dimension]['alpha']
+            if alpha is None or abs(alpha - 1.0) > 1e-9:
+                print(f"   ✗ {dimension} 的alpha应为1，实际为 {alpha}")
+                return False
+        
+        pairs = report['topics']['topic1']['pairs']
+        if len(pairs) != 2 or any(pair['agreement']['overall_score'] != 1.0 for pair in pairs):
+            print(f"   ✗ 假设对一致度计算错误: {pairs}")
+            return False
+        
+        print("   ✓ 评分一致性计算正确")
+        return True
+    except Exception as e:
+        print(f"   ✗ 评分一致性测试失败: {e}")
+        return False
+
+def test_bradley_terry():
+    """测试Bradley-Terry排名拟合"""
+    print("7. 测试Bradley-Terry排名...")
+    try:
+        import numpy as np
+        from bradley_terry import comparison_edges, fit_bradley_terry, prior_edges
+        
+        # 假设0总是胜过1，1总是胜过2（评分1 = A明显更好）
+        a = np.array([0, 0, 1, 1, 0])
+        b = np.array([1, 1, 2, 2, 2])
+        winner, loser, weight = comparison_edges(a, b, np.array([1, 2, 1, 2, 1]))
+        prior = prior_edges([0], 3)
+        strength = fit_bradley_terry(np.concatenate([winner, prior[0]]), np.concatenate([loser, prior[1]]),
+                                     np.concatenate([weight, prior[2]]), 3)
+        
+        if not (np.all(np.isfinite(strength)) and strength[0] > strength[1] > strength[2]):
+            print(f"   ✗ 强度排序错误: {strength}")
+            return False
+        
+        print("   ✓ Bradley-Terry排名正确")
+        return True
+    except Exception as e:
+        print(f"   ✗ Bradley-Terry测试失败: {e}")
+        return False
+
+def test_alignment_report():
+    """测试自动评分与专家评分一致性报告"""
+    print("8. 测试自动评分一致性报告...")
+    try:
+        import numpy as np
+        from alignment_report import DIMENSIONS, compute_alignment
+        
+        # 三个假设的自动评分依次降低，专家偏好与之完全一致
+        hypotheses = {
+            'keys': [('topic1', 1), ('topic1', 2), ('topic1', 3)],
+            'topic': ['topic1'] * 3,
+            'model_source': ['gpt4', 'gpt4', 'claude'],
+            'strategy': ['evolve'] * 3,
+            'auto_scores': np.array([[9.0] * 5, [5.0] * 5, [1.0] * 5]),
+        }
+        counts = np.zeros((3, len(DIMENSIONS), 3))
+        counts[:, :, 0] = 2  # 每个假设对中较小ID的假设都被专家偏好两次
+        report = compute_alignment(hypotheses, np.array([0, 0, 1]), np.array([1, 2, 2]), counts)
+        
+        for dimension in DIMENSIONS:
+            stats = report['dimensions'][dimension]
+            if stats['pairwise_agreement'] != 1.0 or abs(stats['spearman'] - 1.0) > 1e-9:
+                print(f"   ✗ {dimension} 一致性计算错误: {stats}")
+                return False
+        
+        if report['model_source']['claude']['overall_score']['decisive_judgments'] != 4:
+            print(f"   ✗ 按model_source分组错误: {report['model_source']}")
+            return False
+        
+        print("   ✓ 自动评分一致性计算正确")
+        return True
+    except Exception as e:
+        print(f"   ✗ 自动评分一致性测试失败: {e}")
+        return False
+
+def test_search_index():
+    """测试全文检索（中英文、触发器同步、高亮转义）"""
+    print("9. 测试全文检索...")
+    try:
+        import json
+        from search_index import ensure_search_index, missing_sources, search
+        
+        conn = sqlite3.connect(':memory:')
+        conn.execute("CREATE TABLE hypothesis (id INTEGER PRIMARY KEY, topic INTEGER, model_source TEXT, strategy TEXT, hypothesis_content TEXT)")
+        ensure_search_index(conn)
+        conn.execute("INSERT INTO hypothesis VALUES (1, 1, 'gpt4', 'evolve', ?)",
+                     (json.dumps({'title': 'Retrieval <b>augmented</b> 检索增强模型', 'Motivation': 'knowledge'}, ensure_ascii=False),))
+        
+        results, total = search(conn, 'retrieval 检索增强')
+        if total != 1 or '<mark>' not in results[0]['snippet'] or '<b>' in results[0]['snippet']:
+            print(f"   ✗ 检索结果错误: {results}")
+            return False
+        
+        conn.execute("DELETE FROM hypothesis WHERE id = 1")
+        if search(conn, 'retrieval')[1] != 0:
+            print("   ✗ 删除后索引未同步")
+            return False
+        conn.commit()
+        
+        # 索引完整时只读取表结构：不执行DDL，也不提交
+        statements = []
+        conn.set_trace_callback(statements.append)
+        rebuilt = ensure_search_index(conn)
+        conn.set_trace_callback(None)
+        if rebuilt or len(statements) != 1 or not statements[0].startswith('SELECT'):
+            print(f"   ✗ 索引完整时不应执行DDL: {statements}")
+            return False
+        
+        # 表被重建（触发器丢失）后只重建该来源
+        conn.execute("INSERT INTO hypothesis VALUES (2, 1, 'gpt4', 'evolve', ?)", (json.dumps({'title': 'Graph networks'}),))
+        conn.execute("DROP TRIGGER hypothesis_fts_insert")
+        conn.commit()
+        if missing_sources(conn) != (True, ['hypothesis']) or ensure_search_index(conn) != ['hypothesis'] \
+                or search(conn, 'graph')[1] != 1:
+            print("   ✗ 触发器缺失时应重建对应来源的索引")
+            return False
+        
+        print("   ✓ 全文检索正确")
+        return True
+    except Exception as e:
+        print(f"   ✗ 全文检索测试失败: {e}")
+        return False
+
+def test_near_duplicates():
+    """测试近似重复检测"""
+    print("10. 测试近似重复检测...")
+    try:
+        import numpy as np
+        from near_duplicates import find_clusters, minhash_signatures, shingles
+        
+        base = ' '.join(f'word{i}' for i in range(200))
+        texts = [base, base + ' extra', ' '.join(f'other{i}' for i in range(200))]
+        signatures = minhash_signatures([shingles(text) for text in texts])
+        roots, _ = find_clusters(signatures, np.zeros(len(texts), dtype=bool))
+        
+        if roots[0] != roots[1] or roots[0] == roots[2]:
+            print(f"   ✗ 聚类结果错误: {roots}")
+            return False
+        
+        print("   ✓ 近似重复检测正确")
+        return True
+    except Exception as e:
+        print(f"   ✗ 近似重复检测测试失败: {e}")
+        return False
+
+def test_pool_sampler():
+    """测试分层抽样的配额与可复现性"""
+    print("11. 测试分层抽样...")
+    try:
+        import random
+        from collections import Counter
+        from pool_sampler import COLUMN_INDEX, HYPOTHESIS_COLUMNS, reservoir_by_stratum, select_with_quotas
+        
+        # 90% 的假设来自 gpt4
+        rows = []
+        for i in range(1000):
+            row = [None] * len(HYPOTHESIS_COLUMNS)
+            row[COLUMN_INDEX['id']] = i
+            row[COLUMN_INDEX['model_source']] = 'gpt4' if i % 10 else 'claude'
+            row[COLUMN_INDEX['strategy']] = 'evolve' if i % 3 else 'baseline'
+            rows.append(tuple(row))
+        config = {'stratify_by': ['model_source', 'strategy'], 'quotas': {'model_source': {'*': 4}}}
+        
+        def sample(seed):
+            rng = random.Random(seed)
+            reservoirs, _ = reservoir_by_stratum(iter(rows), config['stratify_by'], 16, rng)
+            return select_with_quotas(reservoirs, 8, config, rng)
+        
+        selected = sample(1)
+        sources = Counter(row[COLUMN_INDEX['model_source']] for row in selected)
+        if len(selected) != 8 or sources['gpt4'] != 4 or sources['claude'] != 4:
+            print(f"   ✗ 配额未生效: {sources}")
+            return False
+        if sample(1) != selected:
+            print("   ✗ 相同种子的抽样结果不同")
+            return False
+        
+        print("   ✓ 分层抽样正确")
+        return True
+    except Exception as e:
+        print(f"   ✗ 分层抽样测试失败: {e}")
+        return False
+
+def test_rate_limit():
+    """测试令牌桶的消耗、拒绝与补充"""
+    print("12. 测试写接口限流...")
+    try:
+        import tempfile
+        import rate_limit
+        from rate_limit import MemoryBuckets
+        
+        buckets = MemoryBuckets()
+        # 容量3，每秒补充1个
+        results = [buckets.take('session:a', 1.0, 3.0, now=0.0)[0] for _ in range(4)]
+        if results != [True, True, True, False]:
+            print(f"   ✗ 桶容量不正确: {results}")
+            return False
+        allowed, wait = buckets.take('session:a', 1.0, 3.0, now=0.5)
+        if allowed or abs(wait - 0.5) > 1e-9:
+            print(f"   ✗ 等待时间不正确: {wait}")
+            return False
+        if not buckets.take('session:a', 1.0, 3.0, now=1.0)[0]:
+            print("   ✗ 令牌没有补充")
+            return False
+        if not buckets.take('session:b', 1.0, 3.0, cost=10, now=0.0)[0]:
+            print("   ✗ 超过容量的批量请求永远无法通过")
+            return False
+        
+        # 按检查次数定期清理；每个桶按自己的容量与速率判断是否已补满
+        original = (rate_limit.MEMORY_PRUNE_THRESHOLD, rate_limit.PRUNE_INTERVAL)
+        rate_limit.MEMORY_PRUNE_THRESHOLD, rate_limit.PRUNE_INTERVAL = 2, 3
+        try:
+            buckets = MemoryBuckets()
+            scans = []
+            prune = buckets.prune
+            buckets.prune = lambda now: scans.append(now) or prune(now)
+            buckets.take('ip:slow', 0.01, 100.0, now=0.0)
+            for key, now in (('session:x', 0.0), ('session:y', 0.0), ('session:z', 5.0), ('session:z', 5.0),
+                             ('session:z', 5.0)):
+                buckets.take(key, 1.0, 1.0, now=now)
+            if scans != [0.0, 5.0] or set(buckets.buckets) != {'ip:slow', 'session:z'}:
+                print(f"   ✗ 桶清理不正确: {scans} {sorted(buckets.buckets)}")
+                return False
+            
+            with tempfile.TemporaryDirectory() as tmp:
+                buckets = rate_limit.SQLiteBuckets(os.path.join(tmp, 'buckets.db'))
+                buckets.take('ip:slow', 0.01, 100.0, now=0.0)
+                buckets.take('session:a', 1.0, 1.0, now=0.0)
+                buckets.take('session:b', 1.0, 1.0, now=20000.0)
+                keys = [row[0] for row in buckets.connection().execute("SELECT key FROM rate_limit_buckets")]
+                buckets.connection().close()
+            if keys != ['session:b']:
+                print(f"   ✗ sqlite后端应定期清理补满的桶: {keys}")
+                return False
+        finally:
+            rate_limit.MEMORY_PRUNE_THRESHOLD, rate_limit.PRUNE_INTERVAL = original
+        
+        print("   ✓ 令牌桶限流正确")
+        return True
+    except Exception as e:
+        print(f"   ✗ 写接口限流测试失败: {e}")
+        return False
+
+def test_archive_ratings():
+    """测试评分分区归档与跨分区读取"""
+    print("13. 测试评分归档...")
+    try:
+        import tempfile
+        from archive_ratings import archive_partition, iter_rows, load_partitions
+        
+        with tempfile.TemporaryDirectory() as tmp:
+            conn = sqlite3.connect(os.path.join(tmp, 'main.db'))
+            conn.execute("""
+                CREATE TABLE ratings (rating_id INTEGER PRIMARY KEY AUTOINCREMENT, topic_name TEXT,
+                                      overall_score INTEGER, timestamp TIMESTAMP)
+            """)
+            conn.execute("""
+                CREATE TABLE comments (comment_id INTEGER PRIMARY KEY AUTOINCREMENT, topic_name TEXT,
+                                       comment_text TEXT, timestamp TIMESTAMP)
+            """)
+            for i, month in enumerate(['2026-07', '2026-07', '2026-08', '2026-09']):
+                conn.execute("INSERT INTO ratings (topic_name, overall_score, timestamp) VALUES (?, ?, ?)",
+                             (f"topic{i % 2 + 1}", i + 1, f"{month}-15 10:00:00"))
+            conn.commit()
+            
+            archive_dir = os.path.join(tmp, 'archive')
+            moved = archive_partition(conn, 'month', '2026-07', archive_dir, compress=True)
+            archive_partition(conn, 'month', '2026-08', archive_dir)
+            if moved['ratings'] != 2 or conn.execute("SELECT COUNT(*) FROM ratings").fetchone()[0] != 1:
+                print(f"   ✗ 归档行数不正确: {moved}")
+                return False
+            
+            _, rows = iter_rows(conn, 'ratings', archive_dir=archive_dir)
+            ids = sorted(row[0] for _, row in rows)
+            if ids != [1, 2, 3, 4]:
+                print(f"   ✗ 跨分区读取不完整: {ids}")
+                return False
+            
+            # 按主题筛选时跳过不包含该主题的分区
+            if [p['partition'] for p in load_partitions(conn, topic='topic2')] != ['month:2026-07']:
+                print("   ✗ 分区裁剪不正确")
+                return False
+            conn.close()
+        
+        print("   ✓ 评分归档正确")
+        return True
+    except Exception as e:
+        print(f"   ✗ 评分归档测试失败: {e}")
+        return False
+
+def test_session_funnel():
+    """测试会话漏斗统计"""
+    print("14. 测试会话漏斗...")
+    try:
+        from session_funnel import compute_funnel, create_benchmark_db, load_session_rows
+        
+        conn = create_benchmark_db(2000)
+        report = compute_funnel(*load_session_rows(conn))
+        lengths = [row[0] for row in conn.execute("SELECT MAX(comparison_number) FROM ratings GROUP BY session_id")]
+        overall = report['overall']
+        if overall['sessions'] != len(lengths) or overall['completed'] != lengths.count(8):
+            print(f"   ✗ 会话数或完成数不正确: {overall['sessions']}, {overall['completed']}")
+            return False
+        # 每一步的会话数 = 下一步的会话数 + 在这一步后流失的会话数
+        steps = overall['steps']
+        if any(a['sessions'] != b['sessions'] + a['dropped_after'] for a, b in zip(steps, steps[1:])):
+            print("   ✗ 漏斗各步骤不一致")
+            return False
+        if sum(stats['sessions'] for stats in report['topics'].values()) != overall['sessions']:
+            print("   ✗ 各主题会话数之和不等于总数")
+            return False
+        conn.close()
+        
+        print("   ✓ 会话漏斗统计正确")
+        return True
+    except Exception as e:
+        print(f"   ✗ 会话漏斗测试失败: {e}")
+        return False
+
+def test_consistency_check():
+    """测试会话内循环偏好检测"""
+    print("15. 测试会话一致性检查...")
+    try:
+        from consistency_check import DIMENSIONS, compute_consistency, consistency_scores, load_session_judgments
+        
+        conn = sqlite3.connect(':memory:')
+        conn.execute(f"""
+            CREATE TABLE ratings (rating_id INTEGER PRIMARY KEY AUTOINCREMENT, session_id TEXT, topic_name TEXT,
+                                  hypothesis_A_id INTEGER, hypothesis_B_id INTEGER,
+                                  {', '.join(dim + ' INTEGER' for dim in DIMENSIONS)})
+        """)
+        # s1: 1>2、2>3、3>1 形成循环；s2: 1>2、2>3、1>3 可传递；评分1表示A更好
+        judgments = [('s1', 1, 2, 1), ('s1', 2, 3, 2), ('s1', 3, 1, 1),
+                     ('s2', 1, 2, 1), ('s2', 2, 3, 2), ('s2', 3, 1, 5)]
+        for session_id, hyp_a, hyp_b, score in judgments:
+            conn.execute(f"INSERT INTO ratings (session_id, topic_name, hypothesis_A_id, hypothesis_B_id, "
+                         f"{', '.join(DIMENSIONS)}) VALUES (?, 'topic1', ?, ?, ?, ?, ?, ?, ?)",
+                         (session_id, hyp_a, hyp_b) + (score,) * len(DIMENSIONS))
+        
+        result = compute_consistency(load_session_judgments(conn))
+        scores = consistency_scores(result['triads'][:, 0], result['cyclic_triads'][:, 0])
+        if list(result['triads'][:, 0]) != [1, 1] or list(scores) != [0.0, 1.0]:
+            print(f"   ✗ 循环检测不正确: {result['triads'][:, 0]}, {scores}")
+            return False
+        conn.close()
+        
+        print("   ✓ 会话一致性检查正确")
+        return True
+    except Exception as e:
+        print(f"   ✗ 会话一致性测试失败: {e}")
+        return False
+
+def test_perf_beacon():
+    """测试性能beacon解析与分位数"""
+    print("16. 测试性能beacon...")
+    try:
+        import json
+        from perf_beacon import compute_percentiles, connect, parse_beacon, store_samples
+        
+        samples = parse_beacon(json.dumps({'route': 'rate_topic', 'topic': 'topic1', 'samples': [
+            {'metric': 'ttfb', 'value': 120}, {'metric': 'unknown', 'value': 1},
+            {'metric': 'load', 'value': -1}, {'metric': 'load', 'value': 'slow'}]}))
+        if samples != [('rate_topic', 'topic1', 'ttfb', 120.0)] or parse_beacon(b'not json'):
+            print(f"   ✗ beacon解析不正确: {samples}")
+            return False
+        
+        conn = connect(':memory:')
+        store_samples(conn, [('rate_topic', 'topic1', 'ttfb', float(v)) for v in range(1, 101)])
+        group, = compute_percentiles(conn)
+        if group['count'] != 100 or group['p50'] != 50.5 or group['p99'] != 99.0:
+            print(f"   ✗ 分位数不正确: {group}")
+            return False
+        conn.close()
+        
+        print("   ✓ 性能beacon正确")
+        return True
+    except Exception as e:
+        print(f"   ✗ 性能beacon测试失败: {e}")
+        return False
+
+def test_hypothesis_corpus():
+    """测试内存映射假设语料"""
+    print("17. 测试假设语料...")
+    try:
+        import json
+        import tempfile
+        from hypothesis_corpus import HypothesisCorpus, export_corpus
+        
+        with tempfile.TemporaryDirectory() as tmp:
+            conn = sqlite3.connect(':memory:')
+            conn.execute("CREATE TABLE hypothesis (id INTEGER PRIMARY KEY, topic INTEGER, hypothesis_content TEXT)")
+            conn.executemany("INSERT INTO hypothesis VALUES (?, ?, ?)", [
+                (1, 1, json.dumps({'title': '知识库 A'})), (5, 2, json.dumps({'title': 'B'})),
+                (7, 1, 'not json'), (9, 1, json.dumps({'title': 'C'}))])
+            path = os.path.join(tmp, 'corpus.bin')
+            export_corpus(conn, path)
+            
+            corpus = HypothesisCorpus(path)
+            pool = corpus.topic_pool(1)
+            if len(corpus) != 3 or [item['id'] for item in pool] != [1, 9] or pool[0]['content']['title'] != '知识库 A':
+                print("   ✗ 语料内容不正确")
+                return False
+            if corpus.get(7) is not None or not corpus.is_current(conn):
+                print("   ✗ 无效记录或过期检查不正确")
+                return False
+            conn.execute("UPDATE hypothesis SET hypothesis_content = ? WHERE id = 5", (json.dumps({'title': 'BB'}),))
+            if corpus.is_current(conn):
+                print("   ✗ 未检测到内容变化")
+                return False
+            corpus.close()
+            conn.close()
+        
+        print("   ✓ 假设语料正确")
+        return True
+    except Exception as e:
+        print(f"   ✗ 假设语料测试失败: {e}")
+        return False
+
+def test_hypothesis_rank_migration():
+    """测试假设排名重新编号与按主题的池配置"""
+    print("18. 测试假设排名迁移...")
+    try:
+        from app import renumber_hypothesis_ranks
+        from pool_sampler import DEFAULT_CONFIG, topic_setting
+        
+        conn = sqlite3.connect(':memory:')
+        cursor = conn.cursor()
+        cursor.execute("CREATE TABLE predefined_comparisons (id INTEGER PRIMARY KEY, topic_name TEXT, hypothesis_rank INTEGER)")
+        cursor.executemany("INSERT INTO predefined_comparisons (topic_name, hypothesis_rank) VALUES (?, ?)",
+                           [('topic1', 3), ('topic1', 1), ('topic1', 3), ('topic2', 1), ('topic2', 2)])
+        renumber_hypothesis_ranks(cursor)
+        renumber_hypothesis_ranks(cursor)
+        ranks = cursor.execute("SELECT id, hypothesis_rank FROM predefined_comparisons ORDER BY id").fetchall()
+        if ranks != [(1, 2), (2, 1), (3, 3), (4, 1), (5, 2)]:
+            print(f"   ✗ 重新编号结果不正确: {ranks}")
+            return False
+        try:
+            cursor.execute("INSERT INTO predefined_comparisons (topic_name, hypothesis_rank) VALUES ('topic2', 2)")
+            print("   ✗ 缺少 (topic_name, hypothesis_rank) 唯一索引")
+            return False
+        except sqlite3.IntegrityError:
+            pass
+        conn.close()
+        
+        config = dict(DEFAULT_CONFIG, topics={'topic3': {'comparisons_per_session': 12}})
+        if topic_setting(config, 'topic3', 'comparisons_per_session') != 12 or topic_setting(config, 'topic1', 'pool_size') != 8:
+            print("   ✗ 按主题的池配置不正确")
+            return False
+        
+        print("   ✓ 假设排名迁移正确")
+        return True
+    except Exception as e:
+        print(f"   ✗ 假设排名迁移测试失败: {e}")
+        return False
+
+def test_content_compression():
+    """测试假设内容的zstd字典压缩"""
+    print("19. 测试内容压缩...")
+    try:
+        import json
+        import random
+        import content_compression
+        from add_content_columns import ensure_content_columns
+        
+        conn = sqlite3.connect(':memory:')
+        conn.execute("CREATE TABLE hypothesis (id INTEGER PRIMARY KEY, topic INTEGER, hypothesis_content TEXT)")
+        rng = random.Random(0)
+        words = ['retrieval', 'language', 'benchmark', 'robustness', 'transfer', '知识', '推理', 'evaluation']
+        contents = [json.dumps({'title': f"{' '.join(rng.choices(words, k=4))} {i}",
+                                'Problem_Statement': ' '.join(rng.choices(words, k=60))}, indent=2, ensure_ascii=False)
+                    for i in range(300)]
+        conn.executemany("INSERT INTO hypothesis (topic, hypothesis_content) VALUES (1, ?)", [(c,) for c in contents])
+        ensure_content_columns(conn)
+        if content_compression.decode_content(conn, contents[0]) != contents[0]:
+            print("   ✗ 未压缩的内容应原样返回")
+            return False
+        if content_compression.zstandard is None:
+            print("   ✓ 未安装zstandard，跳过压缩测试")
+            return True
+        
+        titles = conn.execute("SELECT title FROM hypothesis ORDER BY id").fetchall()
+        dict_id, count = content_compression.compress_database(conn)
+        stats = content_compression.content_stats(conn)
+        decoded = [content_compression.decode_content(conn, row[0])
+                   for row in conn.execute("SELECT hypothesis_content FROM hypothesis ORDER BY id")]
+        if count != 300 or list(stats) != ['blob'] or stats['blob']['bytes'] * 3 > sum(len(c.encode()) for c in contents):
+            print(f"   ✗ 压缩结果不正确: {stats}")
+            return False
+        if decoded != contents or conn.execute("SELECT title FROM hypothesis ORDER BY id").fetchall() != titles:
+            print("   ✗ 解压内容或标题不正确")
+            return False
+        content_compression.decompress_database(conn)
+        if conn.execute("SELECT hypothesis_content FROM hypothesis ORDER BY id").fetchall() != [(c,) for c in contents] \
+                or conn.execute("SELECT title FROM hypothesis ORDER BY id").fetchall() != titles:
+            print("   ✗ 恢复为文本后内容或标题不正确")
+            return False
+        conn.close()
+        
+        print(f"   ✓ 内容压缩正确（字典 {dict_id}）")
+        return True
+    except Exception as e:
+        print(f"   ✗ 内容压缩测试失败: {e}")
+        return False
+
+def test_db_maintenance():
+    """测试数据库后台维护"""
+    print("20. 测试数据库维护...")
+    try:
+        import tempfile
+        import time
+        import db_maintenance
+        
+        with tempfile.TemporaryDirectory() as tmp:
+            db_path = os.path.join(tmp, 'maintenance.db')
+            conn = sqlite3.connect(db_path)
+            conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+            conn.execute("CREATE TABLE scratch (id INTEGER PRIMARY KEY, payload TEXT)")
+            conn.executemany("INSERT INTO scratch (payload) VALUES (?)", [('x' * 500,) for _ in range(2000)])
+            conn.commit()
+            conn.execute("DROP TABLE scratch")
+            conn.commit()
+            db_maintenance.ensure_maintenance_tables(conn)
+            freelist = conn.execute("PRAGMA freelist_count").fetchone()[0]
+            
+            if not db_maintenance.acquire_lock(conn, 'worker-a') or db_maintenance.acquire_lock(conn, 'worker-b'):
+                print("   ✗ 租约应只由一个worker持有")
+                return False
+            if not db_maintenance.acquire_lock(conn, 'worker-b', now=time.time() + db_maintenance.LOCK_LEASE_SECONDS + 1):
+                print("   ✗ 过期的租约应可以被接手")
+                return False
+            db_maintenance.release_lock(conn, 'worker-b')
+            
+            results = db_maintenance.run_maintenance(db_path, holder='worker-a')
+            statuses = {entry['task']: entry['status'] for entry in results}
+            vacuum = next(entry for entry in results if entry['task'] == 'incremental_vacuum')
+            if statuses != {'wal_checkpoint': 'skipped', 'incremental_vacuum': 'ok', 'optimize': 'ok', 'analyze': 'ok'}:
+                print(f"   ✗ 任务状态不正确: {statuses}")
+                return False
+            if vacuum['freelist_after'] >= freelist or vacuum['pages_after'] >= vacuum['pages_before']:
+                print("   ✗ incremental_vacuum 没有归还空闲页")
+                return False
+            if db_maintenance.due_tasks(conn) or db_maintenance.run_maintenance(db_path):
+                print("   ✗ 已执行的任务不应在间隔内重复执行")
+                return False
+            conn.close()
+        
+        print("   ✓ 数据库维护正常")
+        return True
+    except Exception as e:
+        print(f"   ✗ 数据库维护测试失败: {e}")
+        return False
+
+def test_job_queue():
+    """测试基于租约的任务队列"""
+    print("21. 测试任务队列...")
+    try:
+        import json
+        import tempfile
+        import time
+        import job_queue
+        
+        with tempfile.TemporaryDirectory() as tmp:
+            db_path = os.path.join(tmp, 'queue.db')
+            conn = sqlite3.connect(db_path)
+            job_id, count = job_queue.enqueue_job(conn, 'sleep', {'items': 6, 'delay': 0}, lease_seconds=60)
+            
+            # worker崩溃：租约未释放，过期后应被其他worker接手
+            item = job_queue.claim_item(conn, 'crashed')
+            if job_queue.claim_item(conn, 'other', now=time.time() + 61)[0] != item[0]:
+                print("   ✗ 租约过期的工作项应被重新领取")
+                return False
+            if job_queue.complete_item(conn, item[0], job_id, 'crashed', {}):
+                print("   ✗ 租约已被接手时不应标记完成")
+                return False
+            conn.execute("UPDATE job_items SET lease_expires_at = 0 WHERE item_id = ?", (item[0],))
+            conn.commit()
+            
+            processed = job_queue.run_worker(db_path, owner='worker')
+            status = job_queue.job_status(conn, job_id)[0]
+            if processed != count or status['status'] != 'done' or status['counts'] != {'done': count}:
+                print(f"   ✗ 任务没有完成: {status}")
+                return False
+            
+            conn.execute("UPDATE jobs SET status = 'running' WHERE job_id = ?", (job_id,))
+            conn.execute("UPDATE job_items SET status = 'pending' WHERE seq = 0")
+            conn.commit()
+            item = job_queue.claim_item(conn, 'worker')
+            job_queue.fail_item(conn, item[0], job_id, 'worker', 'boom')
+            if job_queue.claim_item(conn, 'worker') is not None:
+                print("   ✗ 失败的工作项应退避后再重试")
+                return False
+            
+            # 一个工作项失败：同阶段的其他工作项继续处理，只阻塞后续阶段，全部结束后任务才标记失败
+            job_id, _ = job_queue.enqueue_job(conn, 'sleep', {'items': 3, 'delay': 0}, max_attempts=1)
+            conn.execute("UPDATE job_items SET stage = 1 WHERE job_id = ? AND seq = 2", (job_id,))
+            conn.commit()
+            item = job_queue.claim_item(conn, 'worker', job_id)
+            job_queue.fail_item(conn, item[0], job_id, 'worker', 'boom')
+            other = job_queue.claim_item(conn, 'worker', job_id)
+            if other is None or other[2] != [1] or job_queue.job_status(conn, job_id)[0]['status'] != 'running':
+                print("   ✗ 失败的工作项不应阻塞同阶段的其他工作项")
+                return False
+            job_queue.complete_item(conn, other[0], job_id, 'worker', {})
+            status = job_queue.job_status(conn, job_id)[0]
+            if status['status'] != 'failed' or status['counts'] != {'done': 1, 'failed': 1, 'pending': 1} \
+                    or job_queue.has_open_items(conn, job_id):
+                print(f"   ✗ 没有可处理的工作项后任务应标记失败: {status}")
+                return False
+            
+            # 翻译：个别行失败时工作项照常完成，失败的行记录在结果中，处理函数内不提交
+            conn.execute("""
+                CREATE TABLE predefined_comparisons (
+                    id INTEGER PRIMARY KEY, topic_name TEXT, hypothesis_rank INTEGER,
+                    hypothesis_content_en TEXT, hypothesis_content_zh TEXT
+                )
+            """)
+            conn.executemany("INSERT INTO predefined_comparisons VALUES (?, 't', ?, ?, '')",
+                             [(i, i, json.dumps({'title': f'T{i}'})) for i in (1, 2, 3)])
+            conn.commit()
+            job_queue._translator['translate'] = lambda content: None if content['title'] == 'T2' else {'title': 'zh'}
+            try:
+                job_id, _ = job_queue.enqueue_job(conn, 'translate', {'delay': 0})
+                job_queue.run_worker(db_path, owner='worker', job_id=job_id)
+            finally:
+                job_queue._translator.pop('translate', None)
+            status = job_queue.job_status(conn, job_id)[0]
+            empty = [row[0] for row in conn.execute(
+                "SELECT id FROM predefined_comparisons WHERE hypothesis_content_zh = '' ORDER BY id")]
+            if status['status'] != 'done' or status['failed_rows'] != 1 or empty != [2]:
+                print(f"   ✗ 部分翻译失败时应完成工作项并记录失败的行: {status} {empty}")
+                return False
+            conn.close()
+        
+        print("   ✓ 任务队列正常")
+        return True
+    except Exception as e:
+        print(f"   ✗ 任务队列测试失败: {e}")
+        return False
+
+def test_lazy_translation():
+    """测试按需翻译的单飞去重与写回"""
+    print("22. 测试按需翻译...")
+    try:
+        import json
+        import tempfile
+        import threading
+        import time
+        import lazy_translation
+        
+        with tempfile.TemporaryDirectory() as tmp:
+            db_path = os.path.join(tmp, 'translation.db')
+            conn = sqlite3.connect(db_path)
+            conn.execute("""
+                CREATE TABLE predefined_comparisons (
+                    id INTEGER PRIMARY KEY, hypothesis_content_en TEXT, hypothesis_content_zh TEXT
+                )
+            """)
+            conn.execute("INSERT INTO predefined_comparisons VALUES (1, ?, '')", (json.dumps({'title': 'Test'}),))
+            conn.commit()
+            
+            calls = []
+            stub = lazy_translation.stub_translator()
+            def slow_translate(content):
+                calls.append(content)
+                time.sleep(0.2)
+                return stub(content)
+            
+            service = lazy_translation.TranslationService(db_path, slow_translate, workers=4)
+            futures = []
+            threads = [threading.Thread(target=lambda: futures.append(service.request(1))) for _ in range(20)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            results = [future.result() for future in futures]
+            
+            zh = conn.execute("SELECT hypothesis_content_zh FROM predefined_comparisons WHERE id = 1").fetchone()[0]
+            if len(calls) != 1 or not all(results):
+                print(f"   ✗ 并发请求应只翻译一次（实际 {len(calls)} 次）")
+                return False
+            if json.loads(zh)['title'] != '[zh] Test':
+                print("   ✗ 译文没有写回数据库")
+                return False
+            if service.request(1).result() or len(calls) != 1:
+                print("   ✗ 已有译文时不应再次翻译")
+                return False
+            
+            # 其他进程已认领的假设不重复翻译
+            conn.execute("UPDATE predefined_comparisons SET hypothesis_content_zh = '' WHERE id = 1")
+            conn.commit()
+            if not lazy_translation.claim(conn, 1, 'other-process') or service.request(1).result():
+                print("   ✗ 其他进程认领的翻译不应重复执行")
+                return False
+            conn.close()
+        
+        # 导入app时不创建翻译服务；第一次需要时创建，之后复用
+        import subprocess
+        check = subprocess.run([sys.executable, '-c', 'import lazy_translation\n'
+                                'lazy_translation.create_service = None\n'
+                                'import app\n'
+                                'assert app._translation_service == {}'],
+                               capture_output=True, text=True, timeout=60)
+        if check.returncode != 0:
+            print(f"   ✗ 导入app时不应创建翻译服务: {check.stderr.strip().splitlines()[-1:]}")
+            return False
+        import app as app_module
+        created = []
+        original = (lazy_translation.create_service, dict(app_module._translation_service))
+        lazy_translation.create_service = lambda db_path: created.append(db_path) or 'service'
+        app_module._translation_service.clear()
+        try:
+            services = [app_module.get_translation_service() for _ in range(3)]
+        finally:
+            lazy_translation.create_service = original[0]
+            app_module._translation_service.clear()
+            app_module._translation_service.update(original[1])
+        if services != ['service'] * 3 or len(created) != 1:
+            print(f"   ✗ 翻译服务应只创建一次: {len(created)}")
+            return False
+        
+        print("   ✓ 按需翻译正常")
+        return True
+    except Exception as e:
+        print(f"   ✗ 按需翻译测试失败: {e}")
+        return False
+
+def test_request_profiler():
+    """测试请求性能剖析"""
+    print("23. 测试请求性能剖析...")
+    try:
+        import tempfile
+        import threading
+        import time
+        from flask import Flask
+        import request_profiler
+        
+        # 未开启时不注册请求钩子
+        app = Flask(__name__)
+        request_profiler.init_app(app)
+        if not (request_profiler.REQUEST_PROFILER_ENABLED or request_profiler.REQUEST_PROFILER_SAMPLE_RATE > 0
+                or request_profiler.REQUEST_PROFILER_SECRET) and app.before_request_funcs:
+            print("   ✗ 未开启时不应注册钩子")
+            return False
+        
+        header = request_profiler.sign('/rate/topic1', time.time() + 60, 'secret')
+        if (not request_profiler.verify(header, '/rate/topic1', 'secret')
+                or request_profiler.verify(header, '/rate/topic2', 'secret')
+                or request_profiler.verify(header, '/rate/topic1', 'other')
+                or request_profiler.verify(header, '/rate/topic1', 'secret', now=time.time() + 120)):
+            print("   ✗ 签名校验不正确")
+            return False
+        
+        def busy_loop(seconds):
+            end = time.perf_counter() + seconds
+            while time.perf_counter() < end:
+                pass
+        
+        sampler = request_profiler.StackSampler(threading.get_ident(), interval=0.001)
+        sampler.start()
+        busy_loop(0.2)
+        sampler.stop()
+        with tempfile.TemporaryDirectory() as tmp:
+            name = request_profiler.save_profile(sampler, tmp, {'endpoint': 'test', 'duration_ms': 200.0,
+                                                                'started_at': time.time()})
+            profiles = request_profiler.list_profiles(tmp)
+            if len(profiles) != 1 or profiles[0]['file'] != name or 'busy_loop' not in profiles[0]['top_functions'][0]['function']:
+                print(f"   ✗ 剖析结果不正确: {profiles}")
+                return False
+            with open(os.path.join(tmp, name), encoding='utf-8') as f:
+                if not all(line.rsplit(' ', 1)[1].strip().isdigit() for line in f):
+                    print("   ✗ collapsed stack 格式不正确")
+                    return False
+        
+        print("   ✓ 请求性能剖析正常")
+        return True
+    except Exception as e:
+        print(f"   ✗ 请求性能剖析测试失败: {e}")
+        return False
+
+def test_bulk_submit():
+    """测试批量提交接口的逐条状态"""
+    print("24. 测试批量提交...")
+    try:
+        import tempfile
+        import app
+        
+        original_db = app.DB_PATH
+        with tempfile.TemporaryDirectory() as tmp:
+            app.DB_PATH = os.path.join(tmp, 'bulk.db')
+            try:
+                create_rating_tables()
+                client = app.app.test_client()
+                rating = {'comparison_number': 1, 'hypothesis_A_id': 1, 'hypothesis_B_id': 2,
+                          **{field: 3 for field in app.RATING_SCORE_FIELDS}}
+                response = client.post('/api/submit-ratings', json={
+                    'ratings': [dict(rating, client_request_id='r1'),
+                                dict(rating, client_request_id='r2', topic='topic1'),
+                                dict(rating, client_request_id='r2', topic='topic1')],
+                    'comments': [{'comment': {'text': 'x'}, 'client_request_id': 'c1', 'topic': 'topic1'},
+                                 {'comment': 'ok', 'client_request_id': 'c2', 'topic': 'topic1'}],
+                })
+                result = response.get_json()
+                statuses = [entry['status'] for entry in result['ratings'] + result['comments']]
+                if response.status_code != 200 or statuses != ['invalid', 'inserted', 'duplicate', 'invalid', 'inserted']:
+                    print(f"   ✗ 逐条状态不正确: {response.status_code} {statuses}")
+                    return False
+                if [entry['client_request_id'] for entry in result['ratings']] != ['r1', 'r2', 'r2']:
+                    print("   ✗ 不合法的条目也应返回 client_request_id")
+                    return False
+                if client.post('/api/submit-ratings', json=[]).status_code != 400:
+                    print("   ✗ 非对象的请求体应返回400")
+                    return False
+                
+                # 离线期间开始了新主题：旧会话的评分按它自己的会话保存，不推进新会话的进度
+                with client.session_transaction() as cookie:
+                    cookie.update(session_id='new-session', topic='topic1', current_comparison=1,
+                                  completed_comparisons=[])
+                response = client.post('/api/submit-ratings', json={'ratings': [
+                    dict(rating, comparison_number=3, client_request_id='r3', topic='topic1', session_id='old-session'),
+                    dict(rating, client_request_id='r4', topic='topic1', session_id='new-session'),
+                ]})
+                conn = sqlite3.connect(app.DB_PATH)
+                saved = conn.execute("SELECT client_request_id, session_id FROM ratings "
+                                     "WHERE client_request_id IN ('r3', 'r4') ORDER BY 1").fetchall()
+                conn.close()
+                if saved != [('r3', 'old-session'), ('r4', 'new-session')]:
+                    print(f"   ✗ 评分应保存在入队时的会话中: {saved}")
+                    return False
+                if response.get_json()['current_comparison'] != 2:
+                    print(f"   ✗ 只有当前会话的评分应推进进度: {response.get_json()['current_comparison']}")
+                    return False
+            finally:
+                app.DB_PATH = original_db
+        
+        print("   ✓ 批量提交正确")
+        return True
+    except Exception as e:
+        print(f"   ✗ 批量提交测试失败: {e}")
+        return False
+
+def test_restore_compressed():
+    """测试从压缩后的数据库恢复预定义假设"""
+    print("25. 测试压缩数据库的假设池恢复...")
+    try:
+        import json
+        import random
+        import tempfile
+        import content_compression
+        import restore_predefined_comparisons
+        from add_content_columns import ensure_content_columns
+        
+        if content_compression.zstandard is None:
+            print("   ✓ 未安装zstandard，跳过")
+            return True
+        
+        original_db = restore_predefined_comparisons.DB_PATH
+        with tempfile.TemporaryDirectory() as tmp:
+            db_path = os.path.join(tmp, 'restore.db')
+            conn = sqlite3.connect(db_path)
+            conn.execute("""
+                CREATE TABLE hypothesis (
+                    id INTEGER PRIMARY KEY, model_source TEXT, topic INTEGER, sub_topic INTEGER, strategy TEXT,
+                    hypothesis_id TEXT, hypothesis_content TEXT, feedback_results TEXT, novelty_score REAL,
+                    significance_score REAL, soundness_score REAL, feasibility_score REAL, overall_winner_score REAL
+                )
+            """)
+            rng = random.Random(0)
+            words = ['retrieval', 'language', 'benchmark', 'robustness', 'transfer', 'evaluation', 'reasoning']
+            conn.executemany("""
+                INSERT INTO hypothesis (model_source, topic, sub_topic, strategy, hypothesis_content, overall_winner_score)
+                VALUES (?, 1, 1, ?, ?, ?)
+            """, [(f"model{i % 4}", f"strategy{i % 3}",
+                   json.dumps({'title': f"{' '.join(rng.choices(words, k=4))} {i}",
+                               'Problem_Statement': ' '.join(rng.choices(words, k=60))}), rng.random())
+                  for i in range(200)])
+            ensure_content_columns(conn)
+            content_compression.compress_database(conn)
+            conn.close()
+            
+            restore_predefined_comparisons.DB_PATH = db_path
+            try:
+                restore_predefined_comparisons.restore_predefined_comparisons()
+            finally:
+                restore_predefined_comparisons.DB_PATH = original_db
+            
+            conn = sqlite3.connect(db_path)
+            rows = conn.execute("SELECT hypothesis_content_en FROM predefined_comparisons WHERE topic_name = 'topic1'").fetchall()
+            conn.close()
+            if len(rows) != 8 or not all(isinstance(row[0], str) and json.loads(row[0])['title'] for row in rows):
+                print(f"   ✗ 恢复的内容不是解压后的JSON文本: {[type(row[0]).__name__ for row in rows]}")
+                return False
+        
+        print("   ✓ 压缩数据库的假设池恢复正确")
+        return True
+    except Exception as e:
+        print(f"   ✗ 压缩数据库的假设池恢复测试失败: {e}")
+        return False
+
+def test_write_backpressure():
+    """测试写接口的限流与写锁争用背压（经过HTTP请求）"""
+    print("26. 测试写接口背压...")
+    try:
+        import tempfile
+        import time
+        from flask import Flask, jsonify
+        import rate_limit
+        
+        with tempfile.TemporaryDirectory() as tmp:
+            db_path = os.path.join(tmp, 'writes.db')
+            setup = sqlite3.connect(db_path)
+            setup.execute("CREATE TABLE writes (id INTEGER PRIMARY KEY)")
+            setup.commit()
+            setup.close()
+            
+            contention = rate_limit.WriteContention(threshold=0.05, half_life=1)
+            app = Flask(__name__)
+            app.secret_key = 'test'
+            
+            def write():
+                conn = sqlite3.connect(db_path, timeout=0.2)
+                try:
+                    rate_limit.begin_write(conn.cursor(), contention)
+                    conn.execute("INSERT INTO writes DEFAULT VALUES")
+                    conn.commit()
+                except sqlite3.OperationalError:
+                    return rate_limit.too_many_requests(rate_limit.BACKPRESSURE_RETRY_AFTER, 'server busy',
+                                                        status=503)
+                finally:
+                    conn.close()
+                return jsonify({'success': True})
+            app.add_url_rule('/api/submit-rating', 'submit_rating', write, methods=['POST'])
+            app.add_url_rule('/api/submit-ratings', 'submit_ratings_bulk', write, methods=['POST'])
+            rate_limit.init_app(app, rate_limit.MemoryBuckets(), contention=contention)
+            client = app.test_client()
+            
+            if client.post('/api/submit-ratings', json=[1, 2]).status_code != 200:
+                print("   ✗ 数组请求体不应让限流钩子出错")
+                return False
+            
+            # 另一个连接持有写锁：本次写入等待超时，之后的写请求在钩子中直接被拒绝
+            holder = sqlite3.connect(db_path, isolation_level=None)
+            holder.execute("BEGIN IMMEDIATE")
+            busy = client.post('/api/submit-rating', json={})
+            holder.execute("ROLLBACK")
+            holder.close()
+            shed = client.post('/api/submit-rating', json={})
+            if busy.status_code != 503 or shed.status_code != 503 or 'Retry-After' not in shed.headers:
+                print(f"   ✗ 写锁争用时应返回503: {busy.status_code} {shed.status_code}")
+                return False
+            if contention.overloaded(now=time.monotonic() + 30)[0]:
+                print("   ✗ 争用结束后背压应随时间解除")
+                return False
+            
+            original_burst = rate_limit.IP_BURST
+            rate_limit.IP_BURST = 1
+            try:
+                app = Flask(__name__)
+                app.secret_key = 'test'
+                app.add_url_rule('/api/submit-rating', 'submit_rating', lambda: jsonify({'success': True}),
+                                 methods=['POST'])
+                rate_limit.init_app(app, rate_limit.MemoryBuckets(), contention=rate_limit.WriteContention())
+                client = app.test_client()
+                codes = [client.post('/api/submit-rating', json={}).status_code for _ in range(2)]
+            finally:
+                rate_limit.IP_BURST = original_burst
+            if codes != [200, 429]:
+                print(f"   ✗ 超出令牌桶容量时应返回429: {codes}")
+                return False
+        
+        print("   ✓ 写接口背压正确")
+        return True
+    except Exception as e:
+        print(f"   ✗ 写接口背压测试失败: {e}")
+        return False
+
+def test_admin_stream_counters():
+    """测试推送连接的主题计数（触发器维护的计数表）与连接数上限检查"""
+    print("27. 测试实时推送计数...")
+    try:
+        from flask import Flask
+        import admin_stream
+        import rating_counters
+        
+        conn = sqlite3.connect(':memory:', isolation_level=None)
+        conn.execute("CREATE TABLE ratings (rating_id INTEGER PRIMARY KEY AUTOINCREMENT, topic_name TEXT NOT NULL)")
+        conn.execute("CREATE TABLE comments (comment_id INTEGER PRIMARY KEY AUTOINCREMENT, topic_name TEXT NOT NULL)")
+        conn.executemany("INSERT INTO ratings (topic_name) VALUES (?)", [('a',), ('a',), ('b',)])
+        rating_counters.ensure_rating_counters(conn)
+        conn.executemany("INSERT INTO ratings (topic_name) VALUES (?)", [('a',), ('c',)])
+        conn.execute("INSERT INTO comments (topic_name) VALUES ('b')")
+        conn.execute("DELETE FROM ratings WHERE rating_id = 2")
+        
+        expected = {'a': 2, 'b': 1, 'c': 1}
+        if rating_counters.topic_counts(conn, 'ratings') != expected:
+            print(f"   ✗ 计数表与评分不一致: {rating_counters.topic_counts(conn, 'ratings')}")
+            return False
+        if rating_counters.deleted_count(conn, 'ratings') != 1:
+            print("   ✗ 删除计数不正确")
+            return False
+        counters = admin_stream.topic_counters(conn, 3, 0)
+        if counters != {'a': {'ratings': 1, 'comments': 0}, 'b': {'ratings': 1, 'comments': 0}}:
+            print(f"   ✗ 水位线之前的主题计数不正确: {counters}")
+            return False
+        rating_counters.ensure_rating_counters(conn, rebuild=True)
+        if rating_counters.topic_counts(conn, 'ratings') != expected:
+            print("   ✗ 重新计数结果不一致")
+            return False
+        conn.close()
+        
+        try:
+            admin_stream.init_app(Flask(__name__), ':memory:', max_clients=4, threads=4)
+            print("   ✗ 推送连接数不小于线程数时应在启动时报错")
+            return False
+        except ValueError:
+            pass
+        admin_stream.init_app(Flask(__name__), ':memory:', max_clients=1, threads=4)
+        
+        print("   ✓ 实时推送计数正确")
+        return True
+    except Exception as e:
+        print(f"   ✗ 实时推送计数测试失败: {e}")
+        return False
+
+def test_warmup_readiness():
+    """测试多个worker并发预热、预热重试与 /healthz、/readyz"""
+    print("28. 测试预热与就绪检查...")
+    try:
+        import tempfile
+        import threading
+        import time
+        from flask import Flask
+        import app as app_module
+        import warmup
+        
+        with tempfile.TemporaryDirectory() as tmp:
+            # 旧版数据库（没有 client_request_id 列）：多个worker同时迁移不应报 duplicate column
+            db_path = os.path.join(tmp, 'upgrade.db')
+            setup = sqlite3.connect(db_path)
+            setup.execute("CREATE TABLE ratings (rating_id INTEGER PRIMARY KEY AUTOINCREMENT, session_id TEXT NOT NULL, "
+                          "topic_name TEXT NOT NULL)")
+            setup.execute("CREATE TABLE comments (comment_id INTEGER PRIMARY KEY AUTOINCREMENT, session_id TEXT NOT NULL, "
+                          "topic_name TEXT NOT NULL)")
+            setup.commit()
+            setup.close()
+            
+            errors = []
+            def migrate():
+                try:
+                    app_module.create_rating_tables()
+                except Exception as e:
+                    errors.append(e)
+            original_db = app_module.DB_PATH
+            app_module.DB_PATH = db_path
+            # 另一个连接先持有写锁：各worker都在迁移前读到旧结构，之后依次获得写锁
+            holder = sqlite3.connect(db_path, isolation_level=None)
+            holder.execute("BEGIN IMMEDIATE")
+            try:
+                workers = [threading.Thread(target=migrate) for _ in range(4)]
+                for worker in workers:
+                    worker.start()
+                time.sleep(0.5)
+                holder.execute("ROLLBACK")
+                for worker in workers:
+                    worker.join()
+            finally:
+                holder.close()
+                app_module.DB_PATH = original_db
+            if errors:
+                print(f"   ✗ 并发迁移失败: {errors[0]}")
+                return False
+            
+            calls = {'flaky': 0, 'broken': True}
+            def flaky():
+                calls['flaky'] += 1
+                if calls['flaky'] == 1:
+                    raise sqlite3.OperationalError('database is locked')
+                return 'ok'
+            def broken():
+                if calls['broken']:
+                    raise sqlite3.OperationalError('database is locked')
+            
+            app = Flask(__name__)
+            warmup.init_app(app, db_path, [('flaky', flaky)])
+            client = app.test_client()
+            if client.get('/healthz').status_code != 200 or client.get('/readyz').status_code != 503:
+                print("   ✗ 预热前 /healthz 应返回200、/readyz 应返回503")
+                return False
+            if not warmup.run(app, sleep=lambda seconds: None):
+                print("   ✗ 失败一次的步骤应在重试后成功")
+                return False
+            ready = client.get('/readyz')
+            if ready.status_code != 200 or ready.get_json()['warmup']['steps'][0]['attempts'] != 2:
+                print(f"   ✗ 预热完成后 /readyz 应返回200: {ready.get_json()}")
+                return False
+            
+            app = Flask(__name__)
+            warmup.init_app(app, db_path, [('broken', broken)])
+            client = app.test_client()
+            if warmup.run(app, sleep=lambda seconds: None):
+                print("   ✗ 一直失败的步骤应使预热失败")
+                return False
+            # 重试用尽后，就绪检查在后台重新预热
+            calls['broken'] = False
+            if client.get('/readyz').status_code != 503:
+                print("   ✗ 预热失败时 /readyz 应返回503")
+                return False
+            deadline = time.monotonic() + 10
+            while app.extensions['warmup']['status'] != 'ready' and time.monotonic() < deadline:
+                time.sleep(0.01)
+            if client.get('/readyz').status_code != 200:
+                print(f"   ✗ 失败后重新预热未恢复就绪: {app.extensions['warmup']['error']}")
+                return False
+        
+        print("   ✓ 预热与就绪检查正确")
+        return True
+    except Exception as e:
+        print(f"   ✗ 预热与就绪检查测试失败: {e}")
+        return False
+
+def test_alignment_refresh():
+    """测试专家偏好汇总的增量刷新：没有变化时不获取写锁，评分被删除时全量重建"""
+    print("29. 测试一致性汇总增量刷新...")
+    try:
+        import tempfile
+        from alignment_report import DIMENSIONS, refresh_pair_stats
+        
+        with tempfile.TemporaryDirectory() as tmp:
+            db_path = os.path.join(tmp, 'alignment.db')
+            conn = sqlite3.connect(db_path, timeout=0)
+            conn.execute(f"""
+                CREATE TABLE ratings (rating_id INTEGER PRIMARY KEY AUTOINCREMENT, topic_name TEXT NOT NULL,
+                                      hypothesis_A_id INTEGER, hypothesis_B_id INTEGER,
+                                      {', '.join(f'{dimension} INTEGER' for dimension in DIMENSIONS)})
+            """)
+            conn.execute("CREATE TABLE comments (comment_id INTEGER PRIMARY KEY AUTOINCREMENT, topic_name TEXT NOT NULL)")
+            insert = f"INSERT INTO ratings (topic_name, hypothesis_A_id, hypothesis_B_id, {', '.join(DIMENSIONS)}) " \
+                     f"VALUES ('topic1', ?, ?, {', '.join('?' for _ in DIMENSIONS)})"
+            conn.executemany(insert, [(1, 2) + (1,) * len(DIMENSIONS), (2, 1) + (1,) * len(DIMENSIONS)])
+            conn.commit()
+            
+            if refresh_pair_stats(conn) != (2, 2):
+                print("   ✗ 首次汇总的水位线或评分数错误")
+                return False
+            
+            # 其他连接持有写锁：没有新评分时刷新只读，不等待写锁（timeout=0 时等待会立即报错）
+            holder = sqlite3.connect(db_path, isolation_level=None)
+            holder.execute("BEGIN IMMEDIATE")
+            try:
+                unchanged = refresh_pair_stats(conn)
+            finally:
+                holder.execute("ROLLBACK")
+                holder.close()
+            if unchanged != (2, 2):
+                print("   ✗ 没有变化时应直接返回已汇总的结果")
+                return False
+            
+            conn.execute(insert, (1, 2) + (5,) * len(DIMENSIONS))
+            conn.commit()
+            if refresh_pair_stats(conn) != (3, 3):
+                print("   ✗ 新评分未增量汇总")
+                return False
+            
+            conn.execute("DELETE FROM ratings WHERE rating_id = 1")
+            conn.commit()
+            if refresh_pair_stats(conn) != (3, 2):
+                print("   ✗ 评分被删除后应全量重建")
+                return False
+            low, high = conn.execute(
+                "SELECT low_preferred, high_preferred FROM alignment_pair_stats WHERE dimension = 'overall_score'"
+            ).fetchone()
+            conn.close()
+            if (low, high) != (0, 2):
+                print(f"   ✗ 重建后的偏好计数错误: {(low, high)}")
+                return False
+        
+        print("   ✓ 一致性汇总增量刷新正确")
+        return True
+    except Exception as e:
+        print(f"   ✗ 一致性汇总增量刷新测试失败: {e}")
+        return False
+
+def test_consistency_refresh():
+    """测试一致性按假设数分块、增量写入与后台重新计算"""
+    print("30. 测试会话一致性增量刷新...")
+    try:
+        import tempfile
+        import time
+        import numpy as np
+        import consistency_check
+        
+        # 一个假设数很多的会话与大量小会话一起计算，结果与逐个会话计算相同
+        conn = consistency_check.create_benchmark_db(30)
+        conn.executemany(f"""
+            INSERT INTO ratings (session_id, topic_name, comparison_number, hypothesis_A_id, hypothesis_B_id,
+                                 {', '.join(consistency_check.DIMENSIONS)})
+            VALUES ('big', 'topic1', ?, ?, ?, {', '.join('?' for _ in consistency_check.DIMENSIONS)})
+        """, [(k, k, (k * 7) % 40 + 40) + ((k % 5) + 1,) * len(consistency_check.DIMENSIONS) for k in range(40)])
+        data = consistency_check.load_session_judgments(conn)
+        result = consistency_check.compute_consistency(data)
+        for s in (0, data['session_ids'].index('big')):
+            rows = slice(data['starts'][s], data['starts'][s + 1] if s + 1 < len(data['starts']) else None)
+            single = consistency_check.compute_consistency({
+                'starts': np.array([0]), 'hypothesis_A_id': data['hypothesis_A_id'][rows],
+                'hypothesis_B_id': data['hypothesis_B_id'][rows], 'scores': data['scores'][rows]})
+            if (single['triads'][0] != result['triads'][s]).any() or \
+                    (single['cyclic_triads'][0] != result['cyclic_triads'][s]).any():
+                print(f"   ✗ 分组计算与单个会话计算不一致: {data['session_ids'][s]}")
+                return False
+        
+        # 结果没有变化时不写入任何行
+        if consistency_check.save_consistency(conn, data, result) == 0 or \
+                consistency_check.save_consistency(conn, data, result) != 0:
+            print("   ✗ 结果未变化时不应重写 session_consistency")
+            return False
+        conn.close()
+        
+        with tempfile.TemporaryDirectory() as tmp:
+            db_path = os.path.join(tmp, 'consistency.db')
+            conn = sqlite3.connect(db_path)
+            conn.executescript(f"""
+                CREATE TABLE ratings (rating_id INTEGER PRIMARY KEY AUTOINCREMENT, session_id TEXT, topic_name TEXT,
+                                      hypothesis_A_id INTEGER, hypothesis_B_id INTEGER,
+                                      {', '.join(dim + ' INTEGER' for dim in consistency_check.DIMENSIONS)});
+                CREATE TABLE comments (comment_id INTEGER PRIMARY KEY AUTOINCREMENT, topic_name TEXT NOT NULL);
+            """)
+            insert = f"INSERT INTO ratings (session_id, topic_name, hypothesis_A_id, hypothesis_B_id, " \
+                     f"{', '.join(consistency_check.DIMENSIONS)}) VALUES ('s1', 'topic1', ?, ?, 1, 1, 1, 1, 1)"
+            conn.executemany(insert, [(1, 2), (2, 3)])
+            conn.commit()
+            
+            original_refresh = consistency_check.CONSISTENCY_REFRESH_SECONDS
+            consistency_check._cache.clear()
+            try:
+                first = consistency_check.get_consistency_report(conn, db_path=db_path)
+                conn.execute(insert, (3, 1))
+                conn.commit()
+                consistency_check.CONSISTENCY_REFRESH_SECONDS = 3600
+                within_ttl = consistency_check.get_consistency_report(conn, db_path=db_path)
+                consistency_check.CONSISTENCY_REFRESH_SECONDS = 0
+                stale = consistency_check.get_consistency_report(conn, db_path=db_path)
+                deadline = time.monotonic() + 10
+                while consistency_check.get_consistency_report(conn, db_path=db_path)['stale'] and \
+                        time.monotonic() < deadline:
+                    time.sleep(0.01)
+                fresh = consistency_check.get_consistency_report(conn, db_path=db_path)
+            finally:
+                consistency_check.CONSISTENCY_REFRESH_SECONDS = original_refresh
+                consistency_check._cache.clear()
+                conn.close()
+            if first['ratings_count'] != 2 or not within_ttl['stale'] or within_ttl['ratings_count'] != 2 \
+                    or not stale['stale']:
+                print("   ✗ 有新评分时请求中不应重新计算")
+                return False
+            if fresh['stale'] or fresh['ratings_count'] != 3 or fresh['dimensions']['overall_score']['cyclic_triads'] != 1:
+                print(f"   ✗ 后台重新计算的结果不正确: {fresh}")
+                return False
+        
+        print("   ✓ 会话一致性增量刷新正确")
+        return True
+    except Exception as e:
+        print(f"   ✗ 会话一致性增量刷新测试失败: {e}")
+        return False
+
+def test_content_columns():
+    """测试标题列：旧生成列迁移、触发器维护、读取标题时不解析JSON"""
+    print("31. 测试标题列...")
+    try:
+        import json
+        import tempfile
+        from add_content_columns import ensure_content_columns
+        
+        with tempfile.TemporaryDirectory() as tmp:
+            db_path = os.path.join(tmp, 'titles.db')
+            conn = sqlite3.connect(db_path, timeout=0)
+            conn.execute("CREATE TABLE hypothesis (id INTEGER PRIMARY KEY, topic INTEGER, hypothesis_content TEXT)")
+            conn.executemany("INSERT INTO hypothesis (topic, hypothesis_content) VALUES (1, ?)",
+                             [(json.dumps({'title': f'title {i}', 'Problem_Statement': 'x' * 5000}),) for i in range(20)])
+            # 旧版本添加的 VIRTUAL 生成列及其索引
+            conn.execute("""ALTER TABLE hypothesis ADD COLUMN title TEXT GENERATED ALWAYS AS
+                            (CASE WHEN json_valid(hypothesis_content) THEN json_extract(hypothesis_content, '$.title') END) VIRTUAL""")
+            conn.execute("CREATE INDEX idx_hypothesis_topic_title ON hypothesis(topic, title)")
+            conn.execute("CREATE TABLE ratings (rating_id INTEGER PRIMARY KEY, hypothesis_A_id INTEGER, hypothesis_B_id INTEGER)")
+            conn.executemany("INSERT INTO ratings (hypothesis_A_id, hypothesis_B_id) VALUES (?, ?)",
+                             [(i, i + 1) for i in range(1, 20)])
+            conn.commit()
+            
+            if ensure_content_columns(conn) != ['hypothesis.title']:
+                print("   ✗ 旧的生成列应迁移为普通列")
+                return False
+            hidden = [column[6] for column in conn.execute("PRAGMA table_xinfo(hypothesis)") if column[1] == 'title']
+            if hidden != [0] or conn.execute("SELECT title FROM hypothesis WHERE id = 3").fetchone() != ('title 2',):
+                print(f"   ✗ 迁移后的标题列不正确: {hidden}")
+                return False
+            
+            # 标题已存在时只读取表结构，不等待其他连接的写锁
+            holder = sqlite3.connect(db_path, isolation_level=None)
+            holder.execute("BEGIN IMMEDIATE")
+            try:
+                repeated = ensure_content_columns(conn)
+            finally:
+                holder.execute("ROLLBACK")
+                holder.close()
+            if repeated != []:
+                print("   ✗ 重复执行不应再添加列")
+                return False
+            
+            # 读取标题不调用 json_extract（覆盖内置函数以计数）
+            calls = []
+            conn.create_function('json_extract', 2, lambda content, path: calls.append(path))
+            rows = conn.execute("""
+                SELECT r.rating_id, h1.title, h2.title FROM ratings r
+                LEFT JOIN hypothesis h1 ON r.hypothesis_A_id = h1.id
+                LEFT JOIN hypothesis h2 ON r.hypothesis_B_id = h2.id
+            """).fetchall()
+            if calls or rows[0][1:] != ('title 0', 'title 1'):
+                print(f"   ✗ 读取标题时不应解析JSON: {len(calls)} 次 json_extract")
+                return False
+            conn.close()
+            
+            conn = sqlite3.connect(db_path)
+            conn.execute("INSERT INTO hypothesis (topic, hypothesis_content) VALUES (2, ?)", (json.dumps({'title': 'new'}),))
+            conn.execute("UPDATE hypothesis SET hypothesis_content = ? WHERE id = 1", (json.dumps({'title': 'edited'}),))
+            conn.execute("UPDATE hypothesis SET hypothesis_content = '42' WHERE id = 2")
+            conn.execute("UPDATE hypothesis SET hypothesis_content = x'00' WHERE id = 3")
+            titles = [row[0] for row in conn.execute("SELECT title FROM hypothesis WHERE id IN (1, 2, 3, 21) ORDER BY id")]
+            conn.close()
+            if titles != ['edited', None, 'title 2', 'new']:
+                print(f"   ✗ 触发器维护的标题不正确: {titles}")
+                return False
+        
+        print("   ✓ 标题列正确")
+        return True
+    except Exception as e:
+        print(f"   ✗ 标题列测试失败: {e}")
+        return False
+
+def test_http_caching():
+    """测试HTML弱ETag与条件GET、按 Accept-Encoding 压缩、指纹URL缓存头、过期的预压缩文件"""
+    print("32. 测试HTTP缓存与压缩...")
+    try:
+        import gzip
+        import tempfile
+        import time
+        from flask import Flask, url_for
+        import http_caching
+        
+        with tempfile.TemporaryDirectory() as tmp:
+            os.makedirs(os.path.join(tmp, 'css'))
+            source = os.path.join(tmp, 'css', 'cached.css')
+            with open(source, 'w') as f:
+                f.write('body{color:red}' * 100)
+            # 预压缩文件比源文件旧：构建产物已过期，不应发送
+            with open(source + '.gz', 'wb') as f:
+                f.write(gzip.compress(b'stale'))
+            old = time.time() - 60
+            os.utime(source + '.gz', (old, old))
+            
+            app = Flask(__name__, static_folder=tmp, static_url_path='/static')
+            app.add_url_rule('/page', 'page', lambda: '<p>' + 'x' * 2000 + '</p>')
+            original_manifest = http_caching._manifest
+            http_caching._manifest = {}
+            try:
+                http_caching.init_app(app)
+                client = app.test_client()
+                
+                page = client.get('/page')
+                etag = page.headers.get('ETag', '')
+                if page.status_code != 200 or not etag.startswith('W/') or 'Content-Encoding' in page.headers:
+                    print(f"   ✗ HTML应带弱ETag，且客户端不接受gzip时不压缩: {etag}")
+                    return False
+                if client.get('/page', headers={'If-None-Match': etag}).status_code != 304:
+                    print("   ✗ ETag匹配时应返回304")
+                    return False
+                compressed = client.get('/page', headers={'Accept-Encoding': 'gzip'})
+                if (compressed.headers.get('Content-Encoding') != 'gzip'
+                        or gzip.decompress(compressed.data) != page.data):
+                    print("   ✗ 客户端接受gzip时HTML应压缩")
+                    return False
+                
+                with app.test_request_context():
+                    url = url_for('static', filename='css/cached.css')
+                if url != f"/static/css/cached.{http_caching.file_content_hash(source)}.css":
+                    print(f"   ✗ 静态文件URL应带内容指纹: {url}")
+                    return False
+                response = client.get(url, headers={'Accept-Encoding': 'gzip'})
+                if (response.cache_control.max_age != http_caching.STATIC_IMMUTABLE_MAX_AGE
+                        or not response.cache_control.immutable):
+                    print(f"   ✗ 指纹URL应返回 immutable: {response.headers.get('Cache-Control')}")
+                    return False
+                if 'Content-Encoding' in response.headers or not response.data.startswith(b'body{'):
+                    print("   ✗ 比源文件旧的 .gz 不应发送")
+                    return False
+                response.close()
+                
+                with open(source + '.gz', 'wb') as f:
+                    f.write(gzip.compress(b'fresh'))
+                response = client.get(url, headers={'Accept-Encoding': 'gzip'})
+                if response.headers.get('Content-Encoding') != 'gzip' or gzip.decompress(response.data) != b'fresh':
+                    print("   ✗ 客户端接受gzip时应发送最新的 .gz")
+                    return False
+                response.close()
+                
+                response = client.get('/static/css/cached.000000000000.css')
+                if response.status_code != 200 or response.cache_control.immutable \
+                        or response.cache_control.max_age != http_caching.STATIC_DEFAULT_MAX_AGE:
+                    print(f"   ✗ 指纹不匹配时只应短时间缓存: {response.headers.get('Cache-Control')}")
+                    return False
+                response.close()
+            finally:
+                http_caching._manifest = original_manifest
+        
+        print("   ✓ HTTP缓存与压缩正确")
+        return True
+    except Exception as e:
+        print(f"   ✗ HTTP缓存测试失败: {e}")
+        return False
+
+def test_asset_bundles():
+    """测试页面资源引用：资源包 -> 本地vendor文件 -> CDN 的回退顺序，以及CSS压缩"""
+    print("33. 测试静态资源包...")
+    try:
+        import json
+        import tempfile
+        from flask import Flask, render_template_string
+        import static_assets
+        from build_static import minify_css
+        
+        css = "/* 注释 */\n.a  :hover {\n  color:  red ;\n}\n.b > .c, .d { margin: 0 ; }"
+        if minify_css(css) != ".a :hover{color:red}.b>.c,.d{margin:0}":
+            print(f"   ✗ CSS压缩结果不正确: {minify_css(css)}")
+            return False
+        
+        with tempfile.TemporaryDirectory() as tmp:
+            app = Flask(__name__, static_folder=tmp, static_url_path='/static')
+            app.add_url_rule('/', 'index', lambda: render_template_string('{{ asset_bundle()|tojson }}'))
+            static_assets.init_app(app)
+            client = app.test_client()
+            bootstrap_css = static_assets.VENDOR_CSS[0]
+            
+            assets = json.loads(client.get('/').data)
+            if assets['css'][:2] != [static_assets.VENDOR_ASSETS[f] for f in static_assets.VENDOR_CSS]:
+                print(f"   ✗ 没有本地vendor文件时应回退到CDN: {assets['css']}")
+                return False
+            
+            os.makedirs(os.path.dirname(os.path.join(tmp, bootstrap_css)))
+            with open(os.path.join(tmp, bootstrap_css), 'w') as f:
+                f.write('.btn{}')
+            assets = json.loads(client.get('/').data)
+            if assets['css'][0] != f"/static/{bootstrap_css}" or not assets['css'][1].startswith('https://'):
+                print(f"   ✗ 本地vendor文件存在时应优先使用: {assets['css']}")
+                return False
+            
+            with open(os.path.join(tmp, 'manifest.json'), 'w') as f:
+                json.dump({'bundles': {'home': {'css': 'dist/home.abc.css'}, 'app': {'js': 'dist/app.abc.js'}}}, f)
+            assets = json.loads(client.get('/').data)
+            if assets != {'css': ['/static/dist/home.abc.css'], 'js': ['/static/dist/app.abc.js']}:
+                print(f"   ✗ 构建后应只引用资源包: {assets}")
+                return False
+        
+        print("   ✓ 静态资源包回退顺序正确")
+        return True
+    except Exception as e:
+        print(f"   ✗ 静态资源包测试失败: {e}")
+        return False
+
+def test_template_cache():
+    """测试模板字节码缓存：预编译后新进程渲染不再编译模板"""
+    print("34. 测试模板字节码缓存...")
+    try:
+        import tempfile
+        from flask import Flask, render_template
+        import template_cache
+        
+        with tempfile.TemporaryDirectory() as tmp:
+            templates = os.path.join(tmp, 'templates')
+            cache_dir = os.path.join(tmp, 'cache')
+            os.makedirs(templates)
+            for name in ('a.html', 'b.html'):
+                with open(os.path.join(templates, name), 'w') as f:
+                    f.write('<p>{{ value }}</p>')
+            
+            app = Flask(__name__, template_folder=templates)
+            template_cache.init_app(app, directory=cache_dir)
+            if template_cache.precompile_templates(app) != ['a.html', 'b.html'] or len(os.listdir(cache_dir)) != 2:
+                print(f"   ✗ 预编译应为每个模板写入字节码: {os.listdir(cache_dir)}")
+                return False
+            
+            # 新的应用（相当于新的worker）从字节码缓存加载，不调用 compile
+            fresh = Flask(__name__, template_folder=templates)
+            template_cache.init_app(fresh, directory=cache_dir)
+            compiled = []
+            compile_template = fresh.jinja_env.compile
+            fresh.jinja_env.compile = lambda *args, **kwargs: compiled.append(args) or compile_template(*args, **kwargs)
+            with fresh.app_context():
+                html = render_template('a.html', value='<b>')
+            if compiled or html != '<p>&lt;b&gt;</p>':
+                print(f"   ✗ 应从字节码缓存加载模板（编译了 {len(compiled)} 次）: {html}")
+                return False
+            
+            # 缓存目录不可用时不启用缓存，应用照常渲染
+            blocked = os.path.join(tmp, 'file')
+            open(blocked, 'w').close()
+            if template_cache.create_bytecode_cache(os.path.join(blocked, 'cache')) is not None:
+                print("   ✗ 缓存目录无法创建时应返回None")
+                return False
+        
+        print("   ✓ 模板字节码缓存正确")
+        return True
+    except Exception as e:
+        print(f"   ✗ 模板字节码缓存测试失败: {e}")
+        return False
+
 def main():
     """主测试函数"""
     print("专家评分系统功能测试")
@@ -137,7 +1669,36 @@ def main():
         test_hypothesis_pools,
         test_database_tables,
         test_comparison_logic,
-        test_hypothesis_content
+        test_hypothesis_content,
+        test_agreement_analysis,
+        test_bradley_terry,
+        test_alignment_report,
+        test_search_index,
+        test_near_duplicates,
+        test_pool_sampler,
+        test_rate_limit,
+        test_archive_ratings,
+        test_session_funnel,
+        test_consistency_check,
+        test_perf_beacon,
+        test_hypothesis_corpus,
+        test_hypothesis_rank_migration,
+        test_content_compression,
+        test_db_maintenance,
+        test_job_queue,
+        test_lazy_translation,
+        test_request_profiler,
+        test_bulk_submit,
+        test_restore_compressed,
+        test_write_backpressure,
+        test_admin_stream_counters,
+        test_warmup_readiness,
+        test_alignment_refresh,
+        test_consistency_refresh,
+        test_content_columns,
+        test_http_caching,
+        test_asset_bundles,
+        test_template_cache
     ]
     
     passed = 0
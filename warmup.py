@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+启动预热与健康检查
+
+- /healthz：存活检查，进程能处理请求即返回200，不访问数据库
+- /readyz：就绪检查，预热完成且数据库可访问时返回200，否则返回503；
+  每次都测量一次SQLite往返延迟（新连接 + 一条索引查询）
+- 预热依次执行 app.py 注册的步骤（建表、加载假设池、缓存各主题的比较数据），
+  最后编译全部模板；gunicorn 在 post_worker_init 中后台启动预热（见 gunicorn.conf.py），
+  python app.py 启动时同步执行
+- 步骤失败（如其他worker正持有写锁）时按 WARMUP_RETRY_DELAY 起指数退避重试，最多 WARMUP_ATTEMPTS 次；
+  仍然失败时，下一次 /readyz 在后台重新预热，worker 不会一直处于未就绪状态
+
+环境变量:
+    READY_MAX_DB_LATENCY_MS=0    数据库往返延迟超过该值时视为未就绪（0表示不限制）
+    WARMUP_ATTEMPTS=3            每个预热步骤的最多尝试次数
+    WARMUP_RETRY_DELAY=1         第一次重试前等待的秒数，之后每次翻倍
+"""
+
+import os
+import sqlite3
+import threading
+import time
+
+from flask import jsonify
+
+READY_MAX_DB_LATENCY_MS = float(os.environ.get('READY_MAX_DB_LATENCY_MS', 0))
+WARMUP_ATTEMPTS = int(os.environ.get('WARMUP_ATTEMPTS', 3))
+WARMUP_RETRY_DELAY = float(os.environ.get('WARMUP_RETRY_DELAY', 1))
+
+# 延迟探测使用的查询：走 predefined_comparisons 的唯一索引，读取真实的数据页
+PROBE_QUERY = "SELECT COUNT(*) FROM predefined_comparisons WHERE topic_name = 'topic1'"
+
+
+def compile_templates(app):
+    """编译全部HTML模板，放入Jinja的模板缓存"""
+    names = [name for name in app.jinja_env.list_templates() if name.endswith('.html')]
+    for name in names:
+        app.jinja_env.get_template(name)
+    return len(names)
+
+
+def probe_database(db_path):
+    """测量一次数据库往返延迟，返回 (是否成功, 毫秒, 错误信息)"""
+    start = time.perf_counter()
+    try:
+        conn = sqlite3.connect(db_path, timeout=1)
+        try:
+            conn.execute(PROBE_QUERY).fetchone()
+        finally:
+            conn.close()
+    except sqlite3.Error as e:
+        return False, (time.perf_counter() - start) * 1000, str(e)
+    return True, (time.perf_counter() - start) * 1000, None
+
+
+def run_step(step, attempts=None, retry_delay=None, sleep=time.sleep):
+    """执行一个步骤，失败时指数退避重试；返回 (结果, 尝试次数)，最后一次的异常原样抛出"""
+    attempts = WARMUP_ATTEMPTS if attempts is None else attempts
+    delay = WARMUP_RETRY_DELAY if retry_delay is None else retry_delay
+    for attempt in range(1, attempts + 1):
+        try:
+            return step(), attempt
+        except Exception as e:
+            if attempt >= attempts:
+                raise
+            print(f"⚠️  预热步骤失败（第{attempt}次），{delay:g} 秒后重试: {e}")
+            sleep(delay)
+            delay *= 2
+
+
+def run(app, sleep=time.sleep):
+    """同步执行全部预热步骤，返回是否成功"""
+    state = app.extensions['warmup']
+    with state['lock']:
+        if state['status'] in ('running', 'ready'):
+            return state['status'] == 'ready'
+        state.update(status='running', error=None, steps=[], started_at=time.time(), finished_at=None)
+
+    steps = list(state['steps_to_run']) + [('templates', lambda: compile_templates(app))]
+    try:
+        for name, step in steps:
+            start = time.perf_counter()
+            result, attempts = run_step(step, sleep=sleep)
+            elapsed = (time.perf_counter() - start) * 1000
+            state['steps'].append({'name': name, 'ms': round(elapsed, 2), 'result': result, 'attempts': attempts})
+            print(f"🔥 预热 {name}: {elapsed:.1f} ms" + (f"（{result}）" if result is not None else ""))
+    except Exception as e:
+        state.update(status='failed', error=str(e), finished_at=time.time())
+        print(f"❌ 预热失败: {e}")
+        return False
+
+    state.update(status='ready', finished_at=time.time())
+    print(f"✅ 预热完成: {(state['finished_at'] - state['started_at']) * 1000:.1f} ms")
+    return True
+
+
+def start(app):
+    """在后台线程中预热，立即返回"""
+    thread = threading.Thread(target=run, args=(app,), name='warmup', daemon=True)
+    thread.start()
+    return thread
+
+
+def init_app(app, db_path, steps):
+    """注册 /healthz、/readyz；steps 为 [(名称, 无参函数)]，函数返回值会显示在 /readyz 中"""
+    app.extensions['warmup'] = {
+        'status': 'pending',
+        'error': None,
+        'steps': [],
+        'steps_to_run': steps,
+        'started_at': None,
+        'finished_at': None,
+        'lock': threading.Lock(),
+    }
+
+    @app.route('/healthz')
+    def healthz():
+        return jsonify({'status': 'ok'})
+
+    @app.route('/readyz')
+    def readyz():
+        state = app.extensions['warmup']
+        if state['status'] == 'failed':
+            # 重试用尽后由就绪检查触发重新预热（后台执行，本次仍返回503）
+            start(app)
+        db_ok, latency_ms, db_error = probe_database(db_path)
+        ready = state['status'] == 'ready' and db_ok
+        if ready and READY_MAX_DB_LATENCY_MS and latency_ms > READY_MAX_DB_LATENCY_MS:
+            ready = False
+            db_error = f'latency above {READY_MAX_DB_LATENCY_MS} ms'
+
+        warmup_ms = None
+        if state['finished_at'] is not None:
+            warmup_ms = round((state['finished_at'] - state['started_at']) * 1000, 2)
+        response = jsonify({
+            'ready': ready,
+            'warmup': {
+                'status': state['status'],
+                'error': state['error'],
+                'ms': warmup_ms,
+                'steps': state['steps'],
+            },
+            'database': {'ok': db_ok, 'latency_ms': round(latency_ms, 3), 'error': db_error},
+        })
+        response.status_code = 200 if ready else 503
+        response.headers['Cache-Control'] = 'no-store'
+        return response
+
+    return app